@@ -0,0 +1,114 @@
+"""Benchmark per-call overhead of get_client with and without the client registry.
+
+Starts a local stub of the OpenAI chat completions endpoint and times
+`get_client(...).generate(...)` the old way (a new SDK client and connection pool for
+every call) and with the shared registry (one SDK client and warm keep-alive
+connections). Also times client construction on its own. The stub answers instantly,
+so the numbers are pure client overhead; against the real API every fresh client also
+pays a TLS handshake (typically 50-150 ms), which the registry avoids too.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_client_reuse --calls 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library import clients
+from search_library.clients import get_client, clear_client_registry, TextPrompt
+
+_COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+}).encode("utf-8")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections: set = set()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        _StubHandler.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_COMPLETION)))
+        self.end_headers()
+        self.wfile.write(_COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def _time_calls(calls: int, fresh: bool) -> dict:
+    clear_client_registry()
+    _StubHandler.connections = set()
+    timings = []
+    for _ in range(calls):
+        if fresh:
+            # Old behavior: nothing is shared between calls
+            clear_client_registry()
+        start = time.perf_counter()
+        client = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+        client.generate([[TextPrompt(text="ping")]], max_tokens=5)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mean_ms": round(1000 * sum(timings) / len(timings), 3),
+        "p50_ms": round(1000 * timings[len(timings) // 2], 3),
+        "p99_ms": round(1000 * timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        "tcp_connections": len(_StubHandler.connections),
+    }
+
+
+def _time_construction(calls: int, fresh: bool) -> float:
+    clear_client_registry()
+    start = time.perf_counter()
+    for _ in range(calls):
+        if fresh:
+            clear_client_registry()
+        get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+    return round(1000 * (time.perf_counter() - start) / calls, 4)
+
+
+def run(calls: int) -> dict:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    try:
+        return {
+            "calls": calls,
+            "http2_available": clients.HTTP2_AVAILABLE,
+            "construction_ms": {
+                "fresh": _time_construction(calls, fresh=True),
+                "registry": _time_construction(calls, fresh=False),
+            },
+            "generate_round_trip": {
+                "fresh": _time_calls(calls, fresh=True),
+                "registry": _time_calls(calls, fresh=False),
+            },
+        }
+    finally:
+        clear_client_registry()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.calls), indent=2))
@@ -0,0 +1,299 @@
+"""Offline end-to-end benchmark of /api/spotify_search against stub providers.
+
+Starts the stub servers (benchmarks/stub_providers.py) and the API (uvicorn main:app)
+in subprocesses, with every provider URL and key pointed at the stubs, then for each
+library size:
+
+- cold: one search by a new user with an empty database, so every track is enriched
+  (lyrics, web search, metadata LLM call, embedding, save); only for sizes up to
+  --cold-max-songs, as enrichment dominates and scales linearly
+- warm: the database holds every track already enriched; for each concurrency level,
+  --rounds x concurrency searches by `concurrency` users, issued by that many clients
+
+For every phase it reports request latency and time to first event percentiles,
+per-stage percentiles of each request's `stage_timings` (the traced stages of
+search_library/tracing.py, summed per request), throughput, the API process's peak
+RSS, and calls per stub route. Queries differ across requests so LLM responses are
+not served from the cache. The JSON report includes the commit, so results can be
+tracked across commits (--output writes it to a file too).
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --sizes 100 --concurrency 1 4 --latency-scale 0
+    python -m benchmarks.bench_e2e --set openai.rate_limit_rps=20 --set genius.error_rate=0.05 --output e2e.json
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A JWT-shaped key, which supabase.create_client requires
+STUB_SUPABASE_KEY = 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.YmVuY2g'
+MOODS = ('sad', 'upbeat', 'dreamy', 'angry', 'nostalgic', 'romantic', 'lonely', 'hopeful')
+TOPICS = ('rain', 'summer nights', 'leaving home', 'the ocean', 'city lights', 'heartbreak', 'driving fast', 'winter')
+QUERIES = [f"{mood} songs about {topic}" for mood, topic in itertools.product(MOODS, TOPICS)]
+REQUEST_TIMEOUT_SECONDS = 900.0
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    data = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {'p50': round(p50, 1), 'p95': round(p95, 1), 'p99': round(p99, 1), 'max': round(float(data.max()), 1), 'mean': round(float(data.mean()), 1)}
+
+
+class Stubs:
+    """The stub provider servers, in a subprocess."""
+
+    def __init__(self, settings: list[str], latency_scale: float):
+        command = [sys.executable, '-m', 'benchmarks.stub_providers', '--latency-scale', str(latency_scale)]
+        for setting in settings:
+            command += ['--set', setting]
+        self.process = subprocess.Popen(command, cwd=BACKEND_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        ready = json.loads(self.process.stdout.readline())
+        self.urls: dict[str, str] = ready['urls']
+        self.configs: dict = ready['configs']
+
+    def reset(self, **options) -> None:
+        for name, url in self.urls.items():
+            httpx.post(f"{url}/_stub/reset", json=options.get(name, {}), timeout=120).raise_for_status()
+
+    def stats(self) -> dict:
+        return {name: httpx.get(f"{url}/_stub/stats", timeout=30).json() for name, url in self.urls.items()}
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+class Server:
+    """The API under test (uvicorn main:app), in a subprocess configured to use the stubs."""
+
+    def __init__(self, stubs: Stubs, port: int, log_path: str):
+        env = {
+            **os.environ,
+            'SPOTIFY_API_URL': stubs.urls['spotify'],
+            'SPOTIFY_ACCOUNTS_URL': stubs.urls['spotify'],
+            'SPOTIFY_CLIENT_ID': 'bench-client',
+            'SPOTIFY_CLIENT_SECRET': 'bench-secret',
+            'GENIUS_API_URL': stubs.urls['genius'],
+            'BRAVE_API_URL': f"{stubs.urls['brave']}/res/v1/web/search",
+            'BRAVE_API_KEY': 'bench-brave-key',
+            'OPENAI_BASE_URL': f"{stubs.urls['openai']}/v1",
+            'OPENAI_API_KEY': 'sk-bench-0000000000000000',
+            'SUPABASE_URL': stubs.urls['supabase'],
+            'SUPABASE_SERVICE_ROLE_KEY': STUB_SUPABASE_KEY,
+            # Set (to nothing) so .env.local files can't switch real credentials on
+            'ANTHROPIC_API_KEY': '',
+            'ANTHROPIC_BASE_URL': stubs.urls['openai'],
+            'GENIUS_ACCESS_TOKEN': '',
+            'BD_ISP_USERNAME': '',
+            'BD_ISP_PASSWORD': '',
+            'LLM_CACHE_DIR': '',
+            'HARDCODE_SONG_COUNT': '0',
+            'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+            'NO_PROXY': '127.0.0.1,localhost',
+            'no_proxy': '127.0.0.1,localhost',
+        }
+        self.url = f"http://127.0.0.1:{port}"
+        self.log_path = log_path
+        self.log = open(log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+            cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + 120
+        while True:
+            try:
+                if httpx.get(f"{self.url}/metrics", timeout=2).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.close()
+                with open(log_path) as log:
+                    raise RuntimeError(f"API server did not start:\n{log.read()[-2000:]}")
+            time.sleep(0.2)
+
+    def _status(self) -> dict[str, int]:
+        with open(f"/proc/{self.process.pid}/status") as status:
+            return {key: int(value.split()[0]) for key, value in (line.split(':', 1) for line in status) if key in ('VmRSS', 'VmHWM')}
+
+    def reset_peak_rss(self) -> bool:
+        """Restart the peak RSS (VmHWM) count; False where the kernel doesn't allow it."""
+        try:
+            with open(f"/proc/{self.process.pid}/clear_refs", 'w') as clear_refs:
+                clear_refs.write('5')
+            return True
+        except OSError:
+            return False
+
+    def memory_mb(self) -> dict:
+        try:
+            status = self._status()
+        except OSError:
+            return {}
+        return {'rss_mb': round(status['VmRSS'] / 1024, 1), 'peak_rss_mb': round(status['VmHWM'] / 1024, 1)}
+
+    def metrics(self) -> dict:
+        """The provider error and cache counters from /metrics."""
+        text = httpx.get(f"{self.url}/metrics", timeout=30).text
+        counters: dict[str, dict] = {}
+        for line in text.splitlines():
+            match = re.match(r'search_(provider_errors|cache_requests)_total\{(.*)\} (\S+)$', line)
+            if match:
+                counters.setdefault(match.group(1), {})[match.group(2).replace('"', '')] = float(match.group(3))
+        return counters
+
+    def close(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def search(server_url: str, user: str, query: str) -> dict:
+    """Run one search and time it from the client side."""
+    start = time.perf_counter()
+    record = {'ok': False, 'first_event_ms': None, 'events': 0}
+    try:
+        with httpx.stream(
+            'GET', f"{server_url}/api/spotify_search", params={'query': query},
+            headers={'Authorization': f"Bearer {user}", 'Accept-Encoding': 'identity'},
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith('data: '):
+                    continue
+                if record['first_event_ms'] is None:
+                    record['first_event_ms'] = 1000 * (time.perf_counter() - start)
+                record['events'] += 1
+                event = json.loads(line[len('data: '):])
+                if event.get('type') == 'results':
+                    token_usage = event.get('token_usage', {})
+                    record.update(ok=True, results=len(event.get('results', [])),
+                                  instant=bool(token_usage.get('instant_search')),
+                                  stage_timings=token_usage.get('stage_timings', {}),
+                                  degradations=[degradation['name'] for degradation in event.get('degradations', [])])
+                elif event.get('type') == 'error':
+                    record['error'] = event.get('error')
+    except httpx.HTTPError as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['latency_ms'] = 1000 * (time.perf_counter() - start)
+    return record
+
+
+def run_phase(server: Server, stubs: Stubs, phase: str, size: int, concurrency: int, requests: int, queries: itertools.cycle) -> dict:
+    stubs.reset()
+    phase_peak = server.reset_peak_rss()
+    jobs = [(f"bench-{phase}-{size}-u{i % concurrency}", next(queries)) for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        records = list(executor.map(lambda job: search(server.url, *job), jobs))
+    wall = time.perf_counter() - start
+
+    stage_totals: dict[str, list[float]] = {}
+    for record in records:
+        for stage, timing in record.get('stage_timings', {}).items():
+            stage_totals.setdefault(stage, []).append(timing['total_ms'])
+    errors = [record.get('error') or 'no results event' for record in records if not record['ok']]
+    return {
+        'phase': phase,
+        'library_size': size,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        **({'error_samples': sorted(set(errors))[:5]} if errors else {}),
+        'instant_matches': sum(1 for record in records if record.get('instant')),
+        # Requests that skipped or cut short stages to meet their deadline, by degradation
+        'degradations': dict(collections.Counter(name for record in records for name in record.get('degradations', []))),
+        'wall_s': round(wall, 2),
+        'throughput_rps': round(requests / wall, 3),
+        'latency_ms': _percentiles([record['latency_ms'] for record in records]),
+        'first_event_ms': _percentiles([record['first_event_ms'] for record in records if record['first_event_ms'] is not None]),
+        'stages_ms': {stage: {'requests': len(totals), **_percentiles(totals)} for stage, totals in stage_totals.items()},
+        'memory': {**server.memory_mb(), 'peak_scope': 'phase' if phase_peak else 'process'},
+        'provider_calls': stubs.stats(),
+    }
+
+
+def run(sizes: list[int], concurrency_levels: list[int], rounds: int, cold_max_songs: int, settings: list[str], latency_scale: float, port: int) -> dict:
+    stubs = Stubs(settings, latency_scale)
+    log_file = tempfile.NamedTemporaryFile(prefix='bench_e2e_server_', suffix='.log', delete=False)
+    log_file.close()
+    server = None
+    phases = []
+    queries = itertools.cycle(QUERIES)
+    try:
+        server = Server(stubs, port, log_file.name)
+        for size in sizes:
+            if size <= cold_max_songs:
+                stubs.reset(spotify={'library_size': size}, supabase={'clear': True})
+                phases.append(run_phase(server, stubs, 'cold', size, 1, 1, queries))
+            stubs.reset(spotify={'library_size': size}, supabase={'clear': True, 'seed_songs': size})
+            for concurrency in concurrency_levels:
+                phases.append(run_phase(server, stubs, 'warm', size, concurrency, rounds * concurrency, queries))
+        server_metrics = server.metrics()
+    finally:
+        if server is not None:
+            server.close()
+        stubs.close()
+    return {
+        'commit': _git_commit(),
+        'config': {
+            'sizes': sizes,
+            'concurrency': concurrency_levels,
+            'rounds': rounds,
+            'cold_max_songs': cold_max_songs,
+            'stubs': stubs.configs,
+        },
+        'phases': phases,
+        'server_metrics': server_metrics,
+        'server_log': log_file.name,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100, 1000, 10000], help="Library sizes (tracks)")
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4, 16], help="Concurrent clients for warm searches")
+    parser.add_argument("--rounds", type=int, default=2, help="Warm searches per client")
+    parser.add_argument("--cold-max-songs", type=int, default=1000, help="Largest library to also run cold")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every stub's default latency (0: pipeline overhead only)")
+    parser.add_argument("--set", action="append", default=[], metavar="PROVIDER.FIELD=VALUE", help="Stub setting, see benchmarks/stub_providers.py")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    report = run(args.sizes, args.concurrency, args.rounds, args.cold_max_songs, args.set, args.latency_scale, args.port)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
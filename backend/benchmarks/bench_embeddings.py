@@ -0,0 +1,88 @@
+"""Benchmark embedding memory footprint, serialized size and decode time per song.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_embeddings --songs 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.embeddings import (
+    decode_embedding,
+    encode_embedding_for_db,
+    encode_embedding_base64,
+    quantize_float16,
+    quantize_int8,
+)
+
+
+def _list_nbytes(values: list[float]) -> int:
+    """Memory held by a list of Python floats (list object + one boxed float per entry)."""
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+def _time_per_item(fn, items) -> float:
+    t0 = time.perf_counter()
+    for item in items:
+        fn(item)
+    return 1e6 * (time.perf_counter() - t0) / len(items)
+
+
+def run(songs: int, dimensions: int) -> dict:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(0, 0.02, size=(songs, dimensions)).astype(np.float32)
+    as_lists = [vector.tolist() for vector in vectors]
+    json_texts = [json.dumps(values) for values in as_lists]
+    pgvector_texts = [encode_embedding_for_db(vector) for vector in vectors]
+    base64_texts = [encode_embedding_base64(vector) for vector in vectors]
+    int8_vectors = [quantize_int8(vector) for vector in vectors]
+
+    int8_error = float(np.mean([np.max(np.abs(q.to_float32() - v)) for q, v in zip(int8_vectors, vectors)]))
+    float16_error = float(np.mean([np.max(np.abs(quantize_float16(v).astype(np.float32) - v)) for v in vectors]))
+
+    return {
+        'songs': songs,
+        'dimensions': dimensions,
+        'memory_bytes_per_song': {
+            'list_of_floats': _list_nbytes(as_lists[0]),
+            'float32': int(vectors[0].nbytes),
+            'float16': int(quantize_float16(vectors[0]).nbytes),
+            'int8': int8_vectors[0].nbytes,
+        },
+        'wire_bytes_per_song': {
+            'json_floats': len(json_texts[0]),
+            'pgvector_text': len(pgvector_texts[0]),
+            'base64_float32': len(base64_texts[0]),
+        },
+        'decode_us_per_song': {
+            'json_to_list': round(_time_per_item(json.loads, json_texts), 2),
+            'list_to_float32': round(_time_per_item(decode_embedding, as_lists), 2),
+            'pgvector_text_to_float32': round(_time_per_item(decode_embedding, pgvector_texts), 2),
+            'base64_to_float32': round(_time_per_item(decode_embedding, base64_texts), 2),
+            'int8_to_float32': round(_time_per_item(lambda q: q.to_float32(), int8_vectors), 2),
+        },
+        'encode_us_per_song': {
+            'pgvector_text': round(_time_per_item(encode_embedding_for_db, vectors[:500]), 2),
+            'base64_float32': round(_time_per_item(encode_embedding_base64, vectors[:500]), 2),
+        },
+        'mean_max_abs_error': {
+            'float16': float16_error,
+            'int8': int8_error,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+    print(json.dumps(run(args.songs, args.dimensions), indent=2))
@@ -0,0 +1,126 @@
+"""Per-song cost of pipeline logging: the old prints versus leveled, lazy logging.
+
+Replays the log calls one song makes through enrichment (Genius search and song lookup,
+metadata, web search, database save) three ways:
+
+- `print`: the f-string prints this replaced, including `json.dumps(payload)[:200]` of a
+  Genius-sized response, written to /dev/null
+- `logging INFO`: the same calls through search_library.log at INFO, where the per-song
+  DEBUG lines are skipped and the per-song INFO line is sampled
+- `logging DEBUG`: everything enabled, with the asynchronous handler; the calling
+  thread only enqueues records, formatting happens on the listener thread
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_logging --songs 2000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.log import LazyJSON, SAMPLED, configure_logging, flush_logging, get_logger
+
+log = get_logger('bench_logging')
+
+
+def genius_payload(hits: int = 10) -> dict:
+    """A Genius search response of realistic size (~20 KB)."""
+    return {'meta': {'status': 200}, 'response': {'hits': [{
+        'index': 'song', 'type': 'song', 'highlights': [],
+        'result': {
+            'id': 1000 + i, 'title': f'Song {i}', 'full_title': f'Song {i} by Artist {i}',
+            'url': f'https://genius.com/artist-{i}-song-{i}-lyrics', 'lyrics_state': 'complete',
+            'primary_artist': {'id': i, 'name': f'Artist {i}', 'url': f'https://genius.com/artists/artist-{i}',
+                               'image_url': 'https://images.genius.com/' + 'a' * 64 + '.1000x1000x1.jpg'},
+            'release_date_components': {'year': 2001, 'month': 1, 'day': 1},
+            'stats': {'unreviewed_annotations': 3, 'hot': False, 'pageviews': 123456},
+            'song_art_image_url': 'https://images.genius.com/' + 'b' * 64 + '.1000x1000x1.png',
+            'header_image_url': 'https://images.genius.com/' + 'c' * 64 + '.1000x1000x1.png',
+            'featured_artists': [{'id': j, 'name': f'Feature {j}'} for j in range(3)],
+        },
+    } for i in range(hits)]}}
+
+
+def _print_song(i: int, payload: dict) -> None:
+    print(f"[spotify_search] Enriching song: Song {i} - Artist {i}")
+    print(f"[DEBUG] Searching for lyrics for: Song {i} Artist {i}")
+    print(f"[DEBUG] Search URL: https://api.genius.com/search?q=Song {i} Artist {i}")
+    print(f"[DEBUG] Search response status: 200")
+    print(f"[DEBUG] Search data: {json.dumps(payload)[:200]}")
+    print(f"[DEBUG] Song ID: {1000 + i}")
+    print(f"[DEBUG] Song URL: https://api.genius.com/songs/{1000 + i}?text_format=plain")
+    print(f"[DEBUG] Song response status: 200")
+    print(f"[DEBUG] Song data: {json.dumps(payload)[:200]}")
+    print(f"[DEBUG] Lyrics length: 1800")
+    print(f"[DEBUG] Getting song metadata for: Song {i} by Artist {i}")
+    print(f"[DEBUG] LLM call took 0.80s")
+    print(f"[LYRICS SUCCESS] Song {i} - Artist {i} 1536")
+    print(f"[DB SUCCESS] Saved Song {i} to database")
+
+
+def _log_song(i: int, payload: dict) -> None:
+    artists = [f'Artist {i}']
+    log.info("Enriching song: %s - %s", f'Song {i}', artists, extra=SAMPLED)
+    log.debug("Searching for lyrics for: %s", f'Song {i} Artist {i}')
+    log.debug("Search URL: %s", f'https://api.genius.com/search?q=Song {i} Artist {i}')
+    log.debug("Search response status: %s", 200)
+    log.debug("Search data: %s", LazyJSON(payload, 200))
+    log.debug("Song ID: %s", 1000 + i)
+    log.debug("Song URL: %s", f'https://api.genius.com/songs/{1000 + i}?text_format=plain')
+    log.debug("Song response status: %s", 200)
+    log.debug("Song data: %s", LazyJSON(payload, 200))
+    log.debug("Lyrics length: %d", 1800)
+    log.debug("Getting song metadata for: %s by %s", f'Song {i}', artists)
+    log.debug("LLM call took %.2fs", 0.8)
+    log.debug("Enriched %s - %s (%d lyric chars)", f'Song {i}', artists, 1800)
+    log.debug("Saved %s to database", f'Song {i}')
+
+
+def _time_per_song(fn, songs: int, payload: dict) -> float:
+    start = time.perf_counter()
+    for i in range(songs):
+        fn(i, payload)
+    return (time.perf_counter() - start) / songs
+
+
+def run(songs: int) -> dict:
+    payload = genius_payload()
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            print_cost = _time_per_song(_print_song, songs, payload)
+
+        configure_logging('INFO', async_handlers=True, stream=devnull)
+        info_cost = _time_per_song(_log_song, songs, payload)
+        flush_logging()
+
+        configure_logging('DEBUG', async_handlers=True, stream=devnull)
+        debug_cost = _time_per_song(_log_song, songs, payload)
+        start = time.perf_counter()
+        flush_logging()
+        drain = time.perf_counter() - start
+
+    configure_logging('INFO', async_handlers=False, stream=io.StringIO())
+    return {
+        'songs': songs,
+        'payload_bytes': len(json.dumps(payload)),
+        'per_song_us': {
+            'print': round(1e6 * print_cost, 2),
+            'logging_info': round(1e6 * info_cost, 2),
+            'logging_debug_async_caller': round(1e6 * debug_cost, 2),
+        },
+        'debug_listener_drain_ms': round(1000 * drain, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.songs), indent=2))
@@ -0,0 +1,113 @@
+"""Benchmark lyric compaction: prompt tokens saved and (optionally) reranker latency.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_lyrics_compaction --songs 100
+    python -m benchmarks.bench_lyrics_compaction --songs 100 --live   # also calls gpt-4o-mini
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.types import Song
+from search_library.chunking import estimate_tokens
+from search_library.lyrics import compact_song, compact_lyrics, DEFAULT_RERANK_LYRICS_CHARS, DEFAULT_REASONING_LYRICS_CHARS
+from search_library.prompts import get_basic_query
+
+_WORDS = (
+    "love night heart fire rain road dream light time baby gone home cold city river "
+    "dance money sky blue wild young lonely tonight forever never remember lost run"
+).split()
+
+
+def _line(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 9))).capitalize()
+
+
+def synthetic_lyrics(rng: random.Random) -> str:
+    """Genius-style lyrics: annotated verses with a chorus repeated 3-4 times."""
+    chorus = [_line(rng) for _ in range(4)]
+    hook = _line(rng)
+    parts = []
+    for verse in range(rng.randint(2, 3)):
+        parts.append(f"[Verse {verse + 1}]")
+        parts.extend(_line(rng) for _ in range(rng.randint(6, 10)))
+        parts.append("")
+        parts.append("[Chorus]")
+        parts.extend(chorus + [hook, hook])
+        parts.append("")
+    parts.append("[Outro]")
+    parts.extend(chorus + [hook] * 4)
+    return "\n".join(parts) + "\n42Embed"
+
+
+def synthetic_library(count: int, seed: int = 0) -> list[Song]:
+    rng = random.Random(seed)
+    return [
+        Song(
+            id=f"bench-{i}",
+            song_link=f"https://open.spotify.com/track/bench-{i}",
+            album=f"Album {i}",
+            name=f"Song {i}",
+            artists=[f"Artist {i % 50}"],
+            lyrics=synthetic_lyrics(rng),
+            song_metadata="Genre: indie rock. Time period: 2010s. Cultural significance: unknown.",
+        )
+        for i in range(count)
+    ]
+
+
+def run(songs: int, query: str, live: bool) -> dict:
+    library = synthetic_library(songs)
+
+    t0 = time.perf_counter()
+    compacted_library = [compact_song(song, query, DEFAULT_RERANK_LYRICS_CHARS) for song in library]
+    compaction_seconds = time.perf_counter() - t0
+
+    raw_prompt = get_basic_query(library, query, n=10)
+    compacted_prompt = get_basic_query(compacted_library, query, n=10)
+    raw_tokens = estimate_tokens(raw_prompt)
+    compacted_tokens = estimate_tokens(compacted_prompt)
+
+    # The reasoning prompt always compacts, so compare the lyric portion it embeds.
+    raw_reasoning_tokens = sum(estimate_tokens(song.lyrics) for song in library)
+    compacted_reasoning_tokens = sum(estimate_tokens(compact_lyrics(song.lyrics, query, DEFAULT_REASONING_LYRICS_CHARS)) for song in library)
+
+    report = {
+        'songs': songs,
+        'compaction_ms_per_song': round(1000 * compaction_seconds / max(1, songs), 4),
+        'rerank_prompt_tokens_raw': raw_tokens,
+        'rerank_prompt_tokens_compacted': compacted_tokens,
+        'rerank_tokens_saved_pct': round(100 * (1 - compacted_tokens / raw_tokens), 1),
+        'reasoning_lyrics_tokens_raw': raw_reasoning_tokens,
+        'reasoning_lyrics_tokens_compacted': compacted_reasoning_tokens,
+        'reasoning_tokens_saved_pct': round(100 * (1 - compacted_reasoning_tokens / raw_reasoning_tokens), 1),
+    }
+
+    if live:
+        from search_library.clients import get_client
+        from search_library.search import search_library
+
+        client = get_client("openai-direct", model_name="gpt-4o-mini")
+        for label, compact in (('raw', False), ('compacted', True)):
+            t0 = time.perf_counter()
+            _, usage = search_library(client, library, query, n=10, chunk_size=100, compact=compact)
+            report[f'rerank_latency_s_{label}'] = round(time.perf_counter() - t0, 3)
+            report[f'rerank_input_tokens_{label}'] = usage['total_input_tokens']
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=100)
+    parser.add_argument("--query", default="that song that goes lonely tonight in the city")
+    parser.add_argument("--live", action="store_true", help="Also time the real gpt-4o-mini reranker")
+    args = parser.parse_args()
+    print(json.dumps(run(args.songs, args.query, args.live), indent=2))
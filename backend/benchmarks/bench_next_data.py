@@ -0,0 +1,190 @@
+"""Benchmark extracting MusixMatch's `__NEXT_DATA__` from a page: BeautifulSoup vs byte scan.
+
+For each page, times and measures the peak memory (tracemalloc) of getting the fields
+`MusixMatchScraper` uses out of the raw response bytes, three ways:
+
+- `bs4`: decode the page, parse it with `BeautifulSoup(..., "html.parser")`, find the
+  script tag and `json.loads` all of it (the previous implementation)
+- `scan+json`: `next_data.find_next_data` over 64 KB chunks, then `json.loads`
+- `scan+paths`: `find_next_data`, then `next_data.decode_paths` for only the used paths
+
+and checks that all three return the same fields. `read_fraction` is the share of the
+page `find_next_data` consumes before it stops.
+
+The default pages are built to the shape of MusixMatch's lyrics and search pages
+(server-rendered markup, then a `__NEXT_DATA__` holding the page's queries and its UI
+translations, then the script tags). Pass saved pages with --pages to measure real ones;
+pages with a `trackInfo` query are read as lyrics pages, the rest as search pages.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_next_data
+    python -m benchmarks.bench_next_data --pages saved/*.html
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from musixmatch_scraper import SEARCH_PATHS, TRACK_PATHS
+from next_data import NEXT_DATA_CHUNK_SIZE, decode_paths, find_next_data
+
+LYRICS = "\n".join(f"Line {i} of the song, the radio on and the rain on the glass" for i in range(60))
+
+
+def _markup(blocks: int) -> str:
+    row = '<div class="css-175oi2r r-18u37iz"><a href="/lyrics/Artist/Song-{i}" class="css-1jxf684">Song {i}</a><span dir="auto">Artist</span></div>'
+    return ''.join(row.format(i=i) for i in range(blocks))
+
+
+def _messages(count: int) -> dict:
+    return {f"page.component.section{i // 50}.label{i}": f"Translated interface string number {i}" for i in range(count)}
+
+
+def _page(page_props: dict, blocks: int) -> bytes:
+    next_data = {
+        'props': {'pageProps': page_props, '__N_SSP': True},
+        'page': '/[lang]/lyrics/[artist]/[track]',
+        'query': {'lang': 'en', 'artist': 'Artist', 'track': 'Song'},
+        'buildId': 'mxm-build-0001',
+        'isFallback': False,
+        'gssp': True,
+        'locale': 'en',
+        'locales': ['en', 'es', 'it', 'de', 'fr', 'pt'],
+        'scriptLoader': [],
+    }
+    scripts = ''.join(f'<script src="/_next/static/chunks/{i:04d}-a1b2c3d4e5f6.js" defer=""></script>' for i in range(40))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charSet="utf-8"/><title>Song lyrics</title>'
+        '<link rel="preload" href="/_next/static/css/app.css" as="style"/></head><body><div id="__next">'
+        f'{_markup(blocks)}</div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(page_props and next_data)}</script>'
+        f'{scripts}</body></html>'
+    ).encode()
+
+
+def track_page() -> bytes:
+    related = [{'id': i, 'name': f"Related Song {i}", 'artistName': f"Artist {i}", 'lyrics': {'snippet': LYRICS[:300]}} for i in range(80)]
+    return _page({
+        'messages': _messages(3000),
+        'data': {
+            'trackInfo': {'data': {
+                'track': {'id': 1, 'name': 'Song', 'artistName': 'Artist', 'releaseDate': '2016-02-19T00:00:00Z', 'spotifyId': '4uLU6hMCjMI75M1A2tKUQC'},
+                'lyrics': {'id': 1, 'body': LYRICS, 'language': 'en', 'copyright': 'Writer(s): Someone'},
+            }},
+            'albumGet': {'data': {'name': 'Album', 'trackCount': 12, 'releaseDate': 1455840000000}},
+            'creditsTrackCollaboratorsGet': {'data': [{'name': f"Writer {i}", 'roles': [{'name': 'Writer'}, {'name': 'Composer'}]} for i in range(4)]},
+            'artistTracksGet': {'data': related},
+            'relatedTracksGet': {'data': related},
+        },
+    }, blocks=1200)
+
+
+def search_page() -> bytes:
+    tracks = [{'id': i, 'name': f"Song {i}", 'artistName': f"Artist {i}", 'albumName': f"Album {i}", 'spotifyId': f"{i:022d}", 'releaseDate': '2010-01-01T00:00:00Z'} for i in range(100)]
+    return _page({
+        'messages': _messages(3000),
+        'data': {'searchGet': {'data': {'tracks': tracks, 'artists': [{'id': i, 'name': f"Artist {i}"} for i in range(50)]}}},
+    }, blocks=800)
+
+
+def _select(json_data: dict, paths: dict[str, tuple[str, ...]]) -> dict:
+    """The values at `paths` of fully decoded JSON, as `decode_paths` returns them."""
+    selected = {}
+    for name, path in paths.items():
+        value = json_data
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            selected[name] = value
+    return selected
+
+
+def _chunks(page: bytes) -> list[bytes]:
+    return [page[i:i + NEXT_DATA_CHUNK_SIZE] for i in range(0, len(page), NEXT_DATA_CHUNK_SIZE)]
+
+
+def extract_bs4(page: bytes, paths: dict) -> dict:
+    soup = BeautifulSoup(page.decode('utf-8'), "html.parser")
+    script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
+    return _select(json.loads(script_tag.string), paths)
+
+
+def extract_scan_json(chunks: list[bytes], paths: dict) -> dict:
+    return _select(json.loads(find_next_data(iter(chunks))), paths)
+
+
+def extract_scan_paths(chunks: list[bytes], paths: dict) -> dict:
+    return decode_paths(find_next_data(iter(chunks)), paths)
+
+
+def measure(fn, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    ms = 1e3 * min(timer.repeat(repeat=repeat, number=number)) / number
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': round(ms, 3), 'peak_kb': round(peak / 1024, 1)}
+
+
+def run_page(name: str, page: bytes, repeat: int) -> dict:
+    paths = TRACK_PATHS if b'"trackInfo"' in page else SEARCH_PATHS
+    chunks = _chunks(page)
+    consumed = 0
+
+    def counted():
+        nonlocal consumed
+        for chunk in chunks:
+            consumed += len(chunk)
+            yield chunk
+
+    script = find_next_data(counted())
+    expected = extract_bs4(page, paths)
+    results = {
+        'bs4': measure(lambda: extract_bs4(page, paths), repeat),
+        'scan+json': measure(lambda: extract_scan_json(chunks, paths), repeat),
+        'scan+paths': measure(lambda: extract_scan_paths(chunks, paths), repeat),
+    }
+    baseline = results['bs4']
+    for result in results.values():
+        result['speedup'] = round(baseline['ms'] / result['ms'], 1)
+        result['memory_reduction'] = round(baseline['peak_kb'] / result['peak_kb'], 1)
+    return {
+        'page': name,
+        'kind': 'track' if paths is TRACK_PATHS else 'search',
+        'page_kb': round(len(page) / 1024, 1),
+        'next_data_kb': round(len(script) / 1024, 1),
+        'read_fraction': round(consumed / len(page), 3),
+        'same_result': extract_scan_json(chunks, paths) == expected and extract_scan_paths(chunks, paths) == expected,
+        'results': results,
+    }
+
+
+def run(pages: list[str], repeat: int = 5) -> dict:
+    if pages:
+        loaded = []
+        for path in pages:
+            with open(path, 'rb') as f:
+                loaded.append((os.path.basename(path), f.read()))
+    else:
+        loaded = [('track (synthetic)', track_page()), ('search (synthetic)', search_page())]
+    return {'chunk_bytes': NEXT_DATA_CHUNK_SIZE, 'pages': [run_page(name, page, repeat) for name, page in loaded]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs='+', default=[], help="Saved MusixMatch pages (default: synthetic lyrics and search pages)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.pages, args.repeat), indent=2))
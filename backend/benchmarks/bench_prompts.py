@@ -0,0 +1,191 @@
+"""Microbenchmarks for prompt construction, response decoding and song objects.
+
+Times, per call, with realistic songs (1.8k chars of lyrics, 700 of metadata, a 1536-d
+embedding):
+
+- `Song.__str__` (also for RawSong and a loaded LazySong), the block every song adds
+  to a reranker prompt
+- `prompts.get_basic_query` for a library of each --sizes (the reranker sends chunks of
+  up to 1000 songs), with the prompt's size and cost per song
+- `decode_assistant_response` for 10 and 100 returned IDs, and
+  `decode_individual_song_reasoning`
+- `Song` / `RawSong` construction and `dataclasses.asdict` for each --sizes
+
+Each case is the best of several repeats. Results are compared with a baseline file
+(default benchmarks/baselines/bench_prompts.json): a case regresses when it is slower
+than its baseline by more than its threshold (the file's `thresholds`, else
+`default_threshold`). Baselines are scaled by a calibration loop timed on both
+machines, so a baseline recorded elsewhere still roughly applies. With --check the exit
+status is 1 when anything regressed.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_prompts
+    python -m benchmarks.bench_prompts --check
+    python -m benchmarks.bench_prompts --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+from dataclasses import asdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.prompts import decode_assistant_response, decode_individual_song_reasoning, get_basic_query
+from search_library.types import LazySong, RawSong, Song
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'bench_prompts.json')
+DEFAULT_THRESHOLD = 1.75
+QUERY = "that song about driving home in the rain with the radio on"
+LYRICS_CHARS = 1800
+METADATA_CHARS = 700
+DIMENSIONS = 1536
+
+
+def _text(line: str, chars: int) -> str:
+    return (line * (chars // len(line) + 1))[:chars]
+
+
+def _song_fields(i: int) -> dict:
+    return {
+        'id': f"{i:022d}",
+        'song_link': f"https://open.spotify.com/track/{i:022d}",
+        'album': f"Album {i}",
+        'name': f"Song {i}",
+        'artists': [f"Artist {i}", "Featured Artist"],
+    }
+
+
+def make_songs(count: int) -> list[Song]:
+    rng = np.random.default_rng(0)
+    lyrics = _text("and I keep running back to the start of the road tonight\n", LYRICS_CHARS)
+    metadata = _text("Genre: indie rock. Time period: 2010s. Movement: blog-era revival. ", METADATA_CHARS)
+    embedding = rng.normal(0, 0.02, size=DIMENSIONS).astype(np.float32)
+    return [Song(**_song_fields(i), lyrics=lyrics, song_metadata=metadata, embedding=embedding.copy()) for i in range(count)]
+
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Best microseconds per call over `repeat` repeats of about 0.2 s each."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return 1e6 * min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def calibrate() -> float:
+    """Microseconds for a fixed string formatting and joining workload, to scale baselines across machines."""
+    return time_call(lambda: '\n'.join([f"{i}: {'x' * (i % 7)}" for i in range(1000)]), repeat=10)
+
+
+def run(sizes: list[int]) -> dict:
+    # Calibrated before and after the cases, keeping the best, so a noisy moment doesn't skew the scale
+    calibration = calibrate()
+    cases: dict[str, dict] = {}
+    song = make_songs(1)[0]
+    raw_song = RawSong(**_song_fields(0))
+    lazy_song = LazySong(**_song_fields(0))
+    lazy_song.set_heavy_fields(song.lyrics, song.song_metadata, song.embedding)
+
+    cases['song_str'] = {'us': time_call(song.__str__)}
+    cases['raw_song_str'] = {'us': time_call(raw_song.__str__)}
+    cases['lazy_song_str'] = {'us': time_call(lazy_song.__str__)}
+
+    for size in sizes:
+        songs = make_songs(size)
+        us = time_call(lambda: get_basic_query(songs, QUERY, n=10))
+        cases[f'get_basic_query/{size}'] = {
+            'us': us,
+            'us_per_song': us / size,
+            'prompt_chars': len(get_basic_query(songs, QUERY, n=10)),
+        }
+
+    for count in (10, 100):
+        response = '\n'.join(f"<song_id>{i:022d}</song_id>" for i in range(count))
+        cases[f'decode_assistant_response/{count}'] = {'us': time_call(lambda: decode_assistant_response(response))}
+    with_reasons = '\n'.join(f"<song_id>{i:022d}</song_id>\n<reason>The chorus matches the query.</reason>" for i in range(10))
+    cases['decode_assistant_response/10_with_reasons'] = {'us': time_call(lambda: decode_assistant_response(with_reasons, generate_song_reasoning=True))}
+    reasoning = "<filter_out>false</filter_out>\n<reason>Same rainy, late-night drive as the query.</reason>"
+    cases['decode_individual_song_reasoning'] = {'us': time_call(lambda: decode_individual_song_reasoning(reasoning))}
+
+    lyrics, metadata, embedding = song.lyrics, song.song_metadata, song.embedding
+    for size in sizes:
+        field_sets = [_song_fields(i) for i in range(size)]
+        songs = make_songs(size)
+        raw_songs = [RawSong(**fields) for fields in field_sets]
+        cases[f'raw_song_construct/{size}'] = {'us': time_call(lambda: [RawSong(**fields) for fields in field_sets])}
+        cases[f'song_construct/{size}'] = {'us': time_call(
+            lambda: [Song(**fields, lyrics=lyrics, song_metadata=metadata, embedding=embedding) for fields in field_sets]
+        )}
+        cases[f'lazy_song_construct/{size}'] = {'us': time_call(lambda: [LazySong(**fields) for fields in field_sets])}
+        cases[f'raw_song_asdict/{size}'] = {'us': time_call(lambda: [asdict(raw) for raw in raw_songs])}
+        cases[f'song_asdict/{size}'] = {'us': time_call(lambda: [asdict(s) for s in songs])}
+
+    for case in cases.values():
+        for key, value in case.items():
+            if isinstance(value, float):
+                case[key] = round(value, 3)
+    return {'calibration_us': round(min(calibration, calibrate()), 3), 'cases': cases}
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Per-case ratio to the (calibration-scaled) baseline, and the cases over their threshold."""
+    scale = result['calibration_us'] / baseline['calibration_us']
+    thresholds = baseline.get('thresholds', {})
+    default_threshold = baseline.get('default_threshold', DEFAULT_THRESHOLD)
+    comparison = {}
+    for name, case in result['cases'].items():
+        if name not in baseline['cases']:
+            continue
+        expected = baseline['cases'][name] * scale
+        threshold = thresholds.get(name, default_threshold)
+        ratio = case['us'] / expected
+        comparison[name] = {'baseline_us': round(expected, 3), 'ratio': round(ratio, 3), 'threshold': threshold, 'regressed': ratio > threshold}
+    return {
+        'calibration_scale': round(scale, 3),
+        'cases': comparison,
+        'regressions': [name for name, case in comparison.items() if case['regressed']],
+    }
+
+
+def save_baseline(result: dict, path: str) -> None:
+    """Write the result's timings as the new baseline, keeping any thresholds already set."""
+    thresholds, default_threshold = {}, DEFAULT_THRESHOLD
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        thresholds = previous.get('thresholds', {})
+        default_threshold = previous.get('default_threshold', DEFAULT_THRESHOLD)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'calibration_us': result['calibration_us'],
+            'default_threshold': default_threshold,
+            'thresholds': thresholds,
+            'cases': {name: case['us'] for name, case in result['cases'].items()},
+        }, f, indent=2)
+        f.write('\n')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[100, 1000, 10000], help="Library sizes")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case regressed")
+    args = parser.parse_args()
+
+    result = run(args.sizes)
+    if args.save_baseline:
+        save_baseline(result, args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            result['comparison'] = compare(result, json.load(f))
+    print(json.dumps(result, indent=2))
+    if args.check and result.get('comparison', {}).get('regressions'):
+        sys.exit(1)
@@ -0,0 +1,90 @@
+"""Benchmark the size and serialization time of the final `results` SSE event.
+
+Compares the old payload (asdict of every song + json.dumps, embedding included) with
+the slim payload from `sse.song_to_result`, serialized with `sse.dumps` and compressed
+with each supported content encoding.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_sse_payload --results 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.types import Song
+from sse import SSEEncoder, SUPPORTED_ENCODINGS, song_to_result
+
+
+def _make_results(count: int, lyrics_chars: int, dimensions: int) -> list[Song]:
+    rng = np.random.default_rng(0)
+    line = "and I keep running back to the start of the road tonight\n"
+    lyrics = (line * (lyrics_chars // len(line) + 1))[:lyrics_chars]
+    return [
+        Song(
+            id=f"spotify:track:{i:022d}",
+            song_link=f"https://open.spotify.com/track/{i:022d}",
+            album=f"Album {i}",
+            name=f"Song {i}",
+            artists=[f"Artist {i}", "Featured Artist"],
+            lyrics=lyrics,
+            song_metadata="Genre: indie rock. Time period: 2010s. " * 20,
+            reasoning="The chorus is about leaving home and coming back, which matches the query. " * 2,
+            embedding=rng.normal(0, 0.02, size=dimensions).astype(np.float32),
+        )
+        for i in range(count)
+    ]
+
+
+def _best_of(fn, repeats: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 3)
+
+
+def run(results: int, lyrics_chars: int, dimensions: int) -> dict:
+    songs = _make_results(results, lyrics_chars, dimensions)
+
+    def old_payload() -> str:
+        dicts = []
+        for song in songs:
+            song_dict = asdict(song)
+            song_dict['embedding'] = song_dict['embedding'].tolist()
+            song_dict['artist'] = ', '.join(song.artists)
+            dicts.append(song_dict)
+        return f"data: {json.dumps({'type': 'results', 'results': dicts})}\n\n"
+
+    def slim_payload(encoding):
+        encoder = SSEEncoder(encoding=encoding)
+        return encoder.event({'type': 'results', 'results': [song_to_result(song) for song in songs]}) + encoder.finish()
+
+    report = {
+        'results': results,
+        'old': {'bytes': len(old_payload().encode('utf-8')), 'serialize_ms': _best_of(old_payload)},
+    }
+    for encoding in (None, *SUPPORTED_ENCODINGS):
+        report[f"slim_{encoding or 'identity'}"] = {
+            'bytes': len(slim_payload(encoding)),
+            'serialize_ms': _best_of(lambda: slim_payload(encoding)),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=10)
+    parser.add_argument("--lyrics-chars", type=int, default=3000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    args = parser.parse_args()
+    print(json.dumps(run(args.results, args.lyrics_chars, args.dimensions), indent=2))
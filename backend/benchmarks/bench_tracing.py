@@ -0,0 +1,109 @@
+"""Cost of stage tracing per span and as a share of a search request.
+
+Times an empty `with span(...)` block nested inside a request trace, with tracing on and
+off, against a bare loop, and the same for a span opened on a worker thread through
+`propagate`. It then estimates the share of a request spent on tracing for a request
+that enriches --songs new songs: every song opens about a dozen spans (lyrics,
+metadata, web search, Brave, page fetch, LLM, embedding, ...) and the fixed stages add
+a few dozen more. Against --request-seconds of wall time (enrichment is network bound,
+typically several seconds for a few hundred songs) the share should stay below 1%.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_tracing --iterations 200000
+    python -m benchmarks.bench_tracing --songs 500 --request-seconds 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.metrics import REGISTRY
+from search_library.tracing import propagate, set_tracing_enabled, span, trace_request
+
+# Spans opened per enriched song and per request outside enrichment
+SPANS_PER_SONG = 12
+FIXED_SPANS_PER_REQUEST = 40
+
+
+def _time_spans(iterations: int) -> float:
+    """Mean seconds per span, opened inside a request and a parent span."""
+    with trace_request('bench_tracing'):
+        with span('bench_parent'):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                with span('bench_stage', index=1):
+                    pass
+            return (time.perf_counter() - start) / iterations
+
+
+def _time_bare_loop(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    return (time.perf_counter() - start) / iterations
+
+
+def _time_propagated(calls: int) -> float:
+    """Mean seconds to run a one-span function on a worker thread, with propagate."""
+    def work():
+        with span('bench_worker'):
+            pass
+
+    with trace_request('bench_tracing'), ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(work).result()  # start the worker thread outside the timing
+        start = time.perf_counter()
+        for _ in range(calls):
+            executor.submit(propagate(work)).result()
+        propagated = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(calls):
+            executor.submit(work).result()
+        plain = time.perf_counter() - start
+    return (propagated - plain) / calls
+
+
+def run(iterations: int, songs: int, request_seconds: float) -> dict:
+    bare = _time_bare_loop(iterations)
+    try:
+        set_tracing_enabled(False)
+        disabled = _time_spans(iterations) - bare
+        set_tracing_enabled(True)
+        enabled = _time_spans(iterations) - bare
+        propagate_cost = _time_propagated(max(1, iterations // 100))
+    finally:
+        set_tracing_enabled(True)
+        REGISTRY.clear()
+
+    spans = FIXED_SPANS_PER_REQUEST + SPANS_PER_SONG * songs
+    # Every enrichment worker submission is wrapped by propagate once per song
+    tracing_seconds = spans * enabled + songs * propagate_cost
+    return {
+        'iterations': iterations,
+        'span_us': {
+            'enabled': round(1e6 * enabled, 2),
+            'disabled': round(1e6 * disabled, 2),
+        },
+        'propagate_us': round(1e6 * propagate_cost, 2),
+        'request_estimate': {
+            'songs': songs,
+            'spans': spans,
+            'request_seconds': request_seconds,
+            'tracing_ms': round(1000 * tracing_seconds, 2),
+            'overhead_pct': round(100 * tracing_seconds / request_seconds, 4),
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--songs", type=int, default=200, help="New songs enriched by the modelled request")
+    parser.add_argument("--request-seconds", type=float, default=10.0, help="Wall time of the modelled request")
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations, args.songs, args.request_seconds), indent=2))
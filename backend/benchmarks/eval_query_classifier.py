@@ -0,0 +1,134 @@
+"""Evaluate (and optionally retrain) the local lyric-query classifier.
+
+Reads the labeled queries in benchmarks/data/lyric_queries.jsonl and reports how many
+queries `classify_lyric_query` decides locally (LLM calls avoided), how accurate those
+local decisions are, and how many queries fall in the uncertain band and still need the
+LLM.
+
+The queries are split into a fixed training split, which the shipped WEIGHTS are fitted
+on, and a held-out split they never see. `held_out` is the number to quote; `training`
+is reported only to show the gap. Cross-validation (weights refit on each fold's
+training part) gives a second held-out estimate over all the queries.
+
+Run from the backend directory:
+
+    python -m benchmarks.eval_query_classifier
+    python -m benchmarks.eval_query_classifier --train   # print WEIGHTS fitted on the training split
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library import query_classifier
+from search_library.query_classifier import (
+    LYRIC, UNCERTAIN, FEATURE_NAMES, classify_lyric_query, query_features,
+)
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lyric_queries.jsonl")
+# Every HOLDOUT_EVERY-th query (in a fixed shuffle) is held out of training
+HOLDOUT_EVERY = 3
+SPLIT_SEED = 0
+
+
+def load_queries(path: str = DATA_PATH) -> list[tuple[str, bool]]:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["query"], bool(row["lyric"])) for row in rows]
+
+
+def split_queries(queries: list[tuple[str, bool]], every: int = HOLDOUT_EVERY, seed: int = SPLIT_SEED) -> tuple[list, list]:
+    """Split into (training, held-out) queries; the same split on every run."""
+    order = np.random.default_rng(seed).permutation(len(queries))
+    held_out_idx = set(order[::every].tolist())
+    train = [q for i, q in enumerate(queries) if i not in held_out_idx]
+    held_out = [q for i, q in enumerate(queries) if i in held_out_idx]
+    return train, held_out
+
+
+def fit_weights(queries: list[tuple[str, bool]], l2: float = 0.003, steps: int = 20000, learning_rate: float = 0.5) -> tuple[float, ...]:
+    """Fit logistic regression weights with L2-regularized gradient descent."""
+    X = np.array([query_features(query) for query, _ in queries])
+    y = np.array([float(label) for _, label in queries])
+    w = np.zeros(X.shape[1])
+    penalty = np.ones_like(w)
+    penalty[0] = 0.0  # bias is not regularized
+    for _ in range(steps):
+        p = 1.0 / (1.0 + np.exp(-X @ w))
+        gradient = X.T @ (p - y) / len(y) + l2 * penalty * w
+        w -= learning_rate * gradient
+    return tuple(round(float(value), 4) for value in w)
+
+
+def evaluate(queries: list[tuple[str, bool]]) -> dict:
+    """Classify every query with the current weights and summarize the decisions."""
+    decided = correct = 0
+    by_reason: dict[str, int] = {}
+    for query, is_lyric in queries:
+        result = classify_lyric_query(query)
+        by_reason[result.reason] = by_reason.get(result.reason, 0) + 1
+        if result.label == UNCERTAIN:
+            continue
+        decided += 1
+        correct += (result.label == LYRIC) == is_lyric
+    total = len(queries)
+    return {
+        "queries": total,
+        "decided_locally": decided,
+        "llm_calls_avoided_pct": round(100 * decided / total, 1) if total else 0.0,
+        "uncertain": total - decided,
+        "local_accuracy_pct": round(100 * correct / decided, 1) if decided else None,
+        "local_correct": correct,
+        "by_reason": by_reason,
+    }
+
+
+def cross_validate(queries: list[tuple[str, bool]], folds: int = 5, seed: int = 0) -> dict:
+    """Refit the weights on each training split and evaluate on the held-out split."""
+    order = np.random.default_rng(seed).permutation(len(queries))
+    shipped = query_classifier.WEIGHTS
+    results = []
+    try:
+        for fold in range(folds):
+            test_idx = set(order[fold::folds].tolist())
+            train = [q for i, q in enumerate(queries) if i not in test_idx]
+            test = [q for i, q in enumerate(queries) if i in test_idx]
+            query_classifier.WEIGHTS = fit_weights(train)
+            results.append(evaluate(test))
+    finally:
+        query_classifier.WEIGHTS = shipped
+
+    total = sum(r["queries"] for r in results)
+    decided = sum(r["decided_locally"] for r in results)
+    correct = sum(r["local_correct"] for r in results)
+    return {
+        "folds": folds,
+        "llm_calls_avoided_pct": round(100 * decided / total, 1),
+        "local_accuracy_pct": round(100 * correct / decided, 1) if decided else None,
+    }
+
+
+def run(path: str = DATA_PATH, train: bool = False) -> dict:
+    queries = load_queries(path)
+    training, held_out = split_queries(queries)
+    report = {
+        "held_out": evaluate(held_out),
+        "training": evaluate(training),
+        "cross_validated": cross_validate(queries),
+    }
+    if train:
+        report["fitted_weights"] = dict(zip(FEATURE_NAMES, fit_weights(training)))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--train", action="store_true", help="Fit weights on the training split and print them")
+    args = parser.parse_args()
+    print(json.dumps(run(args.data, args.train), indent=2))
@@ -0,0 +1,142 @@
+"""Recall@k versus latency of reduced-dimension embedding search.
+
+Compares brute-force cosine search over full 1,536-dimension vectors (the ground truth)
+with inner product search over PCA-reduced vectors at several sizes, each with and
+without rescoring an oversampled candidate set by the full vectors (the `rescore` path
+of search_library.embedding_versions). Truncation is added with --truncate; it is only
+meaningful for corpora from Matryoshka-trained models (text-embedding-3-*), not for
+ada-002 or the synthetic corpus.
+
+Without --embeddings a synthetic corpus is generated that mimics ada-002 output: a large
+shared component (similarities cluster around 0.7-0.9), a low-rank topic structure
+with a decaying spectrum, and isotropic noise. Queries are perturbed corpus vectors. For
+real numbers, export `songs.embedding` to a .npy file (rows = songs) and pass it in.
+
+Run from the backend directory:
+
+    python -m benchmarks.eval_reduced_embeddings
+    python -m benchmarks.eval_reduced_embeddings --embeddings songs.npy --k 10 --dims 128 256
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_library.dim_reduction import PCAProjection, inner_product_top_k, normalize_rows, truncate_embeddings
+from search_library.embedding_versions import RESCORE_OVERSAMPLE
+
+
+def synthetic_corpus(songs: int, queries: int, dimensions: int = 1536, rank: int = 96, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Generate ada-002-like (corpus, queries) as normalized float32 rows."""
+    rng = np.random.default_rng(seed)
+    shared = normalize_rows(rng.standard_normal(dimensions))
+    basis = np.linalg.qr(rng.standard_normal((dimensions, rank)))[0].T
+    spectrum = (np.arange(1, rank + 1) ** -0.8)[:, None]
+    topics = rng.standard_normal((songs, rank))
+    corpus = 2.0 * shared + topics @ (spectrum * basis) + 0.02 * rng.standard_normal((songs, dimensions))
+    targets = rng.integers(0, songs, size=queries)
+    # A query describes its song loosely: perturb both the topics and the noise
+    query_topics = topics[targets] + 0.6 * rng.standard_normal((queries, rank))
+    query_vectors = 2.0 * shared + query_topics @ (spectrum * basis) + 0.02 * rng.standard_normal((queries, dimensions))
+    return normalize_rows(corpus), normalize_rows(query_vectors)
+
+
+def _search(queries: np.ndarray, matrix: np.ndarray, k: int) -> tuple[list[np.ndarray], list[float]]:
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        top, _ = inner_product_top_k(query, matrix, k)
+        timings.append(time.perf_counter() - start)
+        results.append(top)
+    return results, timings
+
+
+def _rescore(queries: np.ndarray, corpus: np.ndarray, candidates: list[np.ndarray], k: int) -> tuple[list[np.ndarray], list[float]]:
+    results, timings = [], []
+    for query, rows in zip(queries, candidates):
+        start = time.perf_counter()
+        top, _ = inner_product_top_k(query, corpus[rows], k)
+        timings.append(time.perf_counter() - start)
+        results.append(rows[top])
+    return results, timings
+
+
+def _recall(results: list[np.ndarray], truth: list[np.ndarray]) -> float:
+    return float(np.mean([len(set(result.tolist()) & set(expected.tolist())) / len(expected) for result, expected in zip(results, truth)]))
+
+
+def _row(name: str, dimensions: int, results, timings, truth, corpus_rows: int) -> dict:
+    timings = sorted(timings)
+    return {
+        'method': name,
+        'dimensions': dimensions,
+        'recall_at_k': round(_recall(results, truth), 4),
+        'p50_ms': round(1000 * timings[len(timings) // 2], 3),
+        'p95_ms': round(1000 * timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'index_mb': round(corpus_rows * dimensions * 4 / 2 ** 20, 1),
+    }
+
+
+def run(corpus: np.ndarray, queries: np.ndarray, k: int, dims: list[int], fit_sample: int, truncate: bool) -> dict:
+    full_results, full_timings = _search(queries, corpus, k)
+    rows = [_row('full', corpus.shape[1], full_results, full_timings, full_results, len(corpus))]
+
+    rng = np.random.default_rng(1)
+    sample = corpus[rng.choice(len(corpus), size=min(fit_sample, len(corpus)), replace=False)]
+    reductions = []
+    for dimensions in dims:
+        projection = PCAProjection.fit(sample, dimensions)
+        reductions.append(('pca', dimensions, projection.project(corpus), projection.project(queries),
+                           float(projection.explained_variance_ratio.sum())))
+        if truncate:
+            reductions.append(('truncate', dimensions, truncate_embeddings(corpus, dimensions), truncate_embeddings(queries, dimensions), None))
+
+    for name, dimensions, reduced_corpus, reduced_queries, variance in reductions:
+        results, timings = _search(reduced_queries, reduced_corpus, k)
+        row = _row(name, dimensions, results, timings, full_results, len(corpus))
+        if variance is not None:
+            row['explained_variance'] = round(variance, 4)
+        rows.append(row)
+
+        candidates, candidate_timings = _search(reduced_queries, reduced_corpus, k * RESCORE_OVERSAMPLE)
+        results, rescore_timings = _rescore(queries, corpus, candidates, k)
+        rows.append(_row(f'{name}+rescore', dimensions, results, [a + b for a, b in zip(candidate_timings, rescore_timings)], full_results, len(corpus)))
+
+    return {
+        'corpus': list(corpus.shape),
+        'queries': len(queries),
+        'k': k,
+        'rescore_oversample': RESCORE_OVERSAMPLE,
+        'results': rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help=".npy file of full-size song embeddings (default: synthetic)")
+    parser.add_argument("--queries", help=".npy file of query embeddings (default: perturbed corpus vectors)")
+    parser.add_argument("--songs", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--fit-sample", type=int, default=20000, help="Songs the PCA projection is fitted on")
+    parser.add_argument("--truncate", action="store_true", help="Also evaluate truncation (Matryoshka models only)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        corpus = normalize_rows(np.load(args.embeddings))
+        if args.queries:
+            queries = normalize_rows(np.load(args.queries))
+        else:
+            rng = np.random.default_rng(0)
+            picked = corpus[rng.integers(0, len(corpus), size=args.num_queries)]
+            queries = normalize_rows(picked + 0.02 * rng.standard_normal(picked.shape))
+    else:
+        corpus, queries = synthetic_corpus(args.songs, args.num_queries)
+    print(json.dumps(run(corpus, queries, args.k, args.dims, args.fit_sample, args.truncate), indent=2))
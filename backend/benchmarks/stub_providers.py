@@ -0,0 +1,706 @@
+"""Local stub servers for the external providers, for offline end-to-end benchmarks.
+
+Each provider gets its own HTTP server that serves just enough of its API for
+/api/spotify_search to run end to end, over a synthetic library of numbered tracks:
+
+- spotify:  /v1/me, /v1/me/playlists, /v1/playlists/{id}/tracks, /v1/tracks, /api/token
+- genius:   /search, /songs/{id}
+- brave:    /res/v1/web/search, linking to pages on the web stub
+- web:      /pages/{key}, HTML articles for trafilatura to extract
+- openai:   /v1/chat/completions (answers in the format each prompt asks for), /v1/embeddings
+- supabase: PostgREST /rest/v1/{table} (select with eq / in filters, insert, upsert) and
+  the match_song_ids, match_songs_v2 and match_song_ids_versioned RPCs, in memory
+
+Every server has its own latency, jitter, error rate and rate limit (see StubConfig):
+over the rate limit a call gets a 429 with Retry-After straight away; otherwise it is
+delayed, and then fails with a 500 with probability error_rate. Every server also
+answers two admin routes, which are neither delayed nor counted:
+
+- GET /_stub/stats: calls per route, injected errors and rate-limited calls
+- POST /_stub/reset: clear the counters; options (JSON body) `{"library_size": n}` on
+  spotify, `{"clear": true, "seed_songs": n}` on supabase to empty the tables and store
+  the first n library tracks as already enriched songs
+
+Spotify playlists hold PLAYLIST_SIZE tracks on one page, which is all the pipeline
+reads of a playlist. Embeddings share a common component, so every song is about
+0.6 similar to every query, like ada-002's narrow similarity range.
+
+Run standalone (prints the base URLs as JSON once listening, serves until interrupted):
+
+    python -m benchmarks.stub_providers --library-size 1000 --set openai.latency_ms=400 --set genius.error_rate=0.05
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+PROVIDERS: tuple[str, ...] = ('spotify', 'genius', 'brave', 'web', 'openai', 'supabase')
+PLAYLIST_SIZE = 1000
+EMBEDDING_DIMENSIONS = 1536
+# Weight of the component shared by all embeddings (cosine between two is about its square)
+EMBEDDING_COMMON_WEIGHT = 0.78
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of one stub server."""
+
+    latency_ms: float = 0.0
+    # Uniformly distributed extra delay, 0 to jitter_ms
+    jitter_ms: float = 0.0
+    # Probability that a call (after its delay) fails with a 500
+    error_rate: float = 0.0
+    # Sustained calls per second before 429s; 0 is unlimited
+    rate_limit_rps: float = 0.0
+    # Calls allowed in a burst above the sustained rate
+    burst: int = 10
+
+
+# Latencies in the range of the real providers' fast calls, kept low enough that a cold
+# 1000-song enrichment finishes in a couple of minutes
+DEFAULT_CONFIGS: dict[str, StubConfig] = {
+    'spotify': StubConfig(latency_ms=40, jitter_ms=20),
+    'genius': StubConfig(latency_ms=60, jitter_ms=30),
+    'brave': StubConfig(latency_ms=80, jitter_ms=40),
+    'web': StubConfig(latency_ms=60, jitter_ms=60),
+    'openai': StubConfig(latency_ms=120, jitter_ms=80),
+    'supabase': StubConfig(latency_ms=8, jitter_ms=4),
+}
+
+WORDS = (
+    'love night heart rain city fire light dance dream river road summer cold time baby '
+    'gold ghost storm ocean silence highway midnight wild broken shadow morning radio '
+    'sky home train window letter money angel devil garden mirror winter thunder'
+).split()
+
+
+def track_id(index: int) -> str:
+    """The 22-character Spotify ID of synthetic track `index`."""
+    return f"bench{index:017d}"
+
+
+def track_json(index: int) -> dict:
+    return {
+        'id': track_id(index),
+        'name': f"Track {index}",
+        'artists': [{'name': f"Artist {index % 997}"}],
+        'album': {'name': f"Album {index // 12}"},
+        'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id(index)}"},
+    }
+
+
+def synthetic_lyrics(seed: int, lines: int = 48) -> str:
+    rng = random.Random(seed)
+    return '\n'.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 8))) for _ in range(lines))
+
+
+def _stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8')) & 0x7FFFFFFF
+
+
+_COMMON_DIRECTION = np.random.default_rng(0).standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+_COMMON_DIRECTION /= np.linalg.norm(_COMMON_DIRECTION)
+
+
+def synthetic_embeddings(seeds: list[int], dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """Deterministic unit vectors, one row per seed."""
+    noise = np.stack([np.random.default_rng(seed).standard_normal(EMBEDDING_DIMENSIONS) for seed in seeds]).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    vectors = EMBEDDING_COMMON_WEIGHT * _COMMON_DIRECTION + np.sqrt(1 - EMBEDDING_COMMON_WEIGHT ** 2) * noise
+    vectors = vectors[:, :dimensions]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _vector_text(vector: np.ndarray) -> str:
+    """A pgvector text literal, as PostgREST returns vector columns."""
+    return '[' + ','.join('%.7g' % x for x in vector.tolist()) + ']'
+
+
+# --------------------------------------------------------------------------- #
+#  Server plumbing
+# --------------------------------------------------------------------------- #
+
+@dataclass
+class StubRequest:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: Any
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+
+@dataclass
+class RawBody:
+    """A pre-encoded response body."""
+
+    data: bytes
+    content_type: str = 'application/json'
+
+
+Handler = Callable[[StubRequest, re.Match], tuple[int, Any]]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class StubProvider:
+    """One provider's routes, injected latency / errors / rate limit, and call counters."""
+
+    name = ''
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.bucket = TokenBucket(config.rate_limit_rps, config.burst) if config.rate_limit_rps > 0 else None
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.errors_injected = 0
+        self.rate_limited = 0
+        self.routes: list[tuple[str, re.Pattern, str, Handler]] = []
+
+    def route(self, method: str, pattern: str, label: str, handler: Handler) -> None:
+        self.routes.append((method, re.compile(pattern + '$'), label, handler))
+
+    def reset(self, options: dict) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.errors_injected = 0
+            self.rate_limited = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'calls': sum(self.calls.values()),
+                'by_route': dict(sorted(self.calls.items())),
+                'errors_injected': self.errors_injected,
+                'rate_limited': self.rate_limited,
+            }
+
+    def handle(self, request: StubRequest) -> tuple[int, Any, dict]:
+        if request.path == '/_stub/stats':
+            return 200, self.stats(), {}
+        if request.path == '/_stub/reset':
+            self.reset(request.json() or {})
+            return 200, {'ok': True}, {}
+
+        for method, pattern, label, handler in self.routes:
+            match = pattern.match(request.path)
+            if method == request.method and match:
+                break
+        else:
+            with self.lock:
+                self.calls[f"{request.method} unmatched"] += 1
+            return 404, {'error': f"no stub route for {request.method} {request.path}"}, {}
+
+        with self.lock:
+            self.calls[label] += 1
+        if self.bucket is not None and not self.bucket.acquire():
+            with self.lock:
+                self.rate_limited += 1
+            return 429, {'error': {'message': 'rate limited', 'type': 'rate_limit_error'}}, {'Retry-After': '1'}
+        delay = self.config.latency_ms + self.config.jitter_ms * self.rng.random()
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.config.error_rate and self.rng.random() < self.config.error_rate:
+            with self.lock:
+                self.errors_injected += 1
+            return 500, {'error': {'message': 'injected error', 'type': 'server_error'}}, {}
+        status, payload = handler(request, match)
+        return status, payload, {}
+
+
+def _handler_class(provider: StubProvider) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            self._dispatch('GET')
+
+        def do_POST(self) -> None:
+            self._dispatch('POST')
+
+        def do_PATCH(self) -> None:
+            self._dispatch('PATCH')
+
+        def _dispatch(self, method: str) -> None:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            parsed = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
+            request = StubRequest(method, parsed.path, query, self.headers, body)
+            try:
+                status, payload, headers = provider.handle(request)
+            except Exception as e:
+                status, payload, headers = 500, {'error': f"stub failure: {type(e).__name__}: {e}"}, {}
+            if isinstance(payload, RawBody):
+                data, content_type = payload.data, payload.content_type
+            else:
+                data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+# --------------------------------------------------------------------------- #
+#  Providers
+# --------------------------------------------------------------------------- #
+
+class SpotifyStub(StubProvider):
+    name = 'spotify'
+
+    def __init__(self, config: StubConfig, seed: int = 0, library_size: int = 100):
+        super().__init__(config, seed)
+        self.library_size = library_size
+        self._pages: dict[tuple[int, int], RawBody] = {}
+        self.route('GET', r'/v1/me', 'GET /v1/me', self.me)
+        self.route('GET', r'/v1/me/playlists', 'GET /v1/me/playlists', self.playlists)
+        self.route('GET', r'/v1/playlists/bench-playlist-(\d+)/tracks', 'GET /v1/playlists/{id}/tracks', self.playlist_tracks)
+        self.route('GET', r'/v1/tracks', 'GET /v1/tracks', self.tracks)
+        self.route('POST', r'/api/token', 'POST /api/token', self.token)
+
+    def reset(self, options: dict) -> None:
+        super().reset(options)
+        if 'library_size' in options:
+            with self.lock:
+                self.library_size = int(options['library_size'])
+                self._pages.clear()
+
+    def me(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        # The access token doubles as the user ID, so concurrent clients can be different users
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not token:
+            return 401, {'error': {'status': 401, 'message': 'No token provided'}}
+        return 200, {'id': token, 'display_name': token}
+
+    def playlists(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        count = -(-self.library_size // PLAYLIST_SIZE)
+        return 200, {'items': [{'id': f"bench-playlist-{i}", 'name': f"Playlist {i}"} for i in range(count)], 'total': count}
+
+    def playlist_tracks(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        playlist = int(match.group(1))
+        with self.lock:
+            size = self.library_size
+            page = self._pages.get((size, playlist))
+        if page is None:
+            indices = range(playlist * PLAYLIST_SIZE, min(size, (playlist + 1) * PLAYLIST_SIZE))
+            page = RawBody(json.dumps({'items': [{'track': track_json(i)} for i in indices], 'total': len(indices)}).encode('utf-8'))
+            with self.lock:
+                self._pages[(size, playlist)] = page
+        return 200, page
+
+    def tracks(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        ids = [value for value in request.query.get('ids', '').split(',') if value]
+        return 200, {'tracks': [track_json(int(value[5:])) if value.startswith('bench') else None for value in ids]}
+
+    def token(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        return 200, {'access_token': f"bench-token-{self.rng.randrange(10 ** 6)}", 'token_type': 'Bearer', 'expires_in': 3600}
+
+
+class GeniusStub(StubProvider):
+    name = 'genius'
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        super().__init__(config, seed)
+        self.route('GET', r'/search', 'GET /search', self.search)
+        self.route('GET', r'/songs/(\d+)', 'GET /songs/{id}', self.song)
+
+    def search(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        query = request.query.get('q', '')
+        song_id = _stable_hash(query)
+        return 200, {'meta': {'status': 200}, 'response': {'hits': [{
+            'index': 'song', 'type': 'song', 'highlights': [],
+            'result': {
+                'id': song_id + i,
+                'title': query.title() if i == 0 else f"{query.title()} ({i})",
+                'full_title': query.title(),
+                'url': f"https://genius.com/songs/{song_id + i}",
+                'lyrics_state': 'complete',
+                'primary_artist': {'id': song_id % 997, 'name': f"Artist {song_id % 997}"},
+            },
+        } for i in range(3)]}}
+
+    def song(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        song_id = int(match.group(1))
+        return 200, {'meta': {'status': 200}, 'response': {'song': {
+            'id': song_id, 'title': f"Song {song_id}", 'lyrics': {'plain': synthetic_lyrics(song_id)},
+        }}}
+
+
+class BraveStub(StubProvider):
+    name = 'brave'
+
+    def __init__(self, config: StubConfig, seed: int = 0, web_url: str = ''):
+        super().__init__(config, seed)
+        self.web_url = web_url
+        self.route('GET', r'/res/v1/web/search', 'GET /res/v1/web/search', self.search)
+
+    def search(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        key = _stable_hash(request.query.get('q', ''))
+        count = int(request.query.get('count', 5))
+        return 200, {'type': 'search', 'web': {'results': [
+            {'url': f"{self.web_url}/pages/{key}-{i}", 'title': f"Result {i}"} for i in range(count)
+        ]}}
+
+
+class WebStub(StubProvider):
+    name = 'web'
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        super().__init__(config, seed)
+        self.route('GET', r'/pages/([\w-]+)', 'GET /pages/{key}', self.page)
+
+    def page(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        rng = random.Random(match.group(1))
+        paragraphs = ''.join(
+            '<p>' + ' '.join(rng.choice(WORDS) for _ in range(60)).capitalize() + '.</p>\n' for _ in range(8)
+        )
+        html = (
+            f"<html><head><title>Article {match.group(1)}</title></head><body>"
+            f"<nav><a href='/'>Home</a></nav><article><h1>About the song</h1>\n{paragraphs}</article>"
+            f"<footer>Copyright</footer></body></html>"
+        )
+        return 200, RawBody(html.encode('utf-8'), 'text/html; charset=utf-8')
+
+
+_RERANK_IDS = re.compile(r'-{12}\nID\n-{12}\n(.+)\n')
+_RERANK_COUNT = re.compile(r'Which (\d+) songs')
+
+
+class OpenAIStub(StubProvider):
+    name = 'openai'
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        super().__init__(config, seed)
+        self.route('POST', r'/v1/chat/completions', 'POST /v1/chat/completions', self.chat)
+        self.route('POST', r'/v1/embeddings', 'POST /v1/embeddings', self.embeddings)
+
+    @staticmethod
+    def reply(prompt: str) -> str:
+        """An answer in the format the pipeline's prompt asks for."""
+        if '<song_id>EXACT_ID_FROM_LIBRARY</song_id>' in prompt:
+            count = _RERANK_COUNT.search(prompt)
+            ids = sorted(_RERANK_IDS.findall(prompt), key=lambda song_id: _stable_hash(prompt[-200:] + song_id))
+            return '\n'.join(f"<song_id>{song_id}</song_id>" for song_id in ids[:int(count.group(1)) if count else 3])
+        if '<filter_out>' in prompt:
+            return '<filter_out>false</filter_out>\n<reason>Same moody, late-night feel as the query.</reason>'
+        if '"YES|extracted_lyrics"' in prompt or 'Respond with ONLY "YES"' in prompt:
+            return 'NO'
+        return (
+            '1. Genre: indie rock with electronic touches\n'
+            '2. Time period: late 2000s\n'
+            '3. Musical movement: the blog-era indie revival\n'
+            '4. References: night drives, city lights and an old love letter\n'
+            '5. Cultural significance: a minor hit that found a second life on streaming playlists'
+        )
+
+    def chat(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        body = request.json()
+        content = body['messages'][-1]['content']
+        prompt = content if isinstance(content, str) else ''.join(part.get('text', '') for part in content)
+        text = self.reply(prompt)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+        return 200, {
+            'id': f"chatcmpl-bench{self.rng.randrange(10 ** 9)}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4o-mini'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+        }
+
+    def embeddings(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        body = request.json()
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        vectors = synthetic_embeddings([_stable_hash(text) for text in inputs], body.get('dimensions') or EMBEDDING_DIMENSIONS)
+        if body.get('encoding_format') == 'base64':
+            encoded = [base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii') for vector in vectors]
+        else:
+            encoded = [vector.tolist() for vector in vectors]
+        tokens = sum(len(text) for text in inputs) // 4
+        return 200, {
+            'object': 'list',
+            'model': body.get('model', 'text-embedding-ada-002'),
+            'data': [{'object': 'embedding', 'index': i, 'embedding': vector} for i, vector in enumerate(encoded)],
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        }
+
+
+class SupabaseStub(StubProvider):
+    """An in-memory PostgREST with the tables and RPCs the pipeline uses."""
+
+    name = 'supabase'
+    PRIMARY_KEYS: dict[str, tuple[str, ...]] = {
+        'songs': ('id',),
+        'users': ('id',),
+        'users_songs': ('user_id', 'song_id'),
+        'song_embeddings': ('song_id', 'model_version'),
+    }
+
+    def __init__(self, config: StubConfig, seed: int = 0):
+        super().__init__(config, seed)
+        self.tables: dict[str, dict[tuple, dict]] = {name: {} for name in self.PRIMARY_KEYS}
+        self.data_lock = threading.Lock()
+        # Bumped on every write; invalidates the per-user embedding matrices
+        self.generation = 0
+        self._matrices: dict[tuple, tuple[int, list[str], np.ndarray]] = {}
+        self.route('GET', r'/rest/v1/(\w+)', 'GET /rest/v1/{table}', self.select)
+        self.route('POST', r'/rest/v1/rpc/(\w+)', 'POST /rest/v1/rpc/{name}', self.rpc)
+        self.route('POST', r'/rest/v1/(\w+)', 'POST /rest/v1/{table}', self.write)
+
+    def reset(self, options: dict) -> None:
+        super().reset(options)
+        with self.data_lock:
+            if options.get('clear'):
+                for rows in self.tables.values():
+                    rows.clear()
+            seed_songs = int(options.get('seed_songs', 0))
+            if seed_songs:
+                embeddings = synthetic_embeddings([_stable_hash(track_id(i)) for i in range(seed_songs)])
+                for i in range(seed_songs):
+                    track = track_json(i)
+                    self.tables['songs'][(track['id'],)] = {
+                        'id': track['id'],
+                        'name': track['name'],
+                        'artists': ', '.join(artist['name'] for artist in track['artists']),
+                        'album': track['album']['name'],
+                        'song_link': track['external_urls']['spotify'],
+                        'lyrics': synthetic_lyrics(i),
+                        'song_metadata': OpenAIStub.reply(''),
+                        'embedding': embeddings[i],
+                    }
+            self.generation += 1
+
+    @staticmethod
+    def _output(row: dict, columns: Optional[list[str]]) -> dict:
+        out = {key: row.get(key) for key in columns} if columns else dict(row)
+        for key, value in out.items():
+            if isinstance(value, np.ndarray):
+                out[key] = _vector_text(value)
+        return out
+
+    def select(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        table = match.group(1)
+        if table not in self.tables:
+            return 404, {'code': '42P01', 'message': f'relation "public.{table}" does not exist'}
+        select = request.query.get('select', '*').replace(' ', '')
+        columns = None if select == '*' else select.split(',')
+        filters = []
+        for column, expression in request.query.items():
+            if column in ('select', 'order', 'limit', 'offset'):
+                continue
+            operator, _, value = expression.partition('.')
+            if operator == 'eq':
+                filters.append((column, {value}))
+            elif operator == 'in':
+                filters.append((column, {item.strip('"') for item in value.strip('()').split(',')}))
+            else:
+                return 400, {'code': 'PGRST100', 'message': f"unsupported filter {expression}"}
+        with self.data_lock:
+            if len(filters) == 1 and filters[0][0] == 'id' and table == 'songs':
+                # Primary-key lookups skip the scan
+                rows = [self.tables[table][(value,)] for value in filters[0][1] if (value,) in self.tables[table]]
+            else:
+                rows = [row for row in self.tables[table].values() if all(str(row.get(column)) in values for column, values in filters)]
+            if 'order' in request.query:
+                column, _, direction = request.query['order'].partition('.')
+                rows.sort(key=lambda row: row.get(column), reverse=direction == 'desc')
+            offset = int(request.query.get('offset', 0))
+            limit = request.query.get('limit')
+            rows = rows[offset:offset + int(limit) if limit else None]
+            return 200, [self._output(row, columns) for row in rows]
+
+    def write(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        table = match.group(1)
+        if table not in self.tables:
+            return 404, {'code': '42P01', 'message': f'relation "public.{table}" does not exist'}
+        body = request.json()
+        rows = body if isinstance(body, list) else [body]
+        prefer = request.headers.get('Prefer', '')
+        keys = self.PRIMARY_KEYS[table]
+        with self.data_lock:
+            stored = self.tables[table]
+            if 'resolution' not in prefer and any(tuple(row.get(key) for key in keys) in stored for row in rows):
+                return 409, {'code': '23505', 'message': f'duplicate key value violates unique constraint "{table}_pkey"'}
+            for row in rows:
+                row = dict(row)
+                if isinstance(row.get('embedding'), str):
+                    row['embedding'] = np.fromstring(row['embedding'].strip('[]'), sep=',', dtype=np.float32)
+                key = tuple(row.get(key) for key in keys)
+                if key in stored and 'ignore-duplicates' in prefer:
+                    continue
+                stored[key] = {**stored.get(key, {}), **row}
+            self.generation += 1
+        if 'return=minimal' in prefer:
+            return 201, RawBody(b'')
+        return 201, [self._output(row, None) for row in rows]
+
+    def _user_matrix(self, user_id: str, model_version: Optional[str]) -> tuple[list[str], np.ndarray]:
+        """The embeddings of a user's songs (for a version, from song_embeddings), cached until the next write."""
+        key = (user_id, model_version)
+        with self.data_lock:
+            cached = self._matrices.get(key)
+            if cached is not None and cached[0] == self.generation:
+                return cached[1], cached[2]
+            song_ids = [row['song_id'] for row in self.tables['users_songs'].values() if row.get('user_id') == user_id]
+            if model_version is None:
+                rows = [self.tables['songs'].get((song_id,)) for song_id in song_ids]
+                vectors = [(row['id'], row['embedding']) for row in rows if row is not None and isinstance(row.get('embedding'), np.ndarray)]
+            else:
+                rows = [self.tables['song_embeddings'].get((song_id, model_version)) for song_id in song_ids]
+                vectors = [(row['song_id'], row['embedding']) for row in rows if row is not None and isinstance(row.get('embedding'), np.ndarray)]
+            ids = [song_id for song_id, _ in vectors]
+            matrix = np.stack([vector for _, vector in vectors]) if vectors else np.zeros((0, 0), dtype=np.float32)
+            self._matrices[key] = (self.generation, ids, matrix)
+            return ids, matrix
+
+    def rpc(self, request: StubRequest, match: re.Match) -> tuple[int, Any]:
+        name = match.group(1)
+        params = request.json() or {}
+        if name not in ('match_song_ids', 'match_songs_v2', 'match_song_ids_versioned'):
+            if name == 'create_vault_secret':
+                return 200, f"bench-secret-{self.rng.randrange(10 ** 9)}"
+            return 404, {'code': 'PGRST202', 'message': f"Could not find the function public.{name}"}
+        ids, matrix = self._user_matrix(params['p_user_id'], params.get('p_model_version') if name == 'match_song_ids_versioned' else None)
+        if not ids:
+            return 200, []
+        query = np.fromstring(params['query_emb'].strip('[]'), sep=',', dtype=np.float32)
+        similarities = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+        order = np.argsort(-similarities)[:int(params['match_count'])]
+        matches = [(ids[i], float(similarities[i])) for i in order if similarities[i] > params['match_threshold']]
+        if name == 'match_songs_v2':
+            with self.data_lock:
+                rows = [self.tables['songs'][(song_id,)] for song_id, _ in matches]
+            return 200, [{**self._output(row, ['id', 'name', 'artists', 'album', 'song_link', 'lyrics', 'song_metadata']), 'similarity': similarity}
+                         for row, (_, similarity) in zip(rows, matches)]
+        return 200, [{'id': song_id, 'similarity': similarity} for song_id, similarity in matches]
+
+
+# --------------------------------------------------------------------------- #
+#  Running the stubs
+# --------------------------------------------------------------------------- #
+
+class StubCluster:
+    """All the stub servers, each on its own port and serving thread."""
+
+    def __init__(self, configs: Optional[dict[str, StubConfig]] = None, host: str = '127.0.0.1', library_size: int = 100, seed: int = 0):
+        configs = {**DEFAULT_CONFIGS, **(configs or {})}
+        self.servers: dict[str, _Server] = {}
+        self.providers: dict[str, StubProvider] = {}
+        web = WebStub(configs['web'], seed)
+        web_server = self._serve('web', web, host)
+        providers = [
+            SpotifyStub(configs['spotify'], seed, library_size=library_size),
+            GeniusStub(configs['genius'], seed),
+            BraveStub(configs['brave'], seed, web_url=f"http://{host}:{web_server.server_address[1]}"),
+            OpenAIStub(configs['openai'], seed),
+            SupabaseStub(configs['supabase'], seed),
+        ]
+        for provider in providers:
+            self._serve(provider.name, provider, host)
+
+    def _serve(self, name: str, provider: StubProvider, host: str) -> _Server:
+        server = _Server((host, 0), _handler_class(provider))
+        threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True).start()
+        self.servers[name] = server
+        self.providers[name] = provider
+        return server
+
+    @property
+    def urls(self) -> dict[str, str]:
+        return {name: f"http://{server.server_address[0]}:{server.server_address[1]}" for name, server in self.servers.items()}
+
+    def close(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def parse_overrides(settings: list[str], latency_scale: float = 1.0) -> dict[str, StubConfig]:
+    """Build per-provider configs from `provider.field=value` settings on top of the defaults."""
+    configs = {
+        name: StubConfig(**{**asdict(config), 'latency_ms': config.latency_ms * latency_scale, 'jitter_ms': config.jitter_ms * latency_scale})
+        for name, config in DEFAULT_CONFIGS.items()
+    }
+    field_types = {field.name: field.type for field in fields(StubConfig)}
+    for setting in settings:
+        target, _, value = setting.partition('=')
+        name, _, field = target.partition('.')
+        providers = PROVIDERS if name == 'all' else (name,)
+        if any(provider not in configs for provider in providers) or field not in field_types:
+            raise ValueError(f"Bad stub setting {setting!r}: expected <provider|all>.<{'|'.join(field_types)}>=<value>")
+        for provider in providers:
+            setattr(configs[provider], field, int(value) if field_types[field] is int else float(value))
+    return configs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--library-size", type=int, default=100)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every default latency and jitter")
+    parser.add_argument("--set", action="append", default=[], metavar="PROVIDER.FIELD=VALUE",
+                        help=f"Override a StubConfig field; providers: {', '.join(PROVIDERS)} or all")
+    args = parser.parse_args()
+    try:
+        configs = parse_overrides(args.set, args.latency_scale)
+    except ValueError as e:
+        parser.error(str(e))
+    cluster = StubCluster(configs, host=args.host, library_size=args.library_size)
+    print(json.dumps({'urls': cluster.urls, 'configs': {name: asdict(config) for name, config in configs.items()}}), flush=True)
+    try:
+        # Serve until interrupted or until the parent closes our stdin
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cluster.close()
+
+
+if __name__ == "__main__":
+    main()
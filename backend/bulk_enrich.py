@@ -0,0 +1,306 @@
+"""Bulk enrichment of the songs table outside of a live search request.
+
+Runs the same stages as `/api/spotify_search` enrichment (`utils.enrich_single_song`:
+Genius lyrics, web search + LLM metadata, embedding) for many tracks at once, writes
+results back with batched upserts and appends every finished track to a checkpoint
+file, so an interrupted run picks up where it stopped when started again with the same
+checkpoint.
+
+Sources:
+    --ids-file PATH          Spotify track IDs, URIs or URLs, one per line
+    --repair-empty-lyrics    rows in `songs` saved without lyrics
+
+Run from the backend directory:
+
+    python bulk_enrich.py --ids-file top_tracks.txt --workers 32
+    python bulk_enrich.py --repair-empty-lyrics --limit 5000 --checkpoint repair.jsonl
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from supabase import create_client, Client
+
+from search_library.types import Song as SearchSong, RawSong
+from utils import (
+    enrich_single_song, upsert_songs, get_app_access_token, get_tracks_by_ids, select_in_chunks,
+    supabase_url, supabase_service_key,
+)
+
+DEFAULT_WORKERS = 16
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CHECKPOINT = 'bulk_enrich_checkpoint.jsonl'
+# Rows fetched per page when scanning the songs table
+DB_PAGE_SIZE = 1000
+# Print a progress line every this many finished songs
+REPORT_EVERY = 25
+
+_TRACK_ID_RE = re.compile(r'(?:spotify:track:|open\.spotify\.com/track/)?([A-Za-z0-9]{22})\b')
+
+
+def parse_track_id(line: str) -> Optional[str]:
+    """Extract a Spotify track ID from a bare ID, a spotify:track: URI or an open.spotify.com URL."""
+    match = _TRACK_ID_RE.search(line.strip())
+    return match.group(1) if match else None
+
+
+def read_track_ids(path: str) -> list[str]:
+    """Read unique track IDs from a file, keeping their order and skipping blank / comment lines."""
+    ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            track_id = parse_track_id(line)
+            if track_id:
+                ids.append(track_id)
+            else:
+                print(f"[bulk_enrich] Skipping unrecognized line: {line.strip()[:80]}")
+    return list(dict.fromkeys(ids))
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished tracks; tracks recorded as `ok` are skipped on resume."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: set[str] = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash
+                        continue
+                    if entry.get('status') == 'ok':
+                        self.done.add(entry['id'])
+
+    def record(self, entries: Iterable[dict]) -> None:
+        entries = list(entries)
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        if not lines:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(entry['id'] for entry in entries if entry.get('status') == 'ok')
+
+
+@dataclass
+class BulkEnrichmentStats:
+    """Throughput, errors and provider usage of a bulk enrichment run."""
+
+    total: int = 0
+    skipped: int = 0
+    enriched: int = 0
+    failed: int = 0
+    written: int = 0
+    missing_lyrics: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error_classes: Counter = field(default_factory=Counter)
+    provider_calls: Counter = field(default_factory=Counter)
+    started_at: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        finished = self.enriched + self.failed
+        return {
+            'total': self.total,
+            'skipped_from_checkpoint': self.skipped,
+            'enriched': self.enriched,
+            'failed': self.failed,
+            'written': self.written,
+            'missing_lyrics': self.missing_lyrics,
+            'elapsed_s': round(elapsed, 1),
+            'songs_per_min': round(60 * finished / elapsed, 1) if elapsed > 0 else 0.0,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'error_classes': dict(self.error_classes.most_common()),
+            'provider_calls': dict(self.provider_calls),
+        }
+
+
+def load_songs_from_ids(supabase: Optional[Client], track_ids: list[str], include_existing: bool = False) -> list[RawSong]:
+    """Resolve track IDs to RawSongs via the Spotify API, skipping tracks already in `songs`."""
+    if supabase is not None and not include_existing:
+        existing = {row['id'] for row in select_in_chunks(supabase, 'songs', 'id', track_ids)}
+        if existing:
+            print(f"[bulk_enrich] {len(existing)} tracks already enriched (use --include-existing to redo them)")
+        track_ids = [track_id for track_id in track_ids if track_id not in existing]
+    if not track_ids:
+        return []
+    return get_tracks_by_ids(track_ids, get_app_access_token())
+
+
+def load_songs_missing_lyrics(supabase: Client, limit: Optional[int] = None) -> list[RawSong]:
+    """Page through `songs` rows whose lyrics are null or empty."""
+    songs = []
+    start = 0
+    while limit is None or len(songs) < limit:
+        page_size = DB_PAGE_SIZE if limit is None else min(DB_PAGE_SIZE, limit - len(songs))
+        rows = (
+            supabase.table('songs')
+            .select('id, name, artists, album, song_link')
+            .or_('lyrics.is.null,lyrics.eq.')
+            .order('id')
+            .range(start, start + page_size - 1)
+            .execute()
+            .data
+        ) or []
+        songs.extend(
+            RawSong(
+                id=row['id'],
+                song_link=row.get('song_link') or '',
+                album=row.get('album') or '',
+                name=row['name'],
+                artists=[artist.strip() for artist in (row.get('artists') or '').split(',') if artist.strip()],
+            )
+            for row in rows
+        )
+        if len(rows) < page_size:
+            break
+        start += page_size
+    return songs
+
+
+def run_bulk_enrichment(
+    songs: list[RawSong],
+    supabase: Optional[Client],
+    checkpoint: Checkpoint,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> BulkEnrichmentStats:
+    """
+    Enrich songs in parallel, upsert them in batches and checkpoint each written batch.
+
+    Args:
+        songs: The songs to enrich
+        supabase: Client to write results with, or None for a dry run
+        checkpoint: Checkpoint of finished tracks; songs already in it are skipped
+        workers: Number of songs enriched concurrently
+        batch_size: Number of enriched songs per upsert
+
+    Returns:
+        The run's statistics
+    """
+    stats = BulkEnrichmentStats(total=len(songs))
+    todo = [song for song in songs if song.id not in checkpoint.done]
+    stats.skipped = len(songs) - len(todo)
+    print(f"[bulk_enrich] {len(todo)} songs to enrich ({stats.skipped} done in checkpoint) with {workers} workers")
+
+    buffer: list[SearchSong] = []
+
+    def flush() -> None:
+        if not buffer:
+            return
+        batch = list(buffer)
+        buffer.clear()
+        try:
+            if supabase is not None:
+                upsert_songs(supabase, batch)
+            stats.written += len(batch) if supabase is not None else 0
+            checkpoint.record({'id': song.id, 'status': 'ok', 'lyrics': bool(song.lyrics)} for song in batch)
+        except Exception as e:
+            error_class = f"DBWrite:{type(e).__name__}"
+            print(f"[bulk_enrich] Failed to write {len(batch)} songs: {e}")
+            stats.error_classes[error_class] += len(batch)
+            checkpoint.record({'id': song.id, 'status': 'error', 'error': error_class} for song in batch)
+
+    remaining = iter(todo)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+
+    def submit_next() -> None:
+        song = next(remaining, None)
+        if song is not None:
+            pending[executor.submit(enrich_single_song, song)] = song
+
+    try:
+        # Keep a bounded window in flight so huge inputs don't queue every song at once
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                song = pending.pop(future)
+                submit_next()
+                try:
+                    enriched_song, usage = future.result()
+                except Exception as e:
+                    stats.failed += 1
+                    stats.error_classes[type(e).__name__] += 1
+                    checkpoint.record([{'id': song.id, 'status': 'error', 'error': type(e).__name__}])
+                    print(f"[bulk_enrich] {song.name} - {', '.join(song.artists)} failed: {e}")
+                    continue
+
+                stats.enriched += 1
+                stats.input_tokens += usage.get('input_tokens', 0)
+                stats.output_tokens += usage.get('output_tokens', 0)
+                stats.provider_calls.update(usage.get('provider_calls', {}))
+                if usage.get('lyrics_error'):
+                    stats.error_classes[f"Lyrics:{usage['lyrics_error']}"] += 1
+                if not enriched_song.lyrics:
+                    stats.missing_lyrics += 1
+                buffer.append(enriched_song)
+                if len(buffer) >= batch_size:
+                    flush()
+
+                finished = stats.enriched + stats.failed
+                if finished % REPORT_EVERY == 0:
+                    report = stats.to_dict()
+                    print(f"[bulk_enrich] {finished}/{len(todo)} songs, {report['songs_per_min']} songs/min, {stats.failed} failed")
+    except KeyboardInterrupt:
+        print("[bulk_enrich] Interrupted, writing finished songs before exiting")
+        executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        flush()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ids-file', help='File with one Spotify track ID, URI or URL per line')
+    source.add_argument('--repair-empty-lyrics', action='store_true', help='Re-enrich songs saved without lyrics')
+    parser.add_argument('--limit', type=int, default=None, help='Enrich at most this many songs')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Songs per upsert')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Checkpoint file; rerun with the same file to resume')
+    parser.add_argument('--include-existing', action='store_true', help='Also re-enrich IDs already in the songs table')
+    parser.add_argument('--dry-run', action='store_true', help='Enrich but do not write to the database')
+    args = parser.parse_args()
+
+    supabase = create_client(supabase_url, supabase_service_key) if supabase_url and supabase_service_key else None
+    if supabase is None and (args.repair_empty_lyrics or not args.dry_run):
+        parser.error('SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required unless --dry-run is used with --ids-file')
+
+    if args.repair_empty_lyrics:
+        songs = load_songs_missing_lyrics(supabase, args.limit)
+    else:
+        track_ids = read_track_ids(args.ids_file)[:args.limit]
+        songs = load_songs_from_ids(supabase, track_ids, include_existing=args.include_existing)
+    print(f"[bulk_enrich] Loaded {len(songs)} songs")
+
+    stats = run_bulk_enrichment(
+        songs,
+        supabase=None if args.dry_run else supabase,
+        checkpoint=Checkpoint(args.checkpoint),
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    print(json.dumps(stats.to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
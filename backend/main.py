@@ -1,18 +1,20 @@
 # api/spotify_search.py
 import copy
 import json, asyncio, os, requests, base64, urllib.request, urllib.parse
+import logging
 import random
 from datetime import datetime
 from typing import Union, List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, Header, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from supabase import create_client, Client
 import sys
+import threading
 import time
-from dataclasses import asdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -30,6 +32,14 @@ from search_library.types import Song as SearchSong, RawSong
 from search_library.clients import get_client
 from search_library.prompts import get_song_metadata_query
 from search_library.clients import TextPrompt
+from search_library.lyric_index import index_songs_for_user
+from search_library.progress import ProgressBus
+from search_library.metrics import TOKENS, render_prometheus
+from search_library.tracing import current_trace, propagate, span, trace_request
+from search_library.deadline import call_timeout, current_deadline, deadline_expired, degrade, request_deadline, time_left_for
+from search_library.log import LazyJSON, get_logger
+
+log = get_logger(__name__)
 
 # Import instant search functionality
 from instant_llm import instant_search
@@ -37,6 +47,17 @@ from instant_llm import instant_search
 # Import utility functions from utils.py
 from utils import (
     ADD_RERANKER_TO_VECTOR_SEARCH,
+    HYBRID_VECTOR_SEARCH,
+    INCLUDE_LYRICS_IN_RESULTS,
+    RACE_INSTANT_SEARCH,
+    CONTINUE_PIPELINE_AFTER_INSTANT_MATCH,
+    REQUEST_DEADLINE_SECONDS,
+    DEADLINE_RERANK_SECONDS,
+    DEADLINE_REASONING_SECONDS,
+    MUSIXMATCH_URL_PATTERNS_PATH,
+    SPOTIFY_API_URL,
+    SPOTIFY_ACCOUNTS_URL,
+    load_user_lyric_index,
     get_lyrics,
     get_song_metadata,  
     get_songs_from_playlists,
@@ -51,18 +72,20 @@ from utils import (
 
 # MusixMatch scraper endpoints
 from musixmatch_scraper import MusixMatchScraper
+from sse import SSEEncoder, choose_encoding, encode_events, song_to_result
 
 # Initialize MusixMatch scraper
-musixmatch_scraper = MusixMatchScraper()
+musixmatch_scraper = MusixMatchScraper(url_patterns_path=MUSIXMATCH_URL_PATTERNS_PATH or None)
 
 def get_user_id(access_token) -> str:
     """Get the user ID from the access token"""
     user_response = requests.get(
-        'https://api.spotify.com/v1/me',
+        f'{SPOTIFY_API_URL}/v1/me',
         headers={
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
-        }
+        },
+        timeout=call_timeout(None)
     )
     if not user_response.ok:
         raise HTTPException(status_code=user_response.status_code, detail="Failed to fetch user profile")
@@ -74,7 +97,7 @@ def get_user_id(access_token) -> str:
 def update_users_songs_join_table(user_id: str, raw_songs: list[RawSong]) -> None:
     """Update the users_songs join table with new songs for the user"""
     try:            
-        print(f"[update_users_songs_join_table] Processing songs for user: {user_id}")
+        log.debug("Updating users_songs for user: %s", user_id)
         
         # Initialize Supabase client
         supabase: Client = create_client(supabase_url, supabase_service_key)
@@ -85,7 +108,7 @@ def update_users_songs_join_table(user_id: str, raw_songs: list[RawSong]) -> Non
         if existing_songs_response.data:
             existing_song_ids = {song['song_id'] for song in existing_songs_response.data}
             
-        print(f"[update_users_songs_join_table] Found {len(existing_song_ids)} existing songs for user")
+        log.debug("Found %d existing songs for user", len(existing_song_ids))
         
         # Find new songs that aren't in the existing list
         new_songs = []
@@ -97,17 +120,16 @@ def update_users_songs_join_table(user_id: str, raw_songs: list[RawSong]) -> Non
                     'song_id': song_id
                 })
                 
-        print(f"[update_users_songs_join_table] Found {len(new_songs)} new songs to add")
         
         # Insert new songs into users_songs table
         if new_songs:
             insert_response = supabase.table('users_songs').insert(new_songs).execute()
-            print(f"[update_users_songs_join_table] Successfully inserted {len(new_songs)} new songs")
+            log.info("Inserted %d new songs into users_songs", len(new_songs))
         else:
-            print(f"[update_users_songs_join_table] No new songs to insert")
+            log.debug("No new songs to insert into users_songs")
             
     except Exception as e:
-        print(f"[update_users_songs_join_table] Error: {e}")
+        log.error("Failed to update users_songs: %s", e)
         # Don't raise exception - this is not critical for the main flow
 
 # Environment variables
@@ -123,7 +145,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=[ "X-Experimental-Stream-Data"],  # this is needed for streaming data header to be read by the client
+    expose_headers=[ "X-Experimental-Stream-Data", "X-Request-ID"],  # this is needed for streaming data header to be read by the client
 )
 
 # Pydantic models for request validation
@@ -232,7 +254,7 @@ async def get_user_playlists(authorization: str = Header(...), refresh_token: Un
 
     try:
         response = requests.get(
-            'https://api.spotify.com/v1/me/playlists?limit=50',
+            f'{SPOTIFY_API_URL}/v1/me/playlists?limit=50',
             headers={
                 'Authorization': f'Bearer {access_token}',
                 'Content-Type': 'application/json'
@@ -243,7 +265,7 @@ async def get_user_playlists(authorization: str = Header(...), refresh_token: Un
             try:
                 new_token = refresh_access_token(refresh_token)
                 response = requests.get(
-                    'https://api.spotify.com/v1/me/playlists?limit=50',
+                    f'{SPOTIFY_API_URL}/v1/me/playlists?limit=50',
                     headers={
                         'Authorization': f'Bearer {new_token}',
                         'Content-Type': 'application/json'
@@ -271,7 +293,7 @@ async def get_playlist(playlist_id: str, authorization: str = Header(...)):
 
     try:
         response = requests.get(
-            f'https://api.spotify.com/v1/playlists/{playlist_id}',
+            f'{SPOTIFY_API_URL}/v1/playlists/{playlist_id}',
             headers={
                 'Authorization': f'Bearer {access_token}',
                 'Content-Type': 'application/json'
@@ -298,7 +320,7 @@ async def login_or_create_user(authorization: str = Header(...), refresh_token:
     try:
         # Get user info from Spotify API
         response = requests.get(
-            'https://api.spotify.com/v1/me',
+            f'{SPOTIFY_API_URL}/v1/me',
             headers={
                 'Authorization': f'Bearer {access_token}',
                 'Content-Type': 'application/json'
@@ -310,7 +332,7 @@ async def login_or_create_user(authorization: str = Header(...), refresh_token:
             try:
                 new_token = refresh_access_token(refresh_token)
                 response = requests.get(
-                    'https://api.spotify.com/v1/me',
+                    f'{SPOTIFY_API_URL}/v1/me',
                     headers={
                         'Authorization': f'Bearer {new_token}',
                         'Content-Type': 'application/json'
@@ -337,7 +359,7 @@ async def login_or_create_user(authorization: str = Header(...), refresh_token:
         existing_user_response = supabase.table('users').select('*').eq('id', user_data.get('id')).execute()
         if existing_user_response.data and len(existing_user_response.data) > 0:
             existing_user = existing_user_response.data[0]
-            print(f"[login-or-create-user] User already exists: {existing_user.get('id')}")
+            log.info("User already exists: %s", existing_user.get('id'))
             return {
                 'success': True,
                 'user_id': existing_user.get('id'),
@@ -360,13 +382,13 @@ async def login_or_create_user(authorization: str = Header(...), refresh_token:
                     'name': secret_name,
                     'description': secret_description
                 }).execute()
-                print(f"[login-or-create-user] Vault response: {vault_response.data}")
+                log.debug("Stored refresh token in vault: %s", vault_response.data)
                 vault_secret_id = vault_response.data if vault_response.data else None
             except Exception as vault_error:
-                print(f"Warning: Failed to store refresh token in vault: {vault_error}")
+                log.warning("Failed to store refresh token in vault: %s", vault_error)
                 # Continue without vault storage - this is not a critical failure
         else:
-            print(f"Warning: No refresh token provided")
+            log.warning("No refresh token provided")
         
         # Extract user information
         user_info = {
@@ -442,11 +464,26 @@ def get_progress_update_copy(processed: int, total: int, song: SearchSong):
     ]
     return random.choice(schemas)
 
+def record_token_usage(stage: str, token_usage: dict) -> None:
+    """Add a stage's token usage (either key style) to the token counters."""
+    input_tokens = token_usage.get('total_input_tokens', token_usage.get('input_tokens', 0))
+    output_tokens = token_usage.get('total_output_tokens', token_usage.get('output_tokens', 0))
+    if input_tokens:
+        TOKENS.inc(input_tokens, stage=stage, direction='input')
+    if output_tokens:
+        TOKENS.inc(output_tokens, stage=stage, direction='output')
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, request outcomes, tokens, cache hits and provider errors"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/spotify_search")
 async def spotify_search(
     query: str = Query(..., description="Search query for songs"),
     authorization: str = Header(...),
-    refresh_token: str = Header(None, alias="refresh-token")
+    refresh_token: str = Header(None, alias="refresh-token"),
+    accept_encoding: str = Header(None, alias="accept-encoding")
 ):
     """Search user's Spotify library for songs matching the query with streaming results"""
     if not authorization or not authorization.startswith('Bearer '):
@@ -457,94 +494,139 @@ async def spotify_search(
     if not query:
         raise HTTPException(status_code=400, detail="Missing query parameter")
 
-    async def event_stream():
+    results_lock = threading.Lock()
+    request_id = uuid.uuid4().hex[:16]
+
+    def publish_results(bus: ProgressBus, *events: dict) -> bool:
+        """Publish the final events of the stream and close it, unless results were already sent."""
+        with results_lock:
+            if bus.closed:
+                return False
+            for event in events:
+                bus.publish(event)
+            bus.close()
+            return True
+
+    def publish_instant_result(bus: ProgressBus, instant_future: Future) -> bool:
+        """Publish the instant match if instant search found one. Returns True if the match was sent."""
+        try:
+            instant_result, instant_token_usage = instant_future.result()
+        except Exception as e:
+            log.error("Instant search failed: %s", e)
+            return False
+        if not instant_result:
+            return False
+
+        log.info("Found instant match: %s by %s", instant_result.name, instant_result.artists)
+        # Convert to dictionary format for frontend
+        song_dict = song_to_result(instant_result, include_lyrics=INCLUDE_LYRICS_IN_RESULTS)
+        
+        # Emit final results with instant match
+        final_data = {
+            'type': 'results',
+            'results': [song_dict],
+            'token_usage': {
+                'total_input_tokens': instant_token_usage.get('total_input_tokens', 0),
+                'total_output_tokens': instant_token_usage.get('total_output_tokens', 0),
+                'total_requests': instant_token_usage.get('total_requests', 0),
+                'instant_search': True,
+                'library_index_match': instant_token_usage.get('library_index_match', False),
+                'instant_input_tokens': instant_token_usage.get('total_input_tokens', 0),
+                'instant_output_tokens': instant_token_usage.get('total_output_tokens', 0),
+                'instant_requests': instant_token_usage.get('total_requests', 0)
+            }
+        }
+        published = publish_results(bus, {'type': 'status', 'message': 'Found instant match!'}, final_data)
+        if published:
+            log.info("Instant search completed successfully")
+        return published
+
+    def record_instant_tokens(instant_future: Future) -> None:
+        if instant_future.exception() is None:
+            record_token_usage('instant_search', instant_future.result()[1])
+
+    def run_search(bus: ProgressBus):
+        # Degradations made to meet the deadline are streamed as they happen, and listed again with the results
+        publish_degradation = lambda degradation: bus.publish({'type': 'degraded', **degradation})
+        with trace_request('spotify_search', request_id) as trace, request_deadline(REQUEST_DEADLINE_SECONDS, on_degrade=publish_degradation):
+            traced_search(bus)
+        log.info("Stage timings: %s", LazyJSON(trace.summary()))
+
+    def traced_search(bus: ProgressBus):
+        instant_future = None
         try:
             # Emit explicit start event to reset frontend progress
-            yield f"data: {json.dumps({'type': 'start', 'message': 'Listening to new songs...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'start', 'message': 'Listening to new songs...', 'request_id': request_id})
             
             # Try instant search first for lyric-heavy queries
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Checking for instant match...'})}\n\n"
-            await asyncio.sleep(0.1)
-            
-            instant_result, instant_token_usage = instant_search(query)
-            
-            if instant_result:
-                # We found an instant match! Return it immediately
-                print(f"[spotify_search] Found instant match: {instant_result.name} by {', '.join(instant_result.artists)}")
-                
-                yield f"data: {json.dumps({'type': 'status', 'message': 'Found instant match!'})}\n\n"
-                await asyncio.sleep(0.1)
-                
-                # Convert to dictionary format for frontend
-                song_dict = asdict(instant_result)
-                song_dict['artist'] = ', '.join(instant_result.artists) if instant_result.artists else ''
-                song_dict['reasoning'] = getattr(instant_result, 'reasoning', '')
-                
-                # Emit final results with instant match
-                final_data = {
-                    'type': 'results',
-                    'results': [song_dict],
-                    'token_usage': {
-                        'total_input_tokens': instant_token_usage.get('total_input_tokens', 0),
-                        'total_output_tokens': instant_token_usage.get('total_output_tokens', 0),
-                        'total_requests': instant_token_usage.get('total_requests', 0),
-                        'instant_search': True,
-                        'instant_input_tokens': instant_token_usage.get('total_input_tokens', 0),
-                        'instant_output_tokens': instant_token_usage.get('total_output_tokens', 0),
-                        'instant_requests': instant_token_usage.get('total_requests', 0)
-                    }
-                }
-                yield f"data: {json.dumps(final_data)}\n\n"
-                print(f"[spotify_search] Instant search completed successfully")
-                return
-            
-            # No instant match found, continue with full search
-            yield f"data: {json.dumps({'type': 'status', 'message': 'No instant match found. Searching your playlists...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'status', 'message': 'Checking for instant match...'})
             
+            # get user id (needed to check the user's own lyrics before any external search)
+            user_id = get_user_id(access_token)
+
+            instant_executor = ThreadPoolExecutor(max_workers=1)
+            instant_future = instant_executor.submit(propagate(instant_search), query, user_id=user_id)
+            instant_executor.shutdown(wait=False)
+            instant_future.add_done_callback(record_instant_tokens)
+
+            if RACE_INSTANT_SEARCH:
+                # The library pipeline runs meanwhile; a confirmed match is sent as soon as it is found
+                instant_future.add_done_callback(lambda future: publish_instant_result(bus, future))
+            else:
+                if publish_instant_result(bus, instant_future):
+                    return
+                bus.publish({'type': 'status', 'message': 'No instant match found. Searching your playlists...'})
+
+            def pipeline_stopped() -> bool:
+                """True once the client is gone, or an instant match was sent and we don't keep warming caches."""
+                return bus.cancelled or (bus.closed and not CONTINUE_PIPELINE_AFTER_INSTANT_MATCH)
+
             # Emit status update
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Fetching playlists...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'status', 'message': 'Fetching playlists...'})
 
             # Get user's playlists
-            playlists_data, updated_access_token = get_playlist_names(access_token, refresh_token)
-            print(f"[spotify_search] Found {len(playlists_data['items'])} playlists")
+            with span('playlist_fetch'):
+                playlists_data, updated_access_token = get_playlist_names(access_token, refresh_token)
+            log.info("Found %d playlists", len(playlists_data['items']))
+            
+            if pipeline_stopped():
+                return
             
             playlist_count = len(playlists_data["items"])
-            yield f"data: {json.dumps({'type': 'status', 'message': f'Found {playlist_count} playlists. Extracting songs...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'status', 'message': f'Found {playlist_count} playlists. Extracting songs...'})
             
             # Get songs from playlists
-            raw_songs = get_songs_from_playlists(playlists_data, updated_access_token, query)
-            print(f"[spotify_search] Found {len(raw_songs)} total songs")
+            with span('playlist_tracks', playlists=len(playlists_data['items'])):
+                raw_songs = get_songs_from_playlists(playlists_data, updated_access_token, query)
+            log.info("Found %d total songs", len(raw_songs))
+            
+            if pipeline_stopped():
+                return
             
             song_count = len(raw_songs)
-            yield f"data: {json.dumps({'type': 'status', 'message': f'Found {song_count} songs. Checking database...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'status', 'message': f'Found {song_count} songs. Checking database...'})
             
             # Check database for already processed songs
             if not SKIP_SUPABASE_CACHE:
-                already_processed_enriched_songs, unprocessed_raw_songs = fetch_already_processed_enriched_songs(raw_songs)
+                with span('cache_check', songs=len(raw_songs)):
+                    already_processed_enriched_songs, unprocessed_raw_songs = fetch_already_processed_enriched_songs(raw_songs)
+                    # Songs new to this user but already enriched by someone else
+                    index_songs_for_user(user_id, already_processed_enriched_songs, only_new=True)
             else:
                 already_processed_enriched_songs, unprocessed_raw_songs = [], raw_songs
                 
-            print(f"[spotify_search] Found {len(already_processed_enriched_songs)} already processed songs")
-            print(f"[spotify_search] Found {len(unprocessed_raw_songs)} unprocessed songs")
-            print(f"[spotify_search] Found {len(raw_songs)} total songs")
+            log.info("Found %d already processed and %d unprocessed of %d total songs",
+                     len(already_processed_enriched_songs), len(unprocessed_raw_songs), len(raw_songs))
 
             # Calculate total progress steps
             total_progress_steps = len(unprocessed_raw_songs)
             
             # Emit initial progress
-            yield f"data: {json.dumps({'type': 'progress', 'processed': 0, 'total': total_progress_steps, 'message': f'Cannoli is listening to your music...'})}\n\n"
-            await asyncio.sleep(0.1)
-
-            # get user id
-            user_id = get_user_id(access_token)
+            bus.publish({'type': 'progress', 'processed': 0, 'total': total_progress_steps, 'message': f'Cannoli is listening to your music...'})
 
             # update users_songs join table
-            update_users_songs_join_table(user_id, raw_songs)
+            with span('users_songs_update'):
+                update_users_songs_join_table(user_id, raw_songs)
 
             # Process unprocessed songs with progress updates
             enriched_songs = []
@@ -555,22 +637,25 @@ async def spotify_search(
             }
             
             if len(unprocessed_raw_songs) > 0:
-                print(f"[spotify_search] Enriching {len(unprocessed_raw_songs)} songs")
                 last_yield_time = time.time()
-                for song, token_usage in enrich_songs(unprocessed_raw_songs):                
-                    enriched_songs.append(song)
-                    # Update token usage
-                    total_enrichment_tokens = token_usage
-
-                    current_time = time.time()
-                    if current_time - last_yield_time >= 4:
-                        progress_update_copy = get_progress_update_copy(len(enriched_songs), total_progress_steps, song)
-                        yield f"data: {json.dumps({'type': 'progress', 'processed': len(enriched_songs), 'total': total_progress_steps, 'message': progress_update_copy})}\n\n"
-                        await asyncio.sleep(0.1)
-                        last_yield_time = current_time
-                    else:
-                        yield f"data: {json.dumps({'type': 'progress', 'processed': len(enriched_songs), 'total': total_progress_steps})}\n\n"
-                        await asyncio.sleep(0.1)
+                with span('enrichment', songs=len(unprocessed_raw_songs)):
+                    for song, token_usage in enrich_songs(unprocessed_raw_songs):                
+                        if pipeline_stopped():
+                            log.info("Stream finished, stopping enrichment")
+                            break
+                        enriched_songs.append(song)
+                        index_songs_for_user(user_id, [song])
+                        # Update token usage
+                        total_enrichment_tokens = token_usage
+
+                        current_time = time.time()
+                        if current_time - last_yield_time >= 4:
+                            progress_update_copy = get_progress_update_copy(len(enriched_songs), total_progress_steps, song)
+                            bus.publish({'type': 'progress', 'processed': len(enriched_songs), 'total': total_progress_steps, 'message': progress_update_copy})
+                            last_yield_time = current_time
+                        else:
+                            bus.publish({'type': 'progress', 'processed': len(enriched_songs), 'total': total_progress_steps})
+                record_token_usage('enrichment', total_enrichment_tokens)
                 
                 # Save newly enriched songs to database
                 # NOTE: Individual songs are now saved to database during enrichment process
@@ -585,16 +670,20 @@ async def spotify_search(
                 #   current_processed = min(i + batch_size, len(already_processed_enriched_songs))
                 #    song = already_processed_enriched_songs[min(i, len(already_processed_enriched_songs) - 1)]
                 #    progress_update_copy = get_progress_update_copy(current_processed, total_progress_steps, song)
-                #     yield f"data: {json.dumps({'type': 'progress', 'processed': current_processed, 'total': total_progress_steps, 'message': progress_update_copy})}\n\n"
+                #     yield {'type': 'progress', 'processed': current_processed, 'total': total_progress_steps, 'message': progress_update_copy}
                 #    await asyncio.sleep(0.2)  # Slightly longer delay to make progress visible
 
             
+            # After an instant match the search only warms caches; it runs only if the pipeline continues
+            if pipeline_stopped():
+                log.info("Stream finished, skipping library search")
+                return
+
             # Combine all enriched songs
             all_enriched_songs = already_processed_enriched_songs + enriched_songs
             
-            yield f"data: {json.dumps({'type': 'completion', 'prev_stage': 'enrichment'})}\n\n"
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Cannoli is searching through your music...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'completion', 'prev_stage': 'enrichment'})
+            bus.publish({'type': 'status', 'message': 'Cannoli is searching through your music...'})
             
             # Search through the songs using vector similarity search
             if SKIP_EXPENSIVE_STEPS:
@@ -603,54 +692,87 @@ async def spotify_search(
                     song.reasoning = f"this is why I think {song.name} by {', '.join(song.artists)} is relevant to the query"
                 time.sleep(3)
             else:
-                start_time = time.time()
-                relevant_songs, search_token_usage = vector_search_library(
-                    user_id=user_id,
-                    user_query=query, 
-                    n=20, 
-                    match_threshold=0.5,  # Adjust this threshold as needed
-                    generate_song_reasoning=False,
-                    verbose=True
-                )
-                end_time = time.time()
-                print(f"[spotify_search] Vector search result count: {len(relevant_songs)}, time taken: {end_time - start_time} seconds")
+                with span('vector_search') as vector_span:
+                    relevant_songs, search_token_usage = vector_search_library(
+                        user_id=user_id,
+                        user_query=query, 
+                        n=20, 
+                        match_threshold=0.5,  # Adjust this threshold as needed
+                        generate_song_reasoning=False,
+                        verbose=True,
+                        lexical_index=load_user_lyric_index(user_id) if HYBRID_VECTOR_SEARCH else None
+                    )
+                    vector_span.set(results=len(relevant_songs))
+                record_token_usage('vector_search', search_token_usage)
+                log.info("Vector search result count: %d, time taken: %.3f seconds", len(relevant_songs), vector_span.duration)
                 
-                # now run LLM search on the remaining songs
-                if ADD_RERANKER_TO_VECTOR_SEARCH:
+                # now run LLM search on the remaining songs, unless lexical and vector search already agree
+                skip_reranker = search_token_usage.get('hybrid', {}).get('skip_reranker', False)
+                if skip_reranker:
+                    log.info("Lexical and vector results agree, skipping LLM reranker")
+                    relevant_songs = relevant_songs[:10]
+                    search_token_usage['reranker_skipped'] = True
+                elif ADD_RERANKER_TO_VECTOR_SEARCH and not time_left_for(DEADLINE_RERANK_SECONDS):
+                    log.info("Too close to the request deadline, skipping LLM reranker")
+                    degrade('skip_reranker')
+                    relevant_songs = relevant_songs[:10]
+                    search_token_usage['reranker_skipped'] = True
+                elif ADD_RERANKER_TO_VECTOR_SEARCH:
                     llm_client = get_client("openai-direct", model_name="gpt-4o-mini")
-                    start_time = time.time()
-                    relevant_songs, llm_search_token_usage = search_library(llm_client, relevant_songs, query, n=10, chunk_size=100, generate_song_reasoning=False, verbose=True)
-                    end_time = time.time()
-                    print(f"[spotify_search] LLM reranker result count: {len(relevant_songs)}, time taken: {end_time - start_time} seconds")
-                    # Combine token usage from both vector and LLM search
-                    search_token_usage['total_input_tokens'] += llm_search_token_usage.get('total_input_tokens', 0)
-                    search_token_usage['total_output_tokens'] += llm_search_token_usage.get('total_output_tokens', 0)
-                    search_token_usage['total_requests'] += llm_search_token_usage.get('total_requests', 0)
-                    search_token_usage['fallback_llm_search'] = True
-                    search_token_usage['llm_search_tokens'] = llm_search_token_usage
+                    try:
+                        with span('rerank', songs=len(relevant_songs)) as rerank_span:
+                            reranked_songs, llm_search_token_usage = search_library(llm_client, relevant_songs, query, n=10, chunk_size=100, generate_song_reasoning=False, verbose=True)
+                    except Exception as e:
+                        # A reranker cut off by the deadline falls back to the vector ranking
+                        if not deadline_expired():
+                            raise
+                        log.warning("LLM reranker failed at the request deadline: %s", e)
+                        degrade('skip_reranker', reason=type(e).__name__)
+                        relevant_songs = relevant_songs[:10]
+                        search_token_usage['reranker_skipped'] = True
+                    else:
+                        relevant_songs = reranked_songs
+                        record_token_usage('rerank', llm_search_token_usage)
+                        log.info("LLM reranker result count: %d, time taken: %.3f seconds", len(relevant_songs), rerank_span.duration)
+                        # Combine token usage from both vector and LLM search
+                        search_token_usage['total_input_tokens'] += llm_search_token_usage.get('total_input_tokens', 0)
+                        search_token_usage['total_output_tokens'] += llm_search_token_usage.get('total_output_tokens', 0)
+                        search_token_usage['total_requests'] += llm_search_token_usage.get('total_requests', 0)
+                        search_token_usage['fallback_llm_search'] = True
+                        search_token_usage['llm_search_tokens'] = llm_search_token_usage
                 else:
-                    print(f"[spotify_search] Skipping LLM reranker")
-                
-                # Generate reasoning for all relevant songs at once
-                yield f"data: {json.dumps({'type': 'status', 'message': 'Generating song explanations...'})}\n\n"
-                await asyncio.sleep(0.1)
+                    log.info("Skipping LLM reranker")
                 
-                # Generate reasoning for all songs at once using batch processing
-                start_time = time.time()
-                relevant_songs, reasoning_token_usage = generate_many_song_reasoning(
-                    songs=relevant_songs,
-                    user_query=query,
-                    similarity_scores=None,  # We don't have individual similarity scores here
-                    verbose=True
-                )
-                end_time = time.time()
-                print(f"[spotify_search] Generated reasoning for {len(relevant_songs)} songs, time taken: {end_time - start_time} seconds")
-                print(f"[spotify_search] Reasoning token usage: {reasoning_token_usage}")
-
-            print(f"[spotify_search] Done searching")
+                if not time_left_for(DEADLINE_REASONING_SECONDS):
+                    # Too close to the request deadline: return the search results without explanations
+                    log.info("Too close to the request deadline, skipping song reasoning")
+                    degrade('skip_reasoning')
+                    reasoning_token_usage = {}
+                else:
+                    # Generate reasoning for all relevant songs at once
+                    bus.publish({'type': 'status', 'message': 'Generating song explanations...'})
+                    
+                    # Generate reasoning for all songs at once using batch processing
+                    similarity_by_id = search_token_usage.get('similarity_scores', {})
+                    with span('reasoning', songs=len(relevant_songs)) as reasoning_span:
+                        relevant_songs, reasoning_token_usage = generate_many_song_reasoning(
+                            songs=relevant_songs,
+                            user_query=query,
+                            similarity_scores=[similarity_by_id.get(song.id) for song in relevant_songs],
+                            verbose=True
+                        )
+                    record_token_usage('reasoning', reasoning_token_usage)
+                    log.info("Generated reasoning for %d songs, time taken: %.3f seconds", len(relevant_songs), reasoning_span.duration)
+                    log.debug("Reasoning token usage: %s", reasoning_token_usage)
+
+            log.debug("Done searching")
+
+            # A confirmed instant match still wins over library results
+            if publish_instant_result(bus, instant_future) or bus.closed:
+                return
+            instant_token_usage = instant_future.result()[1] if instant_future.exception() is None else {}
             
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Processing results...'})}\n\n"
-            await asyncio.sleep(0.1)
+            bus.publish({'type': 'status', 'message': 'Processing results...'})
             
             # Combine token usage from all processes (including instant search tokens)
             combined_token_usage = {
@@ -662,6 +784,7 @@ async def spotify_search(
                 'search_requests': search_token_usage.get('total_requests', 0),
                 'instant_requests': instant_token_usage.get('total_requests', 0),
                 'reasoning_requests': reasoning_token_usage.get('total_requests', 0),
+                'cached_requests': search_token_usage.get('cached_requests', 0) + total_enrichment_tokens.get('cached_requests', 0),
                 'enrichment_input_tokens': total_enrichment_tokens.get('total_input_tokens', 0),
                 'enrichment_output_tokens': total_enrichment_tokens.get('total_output_tokens', 0),
                 'search_input_tokens': search_token_usage.get('total_input_tokens', 0),
@@ -676,56 +799,78 @@ async def spotify_search(
                 'fallback_llm_search': search_token_usage.get('fallback_llm_search', False),
                 'llm_search_tokens': search_token_usage.get('llm_search_tokens', {}),
                 'vector_search_failed': search_token_usage.get('vector_search_failed', False),
-                'error': search_token_usage.get('error', '')
+                'hybrid': search_token_usage.get('hybrid', {}),
+                'reranker_skipped': search_token_usage.get('reranker_skipped', False),
+                'error': search_token_usage.get('error', ''),
+                'request_id': request_id,
+                'stage_timings': current_trace().summary(),
             }
+            deadline = current_deadline()
+            if deadline is not None:
+                combined_token_usage['deadline'] = deadline.to_dict()
             
-            print(f"[spotify_search] Token usage summary:")
-            print(f"  Instant: {instant_token_usage}")
-            print(f"  Enrichment: {total_enrichment_tokens}")
-            print(f"  Search: {search_token_usage}")
-            print(f"  Reasoning: {reasoning_token_usage}")
-            print(f"  Combined: {combined_token_usage}")
+            log.info("Token usage: %d input, %d output, %d requests",
+                     combined_token_usage['total_input_tokens'], combined_token_usage['total_output_tokens'], combined_token_usage['total_requests'])
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Token usage by stage: %s", LazyJSON({
+                    'instant': instant_token_usage,
+                    'enrichment': total_enrichment_tokens,
+                    'search': search_token_usage,
+                    'reasoning': reasoning_token_usage,
+                }))
             
-            # Convert Song objects to dictionaries for JSON serialization
-            result_dicts = []
-            for song in relevant_songs:
-                song_dict = asdict(song)
-                # Convert artists list to single artist string for frontend compatibility
-                song_dict['artist'] = ', '.join(song.artists) if song.artists else ''
-                # Ensure reasoning field is present
-                song_dict['reasoning'] = getattr(song, 'reasoning', '')
-                result_dicts.append(song_dict)
+            # Convert Song objects to the slim result dictionaries the frontend renders
+            result_dicts = [song_to_result(song, include_lyrics=INCLUDE_LYRICS_IN_RESULTS) for song in relevant_songs]
 
             # Emit final results
             final_data = {
                 'type': 'results',
                 'results': result_dicts,
-                'token_usage': combined_token_usage
+                'token_usage': combined_token_usage,
+                'degradations': deadline.degradations if deadline is not None else [],
             }
-            yield f"data: {json.dumps(final_data)}\n\n"
-            print(f"[spotify_search] Done streaming")
+            publish_results(bus, final_data)
+            log.debug("Done streaming")
 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            log.exception("Search pipeline failed")
+            # An instant match can still answer the query when the library pipeline fails
+            if instant_future is not None and publish_instant_result(bus, instant_future):
+                return
             # Emit error event
+            current_trace().error = type(e).__name__
             error_data = {
                 'type': 'error',
-                'error': str(e)
+                'error': str(e),
+                'request_id': request_id
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            bus.publish(error_data)
+
+    async def event_stream():
+        # The pipeline is blocking, so it runs in a worker thread and publishes to the bus
+        bus = ProgressBus()
+        events = bus.stream(run_search)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            log.info("Progress events: %s", bus.stats.to_dict())
 
+    encoder = SSEEncoder(encoding=choose_encoding(accept_encoding))
     return StreamingResponse(
-        event_stream(),
+        encode_events(event_stream(), encoder, label='spotify_search'),
         media_type="text/event-stream",
         headers={
+            **encoder.headers,
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, OPTIONS",
             "Access-Control-Allow-Headers": "Content-Type, Authorization, refresh-token",
             "X-Experimental-Stream-Data": "true",
-            "X-Accel-Buffering": "no"
+            "X-Accel-Buffering": "no",
+            "X-Request-ID": request_id
         },
     )
 
@@ -747,7 +892,7 @@ async def refresh_spotify_token(request: SpotifyRefreshRequest):
         }).encode()
         
         req = urllib.request.Request(
-            "https://accounts.spotify.com/api/token",
+            f"{SPOTIFY_ACCOUNTS_URL}/api/token",
             data,
             headers={
                 "Content-Type": "application/x-www-form-urlencoded",
@@ -1,14 +1,88 @@
 import requests
 import json
+import os
 import re
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from urllib.parse import quote, urljoin
 
+from next_data import NEXT_DATA_CHUNK_SIZE, decode_paths, find_next_data
+from search_library.log import get_logger
+
+log = get_logger(__name__)
+
+# URL variations probed at once by get_track_lyrics
+PROBE_WINDOW = 4
+# HEAD statuses that mean a variation's page doesn't exist (anything else gets a full fetch)
+MISSING_STATUSES = (404, 410)
+PROBE_TIMEOUT = 5
+# Patterns that depend on the track title rather than the artist, so aren't learned per artist
+TRACK_SPECIFIC_PATTERNS = ('track-without-first-word', 'track-without-last-word')
+
+_PENDING = object()
+
+# The parts of a page's __NEXT_DATA__ that are used; nothing else is decoded
+SEARCH_PATHS = {
+    'tracks': ('props', 'pageProps', 'data', 'searchGet', 'data', 'tracks'),
+}
+TRACK_PATHS = {
+    'track': ('props', 'pageProps', 'data', 'trackInfo', 'data', 'track'),
+    'lyrics': ('props', 'pageProps', 'data', 'trackInfo', 'data', 'lyrics', 'body'),
+    'album': ('props', 'pageProps', 'data', 'albumGet', 'data'),
+    'credits': ('props', 'pageProps', 'data', 'creditsTrackCollaboratorsGet', 'data'),
+}
+
+
+class UrlPatternTable:
+    """
+    Which URL variation pattern found lyrics for each artist, optionally persisted as JSON
+    so later lookups (also after a restart) go straight to the right URL.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._patterns: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._patterns = dict(json.load(f))
+            except (OSError, ValueError) as e:
+                log.warning("Could not load URL patterns from %s: %s", path, e)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def get(self, artist_key: str) -> Optional[str]:
+        return self._patterns.get(artist_key)
+
+    def record(self, artist_key: str, pattern: str) -> None:
+        with self._lock:
+            if self._patterns.get(artist_key) == pattern:
+                return
+            self._patterns[artist_key] = pattern
+            if not self.path:
+                return
+            # Write a temporary file and rename it, so readers never see a partial table
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._patterns, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                log.warning("Could not save URL patterns to %s: %s", self.path, e)
+
+
 class MusixMatchScraper:
-    def __init__(self):
+    def __init__(self, url_patterns_path: Optional[str] = None, probe_window: int = PROBE_WINDOW, stop_at_next_data: bool = True):
         self.base_url = "https://www.musixmatch.com"
+        self.probe_window = probe_window
+        # Stop downloading a page once its __NEXT_DATA__ is read (costs the connection's reuse)
+        self.stop_at_next_data = stop_at_next_data
+        self.url_patterns = UrlPatternTable(url_patterns_path)
         self.headers = {
             'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'accept-language': 'en-US,en;q=0.9',
@@ -26,6 +100,8 @@ class MusixMatchScraper:
         }
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        # Enough pooled connections for a full probe window
+        self.session.mount(self.base_url, requests.adapters.HTTPAdapter(pool_maxsize=max(10, probe_window)))
 
     def search_tracks(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -36,23 +112,15 @@ class MusixMatchScraper:
             # Search URL format
             search_url = f"{self.base_url}/search/{quote(query)}"
             
-            response = self.session.get(search_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "html.parser")
-            
             # Find the script tag with the search results
-            script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
+            next_data = self._fetch_next_data(search_url)
             
-            if not script_tag:
+            if next_data is None:
                 return []
             
-            json_data = json.loads(script_tag.string)
-            
             # Navigate through the JSON to find search results
             try:
-                page_props = json_data.get('props', {}).get('pageProps', {})
-                search_results = page_props.get('data', {}).get('searchGet', {}).get('data', {}).get('tracks', [])
+                search_results = decode_paths(next_data, SEARCH_PATHS).get('tracks') or []
                 
                 tracks = []
                 for track in search_results[:limit]:
@@ -70,40 +138,104 @@ class MusixMatchScraper:
                 return tracks
                 
             except KeyError as e:
-                print(f"Could not find search results in JSON: {e}")
+                log.warning("Could not find search results in JSON: %s", e)
                 return []
                 
         except Exception as e:
-            print(f"Error searching tracks: {e}")
+            log.warning("Error searching tracks: %s", e)
             return []
 
     def get_track_lyrics(self, artist_name: str, track_name: str) -> Optional[Dict[str, Any]]:
         """
         Get lyrics for a specific track by artist and track name
+
+        The URL variations are probed concurrently, `probe_window` at a time, with HEAD
+        requests so only pages that exist are fetched and parsed. The earliest variation
+        (in `_generate_url_variations` order) with track data wins, as when trying them one
+        by one. Its pattern is remembered for the artist and tried first next time.
         """
-        # Try multiple URL variations
-        url_variations = self._generate_url_variations(artist_name, track_name)
-        
-        print(f"Trying {len(url_variations)} URL variations for '{track_name}' by '{artist_name}'")
-        
-        for i, lyrics_url in enumerate(url_variations, 1):
-            try:
-                print(f"  [{i}/{len(url_variations)}] Trying: {lyrics_url}")
-                result = self._get_track_from_url(lyrics_url)
-                if result:
-                    print(f"  ✓ Success! Found lyrics at: {lyrics_url}")
-                    return result
-            except Exception as e:
-                print(f"  ✗ Failed: {e}")
-                continue
-        
-        print(f"  ✗ All {len(url_variations)} variations failed")
-        return None
+        candidates = self._generate_url_patterns(artist_name, track_name)
+        artist_key = self._normalize_name(artist_name).lower()
+
+        learned = self.url_patterns.get(artist_key)
+        learned_url = next((url for pattern, url in candidates if pattern == learned), None)
+        if learned_url:
+            log.debug("Trying learned pattern '%s' for '%s': %s", learned, artist_name, learned_url)
+            result = self._get_track_from_url(learned_url)
+            if result:
+                log.info("Found lyrics at %s (learned pattern '%s')", learned_url, learned)
+                return result
+            candidates = [(pattern, url) for pattern, url in candidates if url != learned_url]
+
+        log.debug("Probing %d URL variations for '%s' by '%s'", len(candidates), track_name, artist_name)
+        found = self._probe_urls(candidates)
+        if found is None:
+            log.info("All %d URL variations failed for '%s' by '%s'", len(candidates), track_name, artist_name)
+            return None
+
+        pattern, lyrics_url, result = found
+        log.info("Found lyrics at %s (pattern '%s')", lyrics_url, pattern)
+        if pattern not in TRACK_SPECIFIC_PATTERNS:
+            self.url_patterns.record(artist_key, pattern)
+        return result
+
+    def _probe_urls(self, candidates: List[Tuple[str, str]]) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Find the first (pattern, URL) candidate whose page has track data, probing up to
+        `probe_window` candidates at a time. Probes still running once it is known are
+        abandoned and the rest are never started.
+
+        Returns:
+            (pattern, URL, track data) of the winning candidate, or None if all failed
+        """
+        if not candidates:
+            return None
+        results: List[Any] = [_PENDING] * len(candidates)
+        in_flight = {}
+        next_index = 0
+        executor = ThreadPoolExecutor(max_workers=self.probe_window)
+        try:
+            while True:
+                # Decided once the earliest candidate not known to fail has succeeded
+                for index, result in enumerate(results):
+                    if result is _PENDING:
+                        break
+                    if result is not None:
+                        return (*candidates[index], result)
+                else:
+                    return None
+                while next_index < len(candidates) and len(in_flight) < self.probe_window:
+                    in_flight[executor.submit(self._probe_url, candidates[next_index][1])] = next_index
+                    next_index += 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _probe_url(self, lyrics_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Track data from a URL, checking first with a HEAD request that the page exists
+        """
+        try:
+            response = self.session.head(lyrics_url, timeout=PROBE_TIMEOUT, allow_redirects=True)
+            if response.status_code in MISSING_STATUSES:
+                return None
+        except requests.RequestException:
+            pass  # Inconclusive: the full fetch decides
+        return self._get_track_from_url(lyrics_url)
 
     def _generate_url_variations(self, artist_name: str, track_name: str) -> List[str]:
         """
         Generate multiple URL variations to try when the standard format doesn't work
         """
+        return [url for _, url in self._generate_url_patterns(artist_name, track_name)]
+
+    def _generate_url_patterns(self, artist_name: str, track_name: str) -> List[Tuple[str, str]]:
+        """
+        (pattern, URL) pairs for the URL variations, most likely first; the pattern names
+        how the URL was derived, so it can be reused for other tracks of the artist
+        """
         variations = []
         
         # Clean and normalize names
@@ -111,15 +243,15 @@ class MusixMatchScraper:
         track_clean = self._normalize_name(track_name)
         
         # Standard format
-        variations.append(f"{self.base_url}/lyrics/{artist_clean}/{track_clean}")
+        variations.append(('standard', f"{self.base_url}/lyrics/{artist_clean}/{track_clean}"))
         
         # Try with numbers appended to artist (common pattern)
         for i in range(1, 10):
-            variations.append(f"{self.base_url}/lyrics/{artist_clean}-{i}/{track_clean}")
+            variations.append((f'artist-{i}', f"{self.base_url}/lyrics/{artist_clean}-{i}/{track_clean}"))
         
         # Try different casing variations
-        variations.append(f"{self.base_url}/lyrics/{artist_clean.lower()}/{track_clean.lower()}")
-        variations.append(f"{self.base_url}/lyrics/{artist_clean.title()}/{track_clean.title()}")
+        variations.append(('lower', f"{self.base_url}/lyrics/{artist_clean.lower()}/{track_clean.lower()}"))
+        variations.append(('title', f"{self.base_url}/lyrics/{artist_clean.title()}/{track_clean.title()}"))
         
         # Try with different apostrophe handling
         if "'" in track_name or "'" in artist_name:
@@ -128,27 +260,27 @@ class MusixMatchScraper:
             track_apostrophe = track_name.replace("'", "'").replace("'", "'")
             artist_apostrophe_clean = self._normalize_name(artist_apostrophe)
             track_apostrophe_clean = self._normalize_name(track_apostrophe)
-            variations.append(f"{self.base_url}/lyrics/{artist_apostrophe_clean}/{track_apostrophe_clean}")
+            variations.append(('apostrophe', f"{self.base_url}/lyrics/{artist_apostrophe_clean}/{track_apostrophe_clean}"))
             
             # With numbers for apostrophe versions too
             for i in range(1, 5):
-                variations.append(f"{self.base_url}/lyrics/{artist_apostrophe_clean}-{i}/{track_apostrophe_clean}")
+                variations.append((f'apostrophe-artist-{i}', f"{self.base_url}/lyrics/{artist_apostrophe_clean}-{i}/{track_apostrophe_clean}"))
         
         # Try removing common words that might be omitted
         track_words = track_clean.split('-')
         if len(track_words) > 1:
             # Try without first word
-            variations.append(f"{self.base_url}/lyrics/{artist_clean}/{'-'.join(track_words[1:])}")
+            variations.append(('track-without-first-word', f"{self.base_url}/lyrics/{artist_clean}/{'-'.join(track_words[1:])}"))
             # Try without last word
-            variations.append(f"{self.base_url}/lyrics/{artist_clean}/{'-'.join(track_words[:-1])}")
+            variations.append(('track-without-last-word', f"{self.base_url}/lyrics/{artist_clean}/{'-'.join(track_words[:-1])}"))
         
         # Remove duplicates while preserving order
         seen = set()
         unique_variations = []
-        for url in variations:
+        for pattern, url in variations:
             if url not in seen:
                 seen.add(url)
-                unique_variations.append(url)
+                unique_variations.append((pattern, url))
         
         return unique_variations
 
@@ -177,39 +309,32 @@ class MusixMatchScraper:
         Get track information from a specific URL
         """
         try:
-            response = self.session.get(lyrics_url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, "html.parser")
-            
             # Find the script tag with the track data
-            script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
+            next_data = self._fetch_next_data(lyrics_url)
             
-            if not script_tag:
+            if next_data is None:
                 return None
             
-            json_data = json.loads(script_tag.string)
-            
             # Navigate through the JSON to extract data
             try:
-                page_props = json_data['props']['pageProps']
+                page_data = decode_paths(next_data, TRACK_PATHS)
                 
                 # Extract Track Info
-                track_info = page_props['data']['trackInfo']['data']['track']
+                track_info = page_data['track']
                 track_title = track_info.get('name', 'N/A')
                 artist_name = track_info.get('artistName', 'N/A')
                 track_release_date = track_info.get('releaseDate', 'N/A')
                 spotify_id = track_info.get('spotifyId', 'N/A')
                 
                 # Extract Album Info
-                album_info = page_props['data']['albumGet']['data']
+                album_info = page_data['album']
                 album_title = album_info.get('name', 'N/A')
                 album_track_count = album_info.get('trackCount', 'N/A')
                 album_release_timestamp = album_info.get('releaseDate', 0) / 1000
                 album_release_date = datetime.fromtimestamp(album_release_timestamp).strftime('%Y-%m-%d') if album_release_timestamp > 0 else 'N/A'
                 
                 # Extract Credits/Writers
-                credits_info = page_props['data']['creditsTrackCollaboratorsGet']['data']
+                credits_info = page_data['credits']
                 writers = []
                 for credit in credits_info:
                     writer_name = credit.get('name')
@@ -217,7 +342,7 @@ class MusixMatchScraper:
                     writers.append(f"{writer_name} ({roles})")
                 
                 # Extract Lyrics
-                lyrics_body = page_props['data']['trackInfo']['data']['lyrics']['body']
+                lyrics_body = page_data['lyrics']
                 
                 return {
                     'track': {
@@ -238,13 +363,27 @@ class MusixMatchScraper:
                 }
                 
             except KeyError as e:
-                print(f"Could not find key {e} in the JSON data. The website's data structure may have changed.")
+                log.warning("Could not find key %s in the JSON data. The website's data structure may have changed.", e)
                 return None
                 
         except Exception as e:
-            print(f"Error getting track from URL {lyrics_url}: {e}")
+            log.debug("Error getting track from URL %s: %s", lyrics_url, e)
             return None
 
+    def _fetch_next_data(self, url: str) -> Optional[bytes]:
+        """
+        Download a page just far enough to return its __NEXT_DATA__ JSON (None if it has none)
+        """
+        with self.session.get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(NEXT_DATA_CHUNK_SIZE)
+            next_data = find_next_data(chunks)
+            if not self.stop_at_next_data:
+                # Read the rest, so the connection goes back to the pool
+                for _ in chunks:
+                    pass
+            return next_data
+
     def get_track_by_url(self, lyrics_url: str) -> Optional[Dict[str, Any]]:
         """
         Get track information from a direct lyrics URL
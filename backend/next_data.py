@@ -0,0 +1,152 @@
+"""Extraction of the `__NEXT_DATA__` JSON that Next.js sites (e.g. MusixMatch) embed in their pages.
+
+Rather than parsing the whole page, `find_next_data` scans the raw bytes for the
+`<script id="__NEXT_DATA__">` tag as they are read, and stops consuming the response once
+its closing tag is in. `decode_paths` then decodes only the values the caller asks for:
+objects off the requested paths are skipped member by member and never kept, so large
+parts of the payload (translations, unrelated queries) are not held in memory at once.
+
+    with session.get(url, stream=True) as response:
+        next_data = find_next_data(response.iter_content(NEXT_DATA_CHUNK_SIZE))
+    fields = decode_paths(next_data, {'title': ('props', 'pageProps', 'data', 'track', 'name')})
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Iterable, Optional, Union
+
+# Bytes requested per read while scanning a streamed page
+NEXT_DATA_CHUNK_SIZE: int = 64 * 1024
+
+_OPEN_MARKER = b'id="__NEXT_DATA__"'
+_CLOSE_MARKER = b'</script'
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def find_next_data(chunks: Iterable[bytes]) -> Optional[bytes]:
+    """
+    Return the content of the page's `__NEXT_DATA__` script, reading only as far as its closing tag.
+
+    Args:
+        chunks: The page as successive byte chunks (e.g. `response.iter_content()`); not
+            consumed past the chunk holding the closing tag
+
+    Returns:
+        The script's raw JSON, or None if the page has no `__NEXT_DATA__` script
+    """
+    buffer = bytearray()
+    in_tag = False  # The opening tag's marker is at the start of `buffer`, its '>' not read yet
+    in_script = False  # `buffer` starts at the script's content
+    for chunk in chunks:
+        # Resume each search a marker's length before the new bytes, in case it straddles two chunks
+        search_from = max(0, len(buffer) - (len(_CLOSE_MARKER) if in_script else len(_OPEN_MARKER)))
+        buffer += chunk
+        if not in_script:
+            if not in_tag:
+                marker = buffer.find(_OPEN_MARKER, search_from)
+                if marker < 0:
+                    # Only a possible partial marker needs keeping
+                    del buffer[:max(0, len(buffer) - len(_OPEN_MARKER))]
+                    continue
+                del buffer[:marker]
+                in_tag = True
+                search_from = 0
+            tag_end = buffer.find(b'>', search_from)
+            if tag_end < 0:
+                continue
+            del buffer[:tag_end + 1]
+            in_script = True
+            search_from = 0
+        end = buffer.find(_CLOSE_MARKER, search_from)
+        if end >= 0:
+            del buffer[end:]
+            return bytes(buffer)
+    return None
+
+
+def _build_trie(paths: dict[str, tuple[str, ...]]) -> dict:
+    trie: dict = {}
+    for name, path in paths.items():
+        node = trie
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise ValueError(f"Path {path} for {name!r} runs through another requested value")
+        if path[-1] in node:
+            raise ValueError(f"Path {path} for {name!r} overlaps another requested path")
+        node[path[-1]] = name
+    return trie
+
+
+class _AllFound(Exception):
+    pass
+
+
+def _skip_whitespace(document: str, index: int) -> int:
+    return _whitespace.match(document, index).end()
+
+
+def _walk_object(document: str, index: int, trie: dict, found: dict, wanted: int) -> int:
+    """Decode the requested members of the object starting at `index`; returns the index after it."""
+    index = _skip_whitespace(document, index + 1)
+    if document.startswith('}', index):
+        return index + 1
+    while True:
+        if not document.startswith('"', index):
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", document, index)
+        key, index = scanstring(document, index + 1)
+        index = _skip_whitespace(document, index)
+        if not document.startswith(':', index):
+            raise json.JSONDecodeError("Expecting ':' delimiter", document, index)
+        index = _skip_whitespace(document, index + 1)
+
+        node = trie.get(key)
+        if isinstance(node, str):
+            found[node], index = _decoder.raw_decode(document, index)
+            if len(found) == wanted:
+                raise _AllFound
+        elif node is not None and document.startswith('{', index):
+            index = _walk_object(document, index, node, found, wanted)
+        else:
+            # Off every requested path: decoded (by the C scanner) only to find where it ends
+            _, index = _decoder.raw_decode(document, index)
+
+        index = _skip_whitespace(document, index)
+        if document.startswith('}', index):
+            return index + 1
+        if not document.startswith(',', index):
+            raise json.JSONDecodeError("Expecting ',' delimiter", document, index)
+        index = _skip_whitespace(document, index + 1)
+
+
+def decode_paths(document: Union[str, bytes], paths: dict[str, tuple[str, ...]]) -> dict[str, Any]:
+    """
+    Decode only the values at the given key paths of a JSON object.
+
+    Decoding stops as soon as every path has been found. Paths only run through objects;
+    a path that is missing (or runs into a non-object) is left out of the result.
+
+    Args:
+        document: A JSON document whose top level is an object
+        paths: Result name -> keys leading to the value, e.g. ('props', 'pageProps', 'data')
+
+    Returns:
+        Result name -> decoded value, for the paths that were found
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON (up to the last value needed)
+    """
+    if isinstance(document, (bytes, bytearray)):
+        document = document.decode('utf-8')
+    found: dict[str, Any] = {}
+    index = _skip_whitespace(document, 0)
+    if not document.startswith('{', index):
+        raise json.JSONDecodeError("Expecting object", document, index)
+    try:
+        _walk_object(document, index, _build_trie(paths), found, len(paths))
+    except _AllFound:
+        pass
+    return found
@@ -0,0 +1,62 @@
+"""Backfill an embedding version for the whole songs table.
+
+Re-embeds every song from the lyrics and metadata already stored in `songs` (nothing is
+re-enriched) with batched embedding requests, and writes each batch to `song_embeddings`
+in a single upsert. Songs that already have the version are skipped, so the job can be
+interrupted and rerun at any time. See search_library/embedding_versions.py for the
+migration steps around it.
+
+Run from the backend directory:
+
+    python reembed.py --version 3-small --workers 8
+    python reembed.py --version 3-small-512 --limit 1000
+    python reembed.py --version ada-002-pca256 --fit-pca   # fit the projection first
+"""
+
+import argparse
+import json
+
+from supabase import create_client
+
+from search_library.embedding_versions import EMBEDDING_VERSIONS, get_embedding_version, reembed_library, fit_pca
+from utils import supabase_url, supabase_service_key
+
+DEFAULT_WORKERS = 4
+DEFAULT_PAGE_SIZE = 500
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--version', required=True, choices=[tag for tag, version in EMBEDDING_VERSIONS.items() if not version.legacy])
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent embedding batches')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Songs read from the database per page')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after scanning this many songs')
+    parser.add_argument('--fit-pca', action='store_true', help='Fit and save the PCA projection of a PCA version before backfilling')
+    parser.add_argument('--pca-sample', type=int, default=20000, help='Songs to fit the PCA projection on')
+    args = parser.parse_args()
+
+    if not supabase_url or not supabase_service_key:
+        parser.error('SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required')
+    supabase = create_client(supabase_url, supabase_service_key)
+    version = get_embedding_version(args.version)
+    if args.fit_pca:
+        fit_pca(supabase, version, sample_size=args.pca_sample)
+
+    def report(stats) -> None:
+        progress = stats.to_dict()
+        print(f"[reembed] {progress['scanned']} scanned, {progress['embedded']} embedded, "
+              f"{progress['failed']} failed, {progress['songs_per_min']} songs/min")
+
+    stats = reembed_library(
+        supabase,
+        version,
+        page_size=args.page_size,
+        workers=args.workers,
+        limit=args.limit,
+        on_progress=report,
+    )
+    print(json.dumps(stats.to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Token-budget-aware packing of songs into LLM reranker chunks."""
+
+import math
+from dataclasses import dataclass, field, replace
+
+from .types import Song
+
+# Rough chars-per-token ratio for English prose / lyrics with OpenAI and Anthropic tokenizers.
+CHARS_PER_TOKEN: float = 4.0
+
+# gpt-4o-mini has a 128k context window; leave room for the prompt template and the response.
+DEFAULT_MAX_TOKENS_PER_CHUNK: int = 100_000
+DEFAULT_MAX_TOKENS_PER_SONG: int = 4_000
+
+TRUNCATION_MARKER = "\n[...truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for a string (no tokenizer round trip)."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class ChunkingStats:
+    """Metrics describing how a library was packed into chunks."""
+
+    num_songs: int = 0
+    num_chunks: int = 0
+    max_tokens_per_chunk: int = 0
+    max_tokens_per_song: int = 0
+    songs_per_chunk: list[int] = field(default_factory=list)
+    estimated_tokens_per_chunk: list[int] = field(default_factory=list)
+    total_estimated_tokens: int = 0
+    truncated_songs: int = 0
+    truncated_tokens: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'num_songs': self.num_songs,
+            'num_chunks': self.num_chunks,
+            'max_tokens_per_chunk': self.max_tokens_per_chunk,
+            'max_tokens_per_song': self.max_tokens_per_song,
+            'songs_per_chunk': self.songs_per_chunk,
+            'estimated_tokens_per_chunk': self.estimated_tokens_per_chunk,
+            'total_estimated_tokens': self.total_estimated_tokens,
+            'truncated_songs': self.truncated_songs,
+            'truncated_tokens': self.truncated_tokens,
+        }
+
+
+def _cut(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, preferring the last line break before the limit."""
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+    cut = text[:max_chars]
+    newline = cut.rfind("\n")
+    # Only snap to a line break if it doesn't throw away more than a quarter of the budget.
+    if newline >= max_chars * 3 // 4:
+        cut = cut[:newline]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def truncate_song(song: Song, max_tokens: int) -> Song:
+    """Return a copy of song whose str() fits in max_tokens, or the song itself if it already fits.
+
+    Lyrics are cut first, then song metadata. The cut is a pure function of the song's
+    fields and the budget, so the same song always produces the same prompt text.
+    """
+    if estimate_tokens(str(song)) <= max_tokens:
+        return song
+
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    overhead_chars = len(str(replace(song, lyrics="", song_metadata="")))
+    available = max(0, max_chars - overhead_chars - 2 * len(TRUNCATION_MARKER))
+
+    # Metadata is usually short; give it up to a quarter of the budget and the rest to lyrics.
+    metadata_chars = min(len(song.song_metadata), available // 4)
+    lyrics_chars = available - metadata_chars
+    if lyrics_chars > len(song.lyrics):
+        metadata_chars += lyrics_chars - len(song.lyrics)
+        lyrics_chars = len(song.lyrics)
+
+    return replace(
+        song,
+        lyrics=_cut(song.lyrics, lyrics_chars),
+        song_metadata=_cut(song.song_metadata, metadata_chars),
+    )
+
+
+def pack_songs(
+    library: list[Song],
+    max_tokens_per_chunk: int = DEFAULT_MAX_TOKENS_PER_CHUNK,
+    max_tokens_per_song: int = DEFAULT_MAX_TOKENS_PER_SONG,
+    max_songs_per_chunk: int | None = None,
+) -> tuple[list[list[Song]], ChunkingStats]:
+    """
+    Bin-pack songs into chunks whose estimated prompt size stays under a token budget.
+
+    Songs are placed first-fit in library order, so songs keep their relative order
+    inside a chunk. Songs larger than max_tokens_per_song are replaced by truncated
+    copies (the originals are left untouched).
+
+    Args:
+        library: The songs to pack
+        max_tokens_per_chunk: Estimated token budget for the songs in one chunk
+        max_tokens_per_song: Estimated token budget for a single song
+        max_songs_per_chunk: Optional cap on the number of songs in one chunk
+
+    Returns:
+        A tuple of (chunks, chunking stats)
+    """
+    max_tokens_per_song = min(max_tokens_per_song, max_tokens_per_chunk)
+    stats = ChunkingStats(
+        num_songs=len(library),
+        max_tokens_per_chunk=max_tokens_per_chunk,
+        max_tokens_per_song=max_tokens_per_song,
+    )
+
+    chunks: list[list[Song]] = []
+    chunk_tokens: list[int] = []
+    # Index of the first chunk that may still have room; chunks before it are full.
+    first_open = 0
+
+    for song in library:
+        tokens = estimate_tokens(str(song))
+        if tokens > max_tokens_per_song:
+            song = truncate_song(song, max_tokens_per_song)
+            truncated_tokens = estimate_tokens(str(song))
+            stats.truncated_songs += 1
+            stats.truncated_tokens += tokens - truncated_tokens
+            tokens = truncated_tokens
+
+        placed = False
+        for i in range(first_open, len(chunks)):
+            if max_songs_per_chunk is not None and len(chunks[i]) >= max_songs_per_chunk:
+                if i == first_open:
+                    first_open += 1
+                continue
+            if chunk_tokens[i] + tokens <= max_tokens_per_chunk:
+                chunks[i].append(song)
+                chunk_tokens[i] += tokens
+                placed = True
+                break
+        if not placed:
+            chunks.append([song])
+            chunk_tokens.append(tokens)
+
+    stats.num_chunks = len(chunks)
+    stats.songs_per_chunk = [len(chunk) for chunk in chunks]
+    stats.estimated_tokens_per_chunk = chunk_tokens
+    stats.total_estimated_tokens = sum(chunk_tokens)
+    return chunks, stats
@@ -3,11 +3,13 @@
 import json
 import os
 import random
+import threading
 import time
 from dataclasses import dataclass
 from typing import Any, Tuple, cast, Union, List, Dict, Optional
 from dataclasses_json import DataClassJsonMixin
 import anthropic
+import httpx
 import openai
 from anthropic import (
     NOT_GIVEN as Anthropic_NOT_GIVEN,
@@ -57,7 +59,86 @@ from openai._types import (
 
 import logging
 
+from .deadline import call_timeout, time_left_for
+from .log import get_logger
+
 logging.getLogger("httpx").setLevel(logging.WARNING)
+log = get_logger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool shared by every SDK client of a provider. Enrichment and reasoning run
+# 5-10 requests at a time, so keep enough warm connections for both at once.
+HTTP_MAX_CONNECTIONS: int = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 32
+HTTP_KEEPALIVE_EXPIRY: float = 120.0
+
+# Give up instead of retrying when less than this is left before the request deadline
+RETRY_DEADLINE_SECONDS: float = 15.0
+
+_registry_lock = threading.Lock()
+_http_clients: dict[str, httpx.Client] = {}
+_sdk_clients: dict[tuple, Any] = {}
+_llm_clients: dict[tuple, "LLMClient"] = {}
+
+
+def _shared_http_client(provider: str) -> httpx.Client:
+    """Return the provider's process-wide httpx client (call with _registry_lock held)."""
+    http_client = _http_clients.get(provider)
+    if http_client is None:
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        default_client = anthropic.DefaultHttpxClient if provider == "anthropic" else openai.DefaultHttpxClient
+        http_client = default_client(limits=limits, http2=HTTP2_AVAILABLE)
+        _http_clients[provider] = http_client
+    return http_client
+
+
+def get_sdk_client(provider: str, **options) -> Union[openai.OpenAI, anthropic.Anthropic]:
+    """
+    Return a process-wide SDK client for a provider, configured with `options`.
+
+    Clients are reused per (provider, API key, options) and all clients of a provider
+    share one pooled HTTP/2-capable connection pool, so calls skip client construction
+    and TLS handshakes.
+
+    Args:
+        provider: "openai" or "anthropic"
+        **options: Keyword arguments for the SDK client (e.g. max_retries, timeout)
+
+    Returns:
+        The shared openai.OpenAI or anthropic.Anthropic client
+    """
+    if provider == "openai":
+        sdk_class, api_key = openai.OpenAI, os.getenv("OPENAI_API_KEY")
+    elif provider == "anthropic":
+        sdk_class, api_key = anthropic.Anthropic, os.getenv("ANTHROPIC_API_KEY")
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+    key = (provider, api_key, tuple(sorted(options.items())))
+    with _registry_lock:
+        client = _sdk_clients.get(key)
+        if client is None:
+            client = sdk_class(api_key=api_key, http_client=_shared_http_client(provider), **options)
+            _sdk_clients[key] = client
+        return client
+
+
+def clear_client_registry() -> None:
+    """Drop every shared client and close the connection pools (mainly for tests and benchmarks)."""
+    with _registry_lock:
+        for http_client in _http_clients.values():
+            http_client.close()
+        _http_clients.clear()
+        _sdk_clients.clear()
+        _llm_clients.clear()
 
 
 @dataclass
@@ -175,11 +256,8 @@ class AnthropicDirectClient(LLMClient):
         thinking_tokens: int = 0,
     ):
         """Initialize the Anthropic first party client."""
-        api_key = os.getenv("ANTHROPIC_API_KEY")
         # Disable retries since we are handling retries ourselves.
-        self.client = anthropic.Anthropic(
-            api_key=api_key, max_retries=1, timeout=60 * 5
-        )
+        self.client = get_sdk_client("anthropic", max_retries=1, timeout=60 * 5)
         self.model_name = model_name
         self.max_retries = max_retries
         self.use_caching = use_caching
@@ -250,9 +328,6 @@ class AnthropicDirectClient(LLMClient):
                     message = cast(AnthropicThinkingBlock, message)
                     message_content = message
                 else:
-                    print(
-                        f"Unknown message type: {type(message)}, expected one of {str(TextPrompt)}, {str(TextResult)}, {str(ToolCall)}, {str(ToolFormattedResult)}"
-                    )
                     raise ValueError(
                         f"Unknown message type: {type(message)}, expected one of {str(TextPrompt)}, {str(TextResult)}, {str(ToolCall)}, {str(ToolFormattedResult)}"
                     )
@@ -330,6 +405,8 @@ class AnthropicDirectClient(LLMClient):
                     tools=tool_params,
                     extra_headers=extra_headers,
                     extra_body=extra_body,
+                    # Capped by the request deadline (the client's own timeout otherwise)
+                    timeout=call_timeout(None) or Anthropic_NOT_GIVEN,
                 )
                 break
             except (
@@ -338,11 +415,12 @@ class AnthropicDirectClient(LLMClient):
                 AnthropicRateLimitError,
                 AnthropicOverloadedError,
             ) as e:
-                if retry == self.max_retries - 1:
-                    print(f"Failed Anthropic request after {retry + 1} retries")
+                # The backoff plus another attempt would overrun the request deadline
+                if retry == self.max_retries - 1 or not time_left_for(RETRY_DEADLINE_SECONDS):
+                    log.error("Failed Anthropic request after %d retries", retry + 1)
                     raise e
                 else:
-                    print(f"Retrying LLM request: {retry + 1}/{self.max_retries}")
+                    log.warning("Retrying Anthropic request: %d/%d", retry + 1, self.max_retries)
                     # Sleep 4-6 seconds with jitter to avoid thundering herd.
                     time.sleep(5 * random.uniform(0.8, 1.2))
 
@@ -351,10 +429,7 @@ class AnthropicDirectClient(LLMClient):
         assert response is not None
         for message in response.content:
             if "</invoke>" in str(message):
-                warning_msg = "\n".join(
-                    ["!" * 80, "WARNING: Unexpected 'invoke' in message", "!" * 80]
-                )
-                print(warning_msg)
+                log.warning("Unexpected 'invoke' in message")
 
             if str(type(message)) == str(AnthropicTextBlock):
                 message = cast(AnthropicTextBlock, message)
@@ -396,11 +471,7 @@ class OpenAIDirectClient(LLMClient):
 
     def __init__(self, model_name: str, max_retries=2, cot_model: bool = False, enable_web_search: bool = False):
         """Initialize the OpenAI first party client."""
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.client = openai.OpenAI(
-            api_key=api_key,
-            max_retries=1,
-        )
+        self.client = get_sdk_client("openai", max_retries=1)
         self.model_name = model_name
         self.max_retries = max_retries
         self.cot_model = cot_model
@@ -474,9 +545,6 @@ class OpenAIDirectClient(LLMClient):
                     "content": augment_message.tool_output,
                 }
             else:
-                print(
-                    f"Unknown message type: {type(augment_message)}, expected one of {str(TextPrompt)}, {str(TextResult)}, {str(ToolCall)}, {str(ToolFormattedResult)}"
-                )
                 raise ValueError(f"Unknown message type: {type(augment_message)}")
             openai_messages.append(openai_message)
 
@@ -530,6 +598,8 @@ class OpenAIDirectClient(LLMClient):
                     tool_choice=tool_choice_param,  # type: ignore
                     max_tokens=openai_max_tokens,
                     extra_body=extra_body,
+                    # Capped by the request deadline (the client's own timeout otherwise)
+                    timeout=call_timeout(None) or OpenAI_NOT_GIVEN,
                 )
                 break
             except (
@@ -537,11 +607,11 @@ class OpenAIDirectClient(LLMClient):
                 OpenAI_InternalServerError,
                 OpenAI_RateLimitError,
             ) as e:
-                if retry == self.max_retries - 1:
-                    print(f"Failed OpenAI request after {retry + 1} retries")
+                if retry == self.max_retries - 1 or not time_left_for(RETRY_DEADLINE_SECONDS):
+                    log.error("Failed OpenAI request after %d retries", retry + 1)
                     raise e
                 else:
-                    print(f"Retrying OpenAI request: {retry + 1}/{self.max_retries}")
+                    log.warning("Retrying OpenAI request: %d/%d", retry + 1, self.max_retries)
                     # Sleep 8-12 seconds with jitter to avoid thundering herd.
                     time.sleep(10 * random.uniform(0.8, 1.2))
 
@@ -569,8 +639,7 @@ class OpenAIDirectClient(LLMClient):
                 # Parse the JSON string into a dictionary
                 tool_input = json.loads(tool_call.function.arguments)
             except json.JSONDecodeError as e:
-                print(f"Failed to parse tool arguments: {tool_call.function.arguments}")
-                print(f"JSON parse error: {str(e)}")
+                log.error("Failed to parse tool arguments (%s): %s", e, tool_call.function.arguments)
                 raise ValueError(f"Invalid JSON in tool arguments: {str(e)}") from e
 
             augment_messages.append(
@@ -595,14 +664,90 @@ class OpenAIDirectClient(LLMClient):
         return augment_messages, message_metadata
 
 
-def get_client(client_name: str, **kwargs) -> LLMClient:
-    """Get a client for a given client name."""
+# Process-wide response cache backend used by get_client (see llm_cache.py); None disables caching
+_response_cache = None
+
+
+def set_response_cache(backend) -> None:
+    """Set (or with None, disable) the response cache backend that get_client wraps clients with."""
+    global _response_cache
+    _response_cache = backend
+
+
+def get_response_cache():
+    """Return the response cache backend used by get_client, if any."""
+    return _response_cache
+
+
+# Secondary routes per primary model name: [(client name, options), ...]; see routing.py
+_fallback_routes: dict[str, list[tuple[str, dict]]] = {}
+
+# API key each client name needs; fallbacks without a key are skipped
+_CLIENT_API_KEYS = {"anthropic-direct": "ANTHROPIC_API_KEY", "openai-direct": "OPENAI_API_KEY"}
+
+
+def set_fallback_routes(routes: dict[str, list[tuple[str, dict]]]) -> None:
+    """Set the (client name, options) routes that requests for each primary model hedge and fail over to."""
+    global _fallback_routes
+    _fallback_routes = dict(routes)
+    with _registry_lock:
+        _llm_clients.clear()
+
+
+def _build_client(client_name: str, route: bool = False, **kwargs) -> LLMClient:
     if client_name == "anthropic-direct":
-        return AnthropicDirectClient(**kwargs)
+        client = AnthropicDirectClient(**kwargs)
     elif client_name == "openai-direct":
         # Default to gpt-4o model for web search support
         if 'model_name' not in kwargs:
             kwargs['model_name'] = 'gpt-4o'
-        return OpenAIDirectClient(**kwargs)
+        client = OpenAIDirectClient(**kwargs)
     else:
-        raise ValueError(f"Unknown client name: {client_name}")
\ No newline at end of file
+        raise ValueError(f"Unknown client name: {client_name}")
+
+    fallbacks = _fallback_routes.get(client.model_name, []) if route else []
+    if not fallbacks:
+        return client
+
+    from .routing import Route, RoutingLLMClient
+    routes = [Route(f"{client_name}:{client.model_name}", client)]
+    for fallback_name, options in fallbacks:
+        if not os.getenv(_CLIENT_API_KEYS.get(fallback_name, ""), ""):
+            continue
+        try:
+            # Routed clients make a single attempt: failing over beats sleeping and retrying
+            fallback = get_client(fallback_name, cache=False, route=False, **{'max_retries': 1, **options})
+        except Exception as e:
+            log.warning("Skipping fallback route %s %s: %s", fallback_name, options, e)
+            continue
+        routes.append(Route(f"{fallback_name}:{fallback.model_name}", fallback))
+    if len(routes) == 1:
+        return client
+    if 'max_retries' not in kwargs:
+        client.max_retries = 1
+    return RoutingLLMClient(routes)
+
+
+def get_client(client_name: str, cache: bool = True, route: bool = True, **kwargs) -> LLMClient:
+    """Get a client for a given client name.
+
+    Clients are stateless between calls, so one instance is reused per (client name, options).
+    When fallback routes are configured for the model, the client hedges and fails over to them
+    (see routing.py); when a response cache is set, the client is wrapped in it (see llm_cache.py).
+    """
+    try:
+        key = (client_name, route, tuple(sorted(kwargs.items())))
+        hash(key)
+    except TypeError:
+        key = None
+    with _registry_lock:
+        client = _llm_clients.get(key) if key is not None else None
+    if client is None:
+        client = _build_client(client_name, route=route, **kwargs)
+        if key is not None:
+            with _registry_lock:
+                client = _llm_clients.setdefault(key, client)
+    if cache and _response_cache is not None:
+        from .llm_cache import CachingLLMClient
+        return CachingLLMClient(client, _response_cache)
+    return client
@@ -0,0 +1,128 @@
+"""Request deadlines: one time budget shared by every stage of a request.
+
+`request_deadline` starts the budget; everything below it reads it from a context
+variable, so it reaches worker threads submitted with `tracing.propagate` too:
+
+    with request_deadline(60.0):
+        requests.get(url, timeout=call_timeout(10))    # never waits past the deadline
+        if not time_left_for(8.0):
+            degrade('skip_reranker')                    # skip a stage we can't afford
+        ...
+
+Network calls cap their timeouts with `call_timeout`. Stages that can be skipped or
+cut short check `time_left_for` first and record what they gave up with `degrade`;
+the degradations of a request are reported to the client. Without a deadline every
+check passes and `call_timeout` returns its default, so code behaves as before.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from .metrics import DEGRADATIONS
+
+# Shortest timeout given to a call, even when the deadline is (nearly) spent
+MIN_CALL_TIMEOUT: float = 1.0
+
+_current_deadline: contextvars.ContextVar[Optional['Deadline']] = contextvars.ContextVar('current_deadline', default=None)
+
+
+class Deadline:
+    """The time budget of one request and the degradations made to meet it."""
+
+    def __init__(self, seconds: float, on_degrade: Optional[Callable[[dict], None]] = None):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        # Called (from the degrading thread) the first time each degradation happens
+        self.on_degrade = on_degrade
+        self._degradations: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def degrade(self, name: str, **details) -> None:
+        """Record a degradation; repeats of the same one only increase its count."""
+        DEGRADATIONS.inc(degradation=name)
+        with self._lock:
+            entry = self._degradations.get(name)
+            first = entry is None
+            if first:
+                entry = self._degradations[name] = {'name': name, 'count': 0, 'at_s': round(self.budget - self.remaining(), 2)}
+            entry['count'] += 1
+            entry.update(details)
+            event = dict(entry)
+        if first and self.on_degrade is not None:
+            self.on_degrade(event)
+
+    @property
+    def degradations(self) -> list[dict]:
+        """The degradations so far, in the order they first happened."""
+        with self._lock:
+            return [dict(entry) for entry in self._degradations.values()]
+
+    def to_dict(self) -> dict:
+        return {'budget_s': self.budget, 'remaining_s': round(self.remaining(), 2), 'degradations': self.degradations}
+
+
+@contextlib.contextmanager
+def request_deadline(seconds: Optional[float], on_degrade: Optional[Callable[[dict], None]] = None) -> Iterator[Optional[Deadline]]:
+    """Give the enclosed request `seconds` to finish (None or 0: no deadline)."""
+    deadline = Deadline(seconds, on_degrade) if seconds else None
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def call_timeout(default: Optional[float], minimum: float = MIN_CALL_TIMEOUT) -> Optional[float]:
+    """
+    The timeout for a network call: `default`, capped by the time left before the deadline.
+
+    Args:
+        default: The call's usual timeout (None: no timeout of its own)
+        minimum: Floor for the result, so a call made at the deadline still gets a chance
+
+    Returns:
+        The timeout in seconds, or `default` when there is no deadline
+    """
+    left = remaining()
+    if left is None:
+        return default
+    capped = left if default is None else min(default, left)
+    return max(minimum, capped)
+
+
+def time_left_for(seconds: float) -> bool:
+    """True if at least `seconds` remain before the current deadline (always True without one)."""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def deadline_expired() -> bool:
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired
+
+
+def degrade(name: str, **details) -> None:
+    """Record a degradation on the current deadline (no-op without one)."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.degrade(name, **details)
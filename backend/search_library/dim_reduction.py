@@ -0,0 +1,134 @@
+"""Dimension reduction for song and query embeddings.
+
+A 1,536-dimension float32 embedding is 6 KB, and similarity search over a library is
+bound by how fast those bytes stream through memory (in pgvector and in NumPy alike).
+Reduced vectors make every scan proportionally cheaper:
+
+- `PCAProjection` is fitted on our own song corpus and keeps the directions that carry
+  most of its energy. Works for any model, including ada-002. The projection is
+  uncentered and not renormalized: every ada-002 vector shares a large common
+  component, and keeping it (and the projected lengths) makes the reduced inner product
+  the best low-rank approximation of the full cosine similarity. Centering scrambles
+  the ranking instead. Reduced vectors are therefore compared by inner product.
+- `truncate_embeddings` keeps the first dimensions and renormalizes. Only valid for
+  models trained for it (text-embedding-3-*); it matches what their `dimensions`
+  parameter returns, so one full-size API call yields both sizes.
+
+Reduced search loses a little recall. `rescore` recovers most of it by ranking an
+oversampled reduced candidate set with the full vectors (see
+benchmarks/eval_reduced_embeddings.py for recall@k versus latency).
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .embeddings import EMBEDDING_DTYPE
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows stay zero)."""
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return (embeddings / np.where(norms == 0, 1, norms)).astype(EMBEDDING_DTYPE, copy=False)
+
+
+def truncate_embeddings(embeddings: np.ndarray, dimensions: int) -> np.ndarray:
+    """Shorten Matryoshka-trained embeddings (text-embedding-3-*) to their first `dimensions` and renormalize."""
+    return normalize_rows(np.asarray(embeddings, dtype=EMBEDDING_DTYPE)[..., :dimensions])
+
+
+@dataclass
+class PCAProjection:
+    """An uncentered PCA projection from full-size to reduced embeddings."""
+
+    # (dimensions, full dimensions), rows ordered by explained energy
+    components: np.ndarray
+    # Share of the corpus' squared norm each component keeps
+    explained_variance_ratio: np.ndarray
+
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dimensions: int) -> 'PCAProjection':
+        """
+        Fit a projection on a sample of full-size embeddings.
+
+        Works on the (full dimensions)^2 second-moment matrix, so memory does not grow
+        with the sample size.
+
+        Args:
+            embeddings: (samples, full dimensions) array
+            dimensions: The number of principal components to keep
+
+        Returns:
+            The fitted projection
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        if dimensions > min(embeddings.shape):
+            raise ValueError(f"Cannot keep {dimensions} components of {embeddings.shape[0]} x {embeddings.shape[1]} embeddings")
+        second_moment = embeddings.T @ embeddings / max(1, len(embeddings))
+        eigenvalues, eigenvectors = np.linalg.eigh(second_moment)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        total_variance = eigenvalues.sum()
+        return cls(
+            components=eigenvectors[:, order].T.astype(EMBEDDING_DTYPE),
+            explained_variance_ratio=(eigenvalues[order] / total_variance if total_variance > 0 else eigenvalues[order]).astype(EMBEDDING_DTYPE),
+        )
+
+    def project(self, embeddings: np.ndarray) -> np.ndarray:
+        """Project full-size embeddings (one or many rows); compare the results by inner product."""
+        return np.asarray(embeddings, dtype=EMBEDDING_DTYPE) @ self.components.T
+
+    def save(self, path: str) -> None:
+        np.savez(path, components=self.components, explained_variance_ratio=self.explained_variance_ratio)
+
+    @classmethod
+    def load(cls, path: str) -> 'PCAProjection':
+        with np.load(path) as data:
+            return cls(
+                components=data['components'].astype(EMBEDDING_DTYPE),
+                explained_variance_ratio=data['explained_variance_ratio'].astype(EMBEDDING_DTYPE),
+            )
+
+
+def inner_product_top_k(query: np.ndarray, matrix: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force top-k inner product search (cosine search for normalized vectors).
+
+    Args:
+        query: A query vector
+        matrix: (rows, dimensions) vectors
+        k: The number of results
+
+    Returns:
+        A tuple of (row indices, similarities), best first
+    """
+    scores = matrix @ query
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=scores.dtype)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top, scores[top]
+
+
+def rescore(query: np.ndarray, candidates: dict[str, np.ndarray], n: int) -> list[tuple[str, float]]:
+    """
+    Rank candidates by cosine similarity of their full-size vectors to the full-size query.
+
+    Args:
+        query: The full-size query embedding
+        candidates: Full-size embeddings of the candidate songs, keyed by song id
+        n: The number of results
+
+    Returns:
+        (song id, full-size similarity) pairs, best first
+    """
+    if not candidates:
+        return []
+    ids = list(candidates)
+    matrix = normalize_rows(np.stack([candidates[song_id] for song_id in ids]))
+    top, scores = inner_product_top_k(normalize_rows(np.asarray(query, dtype=EMBEDDING_DTYPE)), matrix, n)
+    return [(ids[index], float(score)) for index, score in zip(top, scores)]
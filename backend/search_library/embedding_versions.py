@@ -0,0 +1,452 @@
+"""Versioned song embeddings and zero-downtime embedding model migrations.
+
+Every embedding is tagged with an `EmbeddingVersion` (model + optional `dimensions`).
+The original ada-002 vectors stay in `songs.embedding` (the legacy version); every
+other version is stored as a row in `song_embeddings (song_id, model_version,
+embedding)` (primary key `(song_id, model_version)`, one partial vector index per
+version) and searched with the `match_song_ids_versioned` RPC, which takes the
+`match_song_ids` arguments plus `p_model_version` and ranks by inner product (equal to
+cosine similarity for the unit-length vectors the API returns). Vectors from different
+models never share a column or an index. The table, indexes and RPC are defined in
+sql/song_embeddings.sql; a new version needs its index added there (and the file run)
+before it is written or read. Until then, searches of that version fall back to the
+legacy one.
+
+The active `EmbeddingMigration` decides which versions are written and read:
+
+1. write=(old, new)            new songs are embedded with both models,
+2. run `python reembed.py --version new` to backfill from stored lyrics and metadata
+   (batched embedding calls, bulk upserts; no re-enrichment),
+3. read=new, dual_read=old     queries hit both indexes and the rankings are fused with
+                               reciprocal rank fusion, so songs the backfill hasn't
+                               reached yet are still found,
+4. read=new, write=(new,)      migration finished.
+
+Each step is a config change, so the service keeps serving searches throughout.
+
+Reduced versions (`derived_from` set) store a PCA projection or truncation of another
+version's vectors (see dim_reduction). They cost no extra embedding calls: queries are
+embedded once at full size and reduced locally, and the backfill projects the stored
+full-size vectors. With `rescore` on, an oversampled reduced candidate set is reranked
+by the full-size vectors, which are then only read for those candidates.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .clients import get_sdk_client
+from .dim_reduction import PCAProjection, truncate_embeddings
+from .embeddings import decode_embedding, encode_embedding_for_db
+from .log import get_logger
+from .prompts import get_song_doc_embedding_prompt
+from .types import Song
+
+log = get_logger(__name__)
+
+SONG_EMBEDDINGS_TABLE = 'song_embeddings'
+MATCH_SONG_IDS_VERSIONED_RPC = 'match_song_ids_versioned'
+
+# Documents per embeddings request (the API accepts up to 2,048 inputs)
+EMBEDDING_BATCH_SIZE: int = 64
+# Song documents are cut to this many characters before embedding
+MAX_SONG_DOC_CHARS: int = 6144 * 3
+# PCA projections are loaded from <PCA_DIR>/<version tag>.npz
+PCA_DIR: str = os.getenv('EMBEDDING_PCA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'pca'))
+# Reduced searches fetch this many times the requested candidates when rescoring
+RESCORE_OVERSAMPLE: int = 4
+
+
+@dataclass(frozen=True)
+class EmbeddingVersion:
+    """An embedding model configuration; `tag` identifies its vectors in the database."""
+
+    tag: str
+    model: str
+    dimensions: Optional[int] = None
+    # Stored in songs.embedding rather than song_embeddings
+    legacy: bool = False
+    # Added to the caller's match threshold: text-embedding-3 cosine similarities run far
+    # lower than ada-002's, so the same threshold would drop most matches
+    match_threshold_offset: float = 0.0
+    # Reduced version: `dimensions` of this full-size version's vectors, by PCA or truncation
+    derived_from: Optional[str] = None
+    pca: bool = False
+
+
+LEGACY_EMBEDDING_VERSION = EmbeddingVersion('ada-002', 'text-embedding-ada-002', legacy=True)
+
+EMBEDDING_VERSIONS: dict[str, EmbeddingVersion] = {
+    version.tag: version for version in (
+        LEGACY_EMBEDDING_VERSION,
+        EmbeddingVersion('3-small', 'text-embedding-3-small', match_threshold_offset=-0.25),
+        EmbeddingVersion('3-small-512', 'text-embedding-3-small', dimensions=512, match_threshold_offset=-0.25),
+        EmbeddingVersion('3-large-1024', 'text-embedding-3-large', dimensions=1024, match_threshold_offset=-0.25),
+        # Reduced inner products run slightly below the full cosine similarity
+        EmbeddingVersion('ada-002-pca256', 'text-embedding-ada-002', dimensions=256, match_threshold_offset=-0.05, derived_from='ada-002', pca=True),
+        EmbeddingVersion('3-small-256', 'text-embedding-3-small', dimensions=256, match_threshold_offset=-0.25, derived_from='3-small'),
+    )
+}
+
+
+def get_embedding_version(tag: str) -> EmbeddingVersion:
+    try:
+        return EMBEDDING_VERSIONS[tag]
+    except KeyError:
+        raise ValueError(f"Unknown embedding version: {tag} (known: {', '.join(EMBEDDING_VERSIONS)})")
+
+
+@dataclass(frozen=True)
+class EmbeddingMigration:
+    """Which embedding versions are read at query time and written for new songs."""
+
+    read: str = LEGACY_EMBEDDING_VERSION.tag
+    write: tuple[str, ...] = (LEGACY_EMBEDDING_VERSION.tag,)
+    # Second version queried alongside `read` while a migration is in progress
+    dual_read: Optional[str] = None
+    # Rerank reduced-version candidates with the full-size vectors they were derived from
+    rescore: bool = False
+
+    @property
+    def read_versions(self) -> list[EmbeddingVersion]:
+        tags = [self.read] + ([self.dual_read] if self.dual_read and self.dual_read != self.read else [])
+        return [get_embedding_version(tag) for tag in tags]
+
+    @property
+    def write_versions(self) -> list[EmbeddingVersion]:
+        return [get_embedding_version(tag) for tag in self.write]
+
+
+_migration = EmbeddingMigration()
+
+
+def set_embedding_migration(migration: EmbeddingMigration) -> None:
+    """Set the process-wide embedding migration state (validates the version tags)."""
+    global _migration
+    migration.read_versions, migration.write_versions
+    _migration = migration
+
+
+def get_embedding_migration() -> EmbeddingMigration:
+    return _migration
+
+
+_projections: dict[str, PCAProjection] = {}
+_projections_lock = threading.Lock()
+
+
+def get_projection(version: EmbeddingVersion) -> PCAProjection:
+    """Load (once) the PCA projection of a reduced version."""
+    with _projections_lock:
+        projection = _projections.get(version.tag)
+        if projection is None:
+            projection = _projections[version.tag] = PCAProjection.load(os.path.join(PCA_DIR, f"{version.tag}.npz"))
+        return projection
+
+
+def set_projection(version: EmbeddingVersion, projection: PCAProjection, save: bool = True) -> None:
+    """Install a freshly fitted PCA projection, saving it under PCA_DIR unless save is False."""
+    if save:
+        os.makedirs(PCA_DIR, exist_ok=True)
+        projection.save(os.path.join(PCA_DIR, f"{version.tag}.npz"))
+    with _projections_lock:
+        _projections[version.tag] = projection
+
+
+def reduce_embeddings(version: EmbeddingVersion, embeddings: np.ndarray) -> np.ndarray:
+    """Reduce full-size embeddings of version.derived_from (one or many rows) to a reduced version."""
+    if version.pca:
+        return get_projection(version).project(embeddings)
+    return truncate_embeddings(embeddings, version.dimensions)
+
+
+def embed_texts(texts: list[str], version: EmbeddingVersion, openai_client=None, batch_size: int = EMBEDDING_BATCH_SIZE) -> tuple[list[np.ndarray], dict]:
+    """
+    Embed texts with a version's model, batch_size inputs per request.
+
+    Args:
+        texts: The texts to embed
+        version: The embedding version (model and optional dimensions)
+        openai_client: Optional OpenAI client; defaults to the shared client
+        batch_size: Inputs per embeddings request
+
+    Returns:
+        A tuple of (float32 embeddings in input order, token usage)
+    """
+    if version.derived_from:
+        full_embeddings, token_usage = embed_texts(texts, get_embedding_version(version.derived_from), openai_client, batch_size)
+        return list(reduce_embeddings(version, np.stack(full_embeddings))) if full_embeddings else [], token_usage
+    if openai_client is None:
+        openai_client = get_sdk_client("openai")
+    extra = {'dimensions': version.dimensions} if version.dimensions else {}
+    embeddings: list[np.ndarray] = []
+    token_usage = {'input_tokens': 0, 'output_tokens': 0, 'requests': 0}
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        response = openai_client.embeddings.create(model=version.model, input=batch, encoding_format="base64", **extra)
+        # The API may return items out of order; `index` is the input position
+        for item in sorted(response.data, key=lambda item: item.index):
+            embeddings.append(decode_embedding(item.embedding))
+        token_usage['requests'] += 1
+        if getattr(response, 'usage', None) is not None:
+            token_usage['input_tokens'] += response.usage.prompt_tokens
+    return embeddings, token_usage
+
+
+def song_embedding_document(song: Song) -> str:
+    """The text a song's embedding is computed from."""
+    return get_song_doc_embedding_prompt(song)[:MAX_SONG_DOC_CHARS]
+
+
+def embed_songs(songs: list[Song], version: EmbeddingVersion, openai_client=None) -> tuple[list[np.ndarray], dict]:
+    """Embed songs (name, artists, lyrics and metadata) with a version's model in batched requests."""
+    return embed_texts([song_embedding_document(song) for song in songs], version, openai_client)
+
+
+def upsert_versioned_embeddings(supabase, version: EmbeddingVersion, song_ids: list[str], embeddings: list[np.ndarray]) -> None:
+    """Write one version's embeddings for many songs in a single upsert; raises on failure."""
+    if version.legacy:
+        raise ValueError("Legacy embeddings live in songs.embedding")
+    rows = [
+        {'song_id': song_id, 'model_version': version.tag, 'embedding': encode_embedding_for_db(embedding)}
+        for song_id, embedding in zip(song_ids, embeddings)
+        if embedding.size
+    ]
+    if rows:
+        supabase.table(SONG_EMBEDDINGS_TABLE).upsert(rows).execute()
+
+
+def write_song_embeddings(supabase, songs: list[Song], versions: Optional[Iterable[EmbeddingVersion]] = None) -> dict:
+    """
+    Embed and store songs for every non-legacy write version of the active migration.
+
+    Reduced versions are derived from full-size vectors already at hand: the songs' own
+    `embedding` for ada-002, or the vectors of their base version written in the same
+    call. The API is only asked for a base version's vectors when neither exists.
+
+    Args:
+        supabase: The Supabase client
+        songs: Enriched songs (lyrics, metadata and legacy embedding set)
+        versions: Versions to write; defaults to the migration's write versions
+
+    Returns:
+        Token usage per version tag
+    """
+    versions = [version for version in (versions or _migration.write_versions) if not version.legacy]
+    full_size: dict[str, list[np.ndarray]] = {}
+    usage = {}
+    # Full-size versions first, so the reduced versions derived from them reuse their vectors
+    for version in sorted(versions, key=lambda version: version.derived_from is not None):
+        if version.derived_from:
+            full, usage[version.tag] = _base_embeddings(songs, get_embedding_version(version.derived_from), full_size)
+            embeddings = list(reduce_embeddings(version, np.stack(full))) if full else []
+        else:
+            embeddings, usage[version.tag] = embed_songs(songs, version)
+            full_size[version.tag] = embeddings
+        upsert_versioned_embeddings(supabase, version, [song.id for song in songs], embeddings)
+    return usage
+
+
+def _base_embeddings(songs: list[Song], base: EmbeddingVersion, full_size: dict[str, list[np.ndarray]]) -> tuple[list[np.ndarray], dict]:
+    """Full-size `base` vectors of songs, embedding only those not computed or stored on the songs already."""
+    usage = {'input_tokens': 0, 'output_tokens': 0, 'requests': 0}
+    if base.tag in full_size:
+        return full_size[base.tag], usage
+    embeddings = [song.embedding if base.legacy else None for song in songs]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None or not embedding.size]
+    if missing:
+        embedded, usage = embed_songs([songs[i] for i in missing], base)
+        for i, embedding in zip(missing, embedded):
+            embeddings[i] = embedding
+    full_size[base.tag] = embeddings
+    return embeddings, usage
+
+
+def load_embeddings(supabase, version: EmbeddingVersion, song_ids: list[str]) -> dict[str, np.ndarray]:
+    """Fetch the stored embeddings of one version for the given songs (songs without one are left out)."""
+    if not song_ids:
+        return {}
+    if version.legacy:
+        rows = supabase.table('songs').select('id, embedding').in_('id', song_ids).execute().data or []
+        embeddings = {row['id']: decode_embedding(row.get('embedding')) for row in rows}
+    else:
+        rows = (
+            supabase.table(SONG_EMBEDDINGS_TABLE)
+            .select('song_id, embedding')
+            .eq('model_version', version.tag)
+            .in_('song_id', song_ids)
+            .execute()
+            .data
+        ) or []
+        embeddings = {row['song_id']: decode_embedding(row.get('embedding')) for row in rows}
+    return {song_id: embedding for song_id, embedding in embeddings.items() if embedding.size}
+
+
+def fit_pca(supabase, version: EmbeddingVersion, sample_size: int = 20000, page_size: int = 500) -> PCAProjection:
+    """
+    Fit and install the PCA projection of a reduced version on stored full-size vectors.
+
+    Args:
+        supabase: The Supabase client
+        version: A PCA version
+        sample_size: The number of songs to fit on (the first ones by id)
+        page_size: Songs read per page
+
+    Returns:
+        The fitted projection
+    """
+    if not version.pca:
+        raise ValueError(f"{version.tag} is not a PCA version")
+    base = get_embedding_version(version.derived_from)
+    sample: list[np.ndarray] = []
+    offset = 0
+    while len(sample) < sample_size:
+        rows = supabase.table('songs').select('id').order('id').range(offset, offset + page_size - 1).execute().data or []
+        sample.extend(load_embeddings(supabase, base, [row['id'] for row in rows]).values())
+        offset += len(rows)
+        if len(rows) < page_size:
+            break
+    projection = PCAProjection.fit(np.stack(sample[:sample_size]), version.dimensions)
+    set_projection(version, projection)
+    log.info("Fitted %s on %d songs, %.1f%% of variance kept",
+             version.tag, min(len(sample), sample_size), 100 * projection.explained_variance_ratio.sum())
+    return projection
+
+
+def songs_missing_version(supabase, version: EmbeddingVersion, song_ids: list[str]) -> list[str]:
+    """Return the ids among song_ids that have no embedding of this version yet."""
+    if not song_ids:
+        return []
+    rows = (
+        supabase.table(SONG_EMBEDDINGS_TABLE)
+        .select('song_id')
+        .eq('model_version', version.tag)
+        .in_('song_id', song_ids)
+        .execute()
+        .data
+    ) or []
+    done = {row['song_id'] for row in rows}
+    return [song_id for song_id in song_ids if song_id not in done]
+
+
+@dataclass
+class ReembedStats:
+    """Progress of a re-embedding backfill."""
+
+    scanned: int = 0
+    embedded: int = 0
+    failed: int = 0
+    input_tokens: int = 0
+    requests: int = 0
+    started_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'scanned': self.scanned,
+            'embedded': self.embedded,
+            'failed': self.failed,
+            'input_tokens': self.input_tokens,
+            'embedding_requests': self.requests,
+            'elapsed_s': round(elapsed, 1),
+            'songs_per_min': round(60 * self.embedded / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def reembed_library(
+    supabase,
+    version: EmbeddingVersion,
+    page_size: int = 500,
+    workers: int = 4,
+    limit: Optional[int] = None,
+    on_progress=None,
+) -> ReembedStats:
+    """
+    Backfill one embedding version for every song in the songs table.
+
+    Songs that already have the version are skipped, so the job can be stopped and
+    restarted at any time. Lyrics and metadata come from the table; nothing is
+    re-enriched. Reduced versions are computed from the stored full-size vectors without
+    any embedding calls; songs whose full-size vector is missing count as failed.
+
+    Args:
+        supabase: The Supabase client
+        version: The (non-legacy) version to backfill
+        page_size: Songs read per page
+        workers: Concurrent embedding batches
+        limit: Stop after scanning this many songs
+        on_progress: Optional callback receiving the stats after each page
+
+    Returns:
+        The backfill statistics
+    """
+    if version.legacy:
+        raise ValueError("The legacy version is written by enrichment, not backfilled")
+    stats = ReembedStats(started_at=time.monotonic())
+
+    def embed_batch(batch: list[Song]) -> tuple[int, dict]:
+        if version.derived_from:
+            full = load_embeddings(supabase, get_embedding_version(version.derived_from), [song.id for song in batch])
+            song_ids = [song.id for song in batch if song.id in full]
+            if len(song_ids) < len(batch):
+                log.warning("%d songs have no %s embedding", len(batch) - len(song_ids), version.derived_from)
+            embeddings = list(reduce_embeddings(version, np.stack([full[song_id] for song_id in song_ids]))) if song_ids else []
+            usage = {'input_tokens': 0, 'requests': 0}
+        else:
+            song_ids = [song.id for song in batch]
+            embeddings, usage = embed_songs(batch, version)
+        upsert_versioned_embeddings(supabase, version, song_ids, embeddings)
+        return len(song_ids), usage
+
+    # Reduced versions only need ids; their input is the stored full-size vectors
+    columns = 'id, name' if version.derived_from else 'id, name, artists, album, song_link, lyrics, song_metadata'
+    offset = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while limit is None or stats.scanned < limit:
+            rows = (
+                supabase.table('songs')
+                .select(columns)
+                .order('id')
+                .range(offset, offset + page_size - 1)
+                .execute()
+                .data
+            ) or []
+            if not rows:
+                break
+            offset += len(rows)
+            stats.scanned += len(rows)
+
+            missing = set(songs_missing_version(supabase, version, [row['id'] for row in rows]))
+            songs = [
+                Song(
+                    id=row['id'],
+                    song_link=row.get('song_link') or '',
+                    album=row.get('album') or '',
+                    name=row['name'],
+                    artists=[artist.strip() for artist in (row.get('artists') or '').split(',') if artist.strip()],
+                    lyrics=row.get('lyrics') or '',
+                    song_metadata=row.get('song_metadata') or '',
+                )
+                for row in rows if row['id'] in missing
+            ]
+            batches = [songs[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(songs), EMBEDDING_BATCH_SIZE)]
+            for batch, future in [(batch, executor.submit(embed_batch, batch)) for batch in batches]:
+                try:
+                    count, usage = future.result()
+                    stats.embedded += count
+                    stats.failed += len(batch) - count
+                    stats.input_tokens += usage['input_tokens']
+                    stats.requests += usage['requests']
+                except Exception as e:
+                    stats.failed += len(batch)
+                    log.warning("Failed to embed %d songs: %s", len(batch), e)
+            if on_progress is not None:
+                on_progress(stats)
+            if len(rows) < page_size:
+                break
+    return stats
@@ -0,0 +1,92 @@
+"""Compact in-memory representation and (de)serialization of song embeddings.
+
+Embeddings are held as float32 NumPy arrays (6 KB for 1,536 dimensions) instead of
+lists of boxed Python floats (~50 KB). They arrive from three places, each decoded
+straight into an array:
+
+- OpenAI embedding responses, requested with encoding_format="base64",
+- Supabase rows, where a pgvector column comes back as its text form "[0.1,0.2,...]",
+- older rows / callers that still hand over a list of floats.
+
+For caches that hold many embeddings, float16 and int8 (with a per-vector scale)
+quantization are available as well.
+"""
+
+import base64
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+EMBEDDING_DTYPE = np.float32
+
+
+def empty_embedding() -> np.ndarray:
+    return np.empty(0, dtype=EMBEDDING_DTYPE)
+
+
+def decode_embedding(value: Any) -> np.ndarray:
+    """
+    Decode an embedding from any of the formats we receive into a float32 array.
+
+    Args:
+        value: A pgvector text literal, a base64 string of little-endian float32s,
+            a list of floats, a NumPy array, or None
+
+    Returns:
+        A 1-D float32 array (empty if there is no embedding)
+    """
+    if value is None:
+        return empty_embedding()
+    if isinstance(value, np.ndarray):
+        return value.astype(EMBEDDING_DTYPE, copy=False)
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return empty_embedding()
+        if value[0] == "[":
+            return np.fromstring(value[1:-1], sep=",", dtype=EMBEDDING_DTYPE)
+        return np.frombuffer(base64.b64decode(value), dtype="<f4").astype(EMBEDDING_DTYPE, copy=False)
+    return np.asarray(value, dtype=EMBEDDING_DTYPE)
+
+
+def encode_embedding_for_db(embedding: np.ndarray | list[float]) -> str | None:
+    """Encode an embedding as a pgvector text literal for Supabase writes and RPC arguments."""
+    embedding = decode_embedding(embedding)
+    if embedding.size == 0:
+        return None
+    # 9 significant digits round-trip float32 exactly
+    return "[" + ",".join(["%.9g" % x for x in embedding.tolist()]) + "]"
+
+
+def encode_embedding_base64(embedding: np.ndarray) -> str:
+    """Encode an embedding as base64 little-endian float32 (same format as OpenAI's base64 responses)."""
+    return base64.b64encode(decode_embedding(embedding).astype("<f4", copy=False).tobytes()).decode("ascii")
+
+
+@dataclass
+class QuantizedEmbedding:
+    """An int8-quantized embedding: values ≈ data * scale."""
+
+    data: np.ndarray
+    scale: float
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + 4
+
+    def to_float32(self) -> np.ndarray:
+        return self.data.astype(EMBEDDING_DTYPE) * EMBEDDING_DTYPE(self.scale)
+
+
+def quantize_int8(embedding: np.ndarray) -> QuantizedEmbedding:
+    """Symmetric per-vector int8 quantization."""
+    embedding = decode_embedding(embedding)
+    max_abs = float(np.max(np.abs(embedding))) if embedding.size else 0.0
+    scale = max_abs / 127.0 if max_abs > 0 else 1.0
+    data = np.clip(np.rint(embedding / scale), -127, 127).astype(np.int8)
+    return QuantizedEmbedding(data=data, scale=scale)
+
+
+def quantize_float16(embedding: np.ndarray) -> np.ndarray:
+    return decode_embedding(embedding).astype(np.float16)
@@ -0,0 +1,351 @@
+"""Deterministic LLM response cache.
+
+`CachingLLMClient` wraps any `LLMClient` and answers repeated deterministic requests
+(temperature 0, no extended thinking) from a cache backend instead of the network. The
+cache key is a SHA-256 hash of the client class, model, messages, system prompt, tools,
+tool choice and max_tokens, so any change to the prompt is a miss.
+
+Two backends are provided, both bounded by total size in bytes and evicting the least
+recently used entries first:
+
+- `MemoryCacheBackend`: process-local, the default,
+- `DiskCacheBackend`: one file per entry, shared between processes and restarts.
+
+Entries are stored as JSON (see `encode_entry`), never pickled, so a shared cache
+directory cannot run code in the processes reading it.
+
+Responses served from the cache report `cached: True` with zero live `input_tokens` /
+`output_tokens`; the tokens the call would have cost are reported as
+`cached_input_tokens` / `cached_output_tokens`. Answers a routed client got from a
+fallback model (see routing.py) are not stored, since the key names the primary model.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, is_dataclass
+from typing import Any, Optional, Tuple
+
+from anthropic.types import RedactedThinkingBlock, ThinkingBlock
+
+from .clients import LLMClient, LLMMessages, AssistantContentBlock, TextResult, ToolCall, ToolParam
+from .metrics import CACHE_REQUESTS
+from .log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_MEMORY_CACHE_BYTES: int = 64 * 1024 * 1024
+DEFAULT_DISK_CACHE_BYTES: int = 512 * 1024 * 1024
+
+# Bump to invalidate every cached entry (e.g. when the stored format changes)
+CACHE_KEY_VERSION = 2
+
+
+@dataclass
+class CacheStats:
+    """Hit / miss counters of a cache backend."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+    saved_input_tokens: int = 0
+    saved_output_tokens: int = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {**asdict(self), 'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+class CacheBackend:
+    """Byte-bounded key/value store for serialized LLM responses."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def record_hit(self, input_tokens: int, output_tokens: int) -> None:
+        CACHE_REQUESTS.inc(cache='llm', result='hit')
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.saved_input_tokens += input_tokens
+            self.stats.saved_output_tokens += output_tokens
+
+    def record_miss(self) -> None:
+        CACHE_REQUESTS.inc(cache='llm', result='miss')
+        with self._lock:
+            self.stats.misses += 1
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache bounded by the total size of the stored values."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_CACHE_BYTES):
+        super().__init__(max_bytes)
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.stats.bytes -= len(previous)
+            self._entries[key] = value
+            self.stats.bytes += len(value)
+            self.stats.stores += 1
+            while self.stats.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.stats.bytes -= len(evicted)
+                self.stats.evictions += 1
+            self.stats.entries = len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats.entries = 0
+            self.stats.bytes = 0
+
+
+class DiskCacheBackend(CacheBackend):
+    """File-per-entry cache in a directory, evicting the least recently used files by mtime."""
+
+    SUFFIX = '.llmcache'
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_DISK_CACHE_BYTES):
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # key -> (size, last access); rebuilt from the directory so restarts keep their entries
+        self._index: dict[str, Tuple[int, float]] = {}
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                self._index[entry.name[:-len(self.SUFFIX)]] = (stat.st_size, stat.st_mtime)
+        self.stats.entries = len(self._index)
+        self.stats.bytes = sum(size for size, _ in self._index.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("Failed to read %s: %s", path, e)
+            return None
+        with self._lock:
+            if key not in self._index:
+                # Written by another process sharing the directory
+                self.stats.bytes += len(value)
+            self._index[key] = (len(value), time.time())
+            self.stats.entries = len(self._index)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        try:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Failed to write %s: %s", path, e)
+            return
+        with self._lock:
+            previous = self._index.get(key)
+            if previous is not None:
+                self.stats.bytes -= previous[0]
+            self._index[key] = (len(value), time.time())
+            self.stats.bytes += len(value)
+            self.stats.stores += 1
+            if self.stats.bytes > self.max_bytes:
+                for old_key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+                    if self.stats.bytes <= self.max_bytes:
+                        break
+                    if old_key == key:
+                        continue
+                    try:
+                        os.remove(self._path(old_key))
+                    except FileNotFoundError:
+                        pass
+                    del self._index[old_key]
+                    self.stats.bytes -= size
+                    self.stats.evictions += 1
+            self.stats.entries = len(self._index)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._index.clear()
+            self.stats.entries = 0
+            self.stats.bytes = 0
+
+
+def _block_to_jsonable(block: Any) -> Any:
+    if is_dataclass(block):
+        return {'type': type(block).__name__, **asdict(block)}
+    if hasattr(block, 'model_dump'):
+        return block.model_dump()
+    return repr(block)
+
+
+# Response block types a cache entry can hold, by the name stored with each block
+_BLOCK_TYPES = {cls.__name__: cls for cls in (TextResult, ToolCall, ThinkingBlock, RedactedThinkingBlock)}
+
+
+def encode_entry(blocks: list[AssistantContentBlock], usage: dict[str, int]) -> bytes:
+    """Serialize a response as JSON (dataclass blocks via `to_dict`, SDK blocks via `model_dump`)."""
+    encoded_blocks = []
+    for block in blocks:
+        name = type(block).__name__
+        if name not in _BLOCK_TYPES:
+            raise TypeError(f"Cannot cache response block of type {name}")
+        data = block.model_dump(mode='json') if hasattr(block, 'model_dump') else block.to_dict()
+        encoded_blocks.append({'type': name, 'data': data})
+    return json.dumps({'blocks': encoded_blocks, 'usage': usage}, ensure_ascii=False).encode('utf-8')
+
+
+def decode_entry(value: bytes) -> Tuple[list[AssistantContentBlock], dict[str, int]]:
+    """Inverse of `encode_entry`."""
+    entry = json.loads(value)
+    blocks = []
+    for block in entry['blocks']:
+        cls = _BLOCK_TYPES[block['type']]
+        blocks.append(cls.model_validate(block['data']) if hasattr(cls, 'model_validate') else cls.from_dict(block['data']))
+    return blocks, entry['usage']
+
+
+def request_cache_key(
+    client: LLMClient,
+    messages: LLMMessages,
+    max_tokens: int,
+    system_prompt: Optional[str] = None,
+    tools: Optional[list[ToolParam]] = None,
+    tool_choice: Optional[dict[str, str]] = None,
+) -> str:
+    """Hash of everything that determines a deterministic response."""
+    payload = {
+        'version': CACHE_KEY_VERSION,
+        'client': type(client).__name__,
+        'model': getattr(client, 'model_name', None),
+        'messages': [[_block_to_jsonable(block) for block in message] for message in messages],
+        'system_prompt': system_prompt,
+        'tools': [asdict(tool) for tool in tools] if tools else None,
+        'tool_choice': tool_choice,
+        'max_tokens': max_tokens,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class CachingLLMClient(LLMClient):
+    """LLMClient decorator that serves repeated deterministic requests from a cache backend."""
+
+    def __init__(self, client: LLMClient, backend: CacheBackend):
+        self.client = client
+        self.backend = backend
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return getattr(self.client, 'model_name', None)
+
+    def generate(
+        self,
+        messages: LLMMessages,
+        max_tokens: int,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.0,
+        tools: Optional[list[ToolParam]] = None,
+        tool_choice: Optional[dict[str, str]] = None,
+        thinking_tokens: Optional[int] = None,
+    ) -> Tuple[list[AssistantContentBlock], dict[str, Any]]:
+        """Generate responses, from the cache when the request is deterministic and was seen before.
+
+        Args:
+            messages: A list of messages.
+            max_tokens: The maximum number of tokens to generate.
+            system_prompt: A system prompt.
+            temperature: The temperature; only temperature 0 requests are cached.
+            tools: A list of tools.
+            tool_choice: A tool choice.
+            thinking_tokens: Extended thinking budget; requests with thinking are not cached.
+
+        Returns:
+            A generated response.
+        """
+        if temperature != 0.0 or thinking_tokens:
+            return self.client.generate(
+                messages, max_tokens, system_prompt=system_prompt, temperature=temperature,
+                tools=tools, tool_choice=tool_choice, thinking_tokens=thinking_tokens,
+            )
+
+        key = request_cache_key(self.client, messages, max_tokens, system_prompt, tools, tool_choice)
+        cached = self.backend.get(key)
+        if cached is not None:
+            try:
+                blocks, usage = decode_entry(cached)
+            except Exception as e:
+                log.warning("Dropping unreadable entry %.12s: %s", key, e)
+            else:
+                self.backend.record_hit(usage.get('input_tokens', 0), usage.get('output_tokens', 0))
+                return blocks, {
+                    'cached': True,
+                    'input_tokens': 0,
+                    'output_tokens': 0,
+                    'cached_input_tokens': usage.get('input_tokens', 0),
+                    'cached_output_tokens': usage.get('output_tokens', 0),
+                }
+
+        self.backend.record_miss()
+        blocks, metadata = self.client.generate(
+            messages, max_tokens, system_prompt=system_prompt, temperature=temperature,
+            tools=tools, tool_choice=tool_choice, thinking_tokens=thinking_tokens,
+        )
+        if metadata.get('fallback'):
+            # A routed request answered by a fallback model; the key names the primary model
+            return blocks, {**metadata, 'cached': False}
+        usage = {
+            'input_tokens': metadata.get('input_tokens', 0),
+            'output_tokens': metadata.get('output_tokens', 0),
+        }
+        try:
+            self.backend.set(key, encode_entry(blocks, usage))
+        except Exception as e:
+            log.warning("Failed to store response %.12s: %s", key, e)
+        return blocks, {**metadata, 'cached': False}
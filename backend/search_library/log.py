@@ -0,0 +1,220 @@
+"""Leveled, lazy, redacted logging for the search pipeline.
+
+Modules log through `get_logger(__name__)` with %-style arguments:
+
+    log = get_logger(__name__)
+    log.debug('Genius search data: %s', LazyJSON(search_data, 200))
+    log.info('Enriching song: %s', song.name, extra=SAMPLED)
+
+Below the configured level a call is a level check and nothing else: the message is
+never formatted and its arguments are never converted (wrap expensive ones such as
+JSON payloads in `LazyJSON`). Records that pass are handed to a queue and formatted,
+redacted and written by a listener thread, so the request thread does not pay for
+formatting or I/O either. Per-item logs (one per song, URL, ...) pass `extra=SAMPLED`
+and only one in `sample_every` of them is kept per message; the others are dropped
+before a record is even created.
+
+Redaction runs on the final text, exceptions included: registered secret values (the
+API keys and passwords read from the environment by default), bearer tokens, JWTs,
+OpenAI-style keys and credentials in URLs are replaced by `[REDACTED]`.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from .tracing import current_request_id
+
+ROOT_LOGGER_NAME = 'cannoli'
+DEFAULT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] [%(request_id)s] %(message)s'
+DEFAULT_SAMPLE_EVERY: int = 20
+# Environment variables whose values never appear in logs
+SECRET_ENV_VARS: tuple[str, ...] = (
+    'SUPABASE_SERVICE_ROLE_KEY', 'OPENAI_API_KEY', 'ANTHROPIC_API_KEY', 'BRAVE_API_KEY', 'GENIUS_ACCESS_TOKEN',
+    'BD_ISP_USERNAME', 'BD_ISP_PASSWORD', 'SPOTIFY_CLIENT_SECRET',
+)
+REDACTED = '[REDACTED]'
+
+# Mark a per-item log for sampling: `log.info(..., extra=SAMPLED)`
+SAMPLED: dict = {'sampled': True}
+
+_SECRET_PATTERNS = [
+    (re.compile(r'(?i)(bearer\s+)[A-Za-z0-9._~+/=-]+'), r'\1' + REDACTED),
+    (re.compile(r'(://)[^/\s:@]+:[^/\s@]+@'), r'\1' + REDACTED + '@'),
+    (re.compile(r'\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+'), REDACTED),
+    (re.compile(r'\bsk-[A-Za-z0-9_-]{16,}'), REDACTED),
+]
+_secrets: set[str] = set()
+_secrets_lock = threading.Lock()
+_configure_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_sample_every: int = DEFAULT_SAMPLE_EVERY
+# (logger name, message) -> records seen, for SAMPLED records
+_sample_counters: dict[tuple[str, str], itertools.count] = {}
+
+
+def _keep_sample(name: str, msg: Any) -> bool:
+    if _sample_every <= 1:
+        return True
+    key = (name, str(msg))
+    counter = _sample_counters.get(key)
+    if counter is None:
+        counter = _sample_counters.setdefault(key, itertools.count())
+    # next() on itertools.count is atomic under the GIL
+    return next(counter) % _sample_every == 0
+
+
+class PipelineLogger(logging.LoggerAdapter):
+    """A logger that drops sampled-out records before building them.
+
+    Creating a LogRecord costs several microseconds (caller lookup, process and thread
+    info), which per-song logs would otherwise pay even when the record is discarded.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+    # The per-song levels skip LoggerAdapter's extra call layers when disabled
+    def debug(self, msg, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs) -> None:
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log(logging.INFO, msg, *args, **kwargs)
+
+    def log(self, level: int, msg, *args, **kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        extra = kwargs.get('extra')
+        if extra is not None and extra.get('sampled') and not _keep_sample(self.logger.name, msg):
+            return
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+def get_logger(name: str) -> PipelineLogger:
+    """The pipeline logger for a module (`search_library.search` logs as `cannoli.search`)."""
+    return PipelineLogger(logging.getLogger(f"{ROOT_LOGGER_NAME}.{name.rsplit('.', 1)[-1]}"))
+
+
+def register_secret(*values: Optional[str]) -> None:
+    """Redact these values wherever they appear in a log line (short values are ignored)."""
+    with _secrets_lock:
+        _secrets.update(value for value in values if value and len(value) >= 6)
+
+
+def redact(text: str) -> str:
+    """Replace registered secrets and credential-looking substrings."""
+    for secret in _secrets:
+        if secret in text:
+            text = text.replace(secret, REDACTED)
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class LazyJSON:
+    """A log argument serialized to JSON (and truncated) only if the record is written."""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: Optional[int] = None):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = json.dumps(self.value, default=str)
+        return text[:self.limit] if self.limit is not None else text
+
+
+class RedactingFormatter(logging.Formatter):
+    """Formats a record, traceback included, and redacts the result."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, 'request_id'):
+            # Synchronous handlers format in the calling thread
+            record.request_id = current_request_id() or '-'
+        return redact(super().format(record))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records without formatting them; the listener thread formats and writes.
+
+    The stock QueueHandler formats in the calling thread. Here only the request ID is
+    captured (it lives in a context variable), so arguments must not be mutated after
+    the call; log snapshots (copies or LazyJSON of finished data) where that matters.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = current_request_id() or '-'
+        return record
+
+
+def configure_logging(
+    level: str | int = 'INFO',
+    sample_every: int = DEFAULT_SAMPLE_EVERY,
+    async_handlers: bool = True,
+    stream=None,
+    fmt: str = DEFAULT_FORMAT,
+) -> None:
+    """
+    Set up the pipeline loggers; calling it again replaces the previous setup.
+
+    Args:
+        level: Minimum level (name or number) for all `cannoli.*` loggers
+        sample_every: Keep one in this many records logged with `extra=SAMPLED`
+        async_handlers: Format and write on a listener thread instead of the caller's
+        stream: Where lines go (default: stdout, like the prints this replaces)
+        fmt: logging format string; `%(request_id)s` is the current trace's request ID
+    """
+    global _listener, _sample_every
+    register_secret(*(os.getenv(name) for name in SECRET_ENV_VARS))
+
+    output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    output.setFormatter(RedactingFormatter(fmt))
+
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.propagate = False
+        _sample_every = max(1, sample_every)
+        _sample_counters.clear()
+
+        if async_handlers:
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            handler: logging.Handler = DeferredQueueHandler(records)
+            _listener = QueueListener(records, output, respect_handler_level=True)
+            _listener.start()
+        else:
+            handler = output
+        root.addHandler(handler)
+
+
+def flush_logging() -> None:
+    """Write out queued records (stops and restarts the listener thread)."""
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+@atexit.register
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
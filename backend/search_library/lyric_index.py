@@ -0,0 +1,323 @@
+"""Positional inverted index over cached lyrics for exact / near lyric-phrase lookup.
+
+Lyrics for every song in a user's library are already stored in the `songs` table, so a
+lyric query ("the one that goes 'hello darkness my old friend'") can often be answered
+locally in milliseconds instead of going through Genius search and LLM verification.
+
+Each `LyricIndex` holds one user's songs. Lyrics are normalized with the same tokenizer
+used for lyric compaction, token positions are kept for exact phrase matching, and token
+trigram shingles are used to generate candidates and score near-phrase matches.
+
+The same index also scores songs with BM25 over lyrics plus title / artist / album, which
+`vector_search_library` fuses with vector similarity for hybrid retrieval.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, replace
+
+from .lyrics import strip_annotations, tokenize
+from .types import Song, hydrate_songs
+
+SHINGLE_SIZE = 3
+
+# A match must cover at least this many consecutive query tokens to be trusted on its own.
+MIN_MATCH_TOKENS = 4
+MIN_UNQUOTED_MATCH_TOKENS = 6
+
+# Share of a quoted phrase's shingles that must appear in a song for a near-phrase match.
+NEAR_MATCH_SHINGLE_SCORE = 0.6
+
+# Only this many shingle candidates get the (more expensive) positional check.
+MAX_CANDIDATES = 50
+
+# BM25 parameters, and how much a title / artist / album hit counts relative to a lyrics hit.
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_METADATA_WEIGHT = 2.0
+
+# A quoted span: an opening quote after whitespace, a closing quote before whitespace / punctuation.
+# Apostrophes inside the span ("wasn't") are allowed.
+_QUOTED_RE = re.compile(r"(?:^|\s)[\"“‘']([^\"“”]{8,}?)[\"”’'](?=\s|$|[.,!?])")
+
+
+@dataclass
+class LyricMatch:
+    """A song whose lyrics (nearly) contain the query phrase."""
+
+    song: Song
+    matched_tokens: int      # Longest run of consecutive query tokens found verbatim in the lyrics
+    query_tokens: int        # Number of tokens in the (normalized) query phrase
+    shingle_score: float     # Fraction of query shingles that appear anywhere in the lyrics
+    position: int            # Token offset in the lyrics where the longest run starts
+    matched_text: str        # The matched query tokens, space separated
+
+    @property
+    def exact(self) -> bool:
+        return self.matched_tokens == self.query_tokens
+
+
+def _shingles(tokens: list[str]) -> set[tuple[str, ...]]:
+    return {tuple(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def _add_bm25_scores(scores: Counter, term_frequencies: dict[str, int], lengths: dict[str, int], average_length: float, num_songs: int, weight: float) -> None:
+    """Add one term's BM25 contribution for one field to the running scores."""
+    if not term_frequencies:
+        return
+    df = len(term_frequencies)
+    idf = math.log(1 + (num_songs - df + 0.5) / (df + 0.5))
+    for song_id, tf in term_frequencies.items():
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[song_id] / average_length)
+        scores[song_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+
+def extract_lyric_phrase(query: str) -> str:
+    """Return the quoted span of a query if there is one, otherwise the whole query."""
+    quoted = _QUOTED_RE.findall(query)
+    if quoted:
+        return max(quoted, key=len)
+    return query
+
+
+class LyricIndex:
+    """Positional inverted index over one user's cached lyrics."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._songs: dict[str, Song] = {}
+        # token -> song id -> positions of the token in that song's lyrics
+        self._postings: dict[str, dict[str, list[int]]] = {}
+        # shingle -> ids of songs containing it
+        self._shingle_postings: dict[tuple[str, ...], set[str]] = {}
+        self._song_terms: dict[str, set[str]] = {}
+        self._song_shingles: dict[str, set[tuple[str, ...]]] = {}
+        # token -> song id -> term frequency in the song's name / artists / album
+        self._metadata_postings: dict[str, dict[str, int]] = {}
+        self._song_metadata_terms: dict[str, set[str]] = {}
+        self._lyrics_lengths: dict[str, int] = {}
+        self._metadata_lengths: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def __contains__(self, song_id: str) -> bool:
+        return song_id in self._songs
+
+    def add_song(self, song: Song) -> None:
+        """Index a song's lyrics and metadata, replacing any previous version of the same song."""
+        tokens = tokenize(strip_annotations(song.lyrics)) if song.lyrics else []
+        metadata_tokens = tokenize(" ".join([song.name, *song.artists, song.album]))
+        with self._lock:
+            if song.id in self._songs:
+                self._remove_postings(song.id)
+            self._songs[song.id] = song
+
+            metadata_counts = Counter(metadata_tokens)
+            for token, count in metadata_counts.items():
+                self._metadata_postings.setdefault(token, {})[song.id] = count
+            self._song_metadata_terms[song.id] = set(metadata_counts)
+            self._metadata_lengths[song.id] = len(metadata_tokens)
+            self._lyrics_lengths[song.id] = len(tokens)
+
+            positions: dict[str, list[int]] = {}
+            for position, token in enumerate(tokens):
+                positions.setdefault(token, []).append(position)
+            for token, token_positions in positions.items():
+                self._postings.setdefault(token, {})[song.id] = token_positions
+
+            shingles = _shingles(tokens)
+            for shingle in shingles:
+                self._shingle_postings.setdefault(shingle, set()).add(song.id)
+
+            self._song_terms[song.id] = set(positions)
+            self._song_shingles[song.id] = shingles
+
+    def add_songs(self, songs: list[Song]) -> None:
+        for song in songs:
+            self.add_song(song)
+
+    def remove_song(self, song_id: str) -> None:
+        with self._lock:
+            if song_id not in self._songs:
+                return
+            self._remove_postings(song_id)
+            del self._songs[song_id]
+
+    def _remove_postings(self, song_id: str) -> None:
+        for token in self._song_terms.pop(song_id, set()):
+            song_postings = self._postings.get(token)
+            if song_postings is not None:
+                song_postings.pop(song_id, None)
+                if not song_postings:
+                    del self._postings[token]
+        for shingle in self._song_shingles.pop(song_id, set()):
+            song_ids = self._shingle_postings.get(shingle)
+            if song_ids is not None:
+                song_ids.discard(song_id)
+                if not song_ids:
+                    del self._shingle_postings[shingle]
+        for token in self._song_metadata_terms.pop(song_id, set()):
+            song_postings = self._metadata_postings.get(token)
+            if song_postings is not None:
+                song_postings.pop(song_id, None)
+                if not song_postings:
+                    del self._metadata_postings[token]
+        self._lyrics_lengths.pop(song_id, None)
+        self._metadata_lengths.pop(song_id, None)
+
+    def _longest_run(self, song_id: str, tokens: list[str]) -> tuple[int, int, int]:
+        """Longest run of consecutive query tokens appearing contiguously in a song.
+
+        Returns:
+            A tuple of (run length, start position in the song, start index in the query)
+        """
+        best = (0, -1, -1)
+        previous: dict[int, int] = {}
+        for query_index, token in enumerate(tokens):
+            positions = self._postings.get(token, {}).get(song_id, [])
+            current = {position: previous.get(position - 1, 0) + 1 for position in positions}
+            for position, run in current.items():
+                if run > best[0]:
+                    best = (run, position - run + 1, query_index - run + 1)
+            previous = current
+        return best
+
+    def search(self, phrase: str, limit: int = 5) -> list[LyricMatch]:
+        """
+        Find songs whose lyrics contain the phrase exactly or nearly.
+
+        Args:
+            phrase: The lyric phrase (or a query containing one)
+            limit: The maximum number of matches to return
+
+        Returns:
+            Matches ordered by longest verbatim run, then by shingle overlap
+        """
+        tokens = tokenize(phrase)
+        if len(tokens) < SHINGLE_SIZE:
+            return []
+        query_shingles = _shingles(tokens)
+
+        with self._lock:
+            candidate_counts: Counter = Counter()
+            for shingle in query_shingles:
+                for song_id in self._shingle_postings.get(shingle, ()):
+                    candidate_counts[song_id] += 1
+
+            matches = []
+            for song_id, shared in candidate_counts.most_common(MAX_CANDIDATES):
+                run, position, query_start = self._longest_run(song_id, tokens)
+                matches.append(LyricMatch(
+                    song=self._songs[song_id],
+                    matched_tokens=run,
+                    query_tokens=len(tokens),
+                    shingle_score=shared / len(query_shingles),
+                    position=position,
+                    matched_text=" ".join(tokens[query_start:query_start + run]),
+                ))
+
+        matches.sort(key=lambda match: (-match.matched_tokens, -match.shingle_score, match.song.id))
+        return matches[:limit]
+
+    def bm25(self, query: str, limit: int = 20) -> list[tuple[Song, float]]:
+        """
+        Rank songs with BM25 over lyrics plus (weighted) name, artists and album.
+
+        Args:
+            query: The user's search query
+            limit: The maximum number of songs to return
+
+        Returns:
+            (song, score) pairs ordered by descending score
+        """
+        terms = set(tokenize(query))
+        scores: Counter = Counter()
+        with self._lock:
+            num_songs = len(self._songs)
+            if not terms or not num_songs:
+                return []
+            lyrics_average = (sum(self._lyrics_lengths.values()) / num_songs) or 1.0
+            metadata_average = (sum(self._metadata_lengths.values()) / num_songs) or 1.0
+            for term in terms:
+                lyrics_tf = {song_id: len(positions) for song_id, positions in self._postings.get(term, {}).items()}
+                _add_bm25_scores(scores, lyrics_tf, self._lyrics_lengths, lyrics_average, num_songs, 1.0)
+                _add_bm25_scores(scores, self._metadata_postings.get(term, {}), self._metadata_lengths, metadata_average, num_songs, BM25_METADATA_WEIGHT)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [(self._songs[song_id], score) for song_id, score in ranked]
+
+    def find_confident_match(self, query: str) -> LyricMatch | None:
+        """
+        Return the single best match for a lyric query if it is unambiguous, otherwise None.
+
+        If the query quotes a lyric, a verbatim run of MIN_MATCH_TOKENS tokens (or a near
+        match sharing NEAR_MATCH_SHINGLE_SCORE of the phrase's shingles) is enough. For
+        unquoted queries the run must be at least MIN_UNQUOTED_MATCH_TOKENS long, so that
+        descriptive queries ("songs about being in the middle of nowhere") don't short
+        circuit the full search. Ties between two songs are treated as ambiguous.
+        """
+        phrase = extract_lyric_phrase(query)
+        quoted = phrase != query
+        matches = self.search(phrase, limit=2)
+        if not matches:
+            return None
+
+        best = matches[0]
+        if quoted:
+            confident = best.matched_tokens >= MIN_MATCH_TOKENS or best.shingle_score >= NEAR_MATCH_SHINGLE_SCORE
+        else:
+            confident = best.matched_tokens >= MIN_UNQUOTED_MATCH_TOKENS
+        if not confident:
+            return None
+        if len(matches) > 1 and (matches[1].matched_tokens, matches[1].shingle_score) == (best.matched_tokens, best.shingle_score):
+            return None
+        return best
+
+
+# --------------------------------------------------------------------------- #
+#  Per-user registry
+# --------------------------------------------------------------------------- #
+
+MAX_CACHED_USER_INDEXES = 64
+
+_user_indexes: "OrderedDict[str, LyricIndex]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def get_user_lyric_index(user_id: str) -> LyricIndex | None:
+    """Return the cached index for a user, if one has been built in this process."""
+    with _registry_lock:
+        index = _user_indexes.get(user_id)
+        if index is not None:
+            _user_indexes.move_to_end(user_id)
+        return index
+
+
+def set_user_lyric_index(user_id: str, index: LyricIndex) -> None:
+    """Cache a user's index, evicting the least recently used index if the cache is full."""
+    with _registry_lock:
+        _user_indexes[user_id] = index
+        _user_indexes.move_to_end(user_id)
+        while len(_user_indexes) > MAX_CACHED_USER_INDEXES:
+            _user_indexes.popitem(last=False)
+
+
+def index_songs_for_user(user_id: str, songs: list[Song], only_new: bool = False) -> None:
+    """Incrementally add songs to a user's index if the index is loaded."""
+    index = get_user_lyric_index(user_id)
+    if index is None:
+        return
+    if only_new:
+        songs = [song for song in songs if song.id not in index]
+    # Load lazy songs' lyrics in one batch rather than one query per song
+    hydrate_songs(songs)
+    for song in songs:
+        index.add_song(song)
+
+
+def match_to_search_song(match: LyricMatch) -> Song:
+    """Copy the matched song with reasoning that explains the lyric hit."""
+    kind = "Exact" if match.exact else "Close"
+    return replace(match.song, reasoning=f"{kind} lyric match in your library: \"{match.matched_text}\".")
@@ -0,0 +1,293 @@
+"""Lyric compaction for LLM prompts.
+
+Genius lyrics repeat choruses and hooks many times and carry bracketed section
+annotations ("[Chorus: Artist]"). Every repeat costs prompt tokens in the reranker
+and reasoning prompts without adding information, so before a song goes into a
+prompt we:
+
+1. strip bracket annotations and Genius page artifacts,
+2. dedupe repeated sections and lines, recording how many times they occurred,
+3. optionally keep only the lyric windows most relevant to the user's query.
+"""
+
+import re
+from collections import Counter
+from dataclasses import replace
+from difflib import SequenceMatcher
+
+from .types import Song
+
+_HEADER_RE = re.compile(r"^\s*\[[^\]]*\]\s*$")
+_INLINE_BRACKET_RE = re.compile(r"\[[^\]]*\]")
+_EMBED_RE = re.compile(r"\d*\s*Embed\s*$")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_GENIUS_ARTIFACTS = {"you might also like"}
+
+WINDOW_SEPARATOR = "\n...\n"
+
+# Lyric budgets used when building the reranker and per-song reasoning prompts.
+DEFAULT_RERANK_LYRICS_CHARS: int = 2000
+DEFAULT_REASONING_LYRICS_CHARS: int = 1500
+
+# Common function words get a low weight when scoring windows; they still count through bigrams.
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "i", "i'm", "in", "is",
+    "it", "it's", "me", "my", "of", "oh", "on", "or", "so", "that", "the", "to", "we", "you", "your",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with punctuation removed (apostrophes kept)."""
+    return _WORD_RE.findall(text.lower().replace("’", "'"))
+
+
+def normalize_line(line: str) -> str:
+    """Normalize a lyric line for duplicate detection."""
+    return " ".join(tokenize(line))
+
+
+def strip_annotations(lyrics: str) -> str:
+    """Remove bracketed section annotations and Genius page artifacts from lyrics."""
+    lines = []
+    for line in lyrics.split("\n"):
+        if _HEADER_RE.match(line):
+            # Keep section boundaries as blank lines so sections can still be told apart.
+            lines.append("")
+            continue
+        line = _INLINE_BRACKET_RE.sub("", line).strip()
+        if normalize_line(line) in _GENIUS_ARTIFACTS:
+            continue
+        lines.append(line)
+    text = "\n".join(lines).strip()
+    return _EMBED_RE.sub("", text).rstrip()
+
+
+def _split_sections(lyrics: str) -> list[list[str]]:
+    """Split annotation-free lyrics into sections separated by blank lines."""
+    sections: list[list[str]] = []
+    current: list[str] = []
+    for line in lyrics.split("\n"):
+        if line.strip():
+            current.append(line.strip())
+        elif current:
+            sections.append(current)
+            current = []
+    if current:
+        sections.append(current)
+    return sections
+
+
+def dedupe_lyrics(lyrics: str) -> str:
+    """
+    Strip annotations and collapse repeated sections and lines.
+
+    Each section or line is kept at its first occurrence. Repeats are dropped and
+    counted on the kept copy, e.g. "we will rock you (x4)" or "(section x3)". A line
+    count is the line's total number of occurrences in the song.
+    """
+    if not lyrics:
+        return ""
+
+    sections = _split_sections(strip_annotations(lyrics))
+
+    # Count whole-section repeats first (choruses usually repeat verbatim).
+    section_keys: list[tuple[str, ...]] = []
+    section_counts: dict[tuple[str, ...], int] = {}
+    unique_sections: list[list[str]] = []
+    for section in sections:
+        key = tuple(normalize_line(line) for line in section)
+        if key in section_counts:
+            section_counts[key] += 1
+            continue
+        section_counts[key] = 1
+        section_keys.append(key)
+        unique_sections.append(section)
+
+    # Total occurrences of every line across the whole song, repeats included.
+    line_counts: dict[str, int] = {}
+    for section in sections:
+        for line in section:
+            norm = normalize_line(line)
+            if norm:
+                line_counts[norm] = line_counts.get(norm, 0) + 1
+
+    # Then keep each line only at its first occurrence across the remaining sections.
+    seen_lines: set[str] = set()
+    kept_sections: list[tuple[tuple[str, ...], list[tuple[str, str]]]] = []
+    for key, section in zip(section_keys, unique_sections):
+        kept_lines = []
+        for line in section:
+            norm = normalize_line(line)
+            if not norm or norm in seen_lines:
+                continue
+            seen_lines.add(norm)
+            kept_lines.append((line, norm))
+        if kept_lines:
+            kept_sections.append((key, kept_lines))
+
+    rendered_sections = []
+    for key, kept_lines in kept_sections:
+        section_count = section_counts[key]
+        rendered = []
+        for line, norm in kept_lines:
+            # A line's count is only shown when it differs from its section's repeat count.
+            count = line_counts[norm]
+            rendered.append(f"{line} (x{count})" if count > section_count else line)
+        if section_count > 1:
+            rendered.append(f"(section x{section_count})")
+        rendered_sections.append("\n".join(rendered))
+    return "\n\n".join(rendered_sections)
+
+
+def _score_window(lines: list[list[str]], query_terms: set[str], query_bigrams: set[tuple[str, str]]) -> float:
+    score = 0.0
+    for tokens in lines:
+        for token in tokens:
+            if token in query_terms:
+                score += 0.25 if token in _STOPWORDS else 1.0
+        for bigram in zip(tokens, tokens[1:]):
+            if bigram in query_bigrams:
+                score += 2.0
+    return score
+
+
+def select_relevant_windows(lyrics: str, user_query: str, max_chars: int, window_lines: int = 4) -> str:
+    """
+    Keep only the lyric windows that best match the query, within max_chars.
+
+    Windows of window_lines consecutive lines are scored by query word and bigram
+    overlap, picked greedily without overlap, and returned in their original order.
+    Falls back to the opening lines when nothing in the lyrics matches the query.
+
+    Args:
+        lyrics: The lyrics to select from
+        user_query: The user's search query
+        max_chars: Character budget for the returned lyrics
+        window_lines: Number of consecutive lines per window
+
+    Returns:
+        The selected lyric windows joined by an ellipsis line
+    """
+    if len(lyrics) <= max_chars:
+        return lyrics
+
+    lines = [line for line in lyrics.split("\n") if line.strip()]
+    query_tokens = tokenize(user_query)
+    query_terms = set(query_tokens)
+    query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+    line_tokens = [tokenize(line) for line in lines]
+
+    scored_windows = []
+    for start in range(max(1, len(lines) - window_lines + 1)):
+        score = _score_window(line_tokens[start:start + window_lines], query_terms, query_bigrams)
+        if score > 0:
+            scored_windows.append((score, start))
+
+    if not scored_windows:
+        return _take_lines(lines, max_chars)
+
+    # Highest score first; ties go to the earlier window so selection is deterministic.
+    scored_windows.sort(key=lambda window: (-window[0], window[1]))
+    taken = [False] * len(lines)
+    chosen: list[int] = []
+    used_chars = 0
+    for _, start in scored_windows:
+        end = min(start + window_lines, len(lines))
+        if any(taken[start:end]):
+            continue
+        window_chars = sum(len(line) + 1 for line in lines[start:end]) + len(WINDOW_SEPARATOR)
+        if used_chars + window_chars > max_chars:
+            continue
+        for i in range(start, end):
+            taken[i] = True
+        chosen.append(start)
+        used_chars += window_chars
+
+    if not chosen:
+        return _take_lines(lines, max_chars)
+
+    chosen.sort()
+    return WINDOW_SEPARATOR.join(
+        "\n".join(lines[start:min(start + window_lines, len(lines))]) for start in chosen
+    )
+
+
+def _take_lines(lines: list[str], max_chars: int) -> str:
+    """Take whole lines from the start until max_chars is reached."""
+    taken = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > max_chars:
+            break
+        taken.append(line)
+        used += len(line) + 1
+    return "\n".join(taken) if taken else lines[0][:max_chars]
+
+
+def compact_lyrics(lyrics: str, user_query: str | None = None, max_chars: int | None = None) -> str:
+    """
+    Compact lyrics for use in an LLM prompt.
+
+    Args:
+        lyrics: The raw lyrics
+        user_query: Optional query used to pick relevant windows when lyrics exceed max_chars
+        max_chars: Optional character budget for the compacted lyrics
+
+    Returns:
+        The compacted lyrics
+    """
+    compacted = dedupe_lyrics(lyrics)
+    if max_chars is not None and len(compacted) > max_chars:
+        compacted = select_relevant_windows(compacted, user_query or "", max_chars)
+    return compacted
+
+
+def compact_song(song: Song, user_query: str | None = None, max_lyrics_chars: int | None = None) -> Song:
+    """Return a copy of song with compacted lyrics, or the song itself if nothing changes."""
+    if not song.lyrics:
+        return song
+    compacted = compact_lyrics(song.lyrics, user_query, max_lyrics_chars)
+    if compacted == song.lyrics:
+        return song
+    return replace(song, lyrics=compacted)
+
+
+def lyric_match_score(phrase: str, lyrics: str) -> float:
+    """
+    Score how well a lyric phrase matches a song's lyrics, without an LLM.
+
+    The score is the largest share of the phrase's words found, in order, within any
+    window of the lyrics one word longer than the phrase, so 1.0 means the phrase appears
+    verbatim or with one extra word. Misheard or missing words lower the score gradually.
+
+    Args:
+        phrase: The lyric phrase from the user's query
+        lyrics: The candidate song's lyrics
+
+    Returns:
+        A score between 0.0 and 1.0
+    """
+    # Apostrophes are dropped so "ive" matches "i've"
+    phrase_tokens = [token.replace("'", "") for token in tokenize(phrase)]
+    lyric_tokens = [token.replace("'", "") for token in tokenize(strip_annotations(lyrics))] if lyrics else []
+    if not phrase_tokens or not lyric_tokens:
+        return 0.0
+    if f" {' '.join(phrase_tokens)} " in f" {' '.join(lyric_tokens)} ":
+        return 1.0
+
+    phrase_counts = Counter(phrase_tokens)
+    window = len(phrase_tokens) + 1
+    matcher = SequenceMatcher(autojunk=False)
+    matcher.set_seq2(phrase_tokens)
+    best_matched = 0
+    for start in range(max(1, len(lyric_tokens) - window + 2)):
+        candidate = lyric_tokens[start:start + window]
+        # Windows must start on a phrase word; skips most of the lyrics cheaply
+        if candidate[0] not in phrase_counts:
+            continue
+        # Shared words (with multiplicity) bound the in-order match from above
+        if sum((Counter(candidate) & phrase_counts).values()) <= best_matched:
+            continue
+        matcher.set_seq1(candidate)
+        best_matched = max(best_matched, sum(block.size for block in matcher.get_matching_blocks()))
+    return best_matched / len(phrase_tokens)
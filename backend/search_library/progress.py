@@ -0,0 +1,190 @@
+"""Progress event bus between a search pipeline and the SSE writer.
+
+The pipeline (usually running in a worker thread) publishes events as it goes; the
+SSE writer consumes them with `async for event in bus.events()`. Along the way:
+
+- consecutive `progress` events are coalesced and emitted at most once per
+  `progress_interval` seconds (later fields overwrite earlier ones, so a message
+  attached to a coalesced update is kept until a newer message replaces it),
+- every other event is emitted in publish order, right away, after any pending
+  progress update,
+- a `heartbeat` event is emitted whenever nothing else was sent for
+  `heartbeat_interval` seconds, so proxies keep long stages open.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_PROGRESS_INTERVAL: float = 0.25
+DEFAULT_HEARTBEAT_INTERVAL: float = 15.0
+
+HEARTBEAT_EVENT_TYPE = 'heartbeat'
+
+# Producer tasks still running; the event loop only keeps weak references to tasks
+_producer_tasks: set[asyncio.Task] = set()
+
+
+def _producer_finished(task: asyncio.Task) -> None:
+    _producer_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.error("Progress producer failed", exc_info=task.exception())
+
+
+@dataclass
+class ProgressBusStats:
+    """Counts of events published to and emitted by a ProgressBus."""
+
+    published: int = 0
+    coalesced: int = 0
+    emitted: int = 0
+    heartbeats: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'published': self.published,
+            'coalesced': self.coalesced,
+            'emitted': self.emitted,
+            'heartbeats': self.heartbeats,
+        }
+
+
+class ProgressBus:
+    """Thread-safe event bus that rate-limits progress updates and sends heartbeats."""
+
+    def __init__(self, progress_interval: float = DEFAULT_PROGRESS_INTERVAL, heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL):
+        self.progress_interval = progress_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stats = ProgressBusStats()
+        self._lock = threading.Lock()
+        self._queue: deque[dict] = deque()
+        self._pending_progress: dict | None = None
+        self._closed = False
+        self._cancelled = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    @property
+    def closed(self) -> bool:
+        """True once the producer side has finished the stream."""
+        return self._closed
+
+    @property
+    def cancelled(self) -> bool:
+        """True once the consumer has gone away (e.g. the client disconnected)."""
+        return self._cancelled
+
+    def publish(self, event: dict) -> None:
+        """Publish an event. Safe to call from any thread; a no-op once the bus is closed or cancelled."""
+        with self._lock:
+            if self._closed or self._cancelled:
+                return
+            self.stats.published += 1
+            if event.get('type') == 'progress':
+                if self._pending_progress is not None:
+                    self.stats.coalesced += 1
+                    self._pending_progress = {**self._pending_progress, **event}
+                else:
+                    self._pending_progress = dict(event)
+            else:
+                if self._pending_progress is not None:
+                    self._queue.append(self._pending_progress)
+                    self._pending_progress = None
+                self._queue.append(event)
+        self._notify()
+
+    def close(self) -> None:
+        """Mark the end of the stream; pending events are still delivered."""
+        with self._lock:
+            self._closed = True
+        self._notify()
+
+    def cancel(self) -> None:
+        """Stop accepting events; producers should check `cancelled` and stop early."""
+        with self._lock:
+            self._cancelled = True
+        self._notify()
+
+    def run_producer(self, producer: Callable[['ProgressBus'], None]) -> None:
+        """Run producer(bus) and close the bus when it returns or raises."""
+        try:
+            producer(self)
+        finally:
+            self.close()
+
+    async def stream(self, producer: Callable[['ProgressBus'], None]) -> AsyncIterator[dict]:
+        """
+        Run producer(bus) in a worker thread and yield its events as `events` does.
+
+        The bus is cancelled only if the consumer goes away (the generator is closed or its
+        task cancelled, e.g. on a client disconnect). A stream that ends because the bus was
+        closed leaves the producer running, so it can finish work after the final event.
+        """
+        task = asyncio.create_task(asyncio.to_thread(self.run_producer, producer))
+        _producer_tasks.add(task)
+        task.add_done_callback(_producer_finished)
+        try:
+            async for event in self.events():
+                yield event
+        except (GeneratorExit, asyncio.CancelledError):
+            self.cancel()
+            raise
+
+    def _notify(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # The event loop is already closed; nobody is listening anymore
+                pass
+
+    async def events(self) -> AsyncIterator[dict]:
+        """Yield events until the bus is closed (and drained) or cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        last_emit = time.monotonic()
+        last_progress = float('-inf')
+
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                ready = list(self._queue)
+                self._queue.clear()
+                if self._pending_progress is not None and (self._closed or now - last_progress >= self.progress_interval):
+                    ready.append(self._pending_progress)
+                    self._pending_progress = None
+                pending_progress = self._pending_progress is not None
+                finished = self._cancelled or (self._closed and not pending_progress)
+
+            for event in ready:
+                if event.get('type') == 'progress':
+                    last_progress = now
+                self.stats.emitted += 1
+                yield event
+            if ready:
+                last_emit = time.monotonic()
+            if finished:
+                return
+
+            now = time.monotonic()
+            timeout = last_emit + self.heartbeat_interval - now
+            if pending_progress:
+                timeout = min(timeout, last_progress + self.progress_interval - now)
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            if time.monotonic() - last_emit >= self.heartbeat_interval:
+                self.stats.heartbeats += 1
+                last_emit = time.monotonic()
+                yield {'type': HEARTBEAT_EVENT_TYPE}
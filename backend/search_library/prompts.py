@@ -1,4 +1,5 @@
 from .types import Song
+from .lyrics import compact_lyrics, DEFAULT_REASONING_LYRICS_CHARS
 
 def get_basic_query(library: list[Song], user_query: str, n: int = 3, generate_song_reasoning: bool = False) -> str:
     song_str = "\n".join([str(song) for song in library])
@@ -123,7 +124,7 @@ Here is the customer's description of the song:
 Can you help the customer remember the name of the song?
 """
 
-def get_individual_song_reasoning_query(user_query: str, song: 'Song', similarity_score: float = None) -> str:
+def get_individual_song_reasoning_query(user_query: str, song: 'Song', similarity_score: float = None, max_lyrics_chars: int | None = DEFAULT_REASONING_LYRICS_CHARS) -> str:
     """
     Generate a prompt for explaining why a single song matches a user's query.
     
@@ -131,10 +132,12 @@ def get_individual_song_reasoning_query(user_query: str, song: 'Song', similarit
         user_query: The user's search query
         song: The Song object with all its information
         similarity_score: Optional similarity score from vector search
+        max_lyrics_chars: Budget for the compacted lyrics (None keeps all deduped lyrics)
         
     Returns:
         A formatted prompt string for the LLM
     """
+    lyrics = compact_lyrics(song.lyrics, user_query, max_lyrics_chars) if song.lyrics else ''
     
     return f"""
 Hello, I am a music library assistant. I need to explain why this song matches the user's query. If it doesn't match, I have a mechanism
@@ -146,7 +149,7 @@ Song Information:
 - Artist(s): {', '.join(song.artists)}
 - Album: {song.album}
 - Song Metadata: {song.song_metadata if song.song_metadata else 'N/A'}
-- Lyrics: {song.lyrics if song.lyrics else 'N/A'}
+- Lyrics: {lyrics if lyrics else 'N/A'}
 
 User's Query: {user_query}
 
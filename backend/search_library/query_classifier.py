@@ -0,0 +1,174 @@
+"""Local classifier for lyric queries.
+
+Instant search only helps when the query contains song lyrics ("the one that goes
+'hello darkness my old friend'"), and deciding that used to cost an LLM round trip on
+every search. `classify_lyric_query` decides most queries locally:
+
+1. a quoted span of a few words, or a "song that goes / says ..." / "lyrics: ..." cue,
+   is a lyric query and gives the lyrics to search for (unless the cue is followed by a
+   description: "says something about a red dress", "lyrics that mention rain"),
+2. everything else is scored by a small logistic regression over cheap features
+   (function-word and pronoun ratios, descriptive music vocabulary, length, ...).
+
+Scores inside the uncertain band come back as `UNCERTAIN`, and only those need the LLM.
+So does a confident LYRIC score for a query that also talks about the song ("the singer
+...", "that song ..."), since the query as a whole is then not the lyrics to search for.
+The weights are trained on the training split of benchmarks/data/lyric_queries.jsonl with
+`python -m benchmarks.eval_query_classifier --train`, which also reports held-out accuracy.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+from .lyrics import tokenize
+
+LYRIC = "lyric"
+NOT_LYRIC = "not_lyric"
+UNCERTAIN = "uncertain"
+
+# Model probabilities at or above LYRIC_THRESHOLD / at or below NOT_LYRIC_THRESHOLD are trusted.
+# A wrong NOT_LYRIC answer loses the instant match, so that side of the band is the wider one.
+LYRIC_THRESHOLD: float = 0.85
+NOT_LYRIC_THRESHOLD: float = 0.05
+
+# A quoted span needs this many words to count as quoted lyrics.
+MIN_QUOTED_WORDS = 3
+
+_QUOTED_RE = re.compile(r"(?:^|\s)[\"“‘']([^\"“”]+?)[\"”’'](?=\s|$|[.,!?])")
+_CUE_RE = re.compile(
+    r"\b(?:song|one|track|tune)\s+(?:that|which|where)\s+(?:\w+\s+)?(?:goes|go|says|say|sings|sing)\b"
+    r"(?:\s+(?:something\s+)?like)?\s*[:,]?\s*(?P<lyrics>.+)$"
+    r"|\blyrics?\s*(?::|\s(?:that\s+)?(?:go|goes|say|says)\b)\s*:?\s*(?P<lyrics2>.+)$",
+    re.IGNORECASE,
+)
+# A cue followed by a description of the lyrics rather than the lyrics themselves
+_DESCRIBED_RE = re.compile(
+    r"^(?:(?:something|stuff|things?)\s+)?"
+    r"(?:about|regarding|to\s+do\s+with|mention|mentioning|referencing|with|in|that\s+mentions?)\b",
+    re.IGNORECASE,
+)
+# Words that talk about a song instead of quoting it
+_DESCRIPTION_CUES = {
+    "song", "songs", "track", "tracks", "tune", "music", "lyric", "lyrics", "singer", "sings", "sang",
+    "singing", "mention", "mentions", "artist", "band", "album",
+}
+
+_FUNCTION_WORDS = {
+    "a", "an", "and", "the", "to", "of", "in", "on", "at", "for", "with", "but", "or", "so", "if",
+    "all", "just", "is", "it", "be", "was", "are", "when", "now", "up", "down", "out", "never",
+    "always", "can't", "don't", "ain't", "gonna", "wanna", "got", "get",
+}
+_PRONOUNS = {
+    "i", "i'm", "i'll", "i've", "i'd", "me", "my", "mine", "you", "you're", "your", "we", "we're",
+    "our", "us", "she", "she's", "he", "he's", "her", "his", "they", "them", "baby", "oh", "yeah",
+}
+_DESCRIPTIVE_WORDS = {
+    "song", "songs", "music", "track", "tracks", "playlist", "album", "artist", "artists", "band",
+    "bands", "genre", "like", "similar", "about", "vibe", "vibes", "mood", "upbeat", "sad", "happy",
+    "chill", "calm", "energetic", "romantic", "instrumental", "acoustic", "vocals", "vocalists",
+    "female", "male", "classics", "hits", "pop", "rock", "jazz", "hip", "hop", "rap", "country",
+    "indie", "folk", "electronic", "edm", "punk", "metal", "classical", "lofi", "beats", "bass",
+    "soundtrack", "movie", "from", "something", "sound", "sounds", "mention", "mentions", "by",
+    "60s", "70s", "80s", "90s", "2000s", "for", "study", "workout", "party", "drive", "dance",
+}
+
+# Logistic regression weights, in FEATURE_NAMES order (see benchmarks/eval_query_classifier.py).
+FEATURE_NAMES = (
+    "bias",
+    "function_word_ratio",
+    "pronoun_ratio",
+    "descriptive_ratio",
+    "log_tokens",
+    "has_contraction",
+    "starts_descriptive",
+    "repeated_token",
+)
+WEIGHTS = (-3.8371, -0.8658, 3.1174, -3.7668, 2.1336, 2.9389, -1.4418, 1.2813)
+
+
+@dataclass
+class QueryClassification:
+    """Result of classifying a query as a lyric query or not."""
+
+    label: str               # LYRIC, NOT_LYRIC or UNCERTAIN
+    probability: float      # Estimated probability that the query contains lyrics
+    extracted_lyrics: str   # The lyrics to search for (empty unless label == LYRIC)
+    reason: str             # "quoted", "cue", "model" or "empty"
+
+    @property
+    def is_lyric(self) -> bool:
+        return self.label == LYRIC
+
+    @property
+    def is_confident(self) -> bool:
+        return self.label != UNCERTAIN
+
+
+def query_features(query: str) -> list[float]:
+    """Feature vector for the logistic model, in FEATURE_NAMES order."""
+    tokens = tokenize(query)
+    if not tokens:
+        return [1.0] + [0.0] * (len(FEATURE_NAMES) - 1)
+    count = len(tokens)
+    return [
+        1.0,
+        sum(token in _FUNCTION_WORDS for token in tokens) / count,
+        sum(token in _PRONOUNS for token in tokens) / count,
+        sum(token in _DESCRIPTIVE_WORDS for token in tokens) / count,
+        math.log(count),
+        float(any("'" in token for token in tokens)),
+        float(tokens[0] in _DESCRIPTIVE_WORDS),
+        float(len(set(tokens)) < count),
+    ]
+
+
+def lyric_probability(query: str, weights: tuple[float, ...] | None = None) -> float:
+    """Model probability that the query contains song lyrics (module WEIGHTS unless given)."""
+    z = sum(weight * value for weight, value in zip(weights or WEIGHTS, query_features(query)))
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def _quoted_lyrics(query: str) -> str:
+    spans = [span.strip() for span in _QUOTED_RE.findall(query)]
+    spans = [span for span in spans if len(tokenize(span)) >= MIN_QUOTED_WORDS]
+    return max(spans, key=len) if spans else ""
+
+
+def _cued_lyrics(query: str) -> str:
+    match = _CUE_RE.search(query.strip())
+    if not match:
+        return ""
+    lyrics = (match.group("lyrics") or match.group("lyrics2") or "").strip(" '\"“”‘’")
+    if _DESCRIBED_RE.match(lyrics):
+        return ""
+    return lyrics if len(tokenize(lyrics)) >= MIN_QUOTED_WORDS else ""
+
+
+def classify_lyric_query(query: str) -> QueryClassification:
+    """
+    Decide locally whether a query contains song lyrics.
+
+    Args:
+        query: The user's search query
+
+    Returns:
+        A QueryClassification; label UNCERTAIN means the caller should ask the LLM
+    """
+    if not tokenize(query):
+        return QueryClassification(NOT_LYRIC, 0.0, "", "empty")
+
+    quoted = _quoted_lyrics(query)
+    if quoted:
+        return QueryClassification(LYRIC, 1.0, quoted, "quoted")
+
+    cued = _cued_lyrics(query)
+    if cued:
+        return QueryClassification(LYRIC, 1.0, cued, "cue")
+
+    probability = lyric_probability(query)
+    if probability >= LYRIC_THRESHOLD and not _DESCRIPTION_CUES.intersection(tokenize(query)):
+        return QueryClassification(LYRIC, probability, query.strip(), "model")
+    if probability <= NOT_LYRIC_THRESHOLD:
+        return QueryClassification(NOT_LYRIC, probability, "", "model")
+    return QueryClassification(UNCERTAIN, probability, "", "model")
@@ -0,0 +1,330 @@
+"""Hedged, failover-aware routing across LLM endpoints.
+
+`RoutingLLMClient` sends a request to its primary route and, if no answer arrives
+within the primary's recent p95 latency, sends a hedged duplicate to the next route
+(a secondary model or provider) and returns whichever good answer comes first. Errors
+fail over to the next route immediately instead of sleeping and retrying the same
+provider.
+
+Every endpoint has process-wide health shared by all routing clients:
+
+- a `CircuitBreaker` that skips the endpoint after consecutive failures and lets a
+  single trial request through once `reset_timeout` has passed,
+- a `LatencyHistogram` of successful call latencies, which sets the hedge delay and is
+  reported by `routing_stats()`.
+
+Losing requests cannot be cancelled mid-flight (the SDKs are synchronous); they finish
+in the background and still feed the latency histograms.
+"""
+
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+from .clients import LLMClient, LLMMessages, AssistantContentBlock, ToolParam
+from .metrics import PROVIDER_ERRORS
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# Hedge after this latency percentile of the primary route...
+DEFAULT_HEDGE_PERCENTILE: float = 0.95
+# ...clamped to these bounds, and after DEFAULT_HEDGE_DELAY until enough samples exist
+MIN_HEDGE_DELAY: float = 1.0
+MAX_HEDGE_DELAY: float = 60.0
+DEFAULT_HEDGE_DELAY: float = 15.0
+MIN_HEDGE_SAMPLES: int = 20
+
+CIRCUIT_FAILURE_THRESHOLD: int = 3
+CIRCUIT_RESET_TIMEOUT: float = 30.0
+
+ROUTING_MAX_WORKERS: int = 32
+
+# Histogram bucket upper bounds in seconds: 50ms to ~160s, 20% apart
+_BUCKET_BOUNDS: tuple[float, ...] = tuple(0.05 * 1.2 ** i for i in range(45))
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket latency histogram."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = bisect.bisect_left(_BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th quantile (0 < p <= 1), or None if empty."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = p * self.count
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return _BUCKET_BOUNDS[index] if index < len(_BUCKET_BOUNDS) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> dict:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+
+        return {
+            'count': self.count,
+            'mean_s': round(self.total_seconds / self.count, 3) if self.count else None,
+            'p50_s': rounded(self.percentile(0.5)),
+            'p95_s': rounded(self.percentile(0.95)),
+            'p99_s': rounded(self.percentile(0.99)),
+        }
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after reset_timeout lets one trial request through."""
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the trial slot when half open)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class EndpointHealth:
+    """Process-wide breaker, latency histogram and counters for one endpoint."""
+
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    requests: int = 0
+    failures: int = 0
+    wins: int = 0
+    hedges: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'state': self.breaker.state,
+            'requests': self.requests,
+            'failures': self.failures,
+            'wins': self.wins,
+            'hedges': self.hedges,
+            'latency': self.latency.to_dict(),
+        }
+
+
+_health_lock = threading.Lock()
+_endpoint_health: dict[str, EndpointHealth] = {}
+_executor = ThreadPoolExecutor(max_workers=ROUTING_MAX_WORKERS, thread_name_prefix='llm-route')
+
+
+def endpoint_health(name: str) -> EndpointHealth:
+    """Return the shared health record of an endpoint, creating it on first use."""
+    with _health_lock:
+        health = _endpoint_health.get(name)
+        if health is None:
+            health = _endpoint_health[name] = EndpointHealth()
+        return health
+
+
+def routing_stats() -> dict:
+    """Per-endpoint breaker state, counters and latency percentiles."""
+    with _health_lock:
+        items = list(_endpoint_health.items())
+    return {name: health.to_dict() for name, health in items}
+
+
+def reset_routing_stats() -> None:
+    """Forget every endpoint's health (mainly for tests)."""
+    with _health_lock:
+        _endpoint_health.clear()
+
+
+@dataclass
+class Route:
+    """An LLM client together with the endpoint name its health is tracked under."""
+
+    name: str
+    client: LLMClient
+
+    @property
+    def health(self) -> EndpointHealth:
+        return endpoint_health(self.name)
+
+
+class RoutingLLMClient(LLMClient):
+    """LLMClient that hedges slow requests and fails over between routes, first good answer wins."""
+
+    def __init__(
+        self,
+        routes: list[Route],
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        min_hedge_delay: float = MIN_HEDGE_DELAY,
+        max_hedge_delay: float = MAX_HEDGE_DELAY,
+        default_hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        min_hedge_samples: int = MIN_HEDGE_SAMPLES,
+    ):
+        if not routes:
+            raise ValueError("RoutingLLMClient needs at least one route")
+        self.routes = routes
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_samples = min_hedge_samples
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return getattr(self.routes[0].client, 'model_name', None)
+
+    def hedge_delay(self, route: Route) -> float:
+        """Seconds to wait for a route before sending a hedged duplicate."""
+        latency = route.health.latency
+        if latency.count < self.min_hedge_samples:
+            return self.default_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, latency.percentile(self.hedge_percentile)))
+
+    def _call_route(self, route: Route, request: dict) -> Tuple[list[AssistantContentBlock], dict[str, Any]]:
+        health = route.health
+        health.requests += 1
+        start = time.monotonic()
+        try:
+            result = route.client.generate(**request)
+        except Exception as e:
+            health.failures += 1
+            health.breaker.record_failure()
+            PROVIDER_ERRORS.inc(provider=route.name, error=type(e).__name__)
+            raise
+        health.latency.record(time.monotonic() - start)
+        health.breaker.record_success()
+        return result
+
+    def generate(
+        self,
+        messages: LLMMessages,
+        max_tokens: int,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.0,
+        tools: Optional[list[ToolParam]] = None,
+        tool_choice: Optional[dict[str, str]] = None,
+        thinking_tokens: Optional[int] = None,
+    ) -> Tuple[list[AssistantContentBlock], dict[str, Any]]:
+        """Generate a response from the first route that answers successfully.
+
+        Args:
+            messages: A list of messages.
+            max_tokens: The maximum number of tokens to generate.
+            system_prompt: A system prompt.
+            temperature: The temperature.
+            tools: A list of tools.
+            tool_choice: A tool choice.
+            thinking_tokens: Extended thinking budget.
+
+        Returns:
+            A generated response; the metadata also names the winning `route`, whether it
+            was a `fallback` (not the primary) and whether the request was `hedged` or
+            needed `failovers`.
+        """
+        request = dict(
+            messages=messages, max_tokens=max_tokens, system_prompt=system_prompt, temperature=temperature,
+            tools=tools, tool_choice=tool_choice, thinking_tokens=thinking_tokens,
+        )
+        # Skip endpoints with an open circuit (a side-effect-free check: half-open trial
+        # slots are only claimed by `launch`, for the routes actually sent the request)
+        routes = [route for route in self.routes if route.health.breaker.state != 'open']
+
+        pending: dict[Future, Route] = {}
+        errors: list[Exception] = []
+        launched = 0
+        hedged = False
+
+        def submit(route: Route) -> Route:
+            pending[_executor.submit(self._call_route, route, request)] = route
+            return route
+
+        def launch() -> Optional[Route]:
+            """Send the request to the next route whose breaker lets it through, if any."""
+            nonlocal launched
+            while launched < len(routes):
+                route = routes[launched]
+                launched += 1
+                if route.health.breaker.allow():
+                    return submit(route)
+            return None
+
+        # Never end up with nothing to try
+        primary = launch() or submit(self.routes[0])
+        hedge_at = time.monotonic() + self.hedge_delay(primary)
+
+        while pending:
+            can_hedge = not hedged and launched < len(routes)
+            timeout = max(0.0, hedge_at - time.monotonic()) if can_hedge else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                route = launch()
+                hedged = route is not None
+                if route is not None:
+                    route.health.hedges += 1
+                    log.info("%s slower than %.1fs, hedging to %s", primary.name, self.hedge_delay(primary), route.name)
+                continue
+
+            for future in done:
+                route = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    route.health.wins += 1
+                    blocks, metadata = future.result()
+                    return blocks, {
+                        **metadata, 'route': route.name, 'fallback': route is not self.routes[0],
+                        'hedged': hedged, 'failovers': len(errors),
+                    }
+                errors.append(error)
+                log.warning("%s failed: %s", route.name, error)
+            if not pending:
+                route = launch()
+                if route is not None:
+                    log.warning("Failing over to %s", route.name)
+
+        raise errors[-1]
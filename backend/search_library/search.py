@@ -1,14 +1,41 @@
-from .prompts import get_basic_query, decode_assistant_response, get_individual_song_reasoning_query, decode_individual_song_reasoning, get_song_doc_embedding_prompt, get_song_query_embedding_prompt
-from .types import Song
-from .clients import LLMClient, TextPrompt
+from .prompts import get_basic_query, decode_assistant_response, get_individual_song_reasoning_query, decode_individual_song_reasoning, get_song_query_embedding_prompt
+from .types import Song, LazySong, hydrate_songs
+from .lyrics import compact_song, DEFAULT_RERANK_LYRICS_CHARS
+from .lyric_index import LyricIndex
+from .embeddings import decode_embedding, encode_embedding_for_db, empty_embedding
+from .chunking import pack_songs, estimate_tokens, ChunkingStats, DEFAULT_MAX_TOKENS_PER_CHUNK, DEFAULT_MAX_TOKENS_PER_SONG
+from .clients import LLMClient, TextPrompt, get_sdk_client
+from .embedding_versions import (
+    EmbeddingVersion, LEGACY_EMBEDDING_VERSION, MATCH_SONG_IDS_VERSIONED_RPC, RESCORE_OVERSAMPLE,
+    get_embedding_migration, get_embedding_version, load_embeddings, reduce_embeddings, song_embedding_document,
+)
+from .dim_reduction import rescore
+from .deadline import call_timeout, degrade, deadline_expired, remaining
+from .tracing import propagate, span
+from .log import get_logger
 import numpy as np
-from openai import OpenAI
+from openai import NOT_GIVEN, OpenAI
 from supabase import create_client, Client
 import os
 import concurrent.futures
+import logging
 from typing import Tuple
 
-def search_library(client: LLMClient, library: list[Song], user_query: str, n: int = 3, chunk_size: int = 1000, generate_song_reasoning: bool = False, verbose: bool = False) -> tuple[list[Song], dict]:
+log = get_logger(__name__)
+
+def search_library(
+    client: LLMClient,
+    library: list[Song],
+    user_query: str,
+    n: int = 3,
+    chunk_size: int = 1000,
+    generate_song_reasoning: bool = False,
+    verbose: bool = False,
+    max_tokens_per_chunk: int = DEFAULT_MAX_TOKENS_PER_CHUNK,
+    max_tokens_per_song: int = DEFAULT_MAX_TOKENS_PER_SONG,
+    compact: bool = True,
+    max_lyrics_chars: int | None = DEFAULT_RERANK_LYRICS_CHARS,
+) -> tuple[list[Song], dict]:
     """
     Search the library for songs that match the user's query.
 
@@ -17,86 +44,129 @@ def search_library(client: LLMClient, library: list[Song], user_query: str, n: i
         library: The library of songs to search through
         user_query: The query to search for
         n: The number of songs to return
-        chunk_size: The number of songs to search through at once
+        chunk_size: The maximum number of songs to search through at once
         verbose: Whether to print verbose output
+        max_tokens_per_chunk: Estimated token budget for the songs in one LLM request
+        max_tokens_per_song: Estimated token budget for one song; longer songs are truncated
+        compact: Whether to dedupe and strip annotations from lyrics before prompting
+        max_lyrics_chars: If compacting, keep only the query-relevant lyric windows up to this many chars
 
     Returns:
         A tuple of (songs that match the user's query, token usage statistics)
     """
+    total_token_usage = {
+        'total_input_tokens': 0,
+        'total_output_tokens': 0,
+        'total_requests': 0,
+        'cached_requests': 0,
+        'requests_breakdown': []
+    }
 
-    min_chars_per_song_lyrics = min([len(song.lyrics) for song in library])
-    max_chars_per_song_lyrics = max([len(song.lyrics) for song in library])
-    avg_chars_per_song_lyrics = sum([len(song.lyrics) for song in library]) / len(library)
-    median_chars_per_song_lyrics = np.median([len(song.lyrics) for song in library])
-    perc25_chars_per_song_lyrics = np.percentile([len(song.lyrics) for song in library], 25)
-    perc75_chars_per_song_lyrics = np.percentile([len(song.lyrics) for song in library], 75)
+    # Load lazy songs' lyrics in one query instead of one per song
+    hydrate_songs(library)
 
-    max_chars_song = max(library, key=lambda x: len(x.lyrics))
+    if not library:
+        total_token_usage['chunking'] = ChunkingStats(max_tokens_per_chunk=max_tokens_per_chunk, max_tokens_per_song=max_tokens_per_song).to_dict()
+        return [], total_token_usage
 
-    with open("/tmp/max_chars_song.txt", "w") as f:
-        f.write(str(max_chars_song))
-    print(f"MIN CHARS PER SONG LYRICS = {min_chars_per_song_lyrics}")
-    print(f"MAX CHARS PER SONG LYRICS = {max_chars_per_song_lyrics}")
-    print(f"AVG CHARS PER SONG LYRICS = {avg_chars_per_song_lyrics}")   
-    print(f"MEDIAN CHARS PER SONG LYRICS = {median_chars_per_song_lyrics}")
-    print(f"PERC25 CHARS PER SONG LYRICS = {perc25_chars_per_song_lyrics}")
-    print(f"PERC75 CHARS PER SONG LYRICS = {perc75_chars_per_song_lyrics}")
+    # Compact lyrics on copies so the prompt doesn't pay for repeated choruses
+    prompt_library = library
+    if compact:
+        prompt_library = [compact_song(song, user_query, max_lyrics_chars) for song in library]
+        total_token_usage['lyrics_compaction'] = {
+            'songs_compacted': sum(1 for song, compacted in zip(library, prompt_library) if song is not compacted),
+            'original_lyrics_chars': sum(len(song.lyrics) for song in library),
+            'compacted_lyrics_chars': sum(len(song.lyrics) for song in prompt_library),
+        }
 
-    # Break library into chunks of chunk_size songs
-    chunks = [library[i:i + chunk_size] for i in range(0, len(library), chunk_size)]
+    # Pack songs into chunks under the token budget (songs that are too long get truncated copies)
+    chunks, chunking_stats = pack_songs(
+        prompt_library,
+        max_tokens_per_chunk=max_tokens_per_chunk,
+        max_tokens_per_song=max_tokens_per_song,
+        max_songs_per_chunk=chunk_size,
+    )
+    lyrics_lengths = [len(song.lyrics) for song in library]
+    total_token_usage['chunking'] = {
+        **chunking_stats.to_dict(),
+        'lyrics_chars': {
+            'min': int(min(lyrics_lengths)),
+            'max': int(max(lyrics_lengths)),
+            'median': float(np.median(lyrics_lengths)),
+            'p25': float(np.percentile(lyrics_lengths, 25)),
+            'p75': float(np.percentile(lyrics_lengths, 75)),
+        },
+    }
 
     if verbose:
-        print(f"NUMBER OF CHUNKS= {len(chunks)}")
-        print(f"SONGS PER CHUNK = {[len(chunk) for chunk in chunks]}")
-    
+        log.info("Reranking in %d chunks; songs per chunk: %s", chunking_stats.num_chunks, chunking_stats.songs_per_chunk)
+        log.debug("Estimated tokens per chunk: %s", chunking_stats.estimated_tokens_per_chunk)
+
     # Run recursive search on each chunk
     filtered_songs = []
-    total_token_usage = {
-        'total_input_tokens': 0,
-        'total_output_tokens': 0,
-        'total_requests': 0,
-        'requests_breakdown': []
-    }
-    
-    for chunk in chunks:
-        chunk_results, chunk_token_usage = recursive_search(client, chunk, user_query, n=n, generate_song_reasoning=generate_song_reasoning, verbose=verbose)
+    for chunk, estimated_tokens in zip(chunks, chunking_stats.estimated_tokens_per_chunk):
+        with span('rerank.chunk', songs=len(chunk)):
+            chunk_results, chunk_token_usage = recursive_search(client, chunk, user_query, n=n, generate_song_reasoning=generate_song_reasoning, verbose=verbose)
         filtered_songs.extend(chunk_results)
         
         # Aggregate token usage
         total_token_usage['total_input_tokens'] += chunk_token_usage.get('input_tokens', 0)
         total_token_usage['total_output_tokens'] += chunk_token_usage.get('output_tokens', 0)
-        total_token_usage['total_requests'] += 1
+        if chunk_token_usage.get('cached'):
+            total_token_usage['cached_requests'] += 1
+        else:
+            total_token_usage['total_requests'] += 1
         total_token_usage['requests_breakdown'].append({
             'chunk_size': len(chunk),
+            'estimated_input_tokens': estimated_tokens,
             'input_tokens': chunk_token_usage.get('input_tokens', 0),
             'output_tokens': chunk_token_usage.get('output_tokens', 0)
         })
     
     if verbose:
-        print(f"NUMBER OF FILTERED SONGS BEFORE REDUCING = {len(filtered_songs)}")
+        log.info("Filtered songs before reducing: %d", len(filtered_songs))
 
     # If we have more songs than requested, run recursive search again on filtered set
     if len(filtered_songs) > n:
-        final_results, final_token_usage = recursive_search(client, filtered_songs, user_query, n=n, verbose=verbose)
+        with span('rerank.final', songs=len(filtered_songs)):
+            final_results, final_token_usage = recursive_search(client, filtered_songs, user_query, n=n, verbose=verbose)
         
         # Add final token usage
         total_token_usage['total_input_tokens'] += final_token_usage.get('input_tokens', 0)
         total_token_usage['total_output_tokens'] += final_token_usage.get('output_tokens', 0)
-        total_token_usage['total_requests'] += 1
+        if final_token_usage.get('cached'):
+            total_token_usage['cached_requests'] += 1
+        else:
+            total_token_usage['total_requests'] += 1
         total_token_usage['requests_breakdown'].append({
             'chunk_size': len(filtered_songs),
+            'estimated_input_tokens': sum(estimate_tokens(str(song)) for song in filtered_songs),
             'input_tokens': final_token_usage.get('input_tokens', 0),
             'output_tokens': final_token_usage.get('output_tokens', 0),
             'final_reduction': True
         })
         
-        return final_results, total_token_usage
+        return _restore_originals(final_results, library), total_token_usage
         
-    return filtered_songs, total_token_usage
+    return _restore_originals(filtered_songs, library), total_token_usage
+
+def _restore_originals(results: list[Song], library: list[Song]) -> list[Song]:
+    """Swap compacted / truncated prompt copies back for the original library songs."""
+    id_to_song = {song.id: song for song in library}
+    restored = []
+    for song in results:
+        original = id_to_song.get(song.id, song)
+        if original is not song:
+            original.reasoning = song.reasoning
+        restored.append(original)
+    return restored
 
 def generate_many_song_reasoning(songs: list[Song], user_query: str, similarity_scores: list[float] = None, verbose: bool = False) -> tuple[list[Song], dict]:
     """
     Generate reasoning for multiple songs using concurrent processing.
+
+    Under a request deadline (see deadline.py), songs whose reasoning is not ready in
+    time are returned without it rather than making the request wait.
     
     Args:
         songs: List of songs to generate reasoning for
@@ -109,9 +179,11 @@ def generate_many_song_reasoning(songs: list[Song], user_query: str, similarity_
     """
     if not songs:
         return [], {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+
+    hydrate_songs(songs)
     
     if verbose:
-        print(f"Generating specific reasoning for {len(songs)} matched songs using {min(10, len(songs))} concurrent threads...")
+        log.info("Generating reasoning for %d matched songs using %d threads", len(songs), min(10, len(songs)))
     
     # Prepare data for concurrent processing
     song_data = []
@@ -120,51 +192,337 @@ def generate_many_song_reasoning(songs: list[Song], user_query: str, similarity_
         song_data.append((song, user_query, similarity_score, verbose))
     
     # Use ThreadPoolExecutor with max 10 workers for concurrent reasoning generation
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+    try:
         # Submit all reasoning generation tasks
+        reason = propagate(generate_individual_song_reasoning)
         future_to_song = {
-            executor.submit(generate_individual_song_reasoning, song_info[0], song_info[1], song_info[2], song_info[3]): i 
+            executor.submit(reason, song_info[0], song_info[1], song_info[2], song_info[3]): i 
             for i, song_info in enumerate(song_data)
         }
         
         # Collect results as they complete
         reasoned_songs = [None] * len(songs)  # Maintain original order
         total_reasoning_tokens = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+        pending = set(future_to_song)
         
-        for future in concurrent.futures.as_completed(future_to_song):
-            song_index = future_to_song[future]
-
-            song_with_reasoning, token_usage = future.result()
-            if song_with_reasoning is not None:
-                reasoned_songs[song_index] = song_with_reasoning
-            
-            # Aggregate token usage
-            total_reasoning_tokens['input_tokens'] += token_usage.get('input_tokens', 0)
-            total_reasoning_tokens['output_tokens'] += token_usage.get('output_tokens', 0)
-            total_reasoning_tokens['total_tokens'] += token_usage.get('total_tokens', 0)
-            
-            if verbose and song_with_reasoning is not None:
-                print(f"Completed reasoning for: {song_with_reasoning.name}")
+        # Past the request deadline, songs still waiting for (or failing) their reasoning are returned without it
+        try:
+            for future in concurrent.futures.as_completed(future_to_song, timeout=remaining()):
+                song_index = future_to_song[future]
+                pending.discard(future)
+
+                try:
+                    song_with_reasoning, token_usage = future.result()
+                except Exception:
+                    if not deadline_expired():
+                        raise
+                    pending.add(future)
+                    continue
+                if song_with_reasoning is not None:
+                    reasoned_songs[song_index] = song_with_reasoning
+                
+                # Aggregate token usage
+                total_reasoning_tokens['input_tokens'] += token_usage.get('input_tokens', 0)
+                total_reasoning_tokens['output_tokens'] += token_usage.get('output_tokens', 0)
+                total_reasoning_tokens['total_tokens'] += token_usage.get('total_tokens', 0)
+                
+                if verbose and song_with_reasoning is not None:
+                    log.debug("Completed reasoning for: %s", song_with_reasoning.name)
+        except concurrent.futures.TimeoutError:
+            pass
+        if pending:
+            degrade('partial_reasoning', missing=len(pending))
+            for future in pending:
+                reasoned_songs[future_to_song[future]] = songs[future_to_song[future]]
+    finally:
+        # Don't wait for reasoning that missed the deadline
+        expired = deadline_expired()
+        executor.shutdown(wait=not expired, cancel_futures=expired)
     
     # Filter out None entries and return
     final_songs = [song for song in reasoned_songs if song is not None]
     
     if verbose:
-        print(f"Successfully generated reasoning for {len(final_songs)} songs using concurrent processing")
-        for i, song in enumerate(final_songs):
-            print(f"Song {i+1}: {song.name} - {song.reasoning}")
+        log.info("Generated reasoning for %d songs", len(final_songs))
+        if log.isEnabledFor(logging.DEBUG):
+            for i, song in enumerate(final_songs):
+                log.debug("Song %d: %s - %s", i + 1, song.name, song.reasoning)
     
     return final_songs, total_reasoning_tokens
 
-def vector_search_library(user_id: str, user_query: str, n: int = 10, match_threshold: float = 0.5, generate_song_reasoning: bool = False, verbose: bool = False) -> tuple[list[Song], dict]:
+# Reciprocal rank fusion constant (Cormack et al. use k=60)
+RRF_K: int = 60
+
+# Lexical and vector search "agree strongly" when they share the same top hit and this
+# share of their top HYBRID_AGREEMENT_TOP_K results; callers can then skip the LLM reranker.
+HYBRID_AGREEMENT_TOP_K: int = 5
+HYBRID_AGREEMENT_THRESHOLD: float = 0.6
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """
+    Fuse several rankings of song IDs with reciprocal rank fusion.
+
+    Args:
+        rankings: Lists of song IDs, each ordered from most to least relevant
+        k: The RRF constant; larger values flatten the contribution of top ranks
+
+    Returns:
+        (song_id, fused score) pairs ordered by descending score
+    """
+    scores: dict[str, float] = {}
+    first_seen: dict[str, tuple[int, int]] = {}
+    for ranking_index, ranking in enumerate(rankings):
+        for rank, song_id in enumerate(ranking):
+            scores[song_id] = scores.get(song_id, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(song_id, (rank, ranking_index))
+    return sorted(scores.items(), key=lambda item: (-item[1], first_seen[item[0]]))
+
+def fuse_hybrid_results(vector_songs: list[Song], similarity_scores: list[float | None], lexical_results: list[tuple[Song, float]], n: int) -> tuple[list[Song], list[float | None], dict]:
+    """
+    Fuse vector and lexical (BM25) results with reciprocal rank fusion.
+
+    Args:
+        vector_songs: Songs from vector search, most similar first
+        similarity_scores: Vector similarity for each song in vector_songs
+        lexical_results: (song, bm25 score) pairs, best first
+        n: The number of fused songs to return
+
+    Returns:
+        A tuple of (fused songs, their vector similarity or None for lexical-only hits, hybrid stats)
+    """
+    vector_ids = [song.id for song in vector_songs]
+    lexical_ids = [song.id for song, _ in lexical_results]
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:n]
+
+    # Prefer the vector search copy of a song since it carries metadata and embedding
+    id_to_song = {song.id: song for song, _ in lexical_results}
+    id_to_song.update({song.id: song for song in vector_songs})
+    id_to_similarity = dict(zip(vector_ids, similarity_scores))
+
+    top_k = min(HYBRID_AGREEMENT_TOP_K, len(vector_ids), len(lexical_ids))
+    agreement = len(set(vector_ids[:top_k]) & set(lexical_ids[:top_k])) / top_k if top_k else 0.0
+    same_top_hit = bool(vector_ids and lexical_ids and vector_ids[0] == lexical_ids[0])
+
+    stats = {
+        'vector_hits': len(vector_ids),
+        'lexical_hits': len(lexical_ids),
+        'fused_hits': len(fused),
+        'lexical_only_hits': sum(1 for song_id, _ in fused if song_id not in id_to_similarity),
+        'agreement': agreement,
+        'same_top_hit': same_top_hit,
+        'skip_reranker': same_top_hit and agreement >= HYBRID_AGREEMENT_THRESHOLD,
+    }
+    return [id_to_song[song_id] for song_id, _ in fused], [id_to_similarity.get(song_id) for song_id, _ in fused], stats
+
+MATCH_SONG_IDS_RPC = 'match_song_ids'
+SONG_DISPLAY_COLUMNS = 'id, name, artists, album, song_link'
+SONG_PROMPT_COLUMNS = 'id, lyrics, song_metadata'
+
+def match_song_ids(supabase: Client, query_embedding: np.ndarray, user_id: str, match_threshold: float, n: int, version: EmbeddingVersion = LEGACY_EMBEDDING_VERSION) -> list[tuple[str, float]]:
+    """
+    Return the (song id, similarity) pairs of the user's songs closest to the query embedding.
+
+    Legacy (songs.embedding) searches call the `match_song_ids` RPC, which takes the same
+    arguments as `match_songs_v2` but returns only `id` and `similarity`. Databases that
+    don't have it yet fall back to `match_songs_v2` (same result, but the full rows cross
+    the wire). Other versions search song_embeddings with `match_song_ids_versioned`.
+
+    Args:
+        supabase: The Supabase client
+        query_embedding: The query embedding, made with the same version's model
+        user_id: The user whose songs to search
+        match_threshold: The minimum similarity threshold (0.0 to 1.0)
+        n: The maximum number of matches
+        version: The embedding version to search
+
+    Returns:
+        Matches ordered by descending similarity
+    """
+    params = {
+        'query_emb': encode_embedding_for_db(query_embedding),
+        'p_user_id': user_id,
+        'match_threshold': match_threshold + version.match_threshold_offset,
+        'match_count': n
+    }
+    if not version.legacy:
+        response = supabase.rpc(MATCH_SONG_IDS_VERSIONED_RPC, {**params, 'p_model_version': version.tag}).execute()
+        return [(row['id'], row.get('similarity')) for row in response.data]
+    try:
+        response = supabase.rpc(MATCH_SONG_IDS_RPC, params).execute()
+    except Exception as e:
+        log.warning("%s failed (%s), falling back to match_songs_v2", MATCH_SONG_IDS_RPC, e)
+        response = supabase.rpc('match_songs_v2', params).execute()
+    return [(row['id'], row.get('similarity')) for row in response.data]
+
+def merge_dual_read_matches(primary: list[tuple[str, float]], secondary: list[tuple[str, float]], n: int) -> list[tuple[str, float]]:
+    """
+    Fuse the matches of two embedding versions during a migration.
+
+    Similarities of different models aren't comparable, so the rankings are fused with
+    reciprocal rank fusion. Each song keeps the primary version's similarity when it has
+    one (songs not yet re-embedded only appear in the secondary ranking).
+
+    Args:
+        primary: Matches from the read version, best first
+        secondary: Matches from the dual-read version, best first
+        n: The number of matches to return
+
+    Returns:
+        Fused (song id, similarity) pairs
+    """
+    similarities = dict(secondary)
+    similarities.update(primary)
+    fused = reciprocal_rank_fusion([[song_id for song_id, _ in primary], [song_id for song_id, _ in secondary]])[:n]
+    return [(song_id, similarities[song_id]) for song_id, _ in fused]
+
+def match_reduced_and_rescore(supabase: Client, prompt: str, user_id: str, match_threshold: float, n: int, version: EmbeddingVersion, verbose: bool = False) -> tuple[list[tuple[str, float]], dict]:
+    """
+    Search a reduced version's index for RESCORE_OVERSAMPLE * n candidates, then rank them by their full-size vectors.
+
+    The match threshold is applied to the full-size similarities, so it means the same
+    as it does for the full-size version.
+
+    Returns:
+        A tuple of (matches with full-size similarities, embedding token usage)
+    """
+    base = get_embedding_version(version.derived_from)
+    with span('vector_search.embed', version=base.tag):
+        full_query, usage = create_query_embedding(prompt, version=base, verbose=verbose)
+    if 'error' in usage:
+        raise Exception(usage['error'])
+    with span('vector_search.match', version=version.tag):
+        # No threshold on the reduced similarities; candidates are filtered after rescoring
+        candidates = match_song_ids(supabase, reduce_embeddings(version, full_query), user_id, -1.0 - version.match_threshold_offset, n * RESCORE_OVERSAMPLE, version)
+    with span('vector_search.rescore', candidates=len(candidates)):
+        full_embeddings = load_embeddings(supabase, base, [song_id for song_id, _ in candidates])
+    threshold = match_threshold + base.match_threshold_offset
+    matches = [(song_id, similarity) for song_id, similarity in rescore(full_query, full_embeddings, n) if similarity >= threshold]
+    return matches, {**usage, 'rescored_candidates': len(full_embeddings)}
+
+def embed_and_match(supabase: Client, user_query: str, user_id: str, match_threshold: float, n: int, verbose: bool = False) -> tuple[list[tuple[str, float]], dict]:
+    """
+    Embed the query and match it with every read version of the active embedding migration.
+
+    With a dual-read version configured both versions are embedded and searched
+    concurrently and their matches fused with merge_dual_read_matches.
+
+    Returns:
+        A tuple of (matches, embedding token usage)
+    """
+    migration = get_embedding_migration()
+    versions = migration.read_versions
+    prompt = get_song_query_embedding_prompt(user_query)
+
+    def embed_one(version: EmbeddingVersion) -> tuple[list[tuple[str, float]], dict]:
+        if version.derived_from and migration.rescore:
+            return match_reduced_and_rescore(supabase, prompt, user_id, match_threshold, n, version, verbose=verbose)
+        with span('vector_search.embed', version=version.tag):
+            query_embedding, usage = create_query_embedding(prompt, version=version, verbose=verbose)
+        if 'error' in usage:
+            raise Exception(usage['error'])
+        with span('vector_search.match', version=version.tag):
+            return match_song_ids(supabase, query_embedding, user_id, match_threshold, n, version), usage
+
+    if len(versions) == 1:
+        try:
+            matches, usage = embed_one(versions[0])
+        except Exception as e:
+            if versions[0].legacy:
+                raise
+            # e.g. sql/song_embeddings.sql not applied yet; songs.embedding is always there
+            log.error("Embedding version %s failed, searching %s instead: %s", versions[0].tag, LEGACY_EMBEDDING_VERSION.tag, e)
+            matches, usage = embed_one(LEGACY_EMBEDDING_VERSION)
+            return matches, {**usage, 'embedding_version': LEGACY_EMBEDDING_VERSION.tag, 'fallback_from': versions[0].tag}
+        return matches, {**usage, 'embedding_version': versions[0].tag}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(versions)) as executor:
+        futures = [executor.submit(propagate(embed_one), version) for version in versions]
+    results = []
+    for version, future in zip(versions, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            # A half-built index must not take search down; serve the other version alone
+            log.error("Embedding version %s failed: %s", version.tag, e)
+            results.append(([], {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'error': str(e)}))
+    (primary, primary_usage), (secondary, secondary_usage) = results
+    if not primary and not secondary and 'error' in primary_usage:
+        raise Exception(primary_usage['error'])
+    usage = {
+        key: primary_usage.get(key, 0) + secondary_usage.get(key, 0)
+        for key in ('input_tokens', 'output_tokens', 'total_tokens')
+    }
+    usage['embedding_version'] = versions[0].tag
+    usage['dual_read'] = {
+        'version': versions[1].tag,
+        'primary_hits': len(primary),
+        'secondary_hits': len(secondary),
+        'secondary_only_hits': len({song_id for song_id, _ in secondary} - {song_id for song_id, _ in primary}),
+    }
+    return merge_dual_read_matches(primary, secondary, n), usage
+
+def _song_prompt_fields_loader(supabase: Client):
+    """Return a LazySong loader that fetches only the fields the reranker and reasoning prompts use."""
+    def load(songs: list[LazySong]) -> None:
+        response = supabase.table('songs').select(SONG_PROMPT_COLUMNS).in_('id', [song.id for song in songs]).execute()
+        rows_by_id = {row['id']: row for row in response.data}
+        for song in songs:
+            row = rows_by_id.get(song.id)
+            if row is not None:
+                song.set_heavy_fields(row.get('lyrics') or '', row.get('song_metadata') or '', empty_embedding())
+    return load
+
+def fetch_lazy_songs(supabase: Client, song_ids: list[str]) -> list[LazySong]:
+    """
+    Fetch the display fields of songs and return them as LazySongs in song_ids order.
+
+    Lyrics and metadata are loaded in one query the first time any stage reads them;
+    embeddings are never fetched.
+    """
+    if not song_ids:
+        return []
+    response = supabase.table('songs').select(SONG_DISPLAY_COLUMNS).in_('id', song_ids).execute()
+    rows_by_id = {row['id']: row for row in response.data}
+    loader = _song_prompt_fields_loader(supabase)
+    songs = []
+    for song_id in song_ids:
+        row = rows_by_id.get(song_id)
+        if row is None:
+            continue
+        songs.append(LazySong(
+            id=row['id'],
+            name=row['name'],
+            # Convert comma-delimited artists string back to list
+            artists=[artist.strip() for artist in row['artists'].split(',')],
+            album=row['album'],
+            song_link=row['song_link'],
+            loader=loader,
+        ))
+    return songs
+
+def vector_search_library(user_id: str, user_query: str, n: int = 10, match_threshold: float = 0.5, generate_song_reasoning: bool = False, verbose: bool = False, lexical_index: LyricIndex | None = None) -> tuple[list[Song], dict]:
     """
     Search the song library using vector similarity search.
 
+    If a lexical index is given, BM25 over title, artists, album and lyrics runs alongside
+    the vector search and the two rankings are fused with reciprocal rank fusion. The
+    token usage then carries a 'hybrid' entry whose 'skip_reranker' flag says whether the
+    two retrievers agreed strongly enough to skip LLM reranking.
+
+    The query is embedded with the active embedding migration's read version (and its
+    dual-read version, if one is set; see embedding_versions). Retrieval is two-phase:
+    the RPC returns only ids and similarities, then the display fields of the matches are
+    fetched. Returned songs are LazySongs whose lyrics and
+    metadata load on first use. Vector similarities are in token usage under
+    'similarity_scores', keyed by song id.
+
     Args:
         user_query: The query to search for
         n: The number of songs to return
         match_threshold: The minimum similarity threshold (0.0 to 1.0)
         verbose: Whether to print verbose output
+        lexical_index: Optional per-user LyricIndex for hybrid lexical + vector retrieval
 
     Returns:
         A tuple of (songs that match the user's query, token usage statistics)
@@ -178,52 +536,33 @@ def vector_search_library(user_id: str, user_query: str, n: int = 10, match_thre
     
     supabase: Client = create_client(supabase_url, supabase_service_key)
     
-    # Generate embedding for the user query
-    user_query_embedding_prompt = get_song_query_embedding_prompt(user_query)
-    query_embedding, embedding_token_usage = create_query_embedding(user_query_embedding_prompt, verbose=verbose)
-    
     if verbose:
-        print(f"Generated query embedding with {len(query_embedding)} dimensions")
-        print(f"Using match threshold: {match_threshold}")
-        print(f"Requesting {n} matches")
+        log.debug("Requesting %d matches with threshold %s", n, match_threshold)
     
+    embedding_token_usage = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
     try:
-        # Call the Supabase function to find similar songs
-        response = supabase.rpc('match_songs_v2', {
-            'query_emb': query_embedding,
-            'p_user_id': user_id,
-            'match_threshold': match_threshold,
-            'match_count': n
-        }).execute()
+        # Phase one: embed the query, then ids and similarities only
+        matches, embedding_token_usage = embed_and_match(supabase, user_query, user_id, match_threshold, n, verbose=verbose)
         
         if verbose:
-            print(f"Found {len(response.data)} matching songs")
+            log.info("Found %d matching songs", len(matches))
         
-        # Convert database results to Song objects
-        songs = []
-        for db_song in response.data:
-            # Convert comma-delimited artists string back to list
-            artists_list = [artist.strip() for artist in db_song['artists'].split(',')]
-            
-            song = Song(
-                id=db_song['id'],
-                name=db_song['name'],
-                artists=artists_list,
-                album=db_song['album'],
-                song_link=db_song['song_link'],
-                lyrics=db_song.get('lyrics', ''),
-                song_metadata=db_song.get('song_metadata', ''),
-                embedding=db_song.get('embedding', [])
-            )
-            songs.append(song)
+        # Phase two: display fields now, lyrics and metadata only if a later stage reads them
+        songs = fetch_lazy_songs(supabase, [song_id for song_id, _ in matches])
+        id_to_similarity = dict(matches)
+        similarity_scores = [id_to_similarity.get(song.id) for song in songs]
+
+        hybrid_stats = None
+        if lexical_index is not None:
+            lexical_results = lexical_index.bm25(user_query, limit=n)
+            songs, similarity_scores, hybrid_stats = fuse_hybrid_results(songs, similarity_scores, lexical_results, n)
+            if verbose:
+                log.info("Hybrid search: %s", hybrid_stats)
         
         # Generate specific reasoning for each matched song using the utility function
         cleaned_reasoning_tokens = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
         
         if generate_song_reasoning and songs:
-            # Extract similarity scores for reasoning generation
-            similarity_scores = [response.data[i].get('similarity', None) for i in range(len(songs))]
-            
             # Use the new utility function for concurrent reasoning generation
             songs, cleaned_reasoning_tokens = generate_many_song_reasoning(
                 songs, user_query, similarity_scores, verbose
@@ -238,15 +577,19 @@ def vector_search_library(user_id: str, user_query: str, n: int = 10, match_thre
             'embedding_tokens': embedding_token_usage,
             'reasoning_tokens': cleaned_reasoning_tokens
         }
+        if hybrid_stats is not None:
+            token_usage['hybrid'] = hybrid_stats
+        # Keyed by song id so scores survive reranking and can be passed to generate_many_song_reasoning
+        token_usage['similarity_scores'] = {song.id: score for song, score in zip(songs, similarity_scores) if score is not None}
         
         if verbose:
-            print(f"Vector search completed. Found {len(songs)} songs.")
-            print(f"Token usage: {token_usage}")
+            log.info("Vector search completed. Found %d songs.", len(songs))
+            log.debug("Token usage: %s", token_usage)
         
         return songs, token_usage
         
     except Exception as e:
-        print(f"Error in vector search: {e}")
+        log.error("Error in vector search: %s", e)
         # Return empty results with token usage for embedding generation
         return [], {
             'total_input_tokens': embedding_token_usage.get('input_tokens', 0),
@@ -256,35 +599,46 @@ def vector_search_library(user_id: str, user_query: str, n: int = 10, match_thre
             'error': str(e)
         }
 
-def create_query_embedding(query: str, openai_client: OpenAI = None, model: str = "text-embedding-ada-002", verbose: bool = False) -> tuple[list[float], dict]:
+def create_query_embedding(query: str, openai_client: OpenAI = None, model: str | None = None, verbose: bool = False, version: EmbeddingVersion | None = None) -> tuple[np.ndarray, dict]:
     """
     Create an embedding for a search query using OpenAI's embedding API.
     
     Args:
         query: The search query to create an embedding for
-        openai_client: Optional OpenAI client instance. If None, creates a new one.
-        model: The embedding model to use (default: text-embedding-ada-002)
+        openai_client: Optional OpenAI client instance. If None, uses the shared client.
+        model: The embedding model to use (default: the version's model)
         verbose: Whether to print verbose output
+        version: The embedding version to embed for (default: the migration's read version)
     
     Returns:
         A tuple of (embedding vector, token usage)
     """
     if openai_client is None:
-        openai_client = OpenAI()
+        openai_client = get_sdk_client("openai")
+    if version is None:
+        version = get_embedding_migration().read_versions[0]
+    if version.derived_from:
+        # Embed at full size and reduce locally
+        full_embedding, token_usage = create_query_embedding(query, openai_client, model, verbose, get_embedding_version(version.derived_from))
+        if 'error' in token_usage:
+            return full_embedding, token_usage
+        return reduce_embeddings(version, full_embedding), token_usage
     
     if verbose:
-        print(f"Creating embedding for query: '{query[:100]}...'")
+        log.debug("Creating embedding for query: '%.100s'", query)
     
     try:
-        # Create embedding using OpenAI API
+        # Create embedding using OpenAI API (base64 is ~4x smaller on the wire than JSON floats)
         response = openai_client.embeddings.create(
-            model=model,
+            model=model or version.model,
             input=query,
-            encoding_format="float"
+            encoding_format="base64",
+            timeout=call_timeout(None) or NOT_GIVEN,
+            **({'dimensions': version.dimensions} if version.dimensions else {})
         )
         
         # Extract the embedding vector from the response
-        embedding = response.data[0].embedding
+        embedding = decode_embedding(response.data[0].embedding)
         
         # Extract token usage
         token_usage = {
@@ -294,22 +648,20 @@ def create_query_embedding(query: str, openai_client: OpenAI = None, model: str
         }
         
         if verbose:
-            print(f"Successfully created embedding with {len(embedding)} dimensions")
-            print(f"Token usage: {token_usage}")
+            log.debug("Created embedding with %d dimensions, token usage: %s", len(embedding), token_usage)
         
         return embedding, token_usage
         
     except Exception as e:
-        print(f"Error creating query embedding: {e}")
+        log.error("Error creating query embedding: %s", e)
         # Return empty embedding and token usage on error
-        return [], {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'error': str(e)}
+        return empty_embedding(), {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0, 'error': str(e)}
 
 def recursive_search(client: LLMClient, sublibrary: list[Song], user_query: str, n: int = 3, generate_song_reasoning: bool = False, verbose: bool = False) -> tuple[list[Song], dict]:
     prompt = get_basic_query(sublibrary, user_query, n, generate_song_reasoning=generate_song_reasoning)
 
     if verbose:
-        print("PROMPT LENGTH")
-        print(len(prompt))
+        log.debug("Prompt length: %d", len(prompt))
     
     # The generate method expects list[list[GeneralContentBlock]]
     # So we need to wrap the TextPrompt in another list
@@ -328,20 +680,15 @@ def recursive_search(client: LLMClient, sublibrary: list[Song], user_query: str,
     token_usage = response_tuple[1] if len(response_tuple) > 1 else {}
     
     if verbose:
-        print("RESPONSE TEXT LENGTH")
-        print(len(response_text))
-        print("TOKEN USAGE:")
-        print(f"  Input tokens: {token_usage.get('input_tokens', 'N/A')}")
-        print(f"  Output tokens: {token_usage.get('output_tokens', 'N/A')}")
+        log.debug("Response length: %d, input tokens: %s, output tokens: %s",
+                  len(response_text), token_usage.get('input_tokens', 'N/A'), token_usage.get('output_tokens', 'N/A'))
 
     song_reasons = decode_assistant_response(response_text, generate_song_reasoning=generate_song_reasoning)
 
-    if verbose:
-        print("SONG REASONS LENGTH")
-        print(len(song_reasons))
-        print("SONG REASONS:")
+    if verbose and log.isEnabledFor(logging.DEBUG):
+        log.debug("Song reasons: %d", len(song_reasons))
         for song_id, reason in song_reasons:
-            print(f"  ID: {song_id}, Reason: {reason}")
+            log.debug("  ID: %s, Reason: %s", song_id, reason)
 
     # Create a mapping of song IDs to their reasoning
     id_to_song = {song.id: song for song in sublibrary}
@@ -352,47 +699,43 @@ def recursive_search(client: LLMClient, sublibrary: list[Song], user_query: str,
             song.reasoning = reason
             result_songs.append(song)
             if verbose:
-                print(f"MATCHED: ID {song_id} -> {song.name} by {', '.join(song.artists)}")
+                log.debug("Matched: ID %s -> %s by %s", song_id, song.name, song.artists)
         else:
             if verbose:
-                print(f"NO MATCH: ID {song_id} not found in library")
+                log.debug("No match: ID %s not found in library", song_id)
 
     if verbose:
-        print("SONGS WITH REASONING LENGTH")
-        print(len(result_songs))
+        log.debug("Songs with reasoning: %d", len(result_songs))
 
     return result_songs, token_usage
 
-def create_song_embedding(song: Song, openai_client: OpenAI = None, model: str = "text-embedding-ada-002") -> list[float]:
+def create_song_embedding(song: Song, openai_client: OpenAI = None, model: str | None = None, version: EmbeddingVersion = LEGACY_EMBEDDING_VERSION) -> np.ndarray:
     """
     Create an embedding for a song using OpenAI's embedding API.
     
     Args:
         song: The song object to create an embedding for
-        openai_client: Optional OpenAI client instance. If None, creates a new one.
-        model: The embedding model to use (default: text-embedding-ada-002)
+        openai_client: Optional OpenAI client instance. If None, uses the shared client.
+        model: The embedding model to use (default: the version's model)
+        version: The embedding version (default: the legacy songs.embedding version)
     
     Returns:
-        A list of floats representing the song's embedding
+        A float32 array representing the song's embedding
     """
     if openai_client is None:
-        openai_client = OpenAI()
-    
-    song_serialization = get_song_doc_embedding_prompt(song)
-
-    # set max length to 6144*3 characters
-    max_length_in_chars = 6144*3
-    song_serialization = song_serialization[:max_length_in_chars]
+        openai_client = get_sdk_client("openai")
     
     # Create embedding using OpenAI API
     response = openai_client.embeddings.create(
-        model=model,
-        input=song_serialization,
-        encoding_format="float"
+        model=model or version.model,
+        input=song_embedding_document(song),
+        encoding_format="base64",
+        timeout=call_timeout(None) or NOT_GIVEN,
+        **({'dimensions': version.dimensions} if version.dimensions else {})
     )
     
     # Extract the embedding vector from the response
-    embedding = response.data[0].embedding
+    embedding = decode_embedding(response.data[0].embedding)
     
     return embedding
 
@@ -418,13 +761,14 @@ def generate_individual_song_reasoning(song: Song, user_query: str, similarity_s
     reasoning_prompt = get_individual_song_reasoning_query(user_query, song, similarity_score)
     
     if verbose:
-        print(f"Generating reasoning for song: {song.name} by {', '.join(song.artists)}")
+        log.debug("Generating reasoning for song: %s by %s", song.name, song.artists)
 
     # Generate reasoning
-    response_tuple = llm_client.generate(
-        [[TextPrompt(text=reasoning_prompt)]],
-        max_tokens=200  # Reduced since we only need 1-2 sentences
-    )
+    with span('reasoning.song'):
+        response_tuple = llm_client.generate(
+            [[TextPrompt(text=reasoning_prompt)]],
+            max_tokens=200  # Reduced since we only need 1-2 sentences
+        )
     
     response_blocks = response_tuple[0]
     reasoning_text = response_blocks[0].text
@@ -441,7 +785,7 @@ def generate_individual_song_reasoning(song: Song, user_query: str, similarity_s
     }
     
     if verbose:
-        print(f"Generated reasoning for {song.name}: {reason}")
+        log.debug("Generated reasoning for %s: %s", song.name, reason)
 
     song.reasoning = reason
     return song if not filter_out else None, cleaned_token_usage
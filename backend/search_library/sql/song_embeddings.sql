@@ -0,0 +1,64 @@
+-- Versioned song embeddings (see search_library/embedding_versions.py).
+--
+-- Run once per database (Supabase SQL editor or `psql -f`); every statement is idempotent.
+-- Adding an EmbeddingVersion means adding its partial index below and running this file
+-- again before the version is written or read. The legacy ada-002 vectors stay in
+-- songs.embedding and are searched by match_song_ids / match_songs_v2.
+
+create extension if not exists vector;
+
+create table if not exists public.song_embeddings (
+    song_id text not null references public.songs (id) on delete cascade,
+    model_version text not null,
+    -- Untyped so one table holds every version; the indexes cast to each version's size
+    embedding vector not null,
+    primary key (song_id, model_version)
+);
+
+-- Only the service role (which bypasses RLS) reads and writes embeddings
+alter table public.song_embeddings enable row level security;
+
+-- One partial HNSW index per version, on the same cast the RPC orders by. Inner product:
+-- the API's vectors are unit length, so it equals cosine similarity, and the reduced
+-- versions are searched by inner product before their full-size rescoring.
+create index if not exists song_embeddings_3_small_idx on public.song_embeddings
+    using hnsw ((embedding::vector(1536)) vector_ip_ops) where model_version = '3-small';
+create index if not exists song_embeddings_3_small_512_idx on public.song_embeddings
+    using hnsw ((embedding::vector(512)) vector_ip_ops) where model_version = '3-small-512';
+create index if not exists song_embeddings_3_large_1024_idx on public.song_embeddings
+    using hnsw ((embedding::vector(1024)) vector_ip_ops) where model_version = '3-large-1024';
+create index if not exists song_embeddings_ada_002_pca256_idx on public.song_embeddings
+    using hnsw ((embedding::vector(256)) vector_ip_ops) where model_version = 'ada-002-pca256';
+create index if not exists song_embeddings_3_small_256_idx on public.song_embeddings
+    using hnsw ((embedding::vector(256)) vector_ip_ops) where model_version = '3-small-256';
+
+-- The match_song_ids arguments plus p_model_version; returns (id, similarity), best first.
+-- similarity is the inner product (<#> is its negation). The query's size picks the cast,
+-- so the expression matches the version's partial index.
+create or replace function public.match_song_ids_versioned(
+    query_emb vector,
+    p_user_id text,
+    match_threshold float,
+    match_count int,
+    p_model_version text
+)
+returns table (id text, similarity float)
+language plpgsql
+stable
+as $$
+declare
+    dims int := vector_dims(query_emb);
+begin
+    return query execute format(
+        'select e.song_id, -((e.embedding::vector(%1$s)) <#> $1::vector(%1$s))
+         from public.song_embeddings e
+         join public.users_songs us on us.song_id = e.song_id and us.user_id = $2
+         where e.model_version = $3
+           and -((e.embedding::vector(%1$s)) <#> $1::vector(%1$s)) > $4
+         order by (e.embedding::vector(%1$s)) <#> $1::vector(%1$s)
+         limit $5',
+        dims
+    )
+    using query_emb, p_user_id, p_model_version, match_threshold, match_count;
+end;
+$$;
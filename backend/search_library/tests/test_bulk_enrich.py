@@ -0,0 +1,211 @@
+"""Tests for bulk enrichment: track ID parsing, checkpoints and the enrichment run.
+
+`bulk_enrich` is a top-level backend module (the backend directory is on the path when
+the tests run). Importing it imports `utils`, whose web search client requires
+BRAVE_API_KEY to be set (no request is ever made with it) and which configures the
+process-wide LLM routes, response cache and embedding migration; those are put back
+right after the import so the other test modules see the defaults. Enrichment and
+database writes are replaced by stubs.
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from ..clients import get_response_cache, set_fallback_routes, set_response_cache
+from ..embedding_versions import get_embedding_migration, set_embedding_migration
+from ..types import RawSong, Song
+
+os.environ.setdefault("BRAVE_API_KEY", "test")
+_response_cache, _migration = get_response_cache(), get_embedding_migration()
+
+import bulk_enrich
+from bulk_enrich import Checkpoint, parse_track_id, read_track_ids, run_bulk_enrichment
+
+set_fallback_routes({})
+set_response_cache(_response_cache)
+set_embedding_migration(_migration)
+
+TRACK_ID = "4uLU6hMCjMI75M1A2tKUQC"
+
+
+def raw_song(index: int) -> RawSong:
+    return RawSong(id=f"{index:022d}", song_link="", album="Album", name=f"Song {index}", artists=["Artist"])
+
+
+def enriched(song: RawSong, lyrics: str = "la la la") -> Song:
+    return Song(
+        id=song.id, song_link=song.song_link, album=song.album, name=song.name, artists=song.artists,
+        lyrics=lyrics, song_metadata="",
+    )
+
+
+class StubEnrichment:
+    """Stands in for enrich_single_song: fails for `failing` ids and leaves `no_lyrics` ids without lyrics."""
+
+    def __init__(self, failing: set[str] = frozenset(), no_lyrics: set[str] = frozenset()):
+        self.failing = failing
+        self.no_lyrics = no_lyrics
+        self.calls: list[str] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, song: RawSong):
+        with self._lock:
+            self.calls.append(song.id)
+        if song.id in self.failing:
+            raise TimeoutError("provider timed out")
+        usage = {'input_tokens': 10, 'output_tokens': 2, 'provider_calls': {'genius': 1, 'llm': 2}}
+        if song.id in self.no_lyrics:
+            usage['lyrics_error'] = 'NotFound'
+            return enriched(song, lyrics=""), usage
+        return enriched(song), usage
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replace upsert_songs with a recorder of the batches written."""
+    written: list[list[str]] = []
+    monkeypatch.setattr(bulk_enrich, 'upsert_songs', lambda supabase, songs: written.append([song.id for song in songs]))
+    return written
+
+
+def checkpoint_entries(path) -> list[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestParseTrackId:
+    """Test cases for parse_track_id()."""
+
+    @pytest.mark.parametrize("line", [
+        TRACK_ID,
+        f"  {TRACK_ID}\n",
+        f"spotify:track:{TRACK_ID}",
+        f"https://open.spotify.com/track/{TRACK_ID}?si=abc123",
+    ])
+    def test_recognized_forms(self, line):
+        assert parse_track_id(line) == TRACK_ID
+
+    @pytest.mark.parametrize("line", ["not a track", "spotify:track:short", ""])
+    def test_junk_line(self, line):
+        assert parse_track_id(line) is None
+
+
+class TestReadTrackIds:
+    """Test cases for read_track_ids()."""
+
+    def test_dedupes_in_order_and_skips_comments(self, tmp_path):
+        other = "1" * 22
+        path = tmp_path / "ids.txt"
+        path.write_text("\n".join([
+            "# top tracks",
+            TRACK_ID,
+            "",
+            f"spotify:track:{other}",
+            f"  # {'2' * 22}",
+            f"https://open.spotify.com/track/{TRACK_ID}",
+            "junk",
+        ]))
+
+        assert read_track_ids(str(path)) == [TRACK_ID, other]
+
+
+class TestCheckpoint:
+    """Test cases for Checkpoint."""
+
+    def test_resume_skips_only_ok_ids(self, tmp_path):
+        path = str(tmp_path / "checkpoint.jsonl")
+        Checkpoint(path).record([
+            {'id': "a", 'status': 'ok', 'lyrics': True},
+            {'id': "b", 'status': 'error', 'error': 'TimeoutError'},
+        ])
+
+        assert Checkpoint(path).done == {"a"}
+
+    def test_truncated_last_line_is_ignored(self, tmp_path):
+        path = tmp_path / "checkpoint.jsonl"
+        path.write_text('{"id": "a", "status": "ok"}\n{"id": "b", "sta')
+
+        assert Checkpoint(str(path)).done == {"a"}
+
+    def test_missing_file_starts_empty(self, tmp_path):
+        assert Checkpoint(str(tmp_path / "none.jsonl")).done == set()
+
+
+class TestRunBulkEnrichment:
+    """Test cases for run_bulk_enrichment() with stubbed enrichment and database writes."""
+
+    def test_batches_are_flushed_and_checkpointed(self, tmp_path, monkeypatch, batches):
+        songs = [raw_song(i) for i in range(7)]
+        monkeypatch.setattr(bulk_enrich, 'enrich_single_song', StubEnrichment())
+        path = str(tmp_path / "checkpoint.jsonl")
+
+        stats = run_bulk_enrichment(songs, supabase=object(), checkpoint=Checkpoint(path), workers=2, batch_size=3)
+
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+        assert sorted(song_id for batch in batches for song_id in batch) == [song.id for song in songs]
+        assert stats.enriched == stats.written == 7 and stats.failed == 0
+        assert {entry['id'] for entry in checkpoint_entries(path)} == {song.id for song in songs}
+
+    def test_failures_and_provider_calls_are_counted(self, tmp_path, monkeypatch, batches):
+        songs = [raw_song(i) for i in range(5)]
+        stub = StubEnrichment(failing={songs[1].id}, no_lyrics={songs[2].id})
+        monkeypatch.setattr(bulk_enrich, 'enrich_single_song', stub)
+        path = str(tmp_path / "checkpoint.jsonl")
+
+        stats = run_bulk_enrichment(songs, supabase=object(), checkpoint=Checkpoint(path), workers=2, batch_size=10)
+
+        assert stats.enriched == 4 and stats.failed == 1 and stats.missing_lyrics == 1
+        assert stats.error_classes == {'TimeoutError': 1, 'Lyrics:NotFound': 1}
+        assert stats.provider_calls == {'genius': 4, 'llm': 8}
+        assert (stats.input_tokens, stats.output_tokens) == (40, 8)
+        assert {'id': songs[1].id, 'status': 'error', 'error': 'TimeoutError'} in checkpoint_entries(path)
+        assert Checkpoint(path).done == {song.id for song in songs} - {songs[1].id}
+
+    def test_db_write_error_is_recorded_per_song(self, tmp_path, monkeypatch):
+        songs = [raw_song(i) for i in range(3)]
+        monkeypatch.setattr(bulk_enrich, 'enrich_single_song', StubEnrichment())
+
+        def failing_upsert(supabase, batch):
+            raise ConnectionError("database unavailable")
+
+        monkeypatch.setattr(bulk_enrich, 'upsert_songs', failing_upsert)
+        path = str(tmp_path / "checkpoint.jsonl")
+
+        stats = run_bulk_enrichment(songs, supabase=object(), checkpoint=Checkpoint(path), workers=2, batch_size=2)
+
+        assert stats.written == 0
+        assert stats.error_classes == {'DBWrite:ConnectionError': 3}
+        assert {entry['status'] for entry in checkpoint_entries(path)} == {'error'}
+        assert Checkpoint(path).done == set()
+
+    def test_resume_skips_songs_done_in_checkpoint(self, tmp_path, monkeypatch, batches):
+        songs = [raw_song(i) for i in range(4)]
+        path = str(tmp_path / "checkpoint.jsonl")
+        Checkpoint(path).record([
+            {'id': songs[0].id, 'status': 'ok', 'lyrics': True},
+            {'id': songs[1].id, 'status': 'error', 'error': 'TimeoutError'},
+        ])
+        stub = StubEnrichment()
+        monkeypatch.setattr(bulk_enrich, 'enrich_single_song', stub)
+
+        stats = run_bulk_enrichment(songs, supabase=object(), checkpoint=Checkpoint(path), workers=2, batch_size=10)
+
+        assert stats.skipped == 1 and stats.to_dict()['skipped_from_checkpoint'] == 1
+        assert sorted(stub.calls) == [song.id for song in songs[1:]]
+        assert stats.enriched == 3
+
+    def test_dry_run_writes_nothing(self, tmp_path, monkeypatch, batches):
+        monkeypatch.setattr(bulk_enrich, 'enrich_single_song', StubEnrichment())
+        path = str(tmp_path / "checkpoint.jsonl")
+
+        stats = run_bulk_enrichment([raw_song(0)], supabase=None, checkpoint=Checkpoint(path), workers=1)
+
+        assert batches == [] and stats.written == 0 and stats.enriched == 1
+        assert Checkpoint(path).done == {raw_song(0).id}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
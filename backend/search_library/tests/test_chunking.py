@@ -0,0 +1,82 @@
+"""Tests for token-budget-aware chunk packing."""
+
+import pytest
+from typing import List
+
+from ..chunking import pack_songs, truncate_song, estimate_tokens, TRUNCATION_MARKER
+from ..types import Song
+
+
+def create_song(song_id: int, lyrics_chars: int = 100) -> Song:
+    """Create a test song with lyrics of roughly the given length."""
+    line = "la la la la la la la la la\n"
+    lyrics = (line * (lyrics_chars // len(line) + 1))[:lyrics_chars]
+    return Song(
+        id=str(song_id),
+        song_link=f"https://example.com/song{song_id}",
+        album=f"Test Album {song_id}",
+        name=f"Test Song {song_id}",
+        artists=[f"Test Artist {song_id}"],
+        lyrics=lyrics,
+        song_metadata="genre: test",
+    )
+
+
+def create_songs(lyrics_lengths: List[int]) -> List[Song]:
+    return [create_song(i + 1, length) for i, length in enumerate(lyrics_lengths)]
+
+
+class TestPackSongs:
+    """Test cases for pack_songs."""
+
+    def test_every_chunk_fits_budget(self):
+        songs = create_songs([100, 4000, 200, 3000, 50, 8000, 1000] * 10)
+        chunks, stats = pack_songs(songs, max_tokens_per_chunk=3000, max_tokens_per_song=2500)
+
+        assert stats.num_chunks == len(chunks)
+        assert all(tokens <= 3000 for tokens in stats.estimated_tokens_per_chunk)
+        for chunk, tokens in zip(chunks, stats.estimated_tokens_per_chunk):
+            assert sum(estimate_tokens(str(song)) for song in chunk) == tokens
+
+    def test_all_songs_packed_once(self):
+        songs = create_songs([100, 4000, 200, 3000, 50] * 20)
+        chunks, stats = pack_songs(songs, max_tokens_per_chunk=5000)
+
+        packed_ids = [song.id for chunk in chunks for song in chunk]
+        assert sorted(packed_ids) == sorted(song.id for song in songs)
+        assert sum(stats.songs_per_chunk) == len(songs)
+
+    def test_song_count_cap_matches_fixed_size_chunking(self):
+        songs = create_songs([50] * 2500)
+        chunks, stats = pack_songs(songs, max_songs_per_chunk=1000)
+
+        assert stats.songs_per_chunk == [1000, 1000, 500]
+        assert chunks[1][0].id == "1001"
+
+    def test_long_songs_are_truncated_not_originals(self):
+        songs = create_songs([100, 50000])
+        chunks, stats = pack_songs(songs, max_tokens_per_song=1000)
+
+        assert stats.truncated_songs == 1
+        assert stats.truncated_tokens > 0
+        packed = {song.id: song for chunk in chunks for song in chunk}
+        assert estimate_tokens(str(packed["2"])) <= 1000
+        assert packed["2"].lyrics.endswith(TRUNCATION_MARKER)
+        assert len(songs[1].lyrics) == 50000
+        assert packed["1"] is songs[0]
+
+
+class TestTruncateSong:
+    """Test cases for truncate_song."""
+
+    def test_truncation_is_deterministic(self):
+        song = create_song(1, 20000)
+        assert str(truncate_song(song, 500)) == str(truncate_song(song, 500))
+
+    def test_short_song_returned_unchanged(self):
+        song = create_song(1, 100)
+        assert truncate_song(song, 1000) is song
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
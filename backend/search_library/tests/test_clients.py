@@ -0,0 +1,67 @@
+"""Tests for the shared client registry in get_client."""
+
+import pytest
+
+from ..clients import (
+    OpenAIDirectClient, AnthropicDirectClient, get_client, get_sdk_client, clear_client_registry,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-openai-key")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-anthropic-key")
+    clear_client_registry()
+    yield
+    clear_client_registry()
+
+
+class TestClientRegistry:
+    """Test cases for client reuse across get_client calls."""
+
+    def test_same_options_reuse_client(self):
+        first = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+        second = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+
+        assert isinstance(first, OpenAIDirectClient)
+        assert first is second
+
+    def test_different_options_get_different_clients(self):
+        mini = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+        full = get_client("openai-direct", cache=False, model_name="gpt-4o")
+
+        assert mini is not full
+        assert mini.model_name == "gpt-4o-mini" and full.model_name == "gpt-4o"
+
+    def test_clients_share_sdk_client_and_pool(self):
+        mini = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+        full = get_client("openai-direct", cache=False, model_name="gpt-4o")
+        embeddings = get_sdk_client("openai")
+
+        assert mini.client is full.client
+        assert embeddings is not mini.client
+        assert embeddings._client is mini.client._client
+
+    def test_providers_use_separate_pools(self):
+        anthropic_client = get_client("anthropic-direct", cache=False)
+        openai_client = get_client("openai-direct", cache=False)
+
+        assert isinstance(anthropic_client, AnthropicDirectClient)
+        assert anthropic_client.client._client is not openai_client.client._client
+
+    def test_api_key_change_builds_new_sdk_client(self, monkeypatch):
+        before = get_sdk_client("openai")
+        monkeypatch.setenv("OPENAI_API_KEY", "rotated-key")
+
+        after = get_sdk_client("openai")
+
+        assert after is not before
+        assert after.api_key == "rotated-key"
+
+    def test_unknown_client_name(self):
+        with pytest.raises(ValueError):
+            get_client("nope-direct")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,147 @@
+"""Tests for request deadlines, call timeouts and degradations."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from .. import search
+from ..deadline import (
+    MIN_CALL_TIMEOUT, call_timeout, current_deadline, deadline_expired, degrade, remaining, request_deadline, time_left_for,
+)
+from ..metrics import DEGRADATIONS
+from ..tracing import propagate
+from ..types import Song
+
+
+def make_songs(count: int) -> list[Song]:
+    return [
+        Song(id=str(i), song_link=f"https://example.com/{i}", album="Album", name=f"Song {i}", artists=["Artist"], lyrics="la la", song_metadata="")
+        for i in range(count)
+    ]
+
+
+class TestDeadline:
+
+    def test_deadline_is_scoped_to_the_block(self):
+        assert current_deadline() is None
+        with request_deadline(30) as deadline:
+            assert current_deadline() is deadline
+            assert 29 < remaining() <= 30
+        assert current_deadline() is None
+        assert remaining() is None
+
+    def test_zero_or_none_means_no_deadline(self):
+        for seconds in (0, None):
+            with request_deadline(seconds) as deadline:
+                assert deadline is None
+                assert remaining() is None
+
+    def test_expiry(self):
+        with request_deadline(0.05) as deadline:
+            assert not deadline_expired()
+            time.sleep(0.06)
+            assert deadline.expired and deadline_expired()
+            assert remaining() == 0.0
+
+    def test_deadline_reaches_propagated_worker_threads(self):
+        with request_deadline(30) as deadline:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                seen = executor.submit(propagate(current_deadline)).result()
+        assert seen is deadline
+
+
+class TestCallTimeout:
+
+    def test_without_deadline_returns_default(self):
+        assert call_timeout(10) == 10
+        assert call_timeout(None) is None
+        assert time_left_for(1e9)
+
+    def test_capped_by_time_left(self):
+        with request_deadline(5):
+            assert call_timeout(10) <= 5
+            assert call_timeout(2) == 2
+            assert 4 < call_timeout(None) <= 5
+            assert time_left_for(4) and not time_left_for(6)
+
+    def test_floor_after_expiry(self):
+        with request_deadline(0.01):
+            time.sleep(0.02)
+            assert call_timeout(10) == MIN_CALL_TIMEOUT
+            assert call_timeout(10, minimum=0.5) == 0.5
+
+
+class TestDegrade:
+
+    def test_repeats_are_counted_once_and_reported_once(self):
+        events = []
+        with request_deadline(30, on_degrade=events.append) as deadline:
+            degrade('test_partial', missing=3)
+            degrade('test_partial', missing=2)
+            degrade('test_skip')
+
+        assert [event['name'] for event in events] == ['test_partial', 'test_skip']
+        assert events[0]['count'] == 1
+        partial, skip = deadline.degradations
+        assert partial['count'] == 2 and partial['missing'] == 2
+        assert skip['count'] == 1
+        assert deadline.to_dict()['degradations'] == deadline.degradations
+
+    def test_degradations_are_counted_in_metrics(self):
+        before = DEGRADATIONS.value(degradation='test_metric')
+        with request_deadline(30):
+            degrade('test_metric')
+            degrade('test_metric')
+        assert DEGRADATIONS.value(degradation='test_metric') == before + 2
+
+    def test_without_deadline_is_a_no_op(self):
+        before = DEGRADATIONS.value(degradation='test_no_deadline')
+        degrade('test_no_deadline')
+        assert DEGRADATIONS.value(degradation='test_no_deadline') == before
+
+    def test_degrade_from_several_threads(self):
+        with request_deadline(30) as deadline:
+            threads = [threading.Thread(target=propagate(degrade), args=('test_threads',)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert deadline.degradations[0]['count'] == 8
+
+
+class TestPartialReasoning:
+
+    @pytest.fixture
+    def slow_reasoning(self, monkeypatch):
+        release = threading.Event()
+
+        def reason(song, user_query, similarity_score, verbose):
+            if song.id != '0':
+                release.wait(5)
+            song.reasoning = f"reason {song.id}"
+            return song, {'input_tokens': 1, 'output_tokens': 1, 'total_tokens': 2}
+
+        monkeypatch.setattr(search, 'generate_individual_song_reasoning', reason)
+        yield
+        release.set()
+
+    def test_songs_past_the_deadline_are_returned_without_reasoning(self, slow_reasoning):
+        songs = make_songs(3)
+        with request_deadline(0.2) as deadline:
+            start = time.monotonic()
+            results, token_usage = search.generate_many_song_reasoning(songs, "query")
+
+        assert time.monotonic() - start < 2
+        assert [song.id for song in results] == ['0', '1', '2']
+        assert [song.reasoning for song in results] == ['reason 0', '', '']
+        assert token_usage['total_tokens'] == 2
+        assert deadline.degradations[0]['name'] == 'partial_reasoning'
+        assert deadline.degradations[0]['missing'] == 2
+
+    def test_without_deadline_all_reasoning_is_awaited(self, monkeypatch):
+        monkeypatch.setattr(search, 'generate_individual_song_reasoning', lambda song, *args: (song, {'total_tokens': 1}))
+        results, token_usage = search.generate_many_song_reasoning(make_songs(3), "query")
+        assert len(results) == 3
+        assert token_usage['total_tokens'] == 3
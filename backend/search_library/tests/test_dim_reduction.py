@@ -0,0 +1,60 @@
+"""Tests for PCA / truncation dimension reduction and full-vector rescoring."""
+
+import numpy as np
+import pytest
+
+from ..dim_reduction import PCAProjection, inner_product_top_k, normalize_rows, rescore, truncate_embeddings
+
+
+def low_rank_corpus(rows: int = 400, dimensions: int = 64, rank: int = 8, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    shared = rng.standard_normal(dimensions)
+    basis = rng.standard_normal((rank, dimensions))
+    return normalize_rows(3 * shared + rng.standard_normal((rows, rank)) @ basis)
+
+
+class TestPCAProjection:
+
+    def test_low_rank_corpus_keeps_inner_products(self):
+        corpus = low_rank_corpus()
+        projection = PCAProjection.fit(corpus, 9)
+        reduced = projection.project(corpus)
+
+        assert projection.explained_variance_ratio.sum() == pytest.approx(1.0, abs=1e-4)
+        np.testing.assert_allclose(reduced @ reduced[0], corpus @ corpus[0], atol=1e-4)
+
+    def test_reduced_search_finds_full_top_hits(self):
+        corpus = low_rank_corpus()
+        projection = PCAProjection.fit(corpus, 9)
+        full_top, _ = inner_product_top_k(corpus[5], corpus, 10)
+        reduced_top, _ = inner_product_top_k(projection.project(corpus[5]), projection.project(corpus), 10)
+
+        assert set(reduced_top) == set(full_top)
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        projection = PCAProjection.fit(low_rank_corpus(), 4)
+        path = str(tmp_path / "pca.npz")
+        projection.save(path)
+
+        loaded = PCAProjection.load(path)
+        assert loaded.dimensions == 4
+        np.testing.assert_array_equal(loaded.components, projection.components)
+
+    def test_cannot_keep_more_components_than_samples(self):
+        with pytest.raises(ValueError):
+            PCAProjection.fit(low_rank_corpus(rows=3), 4)
+
+
+class TestTruncationAndRescoring:
+
+    def test_truncation_renormalizes(self):
+        truncated = truncate_embeddings(np.array([[3.0, 4.0, 12.0]]), 2)
+        np.testing.assert_allclose(truncated, [[0.6, 0.8]], rtol=1e-6)
+
+    def test_rescore_orders_by_full_cosine_similarity(self):
+        query = np.array([1.0, 0.0, 0.0])
+        candidates = {'far': np.array([0.0, 1.0, 0.0]), 'near': np.array([2.0, 0.2, 0.0]), 'mid': np.array([1.0, 1.0, 0.0])}
+
+        ranked = rescore(query, candidates, 2)
+        assert [song_id for song_id, _ in ranked] == ['near', 'mid']
+        assert ranked[1][1] == pytest.approx(np.sqrt(0.5), rel=1e-5)
@@ -0,0 +1,286 @@
+"""Tests for versioned embeddings, dual-read matching, reduced versions and re-embedding backfills."""
+
+import base64
+import os
+import re
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+from ..embedding_versions import (
+    EMBEDDING_VERSIONS, EmbeddingMigration, EmbeddingVersion, LEGACY_EMBEDDING_VERSION, embed_texts, get_embedding_migration, get_embedding_version,
+    reembed_library, set_embedding_migration, set_projection, upsert_versioned_embeddings, write_song_embeddings,
+)
+from ..dim_reduction import PCAProjection
+from ..types import Song
+from .. import embedding_versions, search
+from ..search import embed_and_match, match_song_ids, merge_dual_read_matches
+
+
+def encoded(values) -> str:
+    return base64.b64encode(np.asarray(values, dtype=np.float32).tobytes()).decode()
+
+
+class FakeEmbeddings:
+    """Embeds each input as [model index, input length], returning items in reverse order."""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, model, input, encoding_format, **kwargs):
+        self.requests.append({'model': model, 'input': input, **kwargs})
+        inputs = [input] if isinstance(input, str) else input
+        data = [SimpleNamespace(index=i, embedding=encoded([len(model), len(text)])) for i, text in enumerate(inputs)]
+        return SimpleNamespace(data=data[::-1], usage=SimpleNamespace(prompt_tokens=len(inputs), total_tokens=len(inputs)))
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+
+
+class FakeTable:
+    """Chainable select / upsert on one in-memory table."""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.filters = []
+        self.window = None
+        self.rows_to_upsert = None
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def upsert(self, rows):
+        self.rows_to_upsert = rows
+        return self
+
+    def execute(self):
+        table = self.db.tables.setdefault(self.name, [])
+        if self.rows_to_upsert is not None:
+            self.db.upserts.append((self.name, len(self.rows_to_upsert)))
+            table.extend(self.rows_to_upsert)
+            return Mock(data=self.rows_to_upsert)
+        rows = [row for row in table if all(check(row) for check in self.filters)]
+        if self.window is not None:
+            rows = rows[self.window[0]:self.window[1]]
+        return Mock(data=rows)
+
+
+class FakeSupabase:
+    def __init__(self, tables=None, matches=None):
+        self.tables = tables or {}
+        self.matches = matches or {}
+        self.upserts = []
+        self.rpcs = []
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+    def rpc(self, name, params):
+        self.rpcs.append((name, params))
+        return Mock(execute=lambda: Mock(data=self.matches.get(params.get('p_model_version', 'ada-002'), [])))
+
+
+def song_row(song_id: str) -> dict:
+    return {'id': song_id, 'name': f"Song {song_id}", 'artists': "Artist", 'album': "Album",
+            'song_link': "", 'lyrics': f"lyrics {song_id}", 'song_metadata': ""}
+
+
+@pytest.fixture(autouse=True)
+def restore_migration():
+    migration = get_embedding_migration()
+    yield
+    set_embedding_migration(migration)
+
+
+class TestEmbeddingVersions:
+
+    def test_unknown_version_rejected(self):
+        with pytest.raises(ValueError):
+            set_embedding_migration(EmbeddingMigration(read='ada-002', write=('nope',)))
+
+    def test_embed_texts_batches_and_keeps_input_order(self):
+        client = FakeOpenAI()
+        embeddings, usage = embed_texts(["a", "bb", "ccc"], get_embedding_version('3-small-512'), client, batch_size=2)
+
+        assert [int(embedding[1]) for embedding in embeddings] == [1, 2, 3]
+        assert [len(request['input']) for request in client.embeddings.requests] == [2, 1]
+        assert client.embeddings.requests[0]['dimensions'] == 512
+        assert usage['requests'] == 2 and usage['input_tokens'] == 3
+
+    def test_truncated_version_embeds_at_full_size_and_reduces(self):
+        client = FakeOpenAI()
+        embeddings, _ = embed_texts(["abc"], get_embedding_version('3-small-256'), client)
+
+        assert client.embeddings.requests[0]['model'] == 'text-embedding-3-small'
+        assert 'dimensions' not in client.embeddings.requests[0]
+        assert np.linalg.norm(embeddings[0]) == pytest.approx(1.0)
+
+    def test_legacy_version_not_written_to_song_embeddings(self):
+        with pytest.raises(ValueError):
+            upsert_versioned_embeddings(FakeSupabase(), LEGACY_EMBEDDING_VERSION, ["1"], [np.ones(2, dtype=np.float32)])
+
+    def test_reduced_versions_derive_from_vectors_at_hand(self):
+        songs = [Song(id=str(i), song_link="", album="Album", name=f"Song {i}", artists=["Artist"], lyrics="la la", song_metadata="") for i in range(3)]
+        rng = np.random.default_rng(0)
+        for song in songs[:2]:
+            song.embedding = rng.standard_normal(2).astype(np.float32)
+        pca = EmbeddingVersion('ada-002-pca1', 'text-embedding-ada-002', dimensions=1, derived_from='ada-002', pca=True)
+        set_projection(pca, PCAProjection.fit(rng.standard_normal((20, 2)), 1), save=False)
+        client = FakeOpenAI()
+        supabase = FakeSupabase()
+
+        versions = [get_embedding_version('3-small-256'), get_embedding_version('3-small'), pca]
+        with patch.object(embedding_versions, 'get_sdk_client', return_value=client):
+            usage = write_song_embeddings(supabase, songs, versions)
+
+        # One request for 3-small (reused by 3-small-256), one for the song without a legacy embedding
+        assert [(request['model'], len(request['input'])) for request in client.embeddings.requests] == [
+            ('text-embedding-3-small', 3), ('text-embedding-ada-002', 1),
+        ]
+        assert usage['3-small-256']['requests'] == 0
+        written = {(row['model_version'], row['song_id']) for row in supabase.tables['song_embeddings']}
+        assert written == {(tag, str(i)) for tag in ('3-small', '3-small-256', 'ada-002-pca1') for i in range(3)}
+
+
+class TestVersionedMatching:
+
+    def test_non_legacy_version_uses_versioned_rpc(self):
+        supabase = FakeSupabase(matches={'3-small': [{'id': "1", 'similarity': 0.4}]})
+        version = get_embedding_version('3-small')
+
+        assert match_song_ids(supabase, np.ones(2), "user", 0.5, 10, version) == [("1", 0.4)]
+        name, params = supabase.rpcs[0]
+        assert name == 'match_song_ids_versioned'
+        assert params['p_model_version'] == '3-small'
+        assert params['match_threshold'] == pytest.approx(0.5 + version.match_threshold_offset)
+
+    def test_dual_read_keeps_primary_similarity_and_secondary_only_hits(self):
+        merged = merge_dual_read_matches([("a", 0.5), ("b", 0.4)], [("b", 0.9), ("c", 0.8)], n=3)
+
+        assert [song_id for song_id, _ in merged] == ["b", "a", "c"]
+        assert dict(merged) == {"a": 0.5, "b": 0.4, "c": 0.8}
+
+    def test_embed_and_match_queries_both_versions(self):
+        set_embedding_migration(EmbeddingMigration(read='3-small', write=('ada-002', '3-small'), dual_read='ada-002'))
+        supabase = FakeSupabase(matches={
+            '3-small': [{'id': "1", 'similarity': 0.4}],
+            'ada-002': [{'id': "2", 'similarity': 0.8}],
+        })
+        with patch.object(search, 'get_sdk_client', return_value=FakeOpenAI()):
+            matches, usage = embed_and_match(supabase, "query", "user", 0.5, 10)
+
+        assert {song_id for song_id, _ in matches} == {"1", "2"}
+        assert sorted(name for name, _ in supabase.rpcs) == ['match_song_ids', 'match_song_ids_versioned']
+        assert usage['embedding_version'] == '3-small'
+        assert usage['dual_read']['secondary_only_hits'] == 1
+
+    def test_missing_versioned_rpc_falls_back_to_legacy(self):
+        set_embedding_migration(EmbeddingMigration(read='3-small', write=('ada-002', '3-small')))
+        supabase = FakeSupabase(matches={'ada-002': [{'id': "2", 'similarity': 0.8}]})
+        rpc = supabase.rpc
+
+        def rpc_without_versioned(name, params):
+            if name == 'match_song_ids_versioned':
+                raise Exception("Could not find the function public.match_song_ids_versioned")
+            return rpc(name, params)
+
+        supabase.rpc = rpc_without_versioned
+        with patch.object(search, 'get_sdk_client', return_value=FakeOpenAI()):
+            matches, usage = embed_and_match(supabase, "query", "user", 0.5, 10)
+
+        assert matches == [("2", 0.8)]
+        assert usage['embedding_version'] == 'ada-002' and usage['fallback_from'] == '3-small'
+
+    def test_schema_indexes_every_versioned_embedding(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sql', 'song_embeddings.sql')
+        with open(path) as f:
+            sql = f.read()
+        indexed = {tag: int(dims) for dims, tag in re.findall(r"vector\((\d+)\)\) vector_ip_ops\) where model_version = '([^']+)'", sql)}
+
+        for version in EMBEDDING_VERSIONS.values():
+            if version.legacy:
+                continue
+            assert version.tag in indexed
+            assert version.dimensions in (None, indexed[version.tag])
+        assert 'create or replace function public.match_song_ids_versioned' in sql
+
+
+class TestReembedLibrary:
+
+    def test_backfill_skips_done_songs_and_writes_in_bulk(self):
+        version = get_embedding_version('3-small')
+        supabase = FakeSupabase(tables={
+            'songs': [song_row(str(i)) for i in range(5)],
+            'song_embeddings': [{'song_id': "0", 'model_version': '3-small', 'embedding': "[0,0]"}],
+        })
+        with patch.object(embedding_versions, 'get_sdk_client', return_value=FakeOpenAI()):
+            stats = reembed_library(supabase, version, page_size=2, workers=2)
+
+        assert stats.scanned == 5 and stats.embedded == 4 and stats.failed == 0
+        written = {row['song_id'] for row in supabase.tables['song_embeddings']}
+        assert written == {"0", "1", "2", "3", "4"}
+        assert all(count <= 2 for name, count in supabase.upserts)
+
+    def test_reduced_backfill_projects_stored_vectors_without_embedding_calls(self):
+        version = get_embedding_version('3-small-256')
+        supabase = FakeSupabase(tables={
+            'songs': [song_row(str(i)) for i in range(3)],
+            'song_embeddings': [
+                {'song_id': str(i), 'model_version': '3-small', 'embedding': "[" + ",".join(["1"] * 300) + "]"}
+                for i in range(2)
+            ],
+        })
+        with patch.object(embedding_versions, 'get_sdk_client', side_effect=AssertionError("no embedding calls")):
+            stats = reembed_library(supabase, version)
+
+        assert stats.embedded == 2 and stats.failed == 1 and stats.requests == 0
+        reduced = [row for row in supabase.tables['song_embeddings'] if row['model_version'] == '3-small-256']
+        assert len(reduced[0]['embedding'][1:-1].split(",")) == 256
+
+    def test_reduced_search_rescores_with_full_vectors(self):
+        set_embedding_migration(EmbeddingMigration(read='3-small-256', write=('3-small', '3-small-256'), rescore=True))
+        supabase = FakeSupabase(
+            tables={'song_embeddings': [
+                {'song_id': "a", 'model_version': '3-small', 'embedding': "[1,0]"},
+                {'song_id': "b", 'model_version': '3-small', 'embedding': "[1,1]"},
+            ]},
+            matches={'3-small-256': [{'id': "b", 'similarity': 0.9}, {'id': "a", 'similarity': 0.8}]},
+        )
+        with patch.object(search, 'get_sdk_client', return_value=FakeOpenAI()):
+            matches, usage = embed_and_match(supabase, "q", "user", 0.5, 1)
+
+        # The fake query embedding is [len(model), len(prompt)], closest to "b" at full size
+        name, params = supabase.rpcs[0]
+        assert params['match_count'] == 1 * embedding_versions.RESCORE_OVERSAMPLE
+        assert params['match_threshold'] == pytest.approx(-1.0)
+        assert [song_id for song_id, _ in matches] == ["b"]
+        assert usage['rescored_candidates'] == 2
+
+    def test_legacy_version_cannot_be_backfilled(self):
+        with pytest.raises(ValueError):
+            reembed_library(FakeSupabase(), LEGACY_EMBEDDING_VERSION)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,60 @@
+"""Tests for compact embedding encoding and decoding."""
+
+import numpy as np
+import pytest
+
+from ..embeddings import (
+    decode_embedding,
+    encode_embedding_for_db,
+    encode_embedding_base64,
+    quantize_float16,
+    quantize_int8,
+)
+
+
+@pytest.fixture
+def vector() -> np.ndarray:
+    return np.random.default_rng(0).normal(0, 0.02, size=1536).astype(np.float32)
+
+
+class TestDecodeEmbedding:
+    """Test cases for decode_embedding."""
+
+    def test_empty_values(self):
+        for value in (None, [], "", np.empty(0)):
+            decoded = decode_embedding(value)
+            assert decoded.dtype == np.float32
+            assert decoded.size == 0
+
+    def test_list(self, vector):
+        np.testing.assert_array_equal(decode_embedding(vector.tolist()), vector)
+
+    def test_pgvector_text_round_trip(self, vector):
+        np.testing.assert_array_equal(decode_embedding(encode_embedding_for_db(vector)), vector)
+
+    def test_base64_round_trip(self, vector):
+        np.testing.assert_array_equal(decode_embedding(encode_embedding_base64(vector)), vector)
+
+    def test_encode_empty_for_db(self):
+        assert encode_embedding_for_db([]) is None
+
+
+class TestQuantization:
+    """Test cases for float16 / int8 quantization."""
+
+    def test_int8_close_and_small(self, vector):
+        quantized = quantize_int8(vector)
+        assert quantized.data.dtype == np.int8
+        assert quantized.nbytes < vector.nbytes / 3
+        assert np.max(np.abs(quantized.to_float32() - vector)) <= quantized.scale / 2 + 1e-9
+
+    def test_int8_zero_vector(self):
+        quantized = quantize_int8(np.zeros(8, dtype=np.float32))
+        np.testing.assert_array_equal(quantized.to_float32(), np.zeros(8, dtype=np.float32))
+
+    def test_float16(self, vector):
+        assert quantize_float16(vector).nbytes == vector.nbytes // 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,158 @@
+"""Tests for the deterministic LLM response cache."""
+
+import json
+
+import pytest
+from anthropic.types import RedactedThinkingBlock, ThinkingBlock
+
+from ..clients import LLMClient, TextPrompt, TextResult, ToolCall
+from ..llm_cache import CachingLLMClient, MemoryCacheBackend, DiskCacheBackend, decode_entry, encode_entry
+
+
+class CountingLLMClient(LLMClient):
+    """Answers every prompt with its own text and counts live calls."""
+
+    def __init__(self, model_name: str = "test-model"):
+        self.model_name = model_name
+        self.calls = 0
+
+    def generate(self, messages, max_tokens, system_prompt=None, temperature=0.0, tools=None, tool_choice=None, thinking_tokens=None):
+        self.calls += 1
+        return [TextResult(text=f"answer to {messages[0][0].text}")], {'input_tokens': 100, 'output_tokens': 20}
+
+
+def prompt(text: str):
+    return [[TextPrompt(text=text)]]
+
+
+class TestCachingLLMClient:
+    """Test cases for CachingLLMClient."""
+
+    def test_repeated_request_served_from_cache(self):
+        inner = CountingLLMClient()
+        client = CachingLLMClient(inner, MemoryCacheBackend())
+
+        first, first_usage = client.generate(prompt("hello"), max_tokens=100)
+        second, second_usage = client.generate(prompt("hello"), max_tokens=100)
+
+        assert inner.calls == 1
+        assert second == first
+        assert first_usage['cached'] is False and first_usage['input_tokens'] == 100
+        assert second_usage == {
+            'cached': True, 'input_tokens': 0, 'output_tokens': 0,
+            'cached_input_tokens': 100, 'cached_output_tokens': 20,
+        }
+        assert client.backend.stats.hits == 1 and client.backend.stats.misses == 1
+
+    @pytest.mark.parametrize("change", [
+        {'max_tokens': 200},
+        {'system_prompt': "be brief"},
+        {'tool_choice': {'type': 'auto'}},
+    ])
+    def test_key_covers_request_parameters(self, change):
+        inner = CountingLLMClient()
+        client = CachingLLMClient(inner, MemoryCacheBackend())
+
+        client.generate(prompt("hello"), max_tokens=100)
+        client.generate(prompt("hello"), **{'max_tokens': 100, **change})
+
+        assert inner.calls == 2
+
+    def test_key_covers_model(self):
+        backend = MemoryCacheBackend()
+        CachingLLMClient(CountingLLMClient("model-a"), backend).generate(prompt("hello"), max_tokens=100)
+        other = CountingLLMClient("model-b")
+        CachingLLMClient(other, backend).generate(prompt("hello"), max_tokens=100)
+
+        assert other.calls == 1
+
+    def test_nonzero_temperature_not_cached(self):
+        inner = CountingLLMClient()
+        client = CachingLLMClient(inner, MemoryCacheBackend())
+
+        client.generate(prompt("hello"), max_tokens=100, temperature=0.7)
+        client.generate(prompt("hello"), max_tokens=100, temperature=0.7)
+
+        assert inner.calls == 2
+        assert client.backend.stats.entries == 0
+
+    def test_cached_blocks_are_copies(self):
+        client = CachingLLMClient(CountingLLMClient(), MemoryCacheBackend())
+        blocks, _ = client.generate(prompt("hello"), max_tokens=100)
+        blocks[0].text = "mutated"
+
+        cached, _ = client.generate(prompt("hello"), max_tokens=100)
+
+        assert cached[0].text == "answer to hello"
+
+
+class TestCacheBackends:
+    """Test cases for the memory and disk backends."""
+
+    def test_memory_evicts_least_recently_used(self):
+        backend = MemoryCacheBackend(max_bytes=30)
+        backend.set("a", b"x" * 10)
+        backend.set("b", b"x" * 10)
+        backend.set("c", b"x" * 10)
+        backend.get("a")
+        backend.set("d", b"x" * 10)
+
+        assert backend.get("b") is None
+        assert backend.get("a") is not None
+        assert backend.stats.bytes == 30 and backend.stats.evictions == 1
+
+    def test_oversized_value_not_stored(self):
+        backend = MemoryCacheBackend(max_bytes=5)
+        backend.set("a", b"x" * 10)
+
+        assert backend.get("a") is None
+
+    def test_disk_persists_and_evicts(self, tmp_path):
+        backend = DiskCacheBackend(str(tmp_path), max_bytes=25)
+        backend.set("a", b"x" * 10)
+        backend.set("b", b"y" * 10)
+        backend.set("c", b"z" * 10)
+
+        assert backend.get("a") is None
+        assert backend.stats.evictions == 1
+
+        reopened = DiskCacheBackend(str(tmp_path), max_bytes=25)
+        assert reopened.get("c") == b"z" * 10
+        assert reopened.stats.entries == 2 and reopened.stats.bytes == 20
+
+    def test_disk_backend_serves_caching_client(self, tmp_path):
+        inner = CountingLLMClient()
+        CachingLLMClient(inner, DiskCacheBackend(str(tmp_path))).generate(prompt("hello"), max_tokens=100)
+        blocks, usage = CachingLLMClient(inner, DiskCacheBackend(str(tmp_path))).generate(prompt("hello"), max_tokens=100)
+
+        assert inner.calls == 1
+        assert usage['cached'] is True
+        assert blocks == [TextResult(text="answer to hello")]
+
+
+class TestEntryEncoding:
+    """Test cases for encode_entry() / decode_entry()."""
+
+    def test_round_trip_every_block_type(self):
+        blocks = [
+            TextResult(text="hello"),
+            ToolCall(tool_call_id="call_1", tool_name="search", tool_input={'query': "rain", 'limit': 3}),
+            ThinkingBlock(type="thinking", thinking="hmm", signature="sig"),
+            RedactedThinkingBlock(type="redacted_thinking", data="opaque"),
+        ]
+        usage = {'input_tokens': 10, 'output_tokens': 2}
+
+        assert decode_entry(encode_entry(blocks, usage)) == (blocks, usage)
+
+    def test_entry_is_json(self):
+        entry = json.loads(encode_entry([TextResult(text="hello")], {'input_tokens': 1, 'output_tokens': 1}))
+
+        assert entry['blocks'] == [{'type': 'TextResult', 'data': {'text': "hello"}}]
+
+    def test_unknown_block_type_is_not_stored(self):
+        with pytest.raises(TypeError):
+            encode_entry([TextPrompt(text="not a response block")], {})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
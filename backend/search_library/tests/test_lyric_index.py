@@ -0,0 +1,94 @@
+"""Tests for the per-user positional lyric index."""
+
+import pytest
+
+from ..lyric_index import LyricIndex, extract_lyric_phrase, match_to_search_song
+from ..types import Song
+
+
+def create_song(song_id: str, lyrics: str) -> Song:
+    return Song(
+        id=song_id,
+        song_link=f"https://example.com/{song_id}",
+        album="Test Album",
+        name=f"Song {song_id}",
+        artists=["Test Artist"],
+        lyrics=lyrics,
+        song_metadata="",
+    )
+
+
+@pytest.fixture
+def index() -> LyricIndex:
+    index = LyricIndex()
+    index.add_songs([
+        create_song("sound", "[Verse 1]\nHello darkness, my old friend\nI've come to talk with you again"),
+        create_song("queen", "Buddy, you're a boy, make a big noise\nWe will, we will rock you"),
+        create_song("empty", ""),
+    ])
+    return index
+
+
+class TestLyricIndex:
+    """Test cases for LyricIndex."""
+
+    def test_exact_phrase_ignores_case_and_punctuation(self, index):
+        matches = index.search("HELLO DARKNESS my old friend!")
+        assert matches[0].song.id == "sound"
+        assert matches[0].exact
+
+    def test_near_phrase_match(self, index):
+        matches = index.search("i've come to talk to you again")
+        assert matches[0].song.id == "sound"
+        assert not matches[0].exact
+        assert matches[0].matched_tokens == 4
+
+    def test_confident_match_from_quoted_query(self, index):
+        match = index.find_confident_match("that song that goes 'we will we will rock you' at games")
+        assert match is not None
+        assert match.song.id == "queen"
+
+    def test_no_match_for_descriptive_query(self, index):
+        assert index.find_confident_match("sad songs about breakups") is None
+
+    def test_incremental_update_and_remove(self, index):
+        index.add_song(create_song("new", "Is this the real life, is this just fantasy"))
+        assert index.find_confident_match("'is this the real life'").song.id == "new"
+
+        index.add_song(create_song("new", "Completely different words now"))
+        assert index.find_confident_match("'is this the real life'") is None
+
+        index.remove_song("new")
+        assert "new" not in index
+        assert len(index) == 3
+
+    def test_match_to_search_song_sets_reasoning(self, index):
+        match = index.find_confident_match("'hello darkness my old friend'")
+        song = match_to_search_song(match)
+        assert "hello darkness my old friend" in song.reasoning
+        assert index.search("hello darkness my old friend")[0].song.reasoning == ""
+
+
+class TestBM25:
+    """Test cases for LyricIndex.bm25."""
+
+    def test_lyrics_hit_ranks_first(self, index):
+        results = index.bm25("darkness friend")
+        assert results[0][0].id == "sound"
+        assert all(score > 0 for _, score in results)
+
+    def test_metadata_hit(self, index):
+        index.add_song(Song(id="meta", song_link="", album="Bohemian Album", name="Rhapsody", artists=["Queen"], lyrics="", song_metadata=""))
+        assert index.bm25("rhapsody")[0][0].id == "meta"
+
+    def test_no_terms(self, index):
+        assert index.bm25("!!!") == []
+
+
+def test_extract_lyric_phrase_keeps_apostrophes():
+    assert extract_lyric_phrase("the one that goes 'i insist it wasn't always' ok") == "i insist it wasn't always"
+    assert extract_lyric_phrase("upbeat dance music") == "upbeat dance music"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,110 @@
+"""Tests for lyric compaction."""
+
+import pytest
+
+from ..lyrics import strip_annotations, dedupe_lyrics, select_relevant_windows, compact_lyrics, compact_song, lyric_match_score, WINDOW_SEPARATOR
+from ..types import Song
+
+GENIUS_LYRICS = """[Verse 1: Some Artist]
+Walking down the empty street
+Nothing left for me to keep
+
+[Chorus]
+Hello darkness my old friend
+I've come to talk with you again
+
+[Verse 2]
+Neon lights and city heat
+I've come to talk with you again
+
+[Chorus]
+Hello darkness my old friend
+I've come to talk with you again
+You might also like
+12Embed"""
+
+
+class TestStripAnnotations:
+    """Test cases for strip_annotations."""
+
+    def test_removes_headers_and_artifacts(self):
+        stripped = strip_annotations(GENIUS_LYRICS)
+        assert "[" not in stripped
+        assert "You might also like" not in stripped
+        assert not stripped.endswith("Embed")
+        assert "Walking down the empty street" in stripped
+
+
+class TestDedupeLyrics:
+    """Test cases for dedupe_lyrics."""
+
+    def test_repeated_sections_and_lines_are_counted(self):
+        deduped = dedupe_lyrics(GENIUS_LYRICS)
+        assert deduped.count("Hello darkness my old friend") == 1
+        assert deduped.count("I've come to talk with you again") == 1
+        assert "(section x2)" in deduped
+        assert "I've come to talk with you again (x3)" in deduped
+
+    def test_empty_lyrics(self):
+        assert dedupe_lyrics("") == ""
+
+    def test_deduped_is_shorter(self):
+        assert len(dedupe_lyrics(GENIUS_LYRICS)) < len(GENIUS_LYRICS)
+
+
+class TestSelectRelevantWindows:
+    """Test cases for select_relevant_windows."""
+
+    def test_keeps_window_with_query_phrase(self):
+        filler = "\n".join(f"filler line number {i}" for i in range(200))
+        lyrics = filler + "\nhello darkness my old friend\n" + filler
+        selected = select_relevant_windows(lyrics, "song that goes hello darkness my old friend", max_chars=300)
+        assert "hello darkness my old friend" in selected
+        assert len(selected) <= 300
+
+    def test_falls_back_to_opening_lines(self):
+        lyrics = "\n".join(f"line {i}" for i in range(500))
+        selected = select_relevant_windows(lyrics, "zzz", max_chars=100)
+        assert selected.startswith("line 0")
+        assert WINDOW_SEPARATOR not in selected
+        assert len(selected) <= 100
+
+
+class TestCompactSong:
+    """Test cases for compact_song and compact_lyrics."""
+
+    def test_compact_song_leaves_original_untouched(self):
+        song = Song(id="1", song_link="", album="", name="Song", artists=["Artist"], lyrics=GENIUS_LYRICS, song_metadata="")
+        compacted = compact_song(song, "hello darkness")
+        assert compacted is not song
+        assert song.lyrics == GENIUS_LYRICS
+        assert compacted.lyrics == compact_lyrics(GENIUS_LYRICS)
+
+    def test_compact_song_without_lyrics(self):
+        song = Song(id="1", song_link="", album="", name="Song", artists=["Artist"], lyrics="", song_metadata="")
+        assert compact_song(song, "anything") is song
+
+
+class TestLyricMatchScore:
+    """Test cases for lyric_match_score."""
+
+    LYRICS = "[Verse 1]\nHello darkness, my old friend\nI've come to talk with you again\nBecause a vision softly creeping"
+
+    def test_verbatim_phrase_scores_one(self):
+        assert lyric_match_score("hello darkness my old friend", self.LYRICS) == 1.0
+        assert lyric_match_score("Hello, darkness! My old friend", self.LYRICS) == 1.0
+
+    def test_misheard_word_is_ambiguous(self):
+        score = lyric_match_score("ive come to talk to you again", self.LYRICS)
+        assert 0.5 < score < 1.0
+
+    def test_unrelated_phrase_scores_low(self):
+        assert lyric_match_score("we will we will rock you", self.LYRICS) < 0.5
+
+    def test_empty_inputs(self):
+        assert lyric_match_score("", self.LYRICS) == 0.0
+        assert lyric_match_score("hello darkness", "") == 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,91 @@
+"""Tests for the process-wide counters and histograms and their Prometheus rendering."""
+
+import threading
+
+import pytest
+
+from ..metrics import MetricsRegistry
+
+
+class TestCounter:
+
+    def test_counts_per_label_combination(self):
+        registry = MetricsRegistry()
+        requests = registry.counter('requests_total', 'Requests', ('endpoint', 'outcome'))
+
+        requests.inc(endpoint='search', outcome='ok')
+        requests.inc(2, endpoint='search', outcome='ok')
+        requests.inc(endpoint='search', outcome='error')
+
+        assert requests.value(endpoint='search', outcome='ok') == 3
+        assert requests.value(endpoint='search', outcome='error') == 1
+        assert requests.value(endpoint='other', outcome='ok') == 0
+
+    def test_concurrent_increments_are_not_lost(self):
+        registry = MetricsRegistry()
+        hits = registry.counter('hits_total', 'Hits')
+
+        def work():
+            for _ in range(1000):
+                hits.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert hits.value() == 8000
+
+
+class TestHistogram:
+
+    def test_observations_land_in_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, stage='rerank')
+
+        assert latency.count(stage='rerank') == 4
+        samples = latency.samples()
+        assert 'latency_seconds_bucket{stage="rerank",le="0.1"} 2' in samples
+        assert 'latency_seconds_bucket{stage="rerank",le="1"} 3' in samples
+        assert 'latency_seconds_bucket{stage="rerank",le="+Inf"} 4' in samples
+        assert 'latency_seconds_sum{stage="rerank"} 3.65' in samples
+        assert 'latency_seconds_count{stage="rerank"} 4' in samples
+
+
+class TestMetricsRegistry:
+
+    def test_same_name_returns_same_metric(self):
+        registry = MetricsRegistry()
+        assert registry.counter('a_total', 'A') is registry.counter('a_total', 'A')
+
+    def test_name_reused_for_other_kind_raises(self):
+        registry = MetricsRegistry()
+        registry.counter('a_total', 'A')
+        with pytest.raises(ValueError):
+            registry.histogram('a_total', 'A')
+
+    def test_render_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        registry.counter('errors_total', 'Provider errors', ('provider',)).inc(provider='gen"ius')
+        registry.histogram('stage_seconds', 'Stages', buckets=(1.0,)).observe(0.5)
+
+        text = registry.render()
+
+        assert text.endswith('\n')
+        assert '# HELP errors_total Provider errors\n# TYPE errors_total counter\n' in text
+        assert 'errors_total{provider="gen\\"ius"} 1\n' in text
+        assert '# TYPE stage_seconds histogram\n' in text
+        assert 'stage_seconds_bucket{le="1"} 1\n' in text
+        # Metrics are sorted by name
+        assert text.index('errors_total') < text.index('stage_seconds')
+
+    def test_clear_resets_values(self):
+        registry = MetricsRegistry()
+        hits = registry.counter('hits_total', 'Hits')
+        hits.inc(5)
+        registry.clear()
+        assert hits.value() == 0
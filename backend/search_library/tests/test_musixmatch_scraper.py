@@ -0,0 +1,169 @@
+"""Tests for MusixMatch URL probing and the learned URL pattern table.
+
+`musixmatch_scraper` is a top-level backend module (the backend directory is on the
+path when the tests run); its HTTP session is replaced by an in-memory stub.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from musixmatch_scraper import MusixMatchScraper, UrlPatternTable
+
+
+def track_page(name: str) -> bytes:
+    next_data = {'props': {'pageProps': {'data': {
+        'trackInfo': {'data': {
+            'track': {'name': name, 'artistName': "Artist", 'releaseDate': "2016-02-19T00:00:00Z", 'spotifyId': "x"},
+            'lyrics': {'body': f"lyrics of {name}"},
+        }},
+        'albumGet': {'data': {'name': "Album", 'trackCount': 10, 'releaseDate': 1455840000000}},
+        'creditsTrackCollaboratorsGet': {'data': []},
+    }}}}
+    return f'<html><body><script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script></body></html>'.encode()
+
+
+class StubResponse:
+
+    def __init__(self, status_code: int, body: bytes = b""):
+        self.status_code = status_code
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class StubSession:
+    """Serves `pages` (URL -> (delay seconds, track name or None for a 404)) and records the requests."""
+
+    def __init__(self, pages: dict[str, tuple[float, str | None]]):
+        self.pages = pages
+        self.requests: list[tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def _respond(self, method: str, url: str) -> StubResponse:
+        with self._lock:
+            self.requests.append((method, url))
+        delay, name = self.pages.get(url, (0.0, None))
+        time.sleep(delay)
+        if name is None:
+            return StubResponse(404)
+        return StubResponse(200, track_page(name) if method == 'GET' else b"")
+
+    def head(self, url, timeout=None, allow_redirects=True):
+        return self._respond('HEAD', url)
+
+    def get(self, url, timeout=None, stream=False):
+        return self._respond('GET', url)
+
+
+def scraper_with(pages: dict, probe_window: int = 4, url_patterns_path: str | None = None) -> MusixMatchScraper:
+    scraper = MusixMatchScraper(url_patterns_path=url_patterns_path, probe_window=probe_window)
+    scraper.session = StubSession(pages)
+    return scraper
+
+
+class TestProbeUrls:
+    """Test cases for MusixMatchScraper._probe_urls()."""
+
+    def test_earliest_candidate_wins_over_faster_later_ones(self):
+        candidates = [('a', "https://mxm/a"), ('b', "https://mxm/b"), ('c', "https://mxm/c")]
+        scraper = scraper_with({
+            "https://mxm/a": (0.05, None),
+            "https://mxm/b": (0.15, "B"),
+            "https://mxm/c": (0.0, "C"),
+        })
+
+        pattern, url, result = scraper._probe_urls(candidates)
+
+        assert (pattern, url) == ('b', "https://mxm/b")
+        assert result['track']['title'] == "B"
+
+    def test_slow_first_candidate_still_wins(self):
+        candidates = [('a', "https://mxm/a"), ('b', "https://mxm/b")]
+        scraper = scraper_with({"https://mxm/a": (0.1, "A"), "https://mxm/b": (0.0, "B")})
+
+        assert scraper._probe_urls(candidates)[0] == 'a'
+
+    def test_missing_pages_are_not_fetched(self):
+        candidates = [('a', "https://mxm/a"), ('b', "https://mxm/b")]
+        scraper = scraper_with({"https://mxm/b": (0.0, "B")})
+
+        assert scraper._probe_urls(candidates)[0] == 'b'
+        assert ('GET', "https://mxm/a") not in scraper.session.requests
+
+    def test_candidates_beyond_the_window_wait_for_a_free_slot(self):
+        candidates = [(str(i), f"https://mxm/{i}") for i in range(5)]
+        scraper = scraper_with({"https://mxm/0": (0.0, "first")}, probe_window=2)
+
+        assert scraper._probe_urls(candidates)[0] == '0'
+        # Decided by candidate 0, so the ones past the first window are never started
+        assert {url for _, url in scraper.session.requests} <= {"https://mxm/0", "https://mxm/1"}
+
+    def test_all_failing_returns_none(self):
+        scraper = scraper_with({})
+
+        assert scraper._probe_urls([('a', "https://mxm/a"), ('b', "https://mxm/b")]) is None
+        assert scraper._probe_urls([]) is None
+
+
+class TestUrlPatternTable:
+    """Test cases for UrlPatternTable and the patterns get_track_lyrics learns."""
+
+    def test_record_persists_and_reloads(self, tmp_path):
+        path = str(tmp_path / "patterns" / "url_patterns.json")
+        table = UrlPatternTable(path)
+        table.record("artist", 'artist-2')
+
+        reloaded = UrlPatternTable(path)
+        assert reloaded.get("artist") == 'artist-2' and len(reloaded) == 1
+        assert not [name for name in (tmp_path / "patterns").iterdir() if name.suffix == '.tmp']
+
+    def test_unreadable_file_starts_empty(self, tmp_path):
+        path = tmp_path / "url_patterns.json"
+        path.write_text("{not json")
+
+        assert len(UrlPatternTable(str(path))) == 0
+
+    def test_in_memory_table(self):
+        table = UrlPatternTable()
+        table.record("artist", 'lower')
+
+        assert table.get("artist") == 'lower' and table.get("other") is None
+
+    def test_learned_pattern_is_tried_first(self, tmp_path):
+        path = str(tmp_path / "url_patterns.json")
+        base = "https://www.musixmatch.com/lyrics"
+        scraper = scraper_with({f"{base}/Artist-2/Song": (0.0, "Song")}, url_patterns_path=path)
+
+        assert scraper.get_track_lyrics("Artist", "Song")['track']['title'] == "Song"
+        assert UrlPatternTable(path).get("artist") == 'artist-2'
+
+        scraper = scraper_with({f"{base}/Artist-2/Other-Song": (0.0, "Other Song")}, url_patterns_path=path)
+        assert scraper.get_track_lyrics("Artist", "Other Song")['track']['title'] == "Other Song"
+        assert scraper.session.requests == [('GET', f"{base}/Artist-2/Other-Song")]
+
+    def test_track_specific_patterns_are_not_learned(self):
+        base = "https://www.musixmatch.com/lyrics"
+        scraper = scraper_with({f"{base}/Artist/Song": (0.0, "Song")})
+
+        assert scraper.get_track_lyrics("Artist", "The Song") is not None
+        assert len(scraper.url_patterns) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
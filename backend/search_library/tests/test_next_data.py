@@ -0,0 +1,111 @@
+"""Tests for streamed `__NEXT_DATA__` extraction and path-selective JSON decoding.
+
+`next_data` is a top-level backend module (the backend directory is on the path when the
+tests run).
+"""
+
+import json
+
+import pytest
+
+from next_data import decode_paths, find_next_data
+
+NEXT_DATA = {
+    'props': {'pageProps': {
+        'messages': {f"label{i}": f"text {i}" for i in range(50)},
+        'data': {'track': {'name': "Song", 'artistName': "Artist"}, 'lyrics': "la la </ la", 'count': 3},
+    }},
+    'page': "/lyrics",
+}
+PAGE = (
+    '<html><head><script src="/app.js"></script></head><body><div id="__next">markup</div>'
+    f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(NEXT_DATA)}</script>'
+    '<script src="/chunk.js"></script></body></html>'
+).encode()
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestFindNextData:
+    """Test cases for find_next_data()."""
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(PAGE)])
+    def test_any_chunking_gives_the_script(self, size):
+        assert json.loads(find_next_data(chunked(PAGE, size))) == NEXT_DATA
+
+    @pytest.mark.parametrize("marker", [b'id="__NEXT_DATA__"', b'type="application/json">', b'</script'])
+    def test_markers_split_across_chunks(self, marker):
+        start = PAGE.index(marker) + len(marker) // 2
+        for split in range(start - 2, start + 3):
+            assert json.loads(find_next_data([PAGE[:split], PAGE[split:]])) == NEXT_DATA
+
+    def test_stops_reading_after_the_closing_tag(self):
+        chunks = chunked(PAGE, 16)
+        consumed = []
+
+        def read():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        find_next_data(read())
+        assert len(consumed) < len(chunks)
+
+    def test_page_without_the_tag(self):
+        page = b'<html><body><script id="other">{"a": 1}</script></body></html>'
+
+        assert find_next_data(chunked(page, 1)) is None
+        assert find_next_data([]) is None
+
+    def test_unterminated_script(self):
+        assert find_next_data([b'<script id="__NEXT_DATA__">{"a": 1}']) is None
+
+
+class TestDecodePaths:
+    """Test cases for decode_paths()."""
+
+    def test_decodes_requested_paths_only(self):
+        document = json.dumps(NEXT_DATA).encode()
+
+        assert decode_paths(document, {
+            'track': ('props', 'pageProps', 'data', 'track'),
+            'count': ('props', 'pageProps', 'data', 'count'),
+            'page': ('page',),
+        }) == {'track': {'name': "Song", 'artistName': "Artist"}, 'count': 3, 'page': "/lyrics"}
+
+    def test_missing_paths_are_left_out(self):
+        assert decode_paths(json.dumps(NEXT_DATA), {
+            'missing': ('props', 'nope'),
+            'lyrics': ('props', 'pageProps', 'data', 'lyrics'),
+        }) == {'lyrics': "la la </ la"}
+
+    def test_path_through_a_non_object_is_left_out(self):
+        assert decode_paths('{"a": [{"b": 1}], "c": "text"}', {'b': ('a', 'b'), 'd': ('c', 'd')}) == {}
+
+    def test_escapes_and_whitespace(self):
+        document = ' { "a" : { "k\\"ey" : "v\\u00e9" } , "b" : [1, 2] } '
+
+        assert decode_paths(document, {'v': ('a', 'k"ey'), 'b': ('b',)}) == {'v': "vé", 'b': [1, 2]}
+
+    def test_overlapping_paths_rejected(self):
+        with pytest.raises(ValueError):
+            decode_paths('{}', {'outer': ('a',), 'inner': ('a', 'b')})
+
+    @pytest.mark.parametrize("document", [
+        '[1, 2]',
+        '{"a": 1,}',
+        '{"a" 1}',
+        '{"a": 1 "b": 2}',
+        '{a: 1}',
+        '{"a": {"b": tru}}',
+        '',
+    ])
+    def test_invalid_json_raises(self, document):
+        with pytest.raises(json.JSONDecodeError):
+            decode_paths(document, {'b': ('a', 'b'), 'z': ('z',)})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,181 @@
+"""Tests for the progress event bus."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from .. import progress
+from ..progress import ProgressBus, HEARTBEAT_EVENT_TYPE
+
+
+def collect(bus: ProgressBus, producer) -> tuple[list[dict], float]:
+    """Run producer(bus) in a thread and return (emitted events, elapsed seconds)."""
+    async def consume():
+        asyncio.create_task(asyncio.to_thread(bus.run_producer, producer))
+        return [event async for event in bus.events()]
+
+    start = time.perf_counter()
+    events = asyncio.run(consume())
+    return events, time.perf_counter() - start
+
+
+def collect_published(bus: ProgressBus, producer) -> list[dict]:
+    """Publish everything up front, then drain the bus (deterministic coalescing)."""
+    bus.run_producer(producer)
+
+    async def consume():
+        return [event async for event in bus.events()]
+
+    return asyncio.run(consume())
+
+
+def enrichment_producer(num_songs: int, seconds_per_song: float = 0.0):
+    def produce(bus: ProgressBus):
+        bus.publish({'type': 'start'})
+        for i in range(1, num_songs + 1):
+            if seconds_per_song:
+                time.sleep(seconds_per_song)
+            bus.publish({'type': 'progress', 'processed': i, 'total': num_songs})
+        bus.publish({'type': 'completion', 'prev_stage': 'enrichment'})
+        bus.publish({'type': 'results', 'results': []})
+    return produce
+
+
+class TestProgressBus:
+    """Test cases for ProgressBus."""
+
+    def test_time_does_not_scale_with_song_count(self):
+        # The old stream slept 0.1s per song: 100s for 1,000 songs
+        events, elapsed = collect(ProgressBus(progress_interval=0.05), enrichment_producer(1000))
+
+        assert elapsed < 0.1 * 1000 / 50
+        progress = [event for event in events if event['type'] == 'progress']
+        assert len(progress) < 1000
+        assert progress[-1]['processed'] == 1000
+
+    def test_progress_rate_limited_while_songs_complete(self):
+        bus = ProgressBus(progress_interval=0.1)
+        events, elapsed = collect(bus, enrichment_producer(100, seconds_per_song=0.005))
+
+        progress = [event for event in events if event['type'] == 'progress']
+        assert len(progress) <= elapsed / 0.1 + 2
+        assert bus.stats.coalesced == 100 - len(progress)
+
+    def test_order_preserved_around_progress(self):
+        events = collect_published(ProgressBus(progress_interval=10), enrichment_producer(50))
+
+        assert [event['type'] for event in events] == ['start', 'progress', 'completion', 'results']
+        assert events[1]['processed'] == 50
+
+    def test_coalesced_progress_keeps_message(self):
+        def produce(bus: ProgressBus):
+            bus.publish({'type': 'progress', 'processed': 1, 'total': 3, 'message': 'Listening...'})
+            bus.publish({'type': 'progress', 'processed': 2, 'total': 3})
+            bus.publish({'type': 'progress', 'processed': 3, 'total': 3})
+
+        events = collect_published(ProgressBus(progress_interval=10), produce)
+
+        assert events == [{'type': 'progress', 'processed': 3, 'total': 3, 'message': 'Listening...'}]
+
+    def test_heartbeats_during_long_stage(self):
+        def produce(bus: ProgressBus):
+            bus.publish({'type': 'status', 'message': 'Searching...'})
+            time.sleep(0.35)
+            bus.publish({'type': 'results', 'results': []})
+
+        events, _ = collect(ProgressBus(heartbeat_interval=0.1), produce)
+
+        heartbeats = [event for event in events if event['type'] == HEARTBEAT_EVENT_TYPE]
+        assert 2 <= len(heartbeats) <= 4
+        assert events[0]['type'] == 'status'
+        assert events[-1]['type'] == 'results'
+
+    def test_cancel_stops_stream_and_publishing(self):
+        bus = ProgressBus()
+        stopped = threading.Event()
+
+        def produce(bus: ProgressBus):
+            while not bus.cancelled:
+                bus.publish({'type': 'status', 'message': 'working'})
+                time.sleep(0.01)
+            stopped.set()
+
+        async def consume():
+            asyncio.create_task(asyncio.to_thread(bus.run_producer, produce))
+            async for event in bus.events():
+                bus.cancel()
+            return event
+
+        assert asyncio.run(consume())['type'] == 'status'
+        assert stopped.wait(1)
+
+
+class TestStream:
+    """Test cases for ProgressBus.stream()."""
+
+    def test_producer_failure_is_logged(self, monkeypatch):
+        errors = []
+        monkeypatch.setattr(progress.log, 'error', lambda message, *args, **kwargs: errors.append(kwargs.get('exc_info')))
+
+        def produce(bus: ProgressBus):
+            bus.publish({'type': 'status', 'message': 'working'})
+            raise RuntimeError("pipeline failed")
+
+        async def consume():
+            events = [event async for event in bus.stream(produce)]
+            await asyncio.sleep(0.05)  # let the task's done callback run
+            return events
+
+        bus = ProgressBus()
+        assert [event['type'] for event in asyncio.run(consume())] == ['status']
+        assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+        assert not progress._producer_tasks
+
+    def test_closed_stream_leaves_producer_running(self):
+        """An instant match closes the stream; enrichment continues after the client has its result."""
+        enriched = []
+
+        def produce(bus: ProgressBus):
+            bus.publish({'type': 'results', 'results': ['instant match']})
+            bus.close()
+            for i in range(5):
+                if bus.cancelled:
+                    break
+                time.sleep(0.01)
+                enriched.append(i)
+
+        async def consume():
+            return [event async for event in bus.stream(produce)]
+
+        bus = ProgressBus()
+        # asyncio.run() waits for the worker thread when it shuts down the default executor
+        events = asyncio.run(consume())
+        assert [event['type'] for event in events] == ['results']
+        assert enriched == [0, 1, 2, 3, 4]
+        assert not bus.cancelled
+
+    def test_disconnect_cancels_producer(self):
+        stopped = threading.Event()
+
+        def produce(bus: ProgressBus):
+            while not bus.cancelled:
+                bus.publish({'type': 'status', 'message': 'working'})
+                time.sleep(0.01)
+            stopped.set()
+
+        async def consume():
+            events = bus.stream(produce)
+            async for event in events:
+                break
+            await events.aclose()
+
+        bus = ProgressBus()
+        asyncio.run(consume())
+        assert bus.cancelled
+        assert stopped.wait(1)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
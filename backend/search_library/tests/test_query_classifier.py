@@ -0,0 +1,104 @@
+"""Tests for the local lyric-query classifier."""
+
+import pytest
+
+from .. import query_classifier
+from ..query_classifier import (
+    LYRIC, NOT_LYRIC, UNCERTAIN, FEATURE_NAMES, WEIGHTS, classify_lyric_query, query_features,
+)
+
+
+class TestClassifyLyricQuery:
+    """Test cases for classify_lyric_query()."""
+
+    def test_quoted_span_is_lyric(self):
+        result = classify_lyric_query("that song that goes 'hello darkness my old friend' from the 60s")
+
+        assert result.label == LYRIC
+        assert result.reason == "quoted"
+        assert result.extracted_lyrics == "hello darkness my old friend"
+
+    def test_short_quoted_title_is_not_quoted_lyrics(self):
+        assert classify_lyric_query("songs like 'Yellow'").reason != "quoted"
+
+    def test_song_that_goes_cue(self):
+        result = classify_lyric_query("the song that goes na na na na hey hey goodbye")
+
+        assert result.label == LYRIC
+        assert result.reason == "cue"
+        assert result.extracted_lyrics == "na na na na hey hey goodbye"
+
+    def test_lyrics_prefix_cue(self):
+        result = classify_lyric_query("lyrics: i came in like a wrecking ball")
+
+        assert result.label == LYRIC
+        assert result.extracted_lyrics == "i came in like a wrecking ball"
+
+    def test_lyrics_about_a_theme_is_not_a_cue(self):
+        assert classify_lyric_query("songs with lyrics about heartbreak").label != LYRIC
+
+    @pytest.mark.parametrize("query", [
+        "never gonna give you up never gonna let you down",
+        "i'm gonna take my horse to the old town road",
+    ])
+    def test_bare_lyrics_decided_by_model(self, query):
+        result = classify_lyric_query(query)
+
+        assert result.label == LYRIC
+        assert result.reason == "model"
+        assert result.extracted_lyrics == query
+
+    @pytest.mark.parametrize("query", ["sad songs about breakups", "rock music from the 80s", "energetic workout songs"])
+    def test_descriptive_queries_are_not_lyric(self, query):
+        result = classify_lyric_query(query)
+
+        assert result.label == NOT_LYRIC
+        assert result.extracted_lyrics == ""
+
+    def test_ambiguous_query_is_uncertain(self):
+        assert classify_lyric_query("you know that song about the moon").label == UNCERTAIN
+
+    def test_bare_lyrics_with_genre_word_are_not_rejected(self):
+        # "country" is descriptive vocabulary, but this is the chorus of a song
+        assert classify_lyric_query("country roads take me home").label != NOT_LYRIC
+
+    def test_described_lyrics_are_not_extracted(self):
+        result = classify_lyric_query("there's this song where she says something about a red dress")
+
+        assert result.label != LYRIC
+        assert result.extracted_lyrics == ""
+
+    @pytest.mark.parametrize("query", [
+        "lyrics that mention rain",
+        "lyrics mentioning a red car",
+        "lyrics in spanish about summer",
+        "lyrics referencing the ocean and stars",
+        "lyrics with the word paradise in them",
+    ])
+    def test_lyrics_followed_by_a_description_is_not_a_cue(self, query):
+        result = classify_lyric_query(query)
+
+        assert result.label != LYRIC
+        assert result.extracted_lyrics == ""
+
+    def test_lyrics_that_go_cue(self):
+        result = classify_lyric_query("lyrics that go hello from the other side")
+
+        assert result.reason == "cue"
+        assert result.extracted_lyrics == "hello from the other side"
+
+    def test_model_lyric_answer_mentioning_the_song_is_uncertain(self, monkeypatch):
+        monkeypatch.setattr(query_classifier, 'lyric_probability', lambda query: 0.99)
+
+        assert classify_lyric_query("the singer mentions a red dress and dancing").label == UNCERTAIN
+        assert classify_lyric_query("and i'm feeling good").label == LYRIC
+
+    def test_empty_query(self):
+        assert classify_lyric_query("  ?! ").label == NOT_LYRIC
+
+    def test_features_match_weights(self):
+        assert len(query_features("any query")) == len(FEATURE_NAMES) == len(WEIGHTS)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
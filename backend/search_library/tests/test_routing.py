@@ -0,0 +1,223 @@
+"""Tests for hedged, failover-aware LLM routing."""
+
+import time
+
+import pytest
+
+from ..clients import LLMClient, TextPrompt, TextResult, get_client, set_fallback_routes, clear_client_registry
+from ..llm_cache import CachingLLMClient, MemoryCacheBackend
+from ..routing import (
+    CircuitBreaker, LatencyHistogram, Route, RoutingLLMClient, endpoint_health, reset_routing_stats,
+)
+
+
+class FakeLLMClient(LLMClient):
+    """Answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception | None = None):
+        self.model_name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def generate(self, messages, max_tokens, system_prompt=None, temperature=0.0, tools=None, tool_choice=None, thinking_tokens=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [TextResult(text=f"from {self.model_name}")], {'input_tokens': 1, 'output_tokens': 1}
+
+
+def routing_client(*clients: FakeLLMClient, **kwargs) -> RoutingLLMClient:
+    return RoutingLLMClient([Route(client.model_name, client) for client in clients], **kwargs)
+
+
+def ask(client: LLMClient):
+    blocks, metadata = client.generate([[TextPrompt(text="hi")]], max_tokens=10)
+    return blocks[0].text, metadata
+
+
+@pytest.fixture(autouse=True)
+def fresh_health():
+    reset_routing_stats()
+    yield
+    reset_routing_stats()
+
+
+class TestRoutingLLMClient:
+    """Test cases for RoutingLLMClient."""
+
+    def test_fast_primary_is_not_hedged(self):
+        primary, secondary = FakeLLMClient("primary"), FakeLLMClient("secondary")
+
+        text, metadata = ask(routing_client(primary, secondary, default_hedge_delay=1.0))
+
+        assert text == "from primary"
+        assert metadata['route'] == "primary" and metadata['hedged'] is False
+        assert secondary.calls == 0
+
+    def test_slow_primary_is_hedged(self):
+        primary, secondary = FakeLLMClient("primary", delay=1.0), FakeLLMClient("secondary")
+
+        start = time.monotonic()
+        text, metadata = ask(routing_client(primary, secondary, default_hedge_delay=0.05))
+
+        assert text == "from secondary"
+        assert metadata['hedged'] is True
+        assert time.monotonic() - start < 0.5
+        assert endpoint_health("secondary").hedges == 1
+
+    def test_error_fails_over_immediately(self):
+        primary = FakeLLMClient("primary", error=RuntimeError("503"))
+        secondary = FakeLLMClient("secondary")
+
+        text, metadata = ask(routing_client(primary, secondary, default_hedge_delay=10.0))
+
+        assert text == "from secondary"
+        assert metadata['failovers'] == 1 and metadata['hedged'] is False
+
+    def test_all_routes_failing_raises(self):
+        client = routing_client(
+            FakeLLMClient("primary", error=RuntimeError("first")),
+            FakeLLMClient("secondary", error=RuntimeError("second")),
+        )
+
+        with pytest.raises(RuntimeError, match="second"):
+            ask(client)
+
+    def test_open_circuit_skips_route(self):
+        primary = FakeLLMClient("primary", error=RuntimeError("down"))
+        secondary = FakeLLMClient("secondary")
+        client = routing_client(primary, secondary)
+
+        for _ in range(3):
+            ask(client)
+        ask(client)
+
+        assert primary.calls == 3
+        assert endpoint_health("primary").breaker.state == 'open'
+
+    def test_primary_success_leaves_half_open_fallback_trial_free(self):
+        client = routing_client(FakeLLMClient("primary"), FakeLLMClient("secondary"), default_hedge_delay=10.0)
+        fallback = endpoint_health("secondary").breaker
+        fallback.reset_timeout = 0.01
+        for _ in range(fallback.failure_threshold):
+            fallback.record_failure()
+        time.sleep(0.02)
+        assert fallback.state == 'half_open'
+
+        for _ in range(2):
+            assert ask(client)[0] == "from primary"
+
+        # The fallback was never sent a request, so its trial slot is still free
+        assert fallback.allow()
+
+    def test_half_open_fallback_trial_claimed_on_failover(self):
+        primary = FakeLLMClient("primary", error=RuntimeError("503"))
+        secondary = FakeLLMClient("secondary")
+        client = routing_client(primary, secondary, default_hedge_delay=10.0)
+        fallback = endpoint_health("secondary").breaker
+        fallback.reset_timeout = 0.01
+        for _ in range(fallback.failure_threshold):
+            fallback.record_failure()
+        time.sleep(0.02)
+
+        assert ask(client)[0] == "from secondary"
+        assert fallback.state == 'closed'
+
+    def test_fallback_answers_are_not_cached_as_the_primary(self):
+        primary = FakeLLMClient("primary", error=RuntimeError("503"))
+        secondary = FakeLLMClient("secondary")
+        backend = MemoryCacheBackend()
+        client = CachingLLMClient(routing_client(primary, secondary), backend)
+
+        text, metadata = ask(client)
+        assert text == "from secondary" and metadata['fallback'] is True
+        assert backend.stats.entries == 0
+
+        primary.error = None
+        assert ask(client)[0] == "from primary"
+        assert ask(client)[1]['cached'] is True
+
+    def test_hedge_delay_follows_primary_latency(self):
+        client = routing_client(FakeLLMClient("primary"), FakeLLMClient("secondary"), min_hedge_samples=10, min_hedge_delay=0.0)
+        for _ in range(20):
+            endpoint_health("primary").latency.record(2.0)
+
+        assert 2.0 <= client.hedge_delay(client.routes[0]) < 2.5
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker."""
+
+    def test_half_open_allows_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        time.sleep(0.02)
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == 'closed'
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow()
+
+        breaker.record_failure()
+
+        assert breaker.state == 'open'
+
+
+class TestLatencyHistogram:
+    """Test cases for LatencyHistogram."""
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.record(0.1)
+        for _ in range(10):
+            histogram.record(5.0)
+
+        assert 0.1 <= histogram.percentile(0.5) < 0.13
+        assert 5.0 <= histogram.percentile(0.99) < 6.0
+        assert histogram.to_dict()['count'] == 100
+
+    def test_empty(self):
+        assert LatencyHistogram().percentile(0.95) is None
+
+
+class TestGetClientRouting:
+    """Test cases for routing through get_client."""
+
+    def test_configured_fallbacks_wrap_client(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test-openai-key")
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        clear_client_registry()
+        set_fallback_routes({
+            'gpt-4o-mini': [
+                ('openai-direct', {'model_name': 'gpt-4.1-mini'}),
+                ('anthropic-direct', {'model_name': 'claude-3-5-haiku-20241022'}),
+            ],
+        })
+        try:
+            client = get_client("openai-direct", cache=False, model_name="gpt-4o-mini")
+            unrouted = get_client("openai-direct", cache=False, model_name="gpt-4o")
+        finally:
+            set_fallback_routes({})
+            clear_client_registry()
+
+        assert isinstance(client, RoutingLLMClient)
+        # The Anthropic fallback is skipped without an API key
+        assert [route.name for route in client.routes] == ["openai-direct:gpt-4o-mini", "openai-direct:gpt-4.1-mini"]
+        # Routed clients fail over instead of sleeping between retries
+        assert [route.client.max_retries for route in client.routes] == [1, 1]
+        assert not isinstance(unrouted, RoutingLLMClient)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -4,8 +4,8 @@ import pytest
 from unittest.mock import Mock, patch
 from typing import List, Tuple, Any
 
-from ..search import search_library, recursive_search
-from ..types import Song
+from ..search import search_library, recursive_search, reciprocal_rank_fusion, fuse_hybrid_results, match_song_ids, fetch_lazy_songs
+from ..types import Song, hydrate_songs
 from ..clients import LLMClient, TextPrompt, TextResult
 
 
@@ -266,5 +266,115 @@ class TestEdgeCases:
         assert mock_get_query.call_count == 2  # 2 chunks, no additional filtering
 
 
+def create_hybrid_song(song_id: str) -> Song:
+    return Song(id=song_id, song_link="", album="", name=f"Song {song_id}", artists=["Artist"], lyrics="", song_metadata="")
+
+
+class TestHybridFusion:
+    """Test cases for reciprocal rank fusion of vector and lexical results."""
+
+    def test_rrf_rewards_agreement(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+        assert fused[0][0] == "b"
+        assert {song_id for song_id, _ in fused} == {"a", "b", "c", "d"}
+
+    def test_fuse_hybrid_results_skip_reranker_on_agreement(self):
+        songs = [create_hybrid_song(str(i)) for i in range(1, 6)]
+        lexical = [(song, 1.0) for song in songs]
+        fused, similarities, stats = fuse_hybrid_results(songs, [0.9, 0.8, 0.7, 0.6, 0.5], lexical, n=3)
+        assert [song.id for song in fused] == ["1", "2", "3"]
+        assert similarities == [0.9, 0.8, 0.7]
+        assert stats['skip_reranker']
+
+    def test_fuse_hybrid_results_lexical_only_hit(self):
+        songs = [create_hybrid_song(str(i)) for i in range(1, 4)]
+        extra = create_hybrid_song("99")
+        fused, similarities, stats = fuse_hybrid_results(songs, [0.9, 0.8, 0.7], [(extra, 5.0)], n=4)
+        assert "99" in [song.id for song in fused]
+        assert similarities[[song.id for song in fused].index("99")] is None
+        assert stats['lexical_only_hits'] == 1
+        assert not stats['skip_reranker']
+
+
+class FakeQuery:
+    """Records the columns and ids of a Supabase select and returns matching rows."""
+
+    def __init__(self, supabase, rows):
+        self.supabase = supabase
+        self.rows = rows
+        self.ids = None
+
+    def select(self, columns):
+        self.supabase.selects.append(columns)
+        return self
+
+    def in_(self, column, ids):
+        self.ids = list(ids)
+        return self
+
+    def execute(self):
+        return Mock(data=[row for row in self.rows if self.ids is None or row['id'] in self.ids])
+
+
+class FakeSupabase:
+    """Minimal Supabase client with one songs table and optional RPC failures."""
+
+    def __init__(self, rows, matches, failing_rpcs=()):
+        self.rows = rows
+        self.matches = matches
+        self.failing_rpcs = set(failing_rpcs)
+        self.selects = []
+        self.rpcs = []
+
+    def rpc(self, name, params):
+        self.rpcs.append(name)
+        if name in self.failing_rpcs:
+            raise Exception(f"function {name} does not exist")
+        return Mock(execute=lambda: Mock(data=self.matches))
+
+    def table(self, name):
+        return FakeQuery(self, self.rows)
+
+
+def create_db_row(song_id: str) -> dict:
+    return {
+        'id': song_id,
+        'name': f"Song {song_id}",
+        'artists': "Artist A, Artist B",
+        'album': "Album",
+        'song_link': f"https://example.com/{song_id}",
+        'lyrics': f"lyrics {song_id}",
+        'song_metadata': f"metadata {song_id}",
+    }
+
+
+class TestTwoPhaseRetrieval:
+    """Test cases for id-only matching and lazy hydration of vector search results."""
+
+    def test_match_song_ids_falls_back_to_full_rpc(self):
+        supabase = FakeSupabase([], [{'id': "1", 'similarity': 0.9}], failing_rpcs={'match_song_ids'})
+        assert match_song_ids(supabase, [0.1, 0.2], "user", 0.5, 10) == [("1", 0.9)]
+        assert supabase.rpcs == ['match_song_ids', 'match_songs_v2']
+
+    def test_fetch_lazy_songs_keeps_match_order(self):
+        supabase = FakeSupabase([create_db_row(i) for i in ("1", "2", "3")], [])
+        songs = fetch_lazy_songs(supabase, ["3", "missing", "1"])
+
+        assert [song.id for song in songs] == ["3", "1"]
+        assert songs[0].artists == ["Artist A", "Artist B"]
+        assert supabase.selects == ['id, name, artists, album, song_link']
+
+    def test_prompt_fields_loaded_once_without_embeddings(self):
+        supabase = FakeSupabase([create_db_row(i) for i in ("1", "2")], [])
+        songs = fetch_lazy_songs(supabase, ["1", "2"])
+
+        hydrate_songs(songs)
+
+        assert [song.lyrics for song in songs] == ["lyrics 1", "lyrics 2"]
+        assert songs[1].song_metadata == "metadata 2"
+        assert songs[0].embedding.size == 0
+        assert supabase.selects == ['id, name, artists, album, song_link', 'id, lyrics, song_metadata']
+
+
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Tests for nested stage spans, request traces and their metrics."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ..metrics import REQUESTS, STAGE_ERRORS, STAGE_SECONDS
+from ..tracing import current_request_id, current_trace, propagate, set_tracing_enabled, span, trace_request, traced
+
+
+@pytest.fixture(autouse=True)
+def tracing_enabled():
+    set_tracing_enabled(True)
+    yield
+    set_tracing_enabled(True)
+
+
+class TestSpans:
+
+    def test_spans_nest_under_the_request(self):
+        with trace_request('test_nesting', 'req-1') as trace:
+            with span('outer') as outer:
+                with span('inner', songs=3) as inner:
+                    pass
+
+        spans = {s.name: s for s in trace.spans}
+        assert set(spans) == {'test_nesting', 'outer', 'inner'}
+        assert spans['outer'].parent_id == spans['test_nesting'].span_id
+        assert inner.parent_id == outer.span_id
+        assert inner.attributes == {'songs': 3}
+        assert inner.request_id == 'req-1'
+
+    def test_summary_aggregates_repeated_stages(self):
+        with trace_request('test_summary') as trace:
+            for _ in range(3):
+                with span('rerank.chunk'):
+                    pass
+
+        summary = trace.summary()
+        assert summary['rerank.chunk']['count'] == 3
+        assert summary['rerank.chunk']['errors'] == 0
+        assert summary['test_summary']['count'] == 1
+
+    def test_span_without_request_still_feeds_metrics(self):
+        before = STAGE_SECONDS.count(stage='test_orphan')
+        with span('test_orphan') as orphan:
+            assert current_trace() is None
+
+        assert orphan.trace is None
+        assert STAGE_SECONDS.count(stage='test_orphan') == before + 1
+
+    def test_failed_span_records_error_and_reraises(self):
+        before = STAGE_ERRORS.value(stage='test_failing', error='ValueError')
+        with pytest.raises(ValueError):
+            with trace_request('test_errors') as trace:
+                with span('test_failing'):
+                    raise ValueError('boom')
+
+        failing = next(s for s in trace.spans if s.name == 'test_failing')
+        assert failing.error == 'ValueError'
+        assert STAGE_ERRORS.value(stage='test_failing', error='ValueError') == before + 1
+        assert REQUESTS.value(endpoint='test_errors', outcome='error') >= 1
+
+    def test_caught_request_error_counts_as_failed(self):
+        before = REQUESTS.value(endpoint='test_caught', outcome='error')
+        with trace_request('test_caught') as trace:
+            trace.error = 'RuntimeError'
+
+        assert REQUESTS.value(endpoint='test_caught', outcome='error') == before + 1
+        assert trace.to_dict()['error'] == 'RuntimeError'
+
+    def test_traced_decorator(self):
+        @traced('test_decorated')
+        def work(x):
+            return x * 2
+
+        with trace_request('test_decorator') as trace:
+            assert work(4) == 8
+
+        assert 'test_decorated' in trace.summary()
+
+    def test_disabled_tracing_records_nothing(self):
+        set_tracing_enabled(False)
+        before = STAGE_SECONDS.count(stage='test_disabled')
+        with trace_request('test_disabled_request') as trace:
+            with span('test_disabled'):
+                pass
+
+        assert trace.spans == []
+        assert STAGE_SECONDS.count(stage='test_disabled') == before
+
+
+class TestPropagate:
+
+    def test_worker_threads_attach_to_request_and_parent(self):
+        def work(i):
+            with span('worker', index=i):
+                return current_request_id()
+
+        with trace_request('test_threads', 'req-threads') as trace:
+            with span('fan_out') as fan_out:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    request_ids = list(executor.map(propagate(work), range(8)))
+
+        assert request_ids == ['req-threads'] * 8
+        workers = [s for s in trace.spans if s.name == 'worker']
+        assert len(workers) == 8
+        assert all(worker.parent_id == fan_out.span_id for worker in workers)
+
+    def test_without_propagate_workers_are_detached(self):
+        with trace_request('test_detached'):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                assert executor.submit(current_request_id).result() is None
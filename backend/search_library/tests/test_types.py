@@ -0,0 +1,87 @@
+"""Tests for lazily hydrated songs."""
+
+import copy
+import dataclasses
+
+import numpy as np
+import pytest
+
+from ..types import LazySong, Song, hydrate_songs
+
+
+class RecordingLoader:
+    """Loader that fills in heavy fields and records each batch it was called with."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, songs):
+        self.calls.append([song.id for song in songs])
+        for song in songs:
+            song.set_heavy_fields(f"lyrics {song.id}", f"metadata {song.id}", np.ones(3, dtype=np.float32))
+
+
+def create_lazy_song(song_id: str, loader) -> LazySong:
+    return LazySong(
+        id=song_id,
+        song_link=f"https://example.com/song{song_id}",
+        album="Test Album",
+        name=f"Test Song {song_id}",
+        artists=["Test Artist"],
+        loader=loader,
+    )
+
+
+class TestLazySong:
+    """Test cases for LazySong and hydrate_songs."""
+
+    def test_light_fields_do_not_load(self):
+        loader = RecordingLoader()
+        song = create_lazy_song("1", loader)
+        song.reasoning = "because"
+
+        assert song.name == "Test Song 1"
+        assert not song.is_hydrated
+        assert loader.calls == []
+
+    def test_heavy_field_access_loads_once(self):
+        loader = RecordingLoader()
+        song = create_lazy_song("1", loader)
+
+        assert song.lyrics == "lyrics 1"
+        assert song.song_metadata == "metadata 1"
+        assert song.embedding.dtype == np.float32
+        assert loader.calls == [["1"]]
+
+    def test_hydrate_songs_batches_per_loader(self):
+        loader = RecordingLoader()
+        songs = [create_lazy_song(str(i), loader) for i in range(5)]
+        songs[0].hydrate()
+
+        hydrate_songs(songs)
+
+        assert loader.calls == [["0"], ["1", "2", "3", "4"]]
+        assert all(song.is_hydrated for song in songs)
+
+    def test_missing_row_hydrates_empty(self):
+        song = create_lazy_song("1", loader=lambda songs: None)
+
+        assert song.lyrics == ""
+        assert song.embedding.size == 0
+
+    def test_copies_are_loaded(self):
+        loader = RecordingLoader()
+        song = create_lazy_song("1", loader)
+
+        copied = copy.deepcopy(song)
+        replaced = dataclasses.replace(song, lyrics="short")
+
+        assert type(copied) is Song
+        assert copied.lyrics == "lyrics 1"
+        assert replaced.lyrics == "short"
+        assert replaced.song_metadata == "metadata 1"
+        assert song.lyrics == "lyrics 1"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,208 @@
+"""Nested stage spans with request IDs.
+
+`trace_request` starts a trace for one request and `span` times a stage inside it:
+
+    with trace_request('spotify_search') as trace:
+        with span('vector_search'):
+            with span('vector_search.match', version='ada-002'):
+                ...
+    trace.summary()  # per-stage count / total / max milliseconds
+
+Spans nest through a context variable, so a span opened anywhere below a request
+(search_library included) attaches to it without passing anything around. Worker
+threads don't inherit context variables; submit work with `propagate(fn)` to keep the
+request and parent span. Every finished span also feeds the process-wide
+`search_stage_duration_seconds` histogram (and `search_stage_errors_total` when it
+raises), which `/metrics` exposes.
+
+A span costs a few microseconds (see benchmarks/bench_tracing.py), and stages are
+network calls of tens of milliseconds or more, so tracing stays far below 1% of a
+request. `set_tracing_enabled(False)` turns spans into no-ops.
+"""
+
+import contextvars
+import functools
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from .metrics import REQUESTS, STAGE_ERRORS, STAGE_SECONDS
+
+# Spans kept per trace; later spans still feed the metrics
+MAX_SPANS_PER_TRACE: int = 5000
+
+_enabled = True
+_span_ids = itertools.count(1)
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+_current_trace: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('current_trace', default=None)
+
+
+def set_tracing_enabled(enabled: bool) -> None:
+    """Turn span recording on or off process-wide."""
+    global _enabled
+    _enabled = enabled
+
+
+class Trace:
+    """The finished spans of one request."""
+
+    def __init__(self, endpoint: str, request_id: Optional[str] = None):
+        self.endpoint = endpoint
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.spans: list[Span] = []
+        self.dropped = 0
+        # Set by handlers that catch a request's exception, so the request still counts as failed
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, span: 'Span') -> None:
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> dict[str, dict]:
+        """Per-stage span count, total and max duration in milliseconds, in first-start order."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        stages: dict[str, dict] = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+            duration_ms = 1000 * span.duration
+            stage['count'] += 1
+            stage['total_ms'] += duration_ms
+            stage['max_ms'] = max(stage['max_ms'], duration_ms)
+            stage['errors'] += 1 if span.error else 0
+        for stage in stages.values():
+            stage['total_ms'] = round(stage['total_ms'], 1)
+            stage['max_ms'] = round(stage['max_ms'], 1)
+        return stages
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            'request_id': self.request_id,
+            'endpoint': self.endpoint,
+            'dropped_spans': self.dropped,
+            **({'error': self.error} if self.error else {}),
+            'spans': [span.to_dict() for span in spans],
+        }
+
+
+class Span:
+    """A timed stage; use as a context manager (see `span`)."""
+
+    __slots__ = ('name', 'attributes', 'span_id', 'parent_id', 'trace', 'start', 'duration', 'error', '_token')
+
+    def __init__(self, name: str, attributes: dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = 0
+        self.parent_id: Optional[int] = None
+        self.trace: Optional[Trace] = None
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def request_id(self) -> Optional[str]:
+        return self.trace.request_id if self.trace is not None else None
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes once they are known (e.g. result counts)."""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> 'Span':
+        if not _enabled:
+            return self
+        parent = _current_span.get()
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace = _current_trace.get()
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        self._token = None
+        STAGE_SECONDS.observe(self.duration, stage=self.name)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+            STAGE_ERRORS.inc(stage=self.name, error=self.error)
+        if self.trace is not None:
+            self.trace.add(self)
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'duration_ms': round(1000 * self.duration, 3),
+            **({'error': self.error} if self.error else {}),
+            **({'attributes': self.attributes} if self.attributes else {}),
+        }
+
+
+def span(name: str, **attributes: Any) -> Span:
+    """Time a stage: `with span('rerank', songs=20): ...`."""
+    return Span(name, attributes)
+
+
+class trace_request:
+    """Context manager that collects the spans of one request and counts it by outcome."""
+
+    def __init__(self, endpoint: str, request_id: Optional[str] = None):
+        self.trace = Trace(endpoint, request_id)
+        self._token = None
+        self._span = Span(endpoint, {})
+
+    def __enter__(self) -> Trace:
+        self._token = _current_trace.set(self.trace)
+        self._span.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._span.__exit__(exc_type, exc, tb)
+        _current_trace.reset(self._token)
+        failed = exc_type is not None or self.trace.error is not None
+        REQUESTS.inc(endpoint=self.trace.endpoint, outcome='error' if failed else 'ok')
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of `span`."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def propagate(fn: Callable) -> Callable:
+    """Wrap fn so that, run on another thread, it sees the caller's trace and current span."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
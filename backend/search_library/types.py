@@ -1,4 +1,10 @@
-from dataclasses import dataclass, field
+import copy
+from dataclasses import dataclass, field, fields
+from typing import Any
+
+import numpy as np
+
+from .embeddings import empty_embedding
 
 @dataclass
 class RawSong:
@@ -38,7 +44,7 @@ class Song(RawSong):
     lyrics: str
     song_metadata: str
     reasoning: str = field(default_factory=lambda: "")
-    embedding: list[float] = field(default_factory=lambda: [])
+    embedding: np.ndarray = field(default_factory=empty_embedding)
     
     def __str__(self):
         return f"""
@@ -71,4 +77,69 @@ Lyrics
 ------------
 {self.lyrics}
 ------------
-"""
\ No newline at end of file
+"""
+
+_UNLOADED = object()
+
+class LazySong(Song):
+    """
+    A Song whose heavy fields (lyrics, song_metadata, embedding) are loaded on first access.
+
+    The light fields come from the caller (e.g. the Spotify track); the heavy ones are filled
+    in by `loader`, a callable that takes a list of LazySongs and calls `set_heavy_fields` on
+    each. Use `hydrate_songs` to load many songs with one loader call instead of one per song.
+    """
+
+    def __init__(self, *args, loader=None, **kwargs):
+        self._loader = loader
+        self._lyrics = self._song_metadata = self._embedding = _UNLOADED
+        kwargs.setdefault('lyrics', _UNLOADED)
+        kwargs.setdefault('song_metadata', _UNLOADED)
+        kwargs.setdefault('embedding', _UNLOADED)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def is_hydrated(self) -> bool:
+        return self._lyrics is not _UNLOADED
+
+    def set_heavy_fields(self, lyrics: str, song_metadata: str, embedding: np.ndarray) -> None:
+        self._lyrics = lyrics
+        self._song_metadata = song_metadata
+        self._embedding = embedding
+
+    def hydrate(self) -> None:
+        if self.is_hydrated:
+            return
+        if self._loader is not None:
+            self._loader([self])
+        if not self.is_hydrated:
+            self.set_heavy_fields("", "", empty_embedding())
+
+    def _get_heavy(self, name: str):
+        self.hydrate()
+        return getattr(self, name)
+
+    def _set_heavy(self, name: str, value) -> None:
+        if value is not _UNLOADED:
+            # Setting any heavy field makes the song hydrated; load the others first so they aren't lost
+            if not self.is_hydrated and self._loader is not None:
+                self.hydrate()
+            setattr(self, name, value)
+
+    lyrics = property(lambda self: self._get_heavy('_lyrics'), lambda self, value: self._set_heavy('_lyrics', value))
+    song_metadata = property(lambda self: self._get_heavy('_song_metadata'), lambda self, value: self._set_heavy('_song_metadata', value))
+    embedding = property(lambda self: self._get_heavy('_embedding'), lambda self, value: self._set_heavy('_embedding', value))
+
+    def __deepcopy__(self, memo):
+        # Copies are plain, fully loaded Songs; the loader (and its DB client) is not copied
+        return Song(**{f.name: copy.deepcopy(getattr(self, f.name), memo) for f in fields(self)})
+
+
+def hydrate_songs(songs: list[Song]) -> None:
+    """Load heavy fields for all unloaded LazySongs in one loader call per loader."""
+    pending: dict[int, tuple[Any, list[LazySong]]] = {}
+    for song in songs:
+        if isinstance(song, LazySong) and not song.is_hydrated and song._loader is not None:
+            pending.setdefault(id(song._loader), (song._loader, []))[1].append(song)
+    for loader, loader_songs in pending.values():
+        loader(loader_songs)
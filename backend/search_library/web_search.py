@@ -13,6 +13,13 @@ import trafilatura
 from dotenv import load_dotenv
 from trafilatura.meta import reset_caches
 
+from .deadline import call_timeout, time_left_for
+from .metrics import PROVIDER_ERRORS
+from .tracing import propagate, span
+from .log import SAMPLED, get_logger
+
+log = get_logger(__name__)
+
 # --------------------------------------------------------------------------- #
 #  One‑time setup
 # --------------------------------------------------------------------------- #
@@ -24,7 +31,7 @@ _BRAVE_API_KEY: str | None = os.getenv("BRAVE_API_KEY")
 if not _BRAVE_API_KEY:
     raise ValueError("BRAVE_API_KEY env var must be set (see .env.local)")
 
-_BRAVE_ENDPOINT = "https://api.search.brave.com/res/v1/web/search"
+_BRAVE_ENDPOINT = os.getenv("BRAVE_API_URL", "https://api.search.brave.com/res/v1/web/search")
 
 _DEFAULT_HEADERS: dict[str, str] = {
     "User-Agent": (
@@ -54,8 +61,6 @@ def get_google_links(query: str, n: int = 3) -> List[str]:
 
     Retains the original name for backwards compatibility.
     """
-    t0 = time.time()
-
     params = {
         "q": query,
         "count": n,
@@ -65,9 +70,14 @@ def get_google_links(query: str, n: int = 3) -> List[str]:
         "result_filter": "web",  # only canonical web results
     }
 
-    r = _TLS.get(_BRAVE_ENDPOINT, params=params, timeout=10)
-    r.raise_for_status()
-    data: dict = r.json()
+    with span("web_search.brave"):
+        try:
+            r = _TLS.get(_BRAVE_ENDPOINT, params=params, timeout=call_timeout(10))
+            r.raise_for_status()
+        except Exception as exc:
+            PROVIDER_ERRORS.inc(provider="brave", error=type(exc).__name__)
+            raise
+        data: dict = r.json()
 
     links: List[str] = [
         item.get("url")
@@ -75,7 +85,6 @@ def get_google_links(query: str, n: int = 3) -> List[str]:
         if item.get("url")
     ]
 
-    print(f"[PROFILE] get_google_links (Brave): {time.time() - t0:.3f}s")
     return links[:n]
 
 
@@ -87,7 +96,7 @@ def _fetch_clean_text(url: str, timeout: int = 10, max_retries: int = 2) -> Opti
     """Download *url* and return the main article text (or None on failure)."""
     for attempt in range(max_retries):
         try:
-            resp = _TLS.get(url, timeout=timeout, allow_redirects=True)
+            resp = _TLS.get(url, timeout=call_timeout(timeout), allow_redirects=True)
             resp.raise_for_status()
 
             if not resp.text or len(resp.text) < 10:
@@ -99,13 +108,13 @@ def _fetch_clean_text(url: str, timeout: int = 10, max_retries: int = 2) -> Opti
             return txt
 
         except Exception as exc:
-            if attempt == max_retries - 1:
-                print(f"[warn] fetch failed {url[:60]}…: {exc}")
-                return None
+            PROVIDER_ERRORS.inc(provider="web_fetch", error=type(exc).__name__)
             backoff = 1.5 * (attempt + 1) + random.random()
-            print(
-                f"[PROFILE] retry {attempt + 1}/{max_retries - 1}: {type(exc).__name__} for {url[:60]} – sleeping {backoff:.1f}s"
-            )
+            # No retry that would sleep past the request deadline
+            if attempt == max_retries - 1 or not time_left_for(backoff):
+                log.warning("Fetch failed %.60s…: %s", url, exc, extra=SAMPLED)
+                return None
+            log.info("Retry %d/%d: %s for %.60s – sleeping %.1fs", attempt + 1, max_retries - 1, type(exc).__name__, url, backoff, extra=SAMPLED)
             time.sleep(backoff)
 
 
@@ -116,29 +125,29 @@ def _fetch_clean_text(url: str, timeout: int = 10, max_retries: int = 2) -> Opti
 def _parallel_fetch(
     urls: List[str], timeout: int = 10, max_retries: int = 2
 ) -> List[Optional[str]]:
-    t0 = time.time()
     results: List[Optional[str]] = [None] * len(urls)
 
     if not urls:
         return results
 
-    if len(urls) == 1:
-        results[0] = _fetch_clean_text(urls[0], timeout, max_retries)
-    else:
-        max_workers = min(16, len(urls))  # generous for I/O but avoids oversubscription
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            fut_to_idx = {
-                pool.submit(_fetch_clean_text, url, timeout, max_retries): i
-                for i, url in enumerate(urls)
-            }
-            for fut in as_completed(fut_to_idx):
-                idx = fut_to_idx[fut]
-                try:
-                    results[idx] = fut.result()
-                except Exception as exc:  # pragma: no‑cover – defensive guard
-                    print(f"[warn] worker crash on {urls[idx][:60]}: {exc}")
-
-    print(f"[PROFILE] _parallel_fetch: {time.time() - t0:.3f}s for {len(urls)} URLs")
+    with span("web_search.fetch", urls=len(urls)):
+        if len(urls) == 1:
+            results[0] = _fetch_clean_text(urls[0], timeout, max_retries)
+        else:
+            max_workers = min(16, len(urls))  # generous for I/O but avoids oversubscription
+            fetch = propagate(_fetch_clean_text)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                fut_to_idx = {
+                    pool.submit(fetch, url, timeout, max_retries): i
+                    for i, url in enumerate(urls)
+                }
+                for fut in as_completed(fut_to_idx):
+                    idx = fut_to_idx[fut]
+                    try:
+                        results[idx] = fut.result()
+                    except Exception as exc:  # pragma: no‑cover – defensive guard
+                        log.error("Worker crash on %.60s: %s", urls[idx], exc)
+
     return results
 
 
@@ -150,14 +159,12 @@ def search_internet(
     query: str, top_n: int = 5, timeout: int = 15, max_retries: int = 2
 ) -> List[str]:
     """Return list of plain‑text articles for *query* (best‑effort)."""
-    t0 = time.time()
-    links = get_google_links(query, n=top_n)
-    texts = _parallel_fetch(links, timeout=timeout, max_retries=max_retries)
-    reset_caches()  # keep libxml2 heap clean
-    docs = [t for t in texts if t]
-    print(
-        f"[PROFILE] search_internet: {time.time() - t0:.3f}s total (query: '{query}', found {len(docs)} docs)"
-    )
+    with span("web_search") as s:
+        links = get_google_links(query, n=top_n)
+        texts = _parallel_fetch(links, timeout=timeout, max_retries=max_retries)
+        reset_caches()  # keep libxml2 heap clean
+        docs = [t for t in texts if t]
+        s.set(docs=len(docs))
     return docs
 
 
@@ -168,15 +175,12 @@ def search_internet_with_urls(
     max_retries: int = 2,
 ) -> Dict[str, Optional[str]]:
     """Return mapping url -> article_text (first 4k chars)."""
-    t0 = time.time()
-    links = get_google_links(query, n=top_n)
-    texts = _parallel_fetch(links, timeout=timeout, max_retries=max_retries)
-    reset_caches()
-    result = {u: (t[:4000] if t else None) for u, t in zip(links, texts)}
-    ok = sum(1 for v in result.values() if v is not None)
-    print(
-        f"[PROFILE] search_internet_with_urls: {time.time() - t0:.3f}s total (query: '{query}', {ok}/{len(result)} successful)"
-    )
+    with span("web_search") as s:
+        links = get_google_links(query, n=top_n)
+        texts = _parallel_fetch(links, timeout=timeout, max_retries=max_retries)
+        reset_caches()
+        result = {u: (t[:4000] if t else None) for u, t in zip(links, texts)}
+        s.set(docs=sum(1 for v in result.values() if v is not None))
     return result
 
 
@@ -0,0 +1,187 @@
+"""Shaping, serialization and compression of the server-sent event stream.
+
+Search results are converted with `song_to_result`, which copies only the fields the
+frontend renders (never the embedding, lyrics only on request and truncated).
+Events are serialized with orjson when it is installed and compressed per event with
+gzip or brotli, depending on the request's Accept-Encoding. Each event is flushed on
+its own so the client still receives progress updates as they happen.
+"""
+
+import json
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from search_library.log import LazyJSON, get_logger
+from search_library.progress import HEARTBEAT_EVENT_TYPE
+from search_library.types import Song
+
+log = get_logger(__name__)
+
+# Fields sent to the frontend for each result song
+RESULT_FIELDS: tuple[str, ...] = ('id', 'name', 'artists', 'album', 'song_link', 'reasoning')
+
+# Lyrics are not rendered by the frontend; when requested they are cut to this many characters
+DEFAULT_RESULT_LYRICS_CHARS: int = 500
+
+# Preferred content encodings, best first
+SUPPORTED_ENCODINGS: tuple[str, ...] = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def dumps(payload: Any) -> str:
+    """Serialize a JSON payload, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(payload)
+
+
+def song_to_result(song: Song, include_lyrics: bool = False, max_lyrics_chars: Optional[int] = DEFAULT_RESULT_LYRICS_CHARS) -> dict:
+    """
+    Convert a song to the dictionary sent to the frontend.
+
+    Only RESULT_FIELDS are read, so lazy songs are not hydrated unless lyrics are requested.
+
+    Args:
+        song: The result song
+        include_lyrics: Whether to include (truncated) lyrics
+        max_lyrics_chars: Maximum lyric characters to include, or None for the full lyrics
+
+    Returns:
+        The result dictionary
+    """
+    result = {name: getattr(song, name, '') for name in RESULT_FIELDS}
+    # Single artist string for frontend compatibility
+    result['artist'] = ', '.join(song.artists) if song.artists else ''
+    if include_lyrics:
+        lyrics = song.lyrics or ''
+        if max_lyrics_chars is not None and len(lyrics) > max_lyrics_chars:
+            lyrics = lyrics[:max_lyrics_chars].rstrip() + '...'
+        result['lyrics'] = lyrics
+    return result
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content encoding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+@dataclass
+class StreamStats:
+    """Size and serialization cost of one event stream."""
+
+    encoding: Optional[str] = None
+    events: int = 0
+    raw_bytes: int = 0
+    encoded_bytes: int = 0
+    serialize_seconds: float = 0.0
+    compress_seconds: float = 0.0
+    results_raw_bytes: int = 0
+    results_serialize_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'encoding': self.encoding or 'identity',
+            'events': self.events,
+            'raw_bytes': self.raw_bytes,
+            'encoded_bytes': self.encoded_bytes,
+            'compression_ratio': round(self.raw_bytes / self.encoded_bytes, 2) if self.encoded_bytes else None,
+            'serialize_ms': round(self.serialize_seconds * 1000, 2),
+            'compress_ms': round(self.compress_seconds * 1000, 2),
+            'results_raw_bytes': self.results_raw_bytes,
+            'results_serialize_ms': round(self.results_serialize_seconds * 1000, 2),
+        }
+
+
+@dataclass
+class SSEEncoder:
+    """Serializes event payloads to SSE frames and compresses them with a streaming compressor."""
+
+    encoding: Optional[str] = None
+    stats: StreamStats = field(default_factory=StreamStats)
+
+    def __post_init__(self):
+        self.stats.encoding = self.encoding
+        if self.encoding == 'gzip':
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif self.encoding == 'br':
+            self._compressor = brotli.Compressor(quality=5)
+        else:
+            self._compressor = None
+
+    @property
+    def headers(self) -> dict:
+        return {'Content-Encoding': self.encoding, 'Vary': 'Accept-Encoding'} if self.encoding else {}
+
+    def event(self, payload: dict) -> bytes:
+        """Serialize, frame and compress one event; the returned bytes can be decoded on their own."""
+        start = time.perf_counter()
+        if payload.get('type') == HEARTBEAT_EVENT_TYPE:
+            # SSE comment line: keeps the connection alive and is ignored by the client's parser
+            frame = b": heartbeat\n\n"
+        else:
+            frame = f"data: {dumps(payload)}\n\n".encode('utf-8')
+        serialize_seconds = time.perf_counter() - start
+        self.stats.events += 1
+        self.stats.raw_bytes += len(frame)
+        self.stats.serialize_seconds += serialize_seconds
+        if payload.get('type') == 'results':
+            self.stats.results_raw_bytes += len(frame)
+            self.stats.results_serialize_seconds += serialize_seconds
+
+        start = time.perf_counter()
+        if self.encoding == 'gzip':
+            data = self._compressor.compress(frame) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        elif self.encoding == 'br':
+            data = self._compressor.process(frame) + self._compressor.flush()
+        else:
+            data = frame
+        self.stats.compress_seconds += time.perf_counter() - start
+        self.stats.encoded_bytes += len(data)
+        return data
+
+    def finish(self) -> bytes:
+        """Return the bytes that terminate the compressed stream."""
+        if self.encoding == 'gzip':
+            data = self._compressor.flush(zlib.Z_FINISH)
+        elif self.encoding == 'br':
+            data = self._compressor.finish()
+        else:
+            data = b''
+        self.stats.encoded_bytes += len(data)
+        return data
+
+
+async def encode_events(events: AsyncIterator[dict], encoder: SSEEncoder, label: str = 'sse') -> AsyncIterator[bytes]:
+    """Encode an async stream of event payloads and log the stream's size and serialization cost."""
+    try:
+        async for payload in events:
+            yield encoder.event(payload)
+        yield encoder.finish()
+    finally:
+        log.info("Stream payload (%s): %s", label, LazyJSON(encoder.stats.to_dict()))